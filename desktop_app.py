@@ -7,6 +7,7 @@ import json
 import os
 from upbit_bot.trading_bot import UpbitTradingBot, TradingConfig
 from upbit_bot.backtest import EnhancedUpbitBacktest, BacktestConfig
+from upbit_bot.param_search import ParamSpec, get_search_strategy, upbit_evaluator
 from upbit_bot.kimchi_premium import KimchiPremiumCalculator, KimchiPremiumStrategy
 from debug_backtest import DebugUpbitBacktest
 import matplotlib.pyplot as plt
@@ -260,6 +261,10 @@ class UpbitTradingBotGUI:
         opt_controls.pack(fill="x", pady=2)
         
         ttk.Button(opt_controls, text="Find Profitable Boundaries", command=self.optimize_boundaries).pack(side="left", padx=5)
+        ttk.Label(opt_controls, text="Search:").pack(side="left", padx=(5, 0))
+        self.search_mode = tk.StringVar(value="grid")
+        ttk.Combobox(opt_controls, textvariable=self.search_mode, values=["grid", "random", "halving", "tpe"],
+                     state="readonly", width=8).pack(side="left", padx=5)
         ttk.Button(opt_controls, text="Test Multiple Scenarios", command=self.test_scenarios).pack(side="left", padx=5)
         
         # Scenario results
@@ -406,52 +411,52 @@ class UpbitTradingBotGUI:
                 start_dt = datetime.strptime(self.start_date.get(), "%Y-%m-%d")
                 end_dt = datetime.strptime(self.end_date.get(), "%Y-%m-%d")
                 
-                best_params = None
-                best_return = float('-inf')
-                results = []
+                base_config = BacktestConfig(
+                    initial_balance_usd=float(self.initial_balance.get()),
+                    max_trade_amount=float(self.max_trade_amount.get()),
+                    max_trades_per_day=int(self.max_trades_per_day.get())
+                )
+                
+                # Load the history once and backtest every combination on the same data
+                historical_data = EnhancedUpbitBacktest(base_config).load_historical_data(
+                    start_dt, end_dt, use_real_data=self.use_real_data.get(), seed=42)
                 
                 # Test different parameter combinations
-                price_thresholds = [0.1, 0.3, 0.5, 0.7, 1.0, 1.5, 2.0]
-                stop_losses = [1.0, 1.5, 2.0, 3.0, 5.0]
-                take_profits = [0.5, 1.0, 1.5, 2.0, 3.0]
+                space = [
+                    ParamSpec('price_threshold', values=[0.1, 0.3, 0.5, 0.7, 1.0, 1.5, 2.0]),
+                    ParamSpec('stop_loss_threshold', values=[1.0, 1.5, 2.0, 3.0, 5.0]),
+                    ParamSpec('take_profit_threshold', values=[0.5, 1.0, 1.5, 2.0, 3.0])
+                ]
+                search = self.search_mode.get()
+                options = {'n_trials': 40} if search in ('random', 'tpe') else {}
+                strategy = get_search_strategy(search, seed=42, batch_size=5, **options)
+                
+                def report_progress(done, total):
+                    self.queue.put(("optimization_progress", ((done / total) * 100, f"Testing combination {done}/{total}")))
                 
-                total_combinations = len(price_thresholds) * len(stop_losses) * len(take_profits)
-                current = 0
+                with upbit_evaluator(historical_data, base_config, cache_dir='data_cache') as evaluate:
+                    outcome = strategy.run(space, evaluate, report_progress)
                 
-                for threshold in price_thresholds:
-                    for stop_loss in stop_losses:
-                        for take_profit in take_profits:
-                            current += 1
-                            progress = (current / total_combinations) * 100
-                            
-                            self.queue.put(("optimization_progress", (progress, f"Testing combination {current}/{total_combinations}")))
-                            
-                            config = BacktestConfig(
-                                initial_balance_usd=float(self.initial_balance.get()),
-                                max_trade_amount=float(self.max_trade_amount.get()),
-                                price_threshold=threshold,
-                                stop_loss_threshold=stop_loss,
-                                take_profit_threshold=take_profit,
-                                max_trades_per_day=int(self.max_trades_per_day.get())
-                            )
-                            
-                            backtest = EnhancedUpbitBacktest(config)
-                            result = backtest.run_backtest(start_dt, end_dt, use_real_data=self.use_real_data.get())
-                            
-                            result_data = {
-                                'threshold': threshold,
-                                'stop_loss': stop_loss,
-                                'take_profit': take_profit,
-                                'return_pct': result.return_percentage,
-                                'max_drawdown': result.max_drawdown,
-                                'trades': result.total_trades,
-                                'win_rate': result.win_rate
-                            }
-                            results.append(result_data)
-                            
-                            if result.return_percentage > best_return and result.total_trades > 0:
-                                best_return = result.return_percentage
-                                best_params = result_data
+                best_params = None
+                best_return = float('-inf')
+                results = []
+                for trial in outcome.full_trials:
+                    if trial.summary is None:
+                        continue
+                    result_data = {
+                        'threshold': trial.params['price_threshold'],
+                        'stop_loss': trial.params['stop_loss_threshold'],
+                        'take_profit': trial.params['take_profit_threshold'],
+                        'return_pct': trial.summary['return_percentage'],
+                        'max_drawdown': trial.summary['max_drawdown'],
+                        'trades': trial.summary['total_trades'],
+                        'win_rate': trial.summary['win_rate']
+                    }
+                    results.append(result_data)
+                    
+                    if result_data['return_pct'] > best_return and result_data['trades'] > 0:
+                        best_return = result_data['return_pct']
+                        best_params = result_data
                 
                 self.queue.put(("optimization_complete", (best_params, results)))
                 
@@ -20,8 +20,19 @@ logger = logging.getLogger(__name__)
 def run_bot(api_key: Optional[str] = None, secret_key: Optional[str] = None, 
            initial_balance: float = 10000, max_trade_amount: float = 1000, 
            price_threshold: float = 0.5, check_interval: int = 60,
-           virtual_mode: bool = True, max_daily_loss: float = 500):
-    """Run the enhanced trading bot"""
+           virtual_mode: bool = True, max_daily_loss: float = 500,
+           record_path: Optional[str] = None, replay_path: Optional[str] = None,
+           replay_speed: float = 0.0, event_driven: bool = False):
+    """Run the enhanced trading bot
+
+    event_driven reacts to each market data tick on the asyncio runtime, with
+    check_interval as the fallback poll interval when no tick arrives.
+
+    record_path appends every quote the bot reads to a market data log;
+    replay_path runs the bot in virtual mode against such a log instead of the
+    exchanges, at replay_speed times original speed (0 = as fast as possible).
+    """
+    recorder = None
     try:
         # Create trading configuration
         config = TradingConfig(
@@ -32,29 +43,73 @@ def run_bot(api_key: Optional[str] = None, secret_key: Optional[str] = None,
             max_trades_per_day=20
         )
         
+        # Choose where market data comes from
+        sources = {}
+        if replay_path:
+            from upbit_bot.market_replay import MarketDataReplay
+            replay = MarketDataReplay(replay_path, speed=replay_speed or None)
+            sources = {'hub': replay.hub, 'fx': replay.fx, 'clock': replay}
+            virtual_mode = True
+            logger.info(f"Replaying {replay.record_count} observations from {replay_path}")
+        elif record_path:
+            from upbit_bot.market_data_hub import get_market_data_hub
+            from upbit_bot.fx_rate import get_fx_provider
+            from upbit_bot.market_replay import MarketDataRecorder
+            recorder = MarketDataRecorder(record_path)
+            sources = {'hub': recorder.wrap_hub(get_market_data_hub()),
+                       'fx': recorder.wrap_fx(get_fx_provider())}
+            logger.info(f"Recording market data to {record_path}")
+        
         # Create and run bot
         bot = UpbitTradingBot(
             api_key=api_key,
             secret_key=secret_key,
             initial_balance_usd=initial_balance,
             config=config,
-            virtual_mode=virtual_mode
+            virtual_mode=virtual_mode,
+            **sources
         )
         
         logger.info(f"Starting bot in {'virtual' if virtual_mode else 'live'} mode")
         logger.info(f"Configuration: {config}")
         
-        bot.run_bot(check_interval)
+        if event_driven and not replay_path:
+            from upbit_bot.bot_runtime import AsyncRuntimeConfig
+            from upbit_bot.market_data_hub import get_market_data_hub
+            get_market_data_hub().start()  # Background refreshes arrive as ticks
+            asyncio.run(bot.run_bot_async(AsyncRuntimeConfig(poll_interval=check_interval)))
+        else:
+            if event_driven:
+                logger.warning("Replays are paced by the recording; ignoring --event-driven")
+            bot.run_bot(check_interval)
+        
+        if replay_path:
+            latency = bot.decision_latency.summary()
+            print("\n" + "="*60)
+            print("REPLAY RESULTS")
+            print("="*60)
+            print(f"Decisions: {latency['count']}")
+            if latency['count']:
+                print(f"Tick-to-Decision Latency: mean {latency['mean_ms']:.3f} ms | p50 {latency['p50_ms']:.3f} ms | "
+                      f"p99 {latency['p99_ms']:.3f} ms | max {latency['max_ms']:.3f} ms")
+            print(f"Trades: {len(bot.trade_history)}")
+            print(f"Return: {bot.get_performance_summary()['return_percentage']:.2f}%")
+            print("="*60)
         
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
         logger.error(f"Error running bot: {str(e)}")
         sys.exit(1)
+    finally:
+        if recorder is not None:
+            recorder.close()
 
 def run_backtest(start_date: str, end_date: str, initial_balance: float = 10000,
                 max_trade_amount: float = 1000, price_threshold: float = 0.5,
-                use_real_data: bool = False, export_results: bool = False):
+                use_real_data: bool = False, export_results: bool = False,
+                monte_carlo_paths: int = 0, monte_carlo_method: str = 'block_bootstrap',
+                block_length: int = 14):
     """Run enhanced backtest"""
     try:
         # Parse dates
@@ -72,7 +127,8 @@ def run_backtest(start_date: str, end_date: str, initial_balance: float = 10000,
         
         # Run backtest
         backtest = EnhancedUpbitBacktest(config)
-        result = backtest.run_backtest(start_dt, end_dt, use_real_data=use_real_data)
+        historical_data = backtest.load_historical_data(start_dt, end_dt, use_real_data=use_real_data)
+        result = backtest.run_backtest_on_data(historical_data)
         
         # Print results
         print("\n" + "="*60)
@@ -94,6 +150,19 @@ def run_backtest(start_date: str, end_date: str, initial_balance: float = 10000,
         print(f"Average Loss: ${result.average_loss:.2f}")
         print("="*60)
         
+        if monte_carlo_paths > 0:
+            from upbit_bot.monte_carlo import MonteCarloConfig
+            
+            mc_config = MonteCarloConfig(n_paths=monte_carlo_paths, method=monte_carlo_method,
+                                         block_length=block_length)
+            summary = backtest.monte_carlo(historical_data, result, mc_config).summary()
+            returns, drawdowns = summary['return_percentage'], summary['max_drawdown']
+            print(f"\nMONTE CARLO ({monte_carlo_method}, {summary['paths']} paths)")
+            print(f"Return %:     5th {returns['p5']:.2f}% | median {returns['p50']:.2f}% | 95th {returns['p95']:.2f}%")
+            print(f"Max Drawdown: 5th {drawdowns['p5']:.2f}% | median {drawdowns['p50']:.2f}% | 95th {drawdowns['p95']:.2f}%")
+            print(f"Probability of Loss: {summary['probability_of_loss'] * 100:.1f}%")
+            print("="*60)
+        
         # Export results if requested
         if export_results:
             filename = backtest.export_results(result)
@@ -107,7 +176,8 @@ def run_backtest(start_date: str, end_date: str, initial_balance: float = 10000,
         sys.exit(1)
 
 def run_optimization(start_date: str, end_date: str, 
-                    param_ranges: Optional[str] = None):
+                    param_ranges: Optional[str] = None,
+                    search: str = 'grid', n_trials: int = 50):
     """Run parameter optimization"""
     try:
         # Parse dates
@@ -127,7 +197,9 @@ def run_optimization(start_date: str, end_date: str,
         
         # Run optimization
         backtest = EnhancedUpbitBacktest()
-        result = backtest.optimize_parameters(start_dt, end_dt, ranges)
+        search_options = {'n_trials': n_trials} if search in ('random', 'tpe') else {}
+        result = backtest.optimize_parameters(start_dt, end_dt, ranges, cache_dir='data_cache',
+                                              search=search, search_options=search_options)
         
         print("\n" + "="*60)
         print("OPTIMIZATION RESULTS")
@@ -157,6 +229,48 @@ def run_optimization(start_date: str, end_date: str,
         logger.error(f"Error running optimization: {str(e)}")
         sys.exit(1)
 
+def run_walk_forward(start_date: str, end_date: str, train_days: int = 90, test_days: int = 30,
+                     anchored: bool = False, search: str = 'grid', n_trials: int = 50):
+    """Run walk-forward optimization"""
+    try:
+        from upbit_bot.walk_forward import WalkForwardConfig
+        
+        start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+        end_dt = datetime.strptime(end_date, "%Y-%m-%d")
+        ranges = {
+            'price_threshold': (0.1, 2.0, 0.2),
+            'max_trade_amount': (500, 2000, 500),
+            'stop_loss_threshold': (1.0, 5.0, 1.0)
+        }
+        wf_config = WalkForwardConfig(train_period=f"{train_days}D", test_period=f"{test_days}D", anchored=anchored)
+        
+        backtest = EnhancedUpbitBacktest()
+        search_options = {'n_trials': n_trials} if search in ('random', 'tpe') else {}
+        result = backtest.walk_forward(start_dt, end_dt, ranges, wf_config, cache_dir='data_cache',
+                                       search=search, search_options=search_options)
+        summary = result.summary
+        
+        print("\n" + "="*60)
+        print("WALK-FORWARD RESULTS")
+        print("="*60)
+        for fold in result.folds:
+            test_return = fold.test_summary['return_percentage'] if fold.test_summary else float('nan')
+            print(f"Fold {fold.fold.index + 1}: test {fold.test_range[0]:%Y-%m-%d} to {fold.test_range[1]:%Y-%m-%d} | "
+                  f"train {fold.train_score:.2f}% -> test {test_return:.2f}% | {fold.best_params}")
+        print("-"*60)
+        print(f"Out-of-Sample Return: {summary['oos_return_percentage']:.2f}%")
+        print(f"Out-of-Sample Max Drawdown: {summary['oos_max_drawdown']:.2f}%")
+        print(f"Out-of-Sample Sharpe Ratio: {summary['oos_sharpe_ratio']:.2f}")
+        print(f"Mean Train / Test Return: {summary['mean_train_score']:.2f}% / {summary['mean_test_return']:.2f}%")
+        print(f"Profitable Test Folds: {summary['profitable_test_folds']}/{summary['tested_folds']}")
+        print("="*60)
+        
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error running walk-forward optimization: {str(e)}")
+        sys.exit(1)
+
 def run_web(host: str = "0.0.0.0", port: int = 8000, debug: bool = False):
     """Run the enhanced web interface"""
     try:
@@ -185,6 +299,10 @@ Examples:
   # Run virtual trading bot
   python main.py bot --virtual --initial-balance 10000
   
+  # Record a virtual session's market data, then replay it as fast as possible
+  python main.py bot --virtual --record session.mdlog
+  python main.py bot --replay session.mdlog --check-interval 60
+  
   # Run live trading bot
   python main.py bot --api-key YOUR_KEY --secret-key YOUR_SECRET
   
@@ -193,6 +311,9 @@ Examples:
   
   # Run optimization
   python main.py optimize --start-date 2023-01-01 --end-date 2023-06-30
+  
+  # Run walk-forward optimization (out-of-sample evaluation)
+  python main.py walkforward --start-date 2022-01-01 --end-date 2023-12-31 --train-days 90 --test-days 30
         """
     )
     
@@ -220,6 +341,14 @@ Examples:
                           help='Run in virtual mode (default if no API keys)')
     bot_parser.add_argument('--max-daily-loss', type=float, default=500,
                           help='Maximum daily loss limit in USD')
+    bot_parser.add_argument('--record', metavar='PATH',
+                          help='Append every quote the bot reads to a market data log')
+    bot_parser.add_argument('--replay', metavar='PATH',
+                          help='Run in virtual mode against a recorded market data log')
+    bot_parser.add_argument('--replay-speed', type=float, default=0.0,
+                          help='Replay speed multiplier (0 = as fast as possible)')
+    bot_parser.add_argument('--event-driven', action='store_true',
+                          help='Decide on every market data tick instead of polling each check interval')
     
     # Backtest command
     backtest_parser = subparsers.add_parser('backtest', help='Run backtest')
@@ -237,6 +366,13 @@ Examples:
                                help='Use real historical data from Upbit')
     backtest_parser.add_argument('--export', action='store_true',
                                help='Export results to JSON file')
+    backtest_parser.add_argument('--monte-carlo', type=int, default=0, metavar='PATHS',
+                               help='Resample the run this many times for return/drawdown distributions')
+    backtest_parser.add_argument('--monte-carlo-method', default='block_bootstrap',
+                               choices=['block_bootstrap', 'permutation', 'trade_bootstrap'],
+                               help='Resampling method (default: block_bootstrap)')
+    backtest_parser.add_argument('--block-length', type=int, default=14,
+                               help='Bars per bootstrap block (default: 14)')
     
     # Optimize command
     optimize_parser = subparsers.add_parser('optimize', help='Optimize parameters')
@@ -246,6 +382,29 @@ Examples:
                                help='End date (YYYY-MM-DD)')
     optimize_parser.add_argument('--param-ranges', 
                                help='Parameter ranges as JSON string')
+    optimize_parser.add_argument('--search', default='grid',
+                               choices=['grid', 'random', 'halving', 'tpe'],
+                               help='Search strategy (default: grid)')
+    optimize_parser.add_argument('--n-trials', type=int, default=50,
+                               help='Evaluations for random and tpe search')
+    
+    # Walk-forward command
+    walkforward_parser = subparsers.add_parser('walkforward', help='Walk-forward optimization')
+    walkforward_parser.add_argument('--start-date', required=True,
+                                  help='Start date (YYYY-MM-DD)')
+    walkforward_parser.add_argument('--end-date', required=True,
+                                  help='End date (YYYY-MM-DD)')
+    walkforward_parser.add_argument('--train-days', type=int, default=90,
+                                  help='Length of each training window in days')
+    walkforward_parser.add_argument('--test-days', type=int, default=30,
+                                  help='Length of each out-of-sample test window in days')
+    walkforward_parser.add_argument('--anchored', action='store_true',
+                                  help='Grow the training window from the start date instead of rolling it')
+    walkforward_parser.add_argument('--search', default='grid',
+                                  choices=['grid', 'random', 'halving', 'tpe'],
+                                  help='Search strategy for each training window (default: grid)')
+    walkforward_parser.add_argument('--n-trials', type=int, default=50,
+                                  help='Evaluations for random and tpe search')
     
     # Parse arguments
     args = parser.parse_args()
@@ -272,7 +431,11 @@ Examples:
             price_threshold=args.price_threshold,
             check_interval=args.check_interval,
             virtual_mode=virtual_mode,
-            max_daily_loss=args.max_daily_loss
+            max_daily_loss=args.max_daily_loss,
+            record_path=args.record,
+            replay_path=args.replay,
+            replay_speed=args.replay_speed,
+            event_driven=args.event_driven
         )
     elif args.command == 'backtest':
         run_backtest(
@@ -282,13 +445,28 @@ Examples:
             max_trade_amount=args.max_trade_amount,
             price_threshold=args.price_threshold,
             use_real_data=args.use_real_data,
-            export_results=args.export
+            export_results=args.export,
+            monte_carlo_paths=args.monte_carlo,
+            monte_carlo_method=args.monte_carlo_method,
+            block_length=args.block_length
         )
     elif args.command == 'optimize':
         run_optimization(
             start_date=args.start_date,
             end_date=args.end_date,
-            param_ranges=args.param_ranges
+            param_ranges=args.param_ranges,
+            search=args.search,
+            n_trials=args.n_trials
+        )
+    elif args.command == 'walkforward':
+        run_walk_forward(
+            start_date=args.start_date,
+            end_date=args.end_date,
+            train_days=args.train_days,
+            test_days=args.test_days,
+            anchored=args.anchored,
+            search=args.search,
+            n_trials=args.n_trials
         )
 
 if __name__ == "__main__":
@@ -5,61 +5,91 @@ This script finds the best entry and exit premium thresholds
 for the Bitcoin kimchi premium arbitrage strategy
 """
 
+import os
+import argparse
 import logging
+from dataclasses import replace
 from datetime import datetime, timedelta
 from upbit_bot.bitcoin_backtest import BitcoinBacktester, BitcoinBacktestConfig
+from upbit_bot.parallel_sweep import run_parallel_sweep
+from upbit_bot.param_search import ParamSpec, bitcoin_evaluator, get_search_strategy
+from upbit_bot.walk_forward import WalkForwardConfig
 import pandas as pd
 import numpy as np
 from itertools import product
 
+# Candles are cached here so every combination reuses the same downloaded history
+DATA_CACHE_DIR = 'data_cache'
+
+# Dimensions explored by the non-grid search modes; high is exclusive, so each
+# range ends one step past its last value (-0.5, 4.0, 0.5, 3.0 and 0.3)
+SEARCH_SPACE = [
+    ParamSpec('entry_premium_threshold', -4.0, -0.5 + 0.25, 0.25, decimals=2),
+    ParamSpec('exit_profit_threshold', 0.5, 4.0 + 0.25, 0.25, decimals=2),
+    ParamSpec('position_portion', 0.1, 0.5 + 0.05, 0.05, decimals=2),
+    ParamSpec('leverage_multiplier', 1.0, 3.0 + 0.5, 0.5, decimals=2),
+    ParamSpec('max_position_size_btc', 0.05, 0.3 + 0.05, 0.05, decimals=2),
+]
+
 # Configure logging
 logging.basicConfig(
     level=logging.WARNING,  # Set to WARNING to reduce output during optimization
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-def run_single_backtest(entry_threshold: float, exit_threshold: float, 
-                       start_date: str, end_date: str, silent: bool = True):
-    """Run a single backtest with given thresholds"""
-    try:
-        # Create configuration
-        config = BitcoinBacktestConfig(
-                    initial_balance_krw=13_500_000,
+def valid_thresholds(params: dict) -> bool:
+    """Entry must be a negative premium and exit a positive profit"""
+    return params['entry_premium_threshold'] < 0 < params['exit_profit_threshold']
+
+def make_base_config() -> BitcoinBacktestConfig:
+    """Starting balances, fees and data cache shared by every optimization run"""
+    return BitcoinBacktestConfig(
+        initial_balance_krw=13_500_000,
         initial_balance_usdt=5_000,
-            initial_btc=0.0,
-            entry_premium_threshold=entry_threshold,
-            exit_profit_threshold=exit_threshold,
-            max_position_size_btc=0.1,
-            upbit_commission=0.0025,
-            binance_commission=0.001,
-            slippage_rate=0.001
-        )
-        
-        # Create backtester
-        backtester = BitcoinBacktester(config)
-        
-        # Run backtest
-        results = backtester.run_backtest(start_date, end_date)
-        
-        if 'error' in results:
-            return None
-            
-        return {
-            'entry_threshold': entry_threshold,
-            'exit_threshold': exit_threshold,
-            'return_percentage': results['return_percentage'],
-            'total_trades': results['total_trades'],
-            'total_return_krw': results['total_return_krw'],
-            'final_value_krw': results['final_value_krw']
-        }
-        
-    except Exception as e:
-        if not silent:
-            print(f"Error with thresholds {entry_threshold}/{exit_threshold}: {e}")
-        return None
+        initial_btc=0.0,
+        max_position_size_btc=0.1,
+        upbit_commission=0.0025,
+        binance_commission=0.001,
+        slippage_rate=0.001,
+        data_cache_dir=DATA_CACHE_DIR
+    )
 
-def optimize_thresholds():
-    """Find optimal entry and exit thresholds"""
+def search_parameters(market_data: pd.DataFrame, base_config: BitcoinBacktestConfig,
+                      search: str, n_trials: int):
+    """Explore SEARCH_SPACE with a random, successive-halving or TPE search"""
+    options = {'n_trials': n_trials} if search in ('random', 'tpe') else {}
+    strategy = get_search_strategy(
+        search,
+        constraint=valid_thresholds,
+        seed=42,
+        **options
+    )
+    
+    def report(done, total):
+        print(f"Progress: {done}/{total} evaluations")
+    
+    # Only batchable fields vary, so each request is simulated in one pass
+    evaluate = bitcoin_evaluator(market_data, replace(base_config, use_vectorized_engine=True))
+    outcome = strategy.run(SEARCH_SPACE, evaluate, report)
+    
+    results = []
+    for trial in outcome.full_trials:
+        if trial.summary:
+            results.append({
+                'entry_threshold': trial.params['entry_premium_threshold'],
+                'exit_threshold': trial.params['exit_profit_threshold'],
+                'position_portion': trial.params['position_portion'],
+                'leverage_multiplier': trial.params['leverage_multiplier'],
+                'max_position_size_btc': trial.params['max_position_size_btc'],
+                'return_percentage': trial.summary['return_percentage'],
+                'total_trades': trial.summary['total_trades'],
+                'total_return_krw': trial.summary['total_return_krw'],
+                'final_value_krw': trial.summary['final_value_krw']
+            })
+    return results
+
+def optimize_thresholds(search: str = 'grid', n_trials: int = 60):
+    """Find optimal entry and exit thresholds (and, for non-grid searches, sizing and leverage)"""
     
     # Define parameter ranges
     entry_thresholds = [-0.5, -1.0, -1.5, -2.0, -2.5, -3.0, -3.5, -4.0]
@@ -75,27 +105,53 @@ def optimize_thresholds():
     print(f"Period: {start_date} to {end_date}")
     print(f"Entry thresholds to test: {entry_thresholds}")
     print(f"Exit thresholds to test: {exit_thresholds}")
-    print(f"Total combinations: {len(entry_thresholds) * len(exit_thresholds)}")
+    if search == 'grid':
+        print(f"Total combinations: {len(entry_thresholds) * len(exit_thresholds)}")
+    else:
+        print(f"Search: {search} over {', '.join(spec.name for spec in SEARCH_SPACE)}")
     print(f"{'='*60}\n")
     
-    # Test all combinations
-    results = []
-    total_combinations = len(entry_thresholds) * len(exit_thresholds)
-    current = 0
-    
-    print("Running backtests...")
-    for entry, exit in product(entry_thresholds, exit_thresholds):
-        current += 1
-        if current % 10 == 0:
-            print(f"Progress: {current}/{total_combinations} ({current/total_combinations*100:.1f}%)")
-        
+    # Load market data once; workers share it read-only through shared memory
+    base_config = make_base_config()
+    market_data = BitcoinBacktester(base_config).fetch_historical_data(start_date, end_date)
+    if market_data.empty:
+        print("No historical data available")
+        return []
+    
+    if search != 'grid':
+        results = search_parameters(market_data, base_config, search, n_trials)
+    else:
         # Skip invalid combinations (entry should be negative, exit positive)
-        if entry >= 0 or exit <= 0 or entry >= exit:
-            continue
+        param_grid = [
+            {'entry_premium_threshold': entry, 'exit_profit_threshold': exit}
+            for entry, exit in product(entry_thresholds, exit_thresholds)
+            if not (entry >= 0 or exit <= 0 or entry >= exit)
+        ]
+        
+        # Test all combinations across every core, collecting results as they finish
+        results = []
+        total_combinations = len(param_grid)
+        current = 0
+        
+        print(f"Running backtests on {os.cpu_count()} cores...")
+        for params, summary in run_parallel_sweep(market_data, param_grid, base_config):
+            current += 1
+            if current % 10 == 0:
+                print(f"Progress: {current}/{total_combinations} ({current/total_combinations*100:.1f}%)")
             
-        result = run_single_backtest(entry, exit, start_date, end_date)
-        if result:
-            results.append(result)
+            if summary:
+                results.append({
+                    'entry_threshold': params['entry_premium_threshold'],
+                    'exit_threshold': params['exit_profit_threshold'],
+                    'return_percentage': summary['return_percentage'],
+                    'total_trades': summary['total_trades'],
+                    'total_return_krw': summary['total_return_krw'],
+                    'final_value_krw': summary['final_value_krw']
+                })
+    
+    if not results:
+        print("No successful backtests")
+        return []
     
     # Sort by return percentage
     results.sort(key=lambda x: x['return_percentage'], reverse=True)
@@ -119,6 +175,9 @@ def optimize_thresholds():
     print(f"{'='*60}")
     print(f"Entry Threshold: {best['entry_threshold']}%")
     print(f"Exit Threshold: {best['exit_threshold']}%")
+    for key in ('position_portion', 'leverage_multiplier', 'max_position_size_btc'):
+        if key in best:
+            print(f"{key}: {best[key]}")
     print(f"Annual Return: {best['return_percentage']:.2f}%")
     print(f"Total Trades: {best['total_trades']}")
     print(f"Total Return: ₩{best['total_return_krw']:,.0f}")
@@ -188,5 +247,55 @@ def optimize_thresholds():
     
     return results
 
+def walk_forward_thresholds(search: str = 'grid', n_trials: int = 60,
+                            train_days: int = 60, test_days: int = 14):
+    """Re-optimize on rolling training windows and report each following test window"""
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    start_date = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
+    
+    print(f"\n{'='*60}")
+    print("BITCOIN ARBITRAGE WALK-FORWARD OPTIMIZATION")
+    print(f"{'='*60}")
+    print(f"Period: {start_date} to {end_date}")
+    print(f"Train/test windows: {train_days}/{test_days} days, {search} search")
+    print(f"{'='*60}\n")
+    
+    space = SEARCH_SPACE[:2] if search == 'grid' else SEARCH_SPACE
+    options = {'n_trials': n_trials} if search in ('random', 'tpe') else {}
+    options['constraint'] = valid_thresholds
+    wf_config = WalkForwardConfig(train_period=f"{train_days}D", test_period=f"{test_days}D")
+    
+    try:
+        result = BitcoinBacktester(make_base_config()).walk_forward(
+            start_date, end_date, space, wf_config, search=search, search_options=options)
+    except ValueError as e:
+        print(str(e))
+        return None
+    
+    for fold in result.folds:
+        test_return = fold.test_summary['return_percentage'] if fold.test_summary else float('nan')
+        params = ', '.join(f"{name}={value}" for name, value in fold.best_params.items())
+        print(f"{fold.test_range[0]:%Y-%m-%d} to {fold.test_range[1]:%Y-%m-%d}: "
+              f"train {fold.train_score:7.2f}% | test {test_return:7.2f}% | {params}")
+    
+    summary = result.summary
+    print(f"\nOut-of-sample return: {summary['oos_return_percentage']:.2f}% "
+          f"(max drawdown {summary['oos_max_drawdown']:.2f}%)")
+    print(f"Mean train return: {summary['mean_train_score']:.2f}%, mean test return: {summary['mean_test_return']:.2f}%")
+    print(f"Profitable test windows: {summary['profitable_test_folds']}/{summary['tested_folds']}")
+    return result
+
 if __name__ == "__main__":
-    optimize_thresholds() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Optimize Bitcoin arbitrage parameters")
+    parser.add_argument('--search', default='grid', choices=['grid', 'random', 'halving', 'tpe'],
+                        help="grid: entry/exit thresholds only; others also tune sizing and leverage")
+    parser.add_argument('--n-trials', type=int, default=60, help="Evaluations for random and tpe search")
+    parser.add_argument('--walk-forward', action='store_true',
+                        help="Optimize on rolling training windows and evaluate out of sample")
+    parser.add_argument('--train-days', type=int, default=60, help="Walk-forward training window (days)")
+    parser.add_argument('--test-days', type=int, default=14, help="Walk-forward test window (days)")
+    args = parser.parse_args()
+    if args.walk_forward:
+        walk_forward_thresholds(args.search, args.n_trials, args.train_days, args.test_days)
+    else:
+        optimize_thresholds(args.search, args.n_trials)
\ No newline at end of file
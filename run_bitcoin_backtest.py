@@ -31,7 +31,8 @@ def main():
         binance_commission=0.001,        # 0.1%
         slippage_rate=0.001,             # 0.1%
         use_scaled_strategy=True,        # Use scaled entry/exit strategy
-        position_portion=0.25            # 25% of capital per position
+        position_portion=0.25,           # 25% of capital per position
+        data_cache_dir='data_cache'      # Reuse previously downloaded candles
     )
     
     # Create backtester
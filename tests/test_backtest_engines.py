@@ -0,0 +1,113 @@
+"""Vectorized and batched backtest engines against the row-by-row loops"""
+
+from dataclasses import asdict, replace
+import numpy as np
+import pandas as pd
+import pytest
+
+from upbit_bot.backtest import ArbitrageStrategy, BacktestConfig, EnhancedUpbitBacktest
+from upbit_bot.batch_backtest import simulate_frame_batch, simulate_upbit_paths
+from upbit_bot.bitcoin_backtest import BitcoinBacktestConfig, BitcoinBacktester
+
+SUMMARY_KEYS = ['final_balance_krw', 'final_balance_usdt', 'final_balance_btc',
+                'final_value_krw', 'return_percentage', 'total_trades', 'open_positions']
+
+
+def bitcoin_frame(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    binance = 40000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    fx = 1350 + np.cumsum(rng.normal(0, 1, n))
+    premium = np.cumsum(rng.normal(0, 0.4, n))
+    premium -= premium.mean()
+    df = pd.DataFrame({'binance_close': binance, 'upbit_close': binance * fx * (1 + premium / 100),
+                       'usd_krw_rate': fx}, index=pd.date_range('2024-01-01', periods=n, freq='h'))
+    binance_krw = df['binance_close'] * df['usd_krw_rate']
+    df['kimchi_premium'] = (df['upbit_close'] - binance_krw) / binance_krw * 100
+    return df
+
+
+def upbit_frame(n: int, seed: int, freq: str = 'h') -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    rate = 1300 + np.cumsum(rng.normal(0, 2, n))
+    price = rate * (1 + rng.normal(0.5, 1.5, n) / 100)
+    price[rng.integers(0, n, 5)] = np.nan
+    return pd.DataFrame({'datetime': pd.date_range('2024-01-01', periods=n, freq=freq),
+                         'usd_krw_rate': rate, 'usdt_krw_price': price, 'volume': 1.0})
+
+
+@pytest.mark.parametrize('scaled', [True, False])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_bitcoin_vectorized_engine_matches_loop(scaled, seed):
+    df = bitcoin_frame(2000, seed)
+    config = BitcoinBacktestConfig(use_scaled_strategy=scaled, entry_premium_threshold=-0.5)
+    loop = BitcoinBacktester(replace(config, use_vectorized_engine=False)).simulate_trades(df)
+    vectorized = BitcoinBacktester(replace(config, use_vectorized_engine=True)).simulate_trades(df)
+
+    for key in SUMMARY_KEYS:
+        assert vectorized[key] == pytest.approx(loop[key], rel=1e-12, abs=1e-9), key
+    assert vectorized['trades'] == loop['trades']
+    np.testing.assert_allclose([bar['total_value_krw'] for bar in vectorized['balance_history']],
+                               [bar['total_value_krw'] for bar in loop['balance_history']])
+
+
+@pytest.mark.parametrize('scaled', [True, False])
+def test_config_batch_matches_single_runs(scaled):
+    df = bitcoin_frame(3000, 7)
+    configs = [BitcoinBacktestConfig(use_scaled_strategy=scaled, entry_premium_threshold=entry,
+                                     exit_profit_threshold=exit_, position_portion=portion,
+                                     leverage_multiplier=leverage)
+               for entry in (-2.0, -1.0, -0.5) for exit_ in (0.5, 2.0)
+               for portion in (0.1, 0.25) for leverage in (1.0, 2.0)]
+
+    batch = simulate_frame_batch(df, configs)
+
+    assert len(batch) == len(configs)
+    for config, summary in zip(configs, batch):
+        single = BitcoinBacktester(replace(config, use_vectorized_engine=False)).simulate_trades(df)
+        for key in SUMMARY_KEYS:
+            assert summary[key] == pytest.approx(single[key], rel=1e-9, abs=1e-6), key
+
+
+def test_config_batch_rejects_differing_shared_fields():
+    df = bitcoin_frame(100, 0)
+    configs = [BitcoinBacktestConfig(), BitcoinBacktestConfig(upbit_commission=0.01)]
+    with pytest.raises(ValueError):
+        simulate_frame_batch(df, configs)
+
+
+@pytest.mark.parametrize('overrides', [
+    {},
+    {'max_trades_per_day': 2},
+    {'initial_balance_krw': 5e6, 'buy_threshold': -0.5, 'sell_threshold': 0.5},
+])
+@pytest.mark.parametrize('seed', [0, 1])
+def test_upbit_vectorized_engine_matches_loop(overrides, seed):
+    df = upbit_frame(1500, seed)
+    results = []
+    for vectorized in (False, True):
+        config = BacktestConfig(use_vectorized_engine=vectorized, **overrides)
+        results.append(EnhancedUpbitBacktest(config, ArbitrageStrategy(config)).run_backtest_on_data(df))
+    loop, fast = results
+
+    assert [asdict(trade) for trade in fast.trades] == [asdict(trade) for trade in loop.trades]
+    assert fast.return_percentage == loop.return_percentage
+    assert fast.max_drawdown == loop.max_drawdown
+    np.testing.assert_array_equal(fast.equity_curve, loop.equity_curve)
+
+
+def test_upbit_path_batch_matches_engine():
+    n, paths = 24 * 30, 8
+    times = pd.date_range('2024-01-01', periods=n, freq='h')
+    rng = np.random.default_rng(3)
+    fx = 1300 * np.exp(np.cumsum(rng.normal(0, 0.001, (n, paths)), axis=0))
+    usdt = fx * (1 + rng.normal(1.0, 1.2, (n, paths)) / 100)
+    config = BacktestConfig(use_vectorized_engine=True, max_trades_per_day=3)
+
+    returns, drawdowns = simulate_upbit_paths(config, times, fx, usdt)
+
+    backtest = EnhancedUpbitBacktest(config, ArbitrageStrategy(config))
+    for path in range(paths):
+        result = backtest.run_backtest_on_data(pd.DataFrame(
+            {'datetime': times, 'usd_krw_rate': fx[:, path], 'usdt_krw_price': usdt[:, path]}))
+        assert returns[path] == pytest.approx(result.return_percentage, abs=1e-9)
+        assert drawdowns[path] == pytest.approx(result.max_drawdown, abs=1e-9)
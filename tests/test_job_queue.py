@@ -0,0 +1,154 @@
+"""Persistent job queue: result reuse and requeue after a restart"""
+
+import asyncio
+
+import pytest
+
+from upbit_bot.job_queue import Job, JobQueue, JobQueueConfig, JobStore, job_spec_key
+
+
+async def wait_for(queue, job_id, status='succeeded'):
+    for _ in range(500):
+        if queue.get(job_id).status == status:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+
+def make_queue(directory, runs, reusable=None):
+    queue = JobQueue(JobQueueConfig(parallelism=1, directory=str(directory)))
+
+    async def runner(spec):
+        runs.append(spec)
+        return {'value': spec['x'] * 2, 'live': spec.get('live', False)}
+
+    queue.register('double', runner, reusable)
+    return queue
+
+
+def test_identical_submit_reuses_the_result(tmp_path):
+    runs = []
+
+    async def scenario():
+        queue = make_queue(tmp_path, runs)
+        await queue.start()
+        job, reused = await queue.submit('double', {'x': 2})
+        await wait_for(queue, job.job_id)
+        again, reused_again = await queue.submit('double', {'x': 2})
+        result = await queue.result(job.job_id)
+        await queue.stop()
+        return job, reused, again, reused_again, result
+
+    job, reused, again, reused_again, result = asyncio.run(scenario())
+
+    assert not reused and reused_again and again.job_id == job.job_id
+    assert result == {'value': 4, 'live': False}
+    assert len(runs) == 1
+
+
+def test_reuse_can_be_declined(tmp_path):
+    runs = []
+
+    async def scenario():
+        queue = make_queue(tmp_path, runs)
+        await queue.start()
+        job, _ = await queue.submit('double', {'x': 2})
+        await wait_for(queue, job.job_id)
+        rerun, reused = await queue.submit('double', {'x': 2}, reuse_result=False)
+        await wait_for(queue, rerun.job_id)
+        await queue.stop()
+        return job, rerun, reused
+
+    job, rerun, reused = asyncio.run(scenario())
+
+    assert not reused and rerun.job_id != job.job_id
+    assert len(runs) == 2
+
+
+def test_results_marked_not_reusable_are_recomputed(tmp_path):
+    runs = []
+
+    async def scenario():
+        queue = make_queue(tmp_path, runs, reusable=lambda spec, result: not result['live'])
+        await queue.start()
+        live, _ = await queue.submit('double', {'x': 1, 'live': True})
+        await wait_for(queue, live.job_id)
+        fixed, _ = await queue.submit('double', {'x': 1})
+        await wait_for(queue, fixed.job_id)
+        live_again, live_reused = await queue.submit('double', {'x': 1, 'live': True})
+        await wait_for(queue, live_again.job_id)
+        _, fixed_reused = await queue.submit('double', {'x': 1})
+        await queue.stop()
+        return live, live_reused, fixed_reused
+
+    live, live_reused, fixed_reused = asyncio.run(scenario())
+
+    assert not live.reusable
+    assert not live_reused and fixed_reused
+    assert len(runs) == 3
+
+
+def test_unknown_kind_is_rejected(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path, [])
+        await queue.start()
+        try:
+            await queue.submit('triple', {'x': 1})
+        finally:
+            await queue.stop()
+
+    with pytest.raises(KeyError):
+        asyncio.run(scenario())
+
+
+def test_unfinished_jobs_are_requeued_on_start(tmp_path):
+    store = JobStore(str(tmp_path))
+    interrupted = Job('a' * 32, 'double', {'x': 3}, job_spec_key('double', {'x': 3}), status='running',
+                      started_at='2024-01-01T00:00:00')
+    waiting = Job('b' * 32, 'double', {'x': 4}, job_spec_key('double', {'x': 4}))
+    store.save(interrupted)
+    store.save(waiting)
+    runs = []
+
+    async def scenario():
+        queue = make_queue(tmp_path, runs)
+        await queue.start()
+        await wait_for(queue, interrupted.job_id)
+        await wait_for(queue, waiting.job_id)
+        results = [await queue.result(job_id) for job_id in (interrupted.job_id, waiting.job_id)]
+        await queue.stop()
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert [result['value'] for result in results] == [6, 8]
+    assert sorted(spec['x'] for spec in runs) == [3, 4]
+    reloaded = JobStore(str(tmp_path)).load()
+    assert all(job.status == 'succeeded' for job in reloaded.values())
+
+
+def test_failed_jobs_are_not_reused(tmp_path):
+    attempts = []
+
+    async def scenario():
+        queue = JobQueue(JobQueueConfig(parallelism=1, directory=str(tmp_path)))
+
+        async def flaky(spec):
+            attempts.append(spec)
+            if len(attempts) == 1:
+                raise RuntimeError('exchange unavailable')
+            return {'ok': True}
+
+        queue.register('flaky', flaky)
+        await queue.start()
+        failed, _ = await queue.submit('flaky', {})
+        await wait_for(queue, failed.job_id, 'failed')
+        retry, reused = await queue.submit('flaky', {})
+        await wait_for(queue, retry.job_id)
+        await queue.stop()
+        return failed, reused
+
+    failed, reused = asyncio.run(scenario())
+
+    assert failed.error == 'exchange unavailable'
+    assert not reused and len(attempts) == 2
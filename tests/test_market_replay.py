@@ -0,0 +1,109 @@
+"""Market data log recording, reading and replay"""
+
+import os
+
+import pytest
+
+from upbit_bot import market_replay
+from upbit_bot.fx_rate import FXQuote
+from upbit_bot.market_replay import MarketDataRecorder, MarketDataReplay, read_market_log
+from upbit_bot.order_book import OrderBook
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(market_replay.time, 'time', fake)
+    return fake
+
+
+def ticker(last):
+    return {'last': last, 'bid': last - 1, 'ask': None, 'baseVolume': 3.0, 'timestamp': 5}
+
+
+def record_session(path, clock):
+    with MarketDataRecorder(path) as recorder:
+        recorder.record_ticker('Upbit', 'USDT/KRW', ticker(1390.0))
+        clock.now += 1
+        recorder.record_order_book('binance', 'BTC/USDT', OrderBook.from_ccxt(
+            {'bids': [[100, 1], [99, 2]], 'asks': [[101, 3]], 'nonce': 9, 'timestamp': 1234}))
+        clock.now += 1
+        recorder.record_fx(FXQuote(1380.0, 'test', clock.now))
+        clock.now += 10
+        recorder.record_ticker('upbit', 'USDT/KRW', ticker(1400.0))
+
+
+def test_log_round_trip(tmp_path, clock):
+    path = str(tmp_path / 'market.mdlog')
+    record_session(path, clock)
+
+    records = list(read_market_log(path))
+
+    assert [(r.kind, r.exchange, r.symbol) for r in records] == [
+        ('ticker', 'upbit', 'USDT/KRW'), ('order_book', 'binance', 'BTC/USDT'),
+        ('fx', 'test', 'USD/KRW'), ('ticker', 'upbit', 'USDT/KRW')]
+    assert records[0].value['last'] == 1390.0 and records[0].value['ask'] is None
+    assert records[1].value.top(10)['bids'] == [[100, 1], [99, 2]]
+    assert records[1].value.nonce == 9 and records[1].value.timestamp == 1234
+    assert records[2].value.rate == 1380.0
+    assert records[3].observed_at - records[0].observed_at == 12
+
+
+def test_same_cached_value_is_recorded_once(tmp_path, clock):
+    path = str(tmp_path / 'market.mdlog')
+    value = ticker(1390.0)
+    with MarketDataRecorder(path) as recorder:
+        recorder.record_ticker('upbit', 'USDT/KRW', value)
+        recorder.record_ticker('upbit', 'USDT/KRW', value)
+
+    assert len(list(read_market_log(path))) == 1
+
+
+def test_reopening_drops_a_partial_record_and_appends(tmp_path, clock):
+    path = str(tmp_path / 'market.mdlog')
+    record_session(path, clock)
+    complete = os.path.getsize(path)
+    with open(path, 'ab') as f:
+        f.write(b'\x01\x00\x00')  # Header cut off by a crash
+
+    with MarketDataRecorder(path) as recorder:
+        clock.now += 1
+        recorder.record_ticker('upbit', 'USDT/KRW', ticker(1410.0))
+
+    records = list(read_market_log(path))
+    assert os.path.getsize(path) > complete
+    assert len(records) == 5
+    assert records[-1].value['last'] == 1410.0
+
+
+def test_replay_starts_once_every_channel_is_visible(tmp_path, clock):
+    path = str(tmp_path / 'market.mdlog')
+    record_session(path, clock)
+
+    replay = MarketDataReplay(path, speed=None)
+
+    assert replay.hub.get_ticker('upbit', 'USDT/KRW')['last'] == 1390.0
+    assert replay.hub.get_order_book('binance', 'BTC/USDT').best_bid == 100
+    assert replay.fx.get_quote().source == 'test'
+    assert replay.sleep(10)
+    assert replay.hub.get_ticker('upbit', 'USDT/KRW')['last'] == 1400.0
+    assert replay.finished and not replay.sleep(1)
+
+    replay.restart()
+    assert replay.hub.get_ticker('upbit', 'USDT/KRW')['last'] == 1390.0
+
+
+def test_replay_rejects_an_empty_log(tmp_path, clock):
+    path = str(tmp_path / 'empty.mdlog')
+    MarketDataRecorder(path).close()
+
+    with pytest.raises(ValueError):
+        MarketDataReplay(path)
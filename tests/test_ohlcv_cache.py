@@ -0,0 +1,61 @@
+"""OHLCVCache downloads only the candles it does not already hold"""
+
+import numpy as np
+
+from upbit_bot.ohlcv_cache import OHLCVCache, timeframe_to_ms
+
+HOUR = timeframe_to_ms('1h')
+START = 1_704_067_200_000  # 2024-01-01 00:00 UTC, long since complete
+
+
+class FakeExchange:
+    """fetch_span that serves hourly candles and records the requested spans"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, since, until):
+        self.calls.append((since, until))
+        return [[ts, 1.0, 2.0, 0.5, ts / HOUR, 10.0] for ts in range(since, until, HOUR)]
+
+
+def test_first_request_fetches_the_whole_range(tmp_path):
+    cache, fetch = OHLCVCache(str(tmp_path)), FakeExchange()
+
+    candles = cache.get_range('binance', 'BTC/USDT', '1h', START, START + 10 * HOUR, fetch)
+
+    assert fetch.calls == [(START, START + 10 * HOUR)]
+    assert candles.shape == (6, 10)
+    np.testing.assert_array_equal(candles[0], np.arange(START, START + 10 * HOUR, HOUR))
+
+
+def test_request_inside_coverage_is_served_from_disk(tmp_path):
+    fetch = FakeExchange()
+    OHLCVCache(str(tmp_path)).get_range('binance', 'BTC/USDT', '1h', START, START + 10 * HOUR, fetch)
+
+    candles = OHLCVCache(str(tmp_path)).get_range(
+        'binance', 'BTC/USDT', '1h', START + 2 * HOUR, START + 5 * HOUR, fetch)
+
+    assert len(fetch.calls) == 1
+    np.testing.assert_array_equal(candles[0], [START + 2 * HOUR, START + 3 * HOUR, START + 4 * HOUR])
+
+
+def test_wider_request_fetches_only_the_gaps(tmp_path):
+    cache, fetch = OHLCVCache(str(tmp_path)), FakeExchange()
+    cache.get_range('binance', 'BTC/USDT', '1h', START + 5 * HOUR, START + 10 * HOUR, fetch)
+
+    candles = cache.get_range('binance', 'BTC/USDT', '1h', START, START + 15 * HOUR, fetch)
+
+    assert fetch.calls[1:] == [(START, START + 5 * HOUR), (START + 10 * HOUR, START + 15 * HOUR)]
+    np.testing.assert_array_equal(candles[0], np.arange(START, START + 15 * HOUR, HOUR))
+    _, coverage = cache.load('binance', 'BTC/USDT', '1h')
+    assert coverage == {'start': START, 'end': START + 15 * HOUR}
+
+
+def test_symbols_and_timeframes_are_cached_separately(tmp_path):
+    cache, fetch = OHLCVCache(str(tmp_path)), FakeExchange()
+    cache.get_range('binance', 'BTC/USDT', '1h', START, START + 4 * HOUR, fetch)
+    cache.get_range('upbit', 'BTC/KRW', '1h', START, START + 4 * HOUR, fetch)
+    cache.get_range('binance', 'BTC/USDT', '1d', START, START + 4 * HOUR, fetch)
+
+    assert len(fetch.calls) == 3
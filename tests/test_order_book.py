@@ -0,0 +1,79 @@
+"""OrderBook snapshots and incremental level changes"""
+
+from upbit_bot.order_book import OrderBook, trim_order_books
+
+
+def make_book(depth=5):
+    return OrderBook.from_ccxt({'bids': [[100, 1], [99, 2], [98, 3]],
+                                'asks': [[101, 1], [102, 2]],
+                                'nonce': 7, 'timestamp': 1000}, 'BTC/USDT', depth)
+
+
+def test_snapshot_keeps_levels_best_first():
+    book = make_book()
+
+    assert book.best_bid == 100 and book.best_ask == 101
+    assert book.top(10)['bids'] == [[100, 1], [99, 2], [98, 3]]
+    assert book.nonce == 7 and book.timestamp == 1000
+
+
+def test_snapshot_deeper_than_depth_is_truncated():
+    book = OrderBook('BTC/USDT', 2)
+    book.load_snapshot([[100, 1], [99, 1], [98, 1]], [[101, 1]])
+
+    assert book.bid_count == 2 and book.bids_truncated
+    assert not book.asks_truncated
+
+
+def test_diff_inserts_updates_and_removes_levels():
+    book = make_book()
+
+    book.apply_diff(bids=[[99.5, 4], [99, 0], [100, 5]], asks=[[100.5, 1], [102, 0]], nonce=8, timestamp=1001)
+
+    assert book.top(10)['bids'] == [[100, 5], [99.5, 4], [98, 3]]
+    assert book.top(10)['asks'] == [[100.5, 1], [101, 1]]
+    assert book.nonce == 8 and book.timestamp == 1001
+
+
+def test_removing_an_unknown_level_is_a_no_op():
+    book = make_book()
+    book.apply_diff(bids=[[50, 0]], asks=[])
+
+    assert book.top(10)['bids'] == [[100, 1], [99, 2], [98, 3]]
+
+
+def test_insert_into_full_book_pushes_out_the_worst_level():
+    book = make_book(depth=3)
+    book.apply_diff(bids=[[100.5, 1]], asks=[])
+
+    assert book.top(10)['bids'] == [[100.5, 1], [100, 1], [99, 2]]
+    assert book.bids_truncated
+    # Levels beyond the known part of a truncated side are ignored
+    book.apply_diff(bids=[[97, 1]], asks=[])
+    assert book.top(10)['bids'] == [[100.5, 1], [100, 1], [99, 2]]
+
+
+def test_emptied_side_has_no_best_price():
+    book = make_book()
+    book.apply_diff(bids=[], asks=[[101, 0], [102, 0]])
+
+    assert book.best_ask is None
+    assert book.price_at('asks') is None
+
+
+def test_copy_is_independent_and_can_be_shallower():
+    book = make_book()
+    shallow = book.copy(depth=2)
+    book.apply_diff(bids=[[100, 9]], asks=[])
+
+    assert shallow.top(10)['bids'] == [[100, 1], [99, 2]]
+    assert shallow.bids_truncated
+    assert shallow.nonce == 7
+
+
+def test_trim_order_books_replaces_books_by_top_levels():
+    data = trim_order_books({'book': make_book(), 'premium': 1.5}, levels=1)
+
+    assert data['book']['bids'] == [[100, 1]] and data['book']['asks'] == [[101, 1]]
+    assert data['premium'] == 1.5
+    assert trim_order_books(None) is None
@@ -0,0 +1,85 @@
+"""ParamSpec grids and unit-interval mapping"""
+
+import pytest
+
+from upbit_bot.param_search import GridSearch, ParamSpec, RandomSearch
+
+
+def test_grid_excludes_the_upper_bound():
+    spec = ParamSpec('threshold', 0.5, 2.0, 0.5)
+
+    assert spec.grid() == [0.5, 1.0, 1.5]
+
+
+def test_grid_values_are_rounded():
+    spec = ParamSpec('threshold', 0.1, 0.4, 0.1, decimals=2)
+
+    assert spec.grid() == [0.1, 0.2, 0.3]
+
+
+def test_grid_needs_a_step_or_values():
+    with pytest.raises(ValueError):
+        ParamSpec('threshold', 0.0, 1.0).grid()
+
+
+@pytest.mark.parametrize('spec', [
+    ParamSpec('grid', -4.0, -0.25, 0.25, decimals=2),
+    ParamSpec('continuous', 0.0, 1.0, decimals=1),
+    ParamSpec('log', 0.01, 1.0, log=True),
+    ParamSpec('log_grid', 1.0, 10.0, 1.0, log=True),
+])
+@pytest.mark.parametrize('u', [0.0, 0.5, 1.0, 1.5, -0.5])
+def test_from_unit_stays_below_high(spec, u):
+    value = spec.from_unit(u)
+
+    assert spec.low <= value < spec.high
+    if spec.step is not None:
+        assert value in spec.grid()
+
+
+def test_from_unit_reaches_both_ends_of_the_grid():
+    spec = ParamSpec('threshold', 0.5, 2.0, 0.5)
+
+    assert spec.from_unit(0.0) == 0.5
+    assert spec.from_unit(1.0) == 1.5
+
+
+def test_to_unit_inverts_from_unit():
+    spec = ParamSpec('threshold', 0.5, 2.0, 0.5)
+    for value in spec.grid():
+        assert spec.from_unit(spec.to_unit(value)) == value
+
+    continuous = ParamSpec('portion', 0.1, 0.5)
+    assert continuous.from_unit(continuous.to_unit(0.3)) == pytest.approx(0.3)
+
+
+def test_values_list_is_used_as_is():
+    spec = ParamSpec('strategy', values=['scaled', 'simple'])
+
+    assert spec.grid() == ['scaled', 'simple']
+    assert spec.from_unit(0.0) == 'scaled'
+    assert spec.from_unit(1.0) == 'simple'
+
+
+def test_grid_search_finds_the_best_point():
+    space = [ParamSpec('x', 0.0, 1.0, 0.25), ParamSpec('y', values=[1, 2])]
+
+    def evaluate(points, fidelity):
+        return [{'return_percentage': point['x'] * point['y']} for point in points]
+
+    result = GridSearch().run(space, evaluate)
+
+    assert result.best_params == {'x': 0.75, 'y': 2}
+    assert len(result.trials) == 8
+
+
+def test_random_search_is_repeatable_with_a_seed():
+    space = [ParamSpec('x', 0.0, 1.0, decimals=3)]
+
+    def evaluate(points, fidelity):
+        return [{'return_percentage': -abs(point['x'] - 0.3)} for point in points]
+
+    first = RandomSearch(n_trials=10, seed=5).run(space, evaluate)
+    second = RandomSearch(n_trials=10, seed=5).run(space, evaluate)
+
+    assert [trial.params for trial in first.trials] == [trial.params for trial in second.trials]
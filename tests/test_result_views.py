@@ -0,0 +1,128 @@
+"""Columnar storage, paging and downsampling of large result tables"""
+
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from upbit_bot.job_queue import JobStore
+from upbit_bot.result_views import (columns_to_records, downsample, inline_view, lttb_indices,
+                                    minmax_indices, paginate_table, records_to_columns)
+
+TIMES = pd.date_range('2024-01-01', periods=3000, freq='min')
+
+
+def trades():
+    return [{'time': TIMES[i].to_pydatetime().replace(microsecond=i % 3 * 500), 'type': 'ENTRY',
+             'size': i, 'price': None if i % 5 == 0 else 1300.5 + i, 'closed': i % 2 == 0,
+             **({'exit_level': 2} if i % 2 == 0 else {})}
+            for i in range(len(TIMES))]
+
+
+def as_json(records):
+    return json.loads(json.dumps(records, default=lambda value: value.isoformat()))
+
+
+def test_columns_round_trip_exactly():
+    records = trades()
+
+    columns = records_to_columns(records)
+
+    assert columns['size'].dtype == np.int64 and columns['closed'].dtype == bool
+    assert np.issubdtype(columns['time'].dtype, np.datetime64)
+    assert isinstance(columns['exit_level'], np.ma.MaskedArray)
+    assert columns_to_records(columns) == as_json(records)
+
+
+def test_tables_that_cannot_round_trip_stay_records():
+    assert records_to_columns([{'a': 1}, {'a': 'x'}]) is None
+    assert records_to_columns([{'a': {'b': 1}}]) is None
+
+
+def test_job_store_keeps_large_tables_as_arrays(tmp_path):
+    store = JobStore(str(tmp_path))
+    result = {'trades': trades(), 'nested': [{'a': {'b': i}} for i in range(2000)], 'final_balance': 1.5}
+
+    store.save_result('job', result)
+
+    assert sorted(store.load_tables('job')) == ['trades']
+    assert JobStore(str(tmp_path)).load_result('job') == as_json(result)
+    stubbed = store.load_result('job', max_rows=1000)
+    assert stubbed['trades'] == {'rows': 3000, 'columns': list(result['trades'][0]), 'truncated': True}
+    assert stubbed['nested'] == result['nested']
+
+
+def test_small_results_stay_json(tmp_path):
+    store = JobStore(str(tmp_path))
+    result = {'trades': [{'time': datetime(2024, 1, 1), 'amount': 1, 'note': None}], 'k': 1}
+
+    store.save_result('small', result)
+
+    assert store.load_tables('small') == {}
+    assert store.load_result('small') == as_json(result)
+
+
+def test_pages_cover_the_table_once():
+    columns = records_to_columns(trades())
+    rows, cursor = [], None
+    while True:
+        page = paginate_table(columns, cursor, limit=700)
+        rows.extend(page['rows'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert page['total'] == 3000
+    assert rows == columns_to_records(columns)
+    with pytest.raises(ValueError):
+        paginate_table(columns, 'abc')
+
+
+def test_inline_view_stubs_only_columnar_tables():
+    result = {'trades': trades(), 'nested': [{'a': {'b': i}} for i in range(2000)]}
+
+    view = inline_view(result)
+
+    assert view['trades']['truncated']
+    assert view['nested'] is result['nested']
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    y = np.sin(np.linspace(0, 20, 5000))
+    y[1234] = 50.0
+    x = np.arange(len(y))
+
+    indices = lttb_indices(x, y, 100)
+
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    assert 1234 in indices
+    assert np.all(np.diff(indices) > 0)
+    np.testing.assert_array_equal(lttb_indices(x[:50], y[:50], 100), np.arange(50))
+
+
+def test_minmax_keeps_each_bucket_extremes():
+    y = np.zeros(1000)
+    y[10], y[20] = 5.0, -5.0
+
+    indices = minmax_indices(y, 10)
+
+    assert 10 in indices and 20 in indices
+    assert len(indices) <= 20
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_downsample_uses_time_axis_and_skips_missing_rows():
+    columns = records_to_columns(trades())
+
+    view = downsample(columns, ['size', 'exit_level'], 50, 'lttb', x_name='time')
+
+    assert view['total_points'] == 3000
+    assert len(view['series']['size']['x']) == 50
+    assert view['series']['size']['x'][0] == '2024-01-01T00:00:00'
+    with pytest.raises(KeyError):
+        downsample(columns, ['missing'], 50)
+    with pytest.raises(ValueError):
+        downsample(columns, ['size'], 50, 'average')
@@ -0,0 +1,80 @@
+"""Walk-forward fold layout and out-of-sample stitching"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from upbit_bot.walk_forward import (Fold, FoldResult, WalkForwardConfig, stitch_out_of_sample,
+                                    walk_forward_folds)
+
+TIMES = pd.date_range('2024-01-01', periods=200, freq='D')
+
+
+def test_rolling_test_windows_tile_without_overlap():
+    folds = walk_forward_folds(TIMES, WalkForwardConfig(train_period='60D', test_period='20D'))
+
+    assert len(folds) == 7
+    for fold in folds:
+        assert fold.train_end - fold.train_start == 60
+        assert fold.test_start == fold.train_end
+    for previous, fold in zip(folds, folds[1:]):
+        assert fold.test_start == previous.test_end
+    assert folds[-1].test_end == len(TIMES)
+
+
+def test_anchored_train_windows_grow_from_the_start():
+    folds = walk_forward_folds(TIMES, WalkForwardConfig(train_period='60D', test_period='20D', anchored=True))
+
+    assert all(fold.train_start == 0 for fold in folds)
+    assert [fold.train_end for fold in folds] == [60 + 20 * i for i in range(len(folds))]
+
+
+def test_step_shorter_than_test_period_is_rejected():
+    with pytest.raises(ValueError):
+        walk_forward_folds(TIMES, WalkForwardConfig(test_period='20D', step_period='10D'))
+
+
+def test_short_folds_are_skipped():
+    folds = walk_forward_folds(TIMES[:65], WalkForwardConfig(train_period='60D', test_period='20D', min_bars=10))
+
+    assert folds == []
+
+
+def fold_result(index, train_start, train_end, test_end, train_score, test_return):
+    equity = np.linspace(100.0, 100.0 * (1 + test_return / 100), test_end - train_end)
+    return FoldResult(Fold(index, train_start, train_end, train_end, test_end),
+                      (TIMES[train_start], TIMES[train_end - 1]), (TIMES[train_end], TIMES[test_end - 1]),
+                      {}, train_score, {'return_percentage': test_return}, equity, 100.0)
+
+
+def test_stitching_compounds_fold_returns():
+    folds = [fold_result(0, 0, 90, 120, 9.0, 10.0), fold_result(1, 30, 120, 150, 9.0, -5.0)]
+
+    times, curve, summary = stitch_out_of_sample(folds, TIMES)
+
+    assert len(curve) == len(times) == 60
+    assert times[0] == TIMES[90] and times[-1] == TIMES[149]
+    assert curve[29] == pytest.approx(110.0)
+    assert summary['final_equity'] == pytest.approx(110.0 * 0.95)
+    assert summary['oos_return_percentage'] == pytest.approx(4.5)
+    assert summary['profitable_test_folds'] == 1
+
+
+def test_efficiency_compares_annualized_returns():
+    # The same return per bar in and out of sample, over windows of different lengths
+    folds = [fold_result(0, 0, 90, 120, 9.0, 3.0), fold_result(1, 30, 120, 150, 9.0, 3.0)]
+
+    summary = stitch_out_of_sample(folds, TIMES)[2]
+
+    assert summary['walk_forward_efficiency'] == pytest.approx(1.0, abs=0.05)
+    assert summary['test_annualized_return'] > 0
+
+
+def test_efficiency_is_not_reported_for_other_metrics():
+    folds = [fold_result(0, 0, 90, 120, 1.5, 3.0)]
+
+    summary = stitch_out_of_sample(folds, TIMES, metric='sharpe_ratio')[2]
+
+    assert summary['walk_forward_efficiency'] is None
+    assert summary['train_annualized_return'] is None
+    assert summary['train_metric'] == 'sharpe_ratio'
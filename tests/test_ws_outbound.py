@@ -0,0 +1,148 @@
+"""Per-connection outbound queues and slow-consumer policies"""
+
+import asyncio
+import json
+
+import pytest
+
+from upbit_bot.ws_outbound import ClientWriter, OutboundQueueConfig
+from upbit_bot.ws_protocol import WireSession
+
+
+class FakeWebSocket:
+    """Records sent frames; each send takes delay seconds"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+        self.closed = False
+
+    async def send_text(self, text):
+        await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        await asyncio.sleep(self.delay)
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        self.closed = True
+
+
+def writer(websocket, max_queued=3, policy='coalesce', on_close=None):
+    return ClientWriter(websocket, WireSession(), OutboundQueueConfig(max_queued=max_queued, policy=policy),
+                        replaceable_types=['market_update', 'job_progress'], on_close=on_close)
+
+
+def types(client):
+    return [item.message['type'] for item in client._queue]
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        writer(FakeWebSocket(), policy='block')
+
+
+def test_messages_are_sent_in_order():
+    async def scenario():
+        websocket = FakeWebSocket()
+        client = writer(websocket)
+        client.start()
+        for index in range(3):
+            client.send({'type': 'event', 'n': index})
+        await asyncio.sleep(0.01)
+        client.close()
+        return websocket, client.stats()
+
+    websocket, stats = asyncio.run(scenario())
+
+    assert [message['n'] for message in websocket.sent] == [0, 1, 2]
+    assert stats['sent'] == 3 and stats['queued'] == 0
+
+
+def test_newer_update_replaces_a_queued_one_of_the_same_job():
+    async def scenario():
+        client = writer(FakeWebSocket(), max_queued=10)
+        client.send({'type': 'job_progress', 'job_id': 'a', 'done': 1})
+        client.send({'type': 'job_progress', 'job_id': 'b', 'done': 1})
+        client.send({'type': 'job_progress', 'job_id': 'a', 'done': 2})
+        return [(item.message['job_id'], item.message['done']) for item in client._queue], client.stats()
+
+    queued, stats = asyncio.run(scenario())
+
+    assert queued == [('b', 1), ('a', 2)]
+    assert stats['coalesced'] == 1
+
+
+def test_coalesce_drops_the_oldest_update_but_keeps_events():
+    async def scenario():
+        client = writer(FakeWebSocket())
+        client.send({'type': 'event'})
+        client.send({'type': 'market_update', 'job_id': None})
+        client.send({'type': 'event'})
+        queued_event = client.send({'type': 'trade_result'})
+        queue_after_event = types(client)
+        # Nothing replaceable left: a further update is itself dropped
+        queued_update = client.send({'type': 'job_progress', 'job_id': 'x'})
+        return queued_event, queue_after_event, queued_update, types(client), client.closed
+
+    queued_event, queue_after_event, queued_update, queue, closed = asyncio.run(scenario())
+
+    assert queued_event and queue_after_event == ['event', 'event', 'trade_result']
+    assert not queued_update and queue == queue_after_event
+    assert not closed
+
+
+def test_drop_oldest_disconnects_when_only_events_are_queued():
+    async def scenario():
+        closed = []
+        client = writer(FakeWebSocket(), policy='drop_oldest', on_close=closed.append)
+        client.send({'type': 'event'})
+        client.send({'type': 'market_update'})
+        client.send({'type': 'event'})
+        first = client.send({'type': 'event'})
+        queue = types(client)
+        second = client.send({'type': 'event'})
+        await asyncio.sleep(0)
+        return first, queue, second, client.closed, closed, client.websocket.closed
+
+    first, queue, second, closed, callbacks, socket_closed = asyncio.run(scenario())
+
+    assert first and queue == ['event', 'event', 'event']
+    assert not second and closed and socket_closed
+    assert len(callbacks) == 1
+
+
+def test_disconnect_policy_closes_a_full_client():
+    async def scenario():
+        client = writer(FakeWebSocket(), max_queued=2, policy='disconnect')
+        client.send({'type': 'market_update'})
+        client.send({'type': 'market_update', 'job_id': 'other'})
+        queued = client.send({'type': 'job_progress', 'job_id': 'x'})
+        return queued, client.closed, client.send({'type': 'event'})
+
+    queued, closed, after_close = asyncio.run(scenario())
+
+    assert not queued and closed and not after_close
+
+
+def test_slow_client_does_not_hold_up_a_fast_one():
+    async def scenario():
+        fast, slow = FakeWebSocket(), FakeWebSocket(delay=0.05)
+        writers = [writer(fast, max_queued=4, policy='disconnect'),
+                   writer(slow, max_queued=4, policy='disconnect')]
+        for client in writers:
+            client.start()
+        for index in range(10):
+            for client in writers:
+                client.send({'type': 'event', 'n': index})
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.01)
+        for client in writers:
+            client.close()
+        return fast, slow, writers
+
+    fast, slow, (fast_writer, slow_writer) = asyncio.run(scenario())
+
+    assert len(fast.sent) == 10 and not fast_writer.stats()['dropped']
+    assert slow_writer.closed and len(slow.sent) < 10
@@ -0,0 +1,87 @@
+"""State diffs and the sequenced WebSocket wire session"""
+
+import json
+from datetime import datetime
+
+import numpy as np
+
+from upbit_bot.ws_protocol import WireSession, apply_patch, decode_frame, diff_state, to_wire
+
+OLD = {'price': 1300.0, 'volume': 2, 'gone': True,
+       'nested': {'a': 1, 'b': {'c': 2, 'd': 3}}, 'trades': [1, 2]}
+NEW = {'price': 1301.0, 'volume': 2, 'added': 'x',
+       'nested': {'a': 1, 'b': {'c': 5}}, 'trades': [1, 2, 3]}
+
+
+def test_patch_turns_old_into_new():
+    patch = diff_state(OLD, NEW)
+
+    assert apply_patch(OLD, patch) == NEW
+    assert set(patch['s']) == {'price', 'added', 'trades'}
+    assert patch['d'] == ['gone']
+    assert patch['p'] == {'nested': {'p': {'b': {'s': {'c': 5}, 'd': ['d']}}}}
+
+
+def test_equal_states_give_an_empty_patch():
+    assert diff_state(OLD, dict(OLD)) == {}
+    assert diff_state({'x': float('nan')}, {'x': float('nan')}) == {}
+
+
+def test_type_changes_are_sent():
+    assert diff_state({'x': 1}, {'x': 1.0}) == {'s': {'x': 1.0}}
+    assert diff_state({'x': {'a': 1}}, {'x': 5}) == {'s': {'x': 5}}
+
+
+def test_to_wire_converts_numpy_and_datetimes():
+    message = to_wire({'a': np.float64(1.5), 'b': np.int64(2), 'c': datetime(2024, 1, 1), 'd': [np.bool_(True)]})
+
+    assert message == {'a': 1.5, 'b': 2, 'c': '2024-01-01T00:00:00', 'd': [True]}
+    json.dumps(message)
+
+
+def test_legacy_session_sends_plain_json():
+    frame = WireSession().encode({'type': 'market_update', 'price': 1})
+
+    assert json.loads(frame) == {'type': 'market_update', 'price': 1}
+
+
+def test_delta_session_sends_full_state_until_acknowledged():
+    session = WireSession('json', delta=True, state_types=['market_update'])
+
+    first = decode_frame(session.encode(dict(OLD, type='market_update')))
+    unacked = decode_frame(session.encode(dict(NEW, type='market_update')))
+    assert first['full'] == dict(OLD, type='market_update') and first['seq'] == 1
+    assert 'full' in unacked
+
+    assert session.handle_control({'type': 'ack', 'seq': first['seq']})
+    delta = decode_frame(session.encode(dict(NEW, type='market_update')))
+    assert delta['base'] == first['seq'] and delta['seq'] == 3
+    assert apply_patch(first['full'], delta['delta']) == dict(NEW, type='market_update')
+
+
+def test_events_carry_a_sequence_number_but_no_diff():
+    session = WireSession('json', delta=True, state_types=['market_update'])
+
+    event = decode_frame(session.encode({'type': 'trade_result', 'ok': True}))
+
+    assert event == {'type': 'trade_result', 'ok': True, 'seq': 1}
+
+
+def test_resync_and_unacked_limit_fall_back_to_full_state():
+    session = WireSession('json', delta=True, state_types=['s'], max_unacked=2)
+    session.encode({'type': 's', 'v': 0})
+    session.acknowledge(1)
+    assert 'delta' in decode_frame(session.encode({'type': 's', 'v': 1}))
+    assert 'delta' in decode_frame(session.encode({'type': 's', 'v': 2}))
+    assert 'full' in decode_frame(session.encode({'type': 's', 'v': 3}))
+
+    session.acknowledge(4)
+    session.handle_control({'type': 'resync'})
+    assert 'full' in decode_frame(session.encode({'type': 's', 'v': 4}))
+
+
+def test_unrelated_client_messages_are_not_control():
+    session = WireSession('json', delta=True)
+
+    assert not session.handle_control({'type': 'subscribe'})
+    assert not session.handle_control('ping')
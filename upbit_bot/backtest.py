@@ -1,12 +1,15 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Sequence, Tuple, Any
 import requests
 import logging
 from dataclasses import dataclass, asdict
+from functools import partial
 import json
 from .trading_bot import TradingConfig, TradeRecord
+from .columnar import FloatSeries, TradeLog, DrawdownHistory
+from .performance import PerformanceAccumulator
 import ccxt
 
 logger = logging.getLogger(__name__)
@@ -25,6 +28,7 @@ class BacktestConfig:
     max_trades_per_day: int = 10
     commission_rate: float = 0.0025  # 0.25% commission
     slippage_rate: float = 0.001  # 0.1% slippage
+    use_vectorized_engine: bool = False  # Compute signals with NumPy; only fills run per bar
     
 class BacktestResult:
     """Results of a backtest"""
@@ -42,11 +46,18 @@ class BacktestResult:
         self.losing_trades = 0
         self.average_win = 0.0
         self.average_loss = 0.0
-        self.trades = []
-        self.balance_history = []  # Track balance over time
+        self.trades = TradeLog()
+        self.balance_history = FloatSeries()  # Track balance over time
         self.drawdown_history = []  # Track drawdown over time
-        self.daily_returns = []  # Daily returns for charting
-        self.equity_curve = []  # Equity curve for charting
+        self.daily_returns = FloatSeries()  # Daily returns for charting
+        self.equity_curve = FloatSeries()  # Equity curve for charting
+
+def _drawdown_timestamp(trades: TradeLog, trade_count: int, i: int) -> datetime:
+    # Try to associate with trade timestamp
+    if i < trade_count:
+        return trades.timestamp_at(i)
+    # Use last trade timestamp + days
+    return trades.timestamp_at(-1) + timedelta(days=i - trade_count + 1)
 
 class StrategyTester:
     """Base class for strategy testing"""
@@ -58,6 +69,10 @@ class StrategyTester:
         """Calculate trading signal based on strategy"""
         raise NotImplementedError("Subclasses must implement calculate_signal")
     
+    def calculate_signals(self, usd_krw_rate: np.ndarray, usdt_krw_price: np.ndarray) -> Optional[np.ndarray]:
+        """Signals for a whole series at once, or None if the strategy has no vectorized form"""
+        return None
+    
     def should_exit_position(self, entry_price: float, current_price: float, 
                            position_type: str, days_held: int) -> bool:
         """Check if position should be exited"""
@@ -99,6 +114,18 @@ class ArbitrageStrategy(StrategyTester):
             return 'SELL'
         else:
             return 'HOLD'
+    
+    def calculate_signals(self, usd_krw_rate: np.ndarray, usdt_krw_price: np.ndarray) -> Optional[np.ndarray]:
+        """calculate_signal over whole arrays: 'BUY', 'SELL' or 'HOLD' per bar"""
+        # A subclass with its own per-bar rule must not silently get this one
+        if type(self).calculate_signal is not ArbitrageStrategy.calculate_signal:
+            return None
+        
+        kimchi_premium = ((usdt_krw_price - usd_krw_rate) / usd_krw_rate) * 100
+        signals = np.full(len(kimchi_premium), 'HOLD', dtype=object)
+        signals[kimchi_premium > self.sell_threshold] = 'SELL'
+        signals[kimchi_premium < self.buy_threshold] = 'BUY'
+        return signals
 
 class EnhancedUpbitBacktest:
     def __init__(self, config: Optional[BacktestConfig] = None, strategy: Optional[StrategyTester] = None):
@@ -119,9 +146,11 @@ class EnhancedUpbitBacktest:
             self.balance_usd = half_balance  # Actually USDT
             self.balance_krw = half_balance * 1300  # Convert to KRW at approximate USDT/KRW rate
         
-        self.trades: List[TradeRecord] = []
-        self.daily_returns: List[float] = []
-        self.equity_curve: List[float] = []
+        self.trades = TradeLog()
+        self.daily_returns = FloatSeries()
+        self.equity_curve = FloatSeries()
+        self.drawdowns = FloatSeries()  # Drawdown (%) at each bar
+        self.performance = PerformanceAccumulator()
         self.current_position = None
         self.position_entry_price = 0
         self.position_entry_date = None
@@ -153,32 +182,36 @@ class EnhancedUpbitBacktest:
             logger.error(f"Error fetching historical data: {str(e)}")
             return self._generate_synthetic_data(start_date, end_date)
     
-    def _generate_synthetic_data(self, start_date: datetime, end_date: datetime) -> pd.DataFrame:
-        """Generate synthetic historical data for testing"""
+    def _generate_synthetic_data(self, start_date: datetime, end_date: datetime,
+                                 seed: Optional[int] = None) -> pd.DataFrame:
+        """Generate synthetic historical data for testing (reproducible when seed is given)"""
         dates = pd.date_range(start=start_date, end=end_date, freq='D')
         data = []
+        random = np.random.RandomState(seed) if seed is not None else np.random
         
         base_usd_krw = 1300.0
         base_usdt_krw = 1300.0
         
         for i, date in enumerate(dates):
             # Simulate realistic price movements
-            usd_krw_rate = base_usd_krw * (1 + np.random.normal(0, 0.005))
-            usdt_krw_price = base_usdt_krw * (1 + np.random.normal(0, 0.008))
+            usd_krw_rate = base_usd_krw * (1 + random.normal(0, 0.005))
+            usdt_krw_price = base_usdt_krw * (1 + random.normal(0, 0.008))
             
             # Add some correlation and market trends
             trend = np.sin(i * 0.1) * 0.002
             usd_krw_rate *= (1 + trend)
-            usdt_krw_price *= (1 + trend + np.random.normal(0, 0.003))
+            usdt_krw_price *= (1 + trend + random.normal(0, 0.003))
             
             data.append({
                 'datetime': date,
                 'usd_krw_rate': usd_krw_rate,
                 'usdt_krw_price': usdt_krw_price,
-                'volume': np.random.uniform(1000000, 10000000)
+                'volume': random.uniform(1000000, 10000000)
             })
         
-        return pd.DataFrame(data)
+        df = pd.DataFrame(data)
+        df.attrs['data_source'] = 'synthetic'
+        return df
     
     def calculate_commission_and_slippage(self, amount: float, price: float) -> float:
         """Calculate trading costs"""
@@ -268,121 +301,116 @@ class EnhancedUpbitBacktest:
                 'average_loss': 0.0
             }
         
-        # Calculate trade-based metrics (we already have initial_value, etc. from above)
-        
-        # Calculate trade-based metrics
-        winning_trades = sum(1 for trade in self.trades if trade.profit_loss > 0)
-        losing_trades = sum(1 for trade in self.trades if trade.profit_loss < 0)
-        win_rate = (winning_trades / len(self.trades)) * 100 if self.trades else 0
-        
-        # Calculate profit metrics
-        total_wins = sum(trade.profit_loss for trade in self.trades if trade.profit_loss > 0)
-        total_losses = sum(abs(trade.profit_loss) for trade in self.trades if trade.profit_loss < 0)
-        
-        avg_win = total_wins / winning_trades if winning_trades > 0 else 0
-        avg_loss = total_losses / losing_trades if losing_trades > 0 else 0
-        profit_factor = total_wins / total_losses if total_losses > 0 else float('inf')
-        
-        # Calculate drawdown
-        max_drawdown = self.calculate_max_drawdown()
-        
-        # Calculate Sharpe ratio
-        sharpe_ratio = self.calculate_sharpe_ratio()
+        # Trade, drawdown and return statistics were accumulated during the run
+        self._record_new_trades()
+        performance = self.performance
         
         return {
             'initial_balance': initial_value,
             'final_balance': final_value,
             'total_return': total_return,
             'return_percentage': return_percentage,
-            'max_drawdown': max_drawdown,
-            'sharpe_ratio': sharpe_ratio,
-            'win_rate': win_rate,
-            'profit_factor': profit_factor,
+            'max_drawdown': performance.max_drawdown,
+            'sharpe_ratio': performance.sharpe_ratio,
+            'win_rate': performance.win_rate,
+            'profit_factor': performance.profit_factor,
             'total_trades': len(self.trades),
-            'winning_trades': winning_trades,
-            'losing_trades': losing_trades,
-            'average_win': avg_win,
-            'average_loss': avg_loss
+            'winning_trades': performance.winning_trades,
+            'losing_trades': performance.losing_trades,
+            'average_win': performance.average_win,
+            'average_loss': performance.average_loss
         }
     
     def calculate_max_drawdown(self) -> float:
         """Calculate maximum drawdown"""
-        if not self.equity_curve:
-            return 0.0
-        
-        peak = self.equity_curve[0]
-        max_dd = 0.0
-        
-        for value in self.equity_curve:
-            if value > peak:
-                peak = value
-            
-            drawdown = (peak - value) / peak * 100
-            max_dd = max(max_dd, drawdown)
-        
-        return max_dd
+        return self.performance.max_drawdown
     
-    def calculate_drawdown_history(self) -> List[Tuple[datetime, float]]:
+    def calculate_drawdown_history(self) -> Sequence[Tuple[datetime, float]]:
         """Calculate drawdown history over time"""
         if not self.equity_curve or not self.trades:
             return []
         
-        drawdown_history = []
-        peak = self.equity_curve[0]
-        
-        for i, value in enumerate(self.equity_curve):
-            if value > peak:
-                peak = value
-            
-            drawdown = (peak - value) / peak * 100 if peak > 0 else 0
-            
-            # Try to associate with trade timestamp
-            if i < len(self.trades):
-                timestamp = datetime.fromisoformat(self.trades[i].timestamp)
-            else:
-                # Use last trade timestamp + days
-                last_timestamp = datetime.fromisoformat(self.trades[-1].timestamp)
-                timestamp = last_timestamp + timedelta(days=i - len(self.trades) + 1)
-            
-            drawdown_history.append((timestamp, drawdown))
-        
-        return drawdown_history
+        # A partial rather than a closure keeps the result picklable for process pools
+        return DrawdownHistory(self.drawdowns.values, partial(_drawdown_timestamp, self.trades, len(self.trades)))
     
     def calculate_sharpe_ratio(self) -> float:
         """Calculate Sharpe ratio"""
-        if not self.daily_returns:
-            return 0.0
-        
-        mean_return = np.mean(self.daily_returns)
-        std_return = np.std(self.daily_returns)
-        
-        if std_return == 0:
-            return 0.0
-        
-        # Annualized Sharpe ratio (assuming 252 trading days)
-        return (mean_return / std_return) * np.sqrt(252)
+        return self.performance.sharpe_ratio
+    
+    def _record_bar(self, balance: float, daily_return: float):
+        """Append one bar to the curves and the running metrics"""
+        self.daily_returns.append(daily_return)
+        self.equity_curve.append(balance)
+        self.drawdowns.append(self.performance.record_bar(balance, daily_return))
+    
+    def _record_new_trades(self):
+        """Feed trades appended since the last call into the running metrics"""
+        recorded = self.performance.trade_count
+        if len(self.trades) > recorded:
+            self.performance.record_trades(self.trades.column('profit_loss')[recorded:])
     
     def run_backtest(self, start_date: datetime, end_date: datetime, 
                     use_real_data: bool = True) -> BacktestResult:
         """Run comprehensive backtest"""
         logger.info(f"Starting backtest from {start_date} to {end_date}")
-        
-        # Reset state
-        self.reset_state()
-        
-        # Fetch historical data
+        historical_data = self.load_historical_data(start_date, end_date, use_real_data)
+        return self.run_backtest_on_data(historical_data)
+    
+    def load_historical_data(self, start_date: datetime, end_date: datetime,
+                             use_real_data: bool = True, seed: Optional[int] = None) -> pd.DataFrame:
+        """Real USDT/KRW history combined with USD/KRW, or synthetic data (seeded if seed is given)
+
+        attrs['data_source'] of the result says which one it is: 'real', or
+        'synthetic' (also when real data was requested but could not be fetched).
+        """
         if use_real_data:
             try:
                 usdt_data = self.fetch_real_historical_data('USDT/KRW', start_date, end_date)
                 # For USD/KRW, we'll use external API or synthetic data
-                historical_data = self._combine_with_usd_krw_data(usdt_data, start_date, end_date)
+                historical_data = self._combine_with_usd_krw_data(usdt_data, start_date, end_date, seed)
             except Exception as e:
                 logger.warning(f"Failed to fetch real data, using synthetic: {str(e)}")
-                historical_data = self._generate_synthetic_data(start_date, end_date)
+                historical_data = self._generate_synthetic_data(start_date, end_date, seed)
         else:
-            historical_data = self._generate_synthetic_data(start_date, end_date)
+            historical_data = self._generate_synthetic_data(start_date, end_date, seed)
+        return historical_data
+    
+    def run_backtest_on_data(self, historical_data: pd.DataFrame) -> BacktestResult:
+        """Run a backtest over already loaded data (datetime, usd_krw_rate, usdt_krw_price columns)"""
+        self.reset_state()
         
         # Run backtest
+        if not (self.config.use_vectorized_engine and self._simulate_vectorized(historical_data)):
+            self._simulate_rows(historical_data)
+        
+        # Calculate final metrics
+        metrics = self.calculate_performance_metrics()
+        
+        result = BacktestResult()
+        result.initial_balance = metrics['initial_balance']
+        result.final_balance = metrics['final_balance']
+        result.total_return = metrics['total_return']
+        result.return_percentage = metrics['return_percentage']
+        result.max_drawdown = metrics['max_drawdown']
+        result.sharpe_ratio = metrics['sharpe_ratio']
+        result.win_rate = metrics['win_rate']
+        result.profit_factor = metrics['profit_factor']
+        result.total_trades = int(metrics['total_trades'])
+        result.winning_trades = int(metrics['winning_trades'])
+        result.losing_trades = int(metrics['losing_trades'])
+        result.average_win = metrics['average_win']
+        result.average_loss = metrics['average_loss']
+        result.trades = self.trades
+        result.balance_history = self.equity_curve
+        result.drawdown_history = self.calculate_drawdown_history()
+        result.daily_returns = self.daily_returns
+        result.equity_curve = self.equity_curve
+        
+        logger.info(f"Backtest completed: {result.return_percentage:.2f}% return, {result.total_trades} trades")
+        return result
+    
+    def _simulate_rows(self, historical_data: pd.DataFrame):
+        """Row-by-row simulation: strategy signal, fill and equity for every bar"""
         previous_balance = self.config.initial_balance_usd
         
         for _, row in historical_data.iterrows():
@@ -413,41 +441,126 @@ class EnhancedUpbitBacktest:
             current_balance = self.balance_usd + self.balance_krw / row['usd_krw_rate']
             daily_return = (current_balance - previous_balance) / previous_balance * 100
             
-            self.daily_returns.append(daily_return)
-            self.equity_curve.append(current_balance)
+            self._record_new_trades()
+            self._record_bar(current_balance, daily_return)
             previous_balance = current_balance
+    
+    def _simulate_vectorized(self, historical_data: pd.DataFrame) -> bool:
+        """Array simulation matching _simulate_rows; returns False if the strategy cannot be vectorized
+        
+        Premium and signals come from the strategy for the whole series at once. Only
+        the balance-dependent fill (daily cap, costs, balance checks) runs per signal
+        bar, on plain floats; equity and daily returns are then computed as arrays.
+        """
+        if (type(self).execute_backtest_trade is not EnhancedUpbitBacktest.execute_backtest_trade or
+                type(self).calculate_commission_and_slippage is not EnhancedUpbitBacktest.calculate_commission_and_slippage):
+            return False
+        
+        usd_krw_rate = historical_data['usd_krw_rate'].to_numpy(dtype=np.float64)
+        usdt_krw_price = historical_data['usdt_krw_price'].to_numpy(dtype=np.float64)
+        signals = self.strategy.calculate_signals(usd_krw_rate, usdt_krw_price)
+        if signals is None:
+            return False
+        
+        times = pd.DatetimeIndex(historical_data['datetime'])
+        days = times.normalize().asi8
+        rates = usd_krw_rate.tolist()
+        prices = usdt_krw_price.tolist()
+        
+        max_trade_amount = self.config.max_trade_amount
+        max_trades_per_day = self.config.max_trades_per_day
+        commission_rate = self.config.commission_rate
+        slippage_rate = self.config.slippage_rate
+        balance_usd = self.balance_usd
+        balance_krw = self.balance_krw
+        daily_trade_count = self.daily_trade_count
+        last_trade_day = None
+        last_trade_bar = None
+        
+        # Bars where balances changed, with the balances after that bar
+        change_bars: List[int] = []
+        usd_after: List[float] = []
+        krw_after: List[float] = []
+        # (bar, action, amount) of every filled trade
+        fills: List[Tuple[int, str, float]] = []
+        
+        for i in np.flatnonzero(signals != 'HOLD').tolist():
+            trade_amount = min(max_trade_amount, balance_usd * 0.3)  # Max 30% per trade
+            if trade_amount <= 100:  # Minimum trade size
+                continue
+            
+            # Daily trade limit (reset on the first attempt of each day, as in execute_backtest_trade)
+            day = days[i]
+            last_trade_bar = i
+            if last_trade_day != day:
+                daily_trade_count = 0
+                last_trade_day = day
+            if daily_trade_count >= max_trades_per_day:
+                continue
+            
+            action = signals[i]
+            price = prices[i]
+            costs = trade_amount * commission_rate + trade_amount * price * slippage_rate
+            if action == 'BUY':
+                if balance_usd < trade_amount + costs:
+                    continue
+                balance_usd -= (trade_amount + costs)
+                balance_krw += trade_amount * price
+            else:
+                krw_needed = trade_amount * price
+                if balance_krw < krw_needed:
+                    continue
+                balance_krw -= krw_needed
+                balance_usd += trade_amount - costs
+            
+            daily_trade_count += 1
+            fills.append((i, action, trade_amount))
+            change_bars.append(i)
+            usd_after.append(balance_usd)
+            krw_after.append(balance_krw)
+        
+        # Balances at every bar are those after the last change at or before it
+        last_change = np.searchsorted(np.asarray(change_bars, dtype=np.int64), np.arange(len(rates)), side='right') - 1
+        usd_series = np.where(last_change >= 0, np.asarray(usd_after + [0.0])[last_change], self.balance_usd)
+        krw_series = np.where(last_change >= 0, np.asarray(krw_after + [0.0])[last_change], self.balance_krw)
+        
+        equity = usd_series + krw_series / usd_krw_rate
+        previous = np.concatenate(([self.config.initial_balance_usd], equity[:-1]))[:len(equity)]
+        daily_returns = (equity - previous) / previous * 100
+        
+        if fills:
+            fill_bars = np.fromiter((i for i, _, _ in fills), dtype=np.int64, count=len(fills))
+            fill_prices = usdt_krw_price[fill_bars]
+            fill_rates = usd_krw_rate[fill_bars]
+            self.trades.extend_columns(
+                times[fill_bars],
+                [action for _, action, _ in fills],
+                amount_usd=np.fromiter((amount for _, _, amount in fills), dtype=np.float64, count=len(fills)),
+                usdt_krw_price=fill_prices,
+                usd_krw_rate=fill_rates,
+                difference_percentage=((fill_prices - fill_rates) / fill_rates) * 100,
+                balance_usd=np.asarray(usd_after),
+                balance_krw=np.asarray(krw_after)
+            )
         
-        # Calculate final metrics
-        metrics = self.calculate_performance_metrics()
-        
-        result = BacktestResult()
-        result.initial_balance = metrics['initial_balance']
-        result.final_balance = metrics['final_balance']
-        result.total_return = metrics['total_return']
-        result.return_percentage = metrics['return_percentage']
-        result.max_drawdown = metrics['max_drawdown']
-        result.sharpe_ratio = metrics['sharpe_ratio']
-        result.win_rate = metrics['win_rate']
-        result.profit_factor = metrics['profit_factor']
-        result.total_trades = int(metrics['total_trades'])
-        result.winning_trades = int(metrics['winning_trades'])
-        result.losing_trades = int(metrics['losing_trades'])
-        result.average_win = metrics['average_win']
-        result.average_loss = metrics['average_loss']
-        result.trades = self.trades
-        result.balance_history = self.equity_curve
-        result.drawdown_history = self.calculate_drawdown_history()
-        result.daily_returns = self.daily_returns
-        result.equity_curve = self.equity_curve
-        
-        logger.info(f"Backtest completed: {result.return_percentage:.2f}% return, {result.total_trades} trades")
-        return result
+        self.balance_usd = balance_usd
+        self.balance_krw = balance_krw
+        self.daily_trade_count = daily_trade_count
+        if last_trade_bar is not None:
+            self.last_trade_date = times[last_trade_bar].date()
+        self.daily_returns.extend(daily_returns)
+        self.equity_curve.extend(equity)
+        self.drawdowns.extend(self.performance.record_bars(equity, daily_returns))
+        self._record_new_trades()
+        return True
     
     def _combine_with_usd_krw_data(self, usdt_data: pd.DataFrame, 
-                                  start_date: datetime, end_date: datetime) -> pd.DataFrame:
-        """Combine USDT data with USD/KRW rates"""
+                                  start_date: datetime, end_date: datetime,
+                                  seed: Optional[int] = None) -> pd.DataFrame:
+        """Combine USDT data with USD/KRW rates (reproducible when seed is given)"""
         # This simulates realistic forex rates with arbitrage opportunities
         combined_data = []
+        random = np.random.RandomState(seed) if seed is not None else np.random
         
         for i, (_, row) in enumerate(usdt_data.iterrows()):
             # Base USD/KRW rate around the USDT price
@@ -458,7 +571,7 @@ class EnhancedUpbitBacktest:
             
             # Add realistic forex market variations
             time_of_day_factor = np.sin(i * 0.1) * 0.002  # Time-based variations
-            market_volatility = np.random.normal(0, 0.003)  # Market noise
+            market_volatility = random.normal(0, 0.003)  # Market noise
             
             # Create periodic arbitrage opportunities
             if i % 8 == 0:  # Every 8th data point
@@ -481,71 +594,99 @@ class EnhancedUpbitBacktest:
             })
         
         logger.info(f"Combined {len(combined_data)} data points with USD/KRW rates")
-        return pd.DataFrame(combined_data)
+        combined = pd.DataFrame(combined_data)
+        # fetch_real_historical_data falls back to synthetic prices when the fetch fails
+        combined.attrs['data_source'] = usdt_data.attrs.get('data_source', 'real')
+        return combined
     
     def optimize_parameters(self, start_date: datetime, end_date: datetime, 
-                           param_ranges: Dict[str, Tuple[float, float, float]]) -> Dict[str, Any]:
-        """Optimize strategy parameters"""
-        logger.info("Starting parameter optimization")
-        
-        best_return = float('-inf')
-        best_params = {}
-        results = []
-        
-        # Generate parameter combinations
-        param_combinations = self._generate_param_combinations(param_ranges)
-        
-        for params in param_combinations:
-            # Update config with new parameters
-            test_config = BacktestConfig(**{**asdict(self.config), **params})
-            test_backtest = EnhancedUpbitBacktest(test_config, ArbitrageStrategy(test_config))
-            
-            try:
-                result = test_backtest.run_backtest(start_date, end_date, use_real_data=False)
-                
-                # Store result
-                result_dict = {
-                    'params': params,
-                    'return_percentage': result.return_percentage,
-                    'max_drawdown': result.max_drawdown,
-                    'sharpe_ratio': result.sharpe_ratio,
-                    'win_rate': result.win_rate,
-                    'total_trades': result.total_trades
-                }
-                results.append(result_dict)
-                
-                # Check if this is the best result
-                if result.return_percentage > best_return:
-                    best_return = result.return_percentage
-                    best_params = params
-                    
-            except Exception as e:
-                logger.error(f"Error in parameter optimization: {str(e)}")
-                continue
-        
-        logger.info(f"Optimization completed. Best return: {best_return:.2f}%")
+                           param_ranges: Dict[str, Tuple[float, float, float]],
+                           seed: Optional[int] = 42, use_real_data: bool = False,
+                           cache_dir: Optional[str] = None,
+                           max_workers: Optional[int] = None,
+                           search: str = 'grid',
+                           search_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Optimize strategy parameters
+        
+        The dataset is loaded once (synthetic data is generated from seed, so every
+        combination sees the same prices) and points are evaluated across a process
+        pool. search picks the strategy from param_search ('grid', 'random',
+        'halving' or 'tpe'; search_options are passed to it). With cache_dir set,
+        results are memoized on disk, so re-running or widening a sweep only
+        computes the new points.
+        """
+        from .param_search import get_search_strategy, upbit_evaluator
+        
+        logger.info(f"Starting parameter optimization ({search} search)")
+        
+        space = self._param_space(param_ranges)
+        historical_data = self.load_historical_data(start_date, end_date, use_real_data, seed)
+        with upbit_evaluator(historical_data, BacktestConfig(**asdict(self.config)),
+                             cache_dir=cache_dir, max_workers=max_workers) as evaluate:
+            outcome = get_search_strategy(search, **(search_options or {})).run(space, evaluate)
+        
+        results = [{'params': trial.params, **trial.summary}
+                   for trial in outcome.full_trials if trial.summary is not None]
+        
+        logger.info(f"Optimization completed over {len(results)} combinations. Best return: {outcome.best_score:.2f}%")
         
         return {
-            'best_params': best_params,
-            'best_return': best_return,
+            'best_params': outcome.best_params,
+            'best_return': outcome.best_score,
             'all_results': results
         }
     
-    def _generate_param_combinations(self, param_ranges: Dict[str, Tuple[float, float, float]]) -> List[Dict[str, float]]:
-        """Generate all parameter combinations for optimization"""
-        combinations = []
-        
-        # Simple grid search - could be improved with more sophisticated optimization
-        for price_threshold in np.arange(*param_ranges.get('price_threshold', (0.1, 2.0, 0.1))):
-            for max_trade_amount in np.arange(*param_ranges.get('max_trade_amount', (500, 2000, 250))):
-                for stop_loss in np.arange(*param_ranges.get('stop_loss_threshold', (1.0, 5.0, 0.5))):
-                    combinations.append({
-                        'price_threshold': round(price_threshold, 2),
-                        'max_trade_amount': round(max_trade_amount, 2),
-                        'stop_loss_threshold': round(stop_loss, 2)
-                    })
-        
-        return combinations[:100]  # Limit to prevent excessive computation
+    def walk_forward(self, start_date: datetime, end_date: datetime,
+                     param_ranges: Dict[str, Tuple[float, float, float]],
+                     wf_config: Optional['WalkForwardConfig'] = None,
+                     seed: Optional[int] = 42, use_real_data: bool = False,
+                     cache_dir: Optional[str] = None,
+                     max_workers: Optional[int] = None,
+                     search: str = 'grid',
+                     search_options: Optional[Dict[str, Any]] = None) -> 'WalkForwardResult':
+        """Walk-forward optimization: fit on rolling train folds, report the following test folds
+        
+        Takes the same search arguments as optimize_parameters; wf_config sets the
+        fold layout. The history is loaded once and shared by every fold.
+        """
+        from .walk_forward import UpbitWalkForward, run_walk_forward
+        
+        historical_data = self.load_historical_data(start_date, end_date, use_real_data, seed)
+        engine = UpbitWalkForward(BacktestConfig(**asdict(self.config)), cache_dir=cache_dir)
+        return run_walk_forward(historical_data, engine, self._param_space(param_ranges), wf_config,
+                                search=search, search_options=search_options, max_workers=max_workers)
+    
+    def monte_carlo(self, historical_data: Optional[pd.DataFrame], result: BacktestResult,
+                    mc_config: Optional['MonteCarloConfig'] = None) -> 'MonteCarloResult':
+        """Return and drawdown distributions of a completed run (see monte_carlo.upbit_monte_carlo)"""
+        from .monte_carlo import upbit_monte_carlo
+        return upbit_monte_carlo(BacktestConfig(**asdict(self.config)), historical_data, result, mc_config)
+    
+    def _param_space(self, param_ranges: Dict[str, Tuple[float, float, float]]) -> List['ParamSpec']:
+        """Search dimensions for optimize_parameters
+        
+        price_threshold, max_trade_amount and stop_loss_threshold always vary (with
+        default (start, stop, step) ranges); any other BacktestConfig field given in
+        param_ranges is added as another dimension.
+        """
+        from .param_search import ParamSpec
+        
+        ranges = {
+            'price_threshold': param_ranges.get('price_threshold', (0.1, 2.0, 0.1)),
+            'max_trade_amount': param_ranges.get('max_trade_amount', (500, 2000, 250)),
+            'stop_loss_threshold': param_ranges.get('stop_loss_threshold', (1.0, 5.0, 0.5)),
+        }
+        config_fields = set(asdict(self.config))
+        for name, value_range in param_ranges.items():
+            if name in ranges:
+                continue
+            if name in config_fields:
+                ranges[name] = value_range
+            else:
+                logger.warning(f"Ignoring unknown optimization parameter: {name}")
+        
+        return [ParamSpec(name, low=start, high=stop, step=step, decimals=2)
+                for name, (start, stop, step) in ranges.items()]
     
     def export_results(self, result: BacktestResult, filename: Optional[str] = None) -> Optional[str]:
         """Export backtest results to JSON"""
@@ -571,8 +712,8 @@ class EnhancedUpbitBacktest:
                     'average_loss': result.average_loss
                 },
                 'trades': [asdict(trade) for trade in result.trades],
-                'daily_returns': result.daily_returns,
-                'equity_curve': result.equity_curve
+                'daily_returns': result.daily_returns.tolist(),
+                'equity_curve': result.equity_curve.tolist()
             }
             
             with open(filename, 'w') as f:
@@ -0,0 +1,230 @@
+"""
+Parallel, Cached Parameter Sweep for EnhancedUpbitBacktest
+
+Runs one BacktestConfig per parameter point over a single, already loaded
+dataset. The dataset's price arrays are placed in shared memory once and the
+points are fanned out across a process pool. Each result summary is memoized
+on disk under a hash of (engine version, config, strategy, dataset), so
+re-running a sweep, or widening its ranges, only computes the points that
+have not been seen.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import weakref
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, replace
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from .backtest import BacktestConfig, EnhancedUpbitBacktest, ArbitrageStrategy
+from .parallel_sweep import SharedMarketData
+
+logger = logging.getLogger(__name__)
+
+UPBIT_MARKET_FIELDS = ['usd_krw_rate', 'usdt_krw_price', 'volume']
+
+SWEEP_SUMMARY_KEYS = ['return_percentage', 'max_drawdown', 'sharpe_ratio', 'win_rate', 'total_trades']
+
+# Fields that do not change a backtest's result
+_IGNORED_FIELDS = {'use_vectorized_engine'}
+
+# Part of every cache key. Bump it whenever a change to the backtest engine (fills, costs,
+# metrics) can change a result, so summaries cached by the old engine are not served
+ENGINE_VERSION = 1
+
+def dataset_fingerprint(historical_data: pd.DataFrame) -> str:
+    """Content hash of the timestamps and market columns of a backtest dataset"""
+    digest = hashlib.sha256()
+    times = pd.DatetimeIndex(historical_data['datetime'])
+    digest.update(str(times.tz).encode())
+    digest.update(times.as_unit('ns').asi8.tobytes())
+    for field in UPBIT_MARKET_FIELDS:
+        if field in historical_data:
+            digest.update(field.encode())
+            digest.update(np.ascontiguousarray(historical_data[field].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+def config_key(config: BacktestConfig, dataset_hash: str, strategy: str = ArbitrageStrategy.__name__) -> str:
+    """Cache key for one backtest of config over the dataset with the given fingerprint"""
+    fields = {name: value for name, value in asdict(config).items() if name not in _IGNORED_FIELDS}
+    payload = json.dumps({'engine': ENGINE_VERSION, 'config': fields, 'strategy': strategy,
+                          'dataset': dataset_hash}, sort_keys=True, default=float)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class SweepResultCache:
+    """Backtest summaries keyed by config_key, kept in an append-only JSON Lines file"""
+
+    def __init__(self, cache_dir: str, filename: str = 'upbit_sweep_results.jsonl'):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, filename)
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._results[entry['key']] = entry['summary']
+                    except (ValueError, KeyError):
+                        continue  # Partially written line from an interrupted sweep
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._results.get(key)
+
+    def put(self, key: str, summary: Dict[str, Any]) -> None:
+        with self._lock:
+            self._results[key] = summary
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'key': key, 'summary': summary}) + '\n')
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+def _summarize(config: BacktestConfig, historical_data: pd.DataFrame) -> Dict[str, Any]:
+    result = EnhancedUpbitBacktest(config, ArbitrageStrategy(config)).run_backtest_on_data(historical_data)
+    return {key: getattr(result, key) for key in SWEEP_SUMMARY_KEYS}
+
+# Per-worker state populated by _init_worker
+_worker_state: Dict[str, Any] = {}
+
+def _init_worker(descriptor: Dict[str, Any]):
+    shm, times, arrays = SharedMarketData.attach(descriptor)
+    _worker_state['shm'] = shm
+    _worker_state['data'] = pd.DataFrame({'datetime': times, **arrays})
+    _worker_state['windows'] = {}
+
+def _worker_window(start: int) -> pd.DataFrame:
+    windows = _worker_state['windows']
+    if start not in windows:
+        if len(windows) >= 8:
+            windows.clear()
+        windows[start] = _worker_state['data'].iloc[start:].reset_index(drop=True)
+    return windows[start]
+
+def _run_sweep_point(config: BacktestConfig, start: int = 0) -> Dict[str, Any]:
+    return _summarize(config, _worker_window(start))
+
+class BacktestSweepPool:
+    """Worker processes and a shared-memory copy of one dataset, reused across sweeps
+
+    A parameter search evaluates many small batches, some of them on only the
+    most recent rows (successive halving). Running each batch through its own
+    run_backtest_sweep would copy the data and start the workers every time;
+    a pool does both once, on the first batch that needs them. Release it with
+    close() or by leaving a with block.
+    """
+
+    def __init__(self, historical_data: pd.DataFrame, cache_dir: Optional[str] = None,
+                 max_workers: Optional[int] = None):
+        self.data = historical_data.reset_index(drop=True)
+        self.cache = SweepResultCache(cache_dir) if cache_dir else None
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._fingerprints: Dict[int, str] = {}  # Window start row -> dataset_fingerprint
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._finalizer = None
+
+    def _start(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            fields = [field for field in UPBIT_MARKET_FIELDS if field in self.data]
+            market_data = SharedMarketData(self.data, fields, times=pd.DatetimeIndex(self.data['datetime']))
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                                 initargs=(market_data.descriptor,))
+            # Also released if the pool is dropped without close()
+            self._finalizer = weakref.finalize(self, BacktestSweepPool._release, self._executor, market_data)
+        return self._executor
+
+    @staticmethod
+    def _release(executor: ProcessPoolExecutor, market_data: SharedMarketData) -> None:
+        executor.shutdown(wait=True)
+        market_data.close()
+
+    def close(self) -> None:
+        if self._finalizer is not None:
+            self._finalizer()
+        self._executor = self._finalizer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def run(self, configs: List[BacktestConfig], rows: Optional[int] = None) -> List[Optional[Dict[str, Any]]]:
+        """Backtest every config over the last `rows` rows (all by default); summaries in config order
+
+        A summary is None if that run failed. With a cache_dir, summaries are read
+        from and written to the on-disk cache, and only uncached configs are run.
+        """
+        start = 0 if rows is None else max(0, len(self.data) - rows)
+        cache = self.cache
+        if cache is not None and start not in self._fingerprints:
+            self._fingerprints[start] = dataset_fingerprint(self.data.iloc[start:])
+        dataset_hash = self._fingerprints.get(start)
+        # Both engines give identical results; the vectorized one is much faster
+        configs = [replace(config, use_vectorized_engine=True) for config in configs]
+
+        summaries: List[Optional[Dict[str, Any]]] = [None] * len(configs)
+        keys: List[Optional[str]] = [None] * len(configs)
+        pending: Dict[str, List[int]] = {}  # One run per distinct key, however often it appears
+        for index, config in enumerate(configs):
+            if cache is not None:
+                keys[index] = config_key(config, dataset_hash)
+                cached = cache.get(keys[index])
+                if cached is not None:
+                    summaries[index] = cached
+                    continue
+            pending.setdefault(keys[index] or str(index), []).append(index)
+
+        if cache is not None:
+            logger.info(f"Sweep: {len(configs) - sum(len(v) for v in pending.values())} of {len(configs)} points cached")
+
+        def store(indices: List[int], summary: Optional[Dict[str, Any]]) -> None:
+            for index in indices:
+                summaries[index] = summary
+            if cache is not None and summary is not None:
+                cache.put(keys[indices[0]], summary)
+
+        if self.max_workers == 1 or (len(pending) <= 1 and self._executor is None):
+            window = self.data.iloc[start:].reset_index(drop=True) if start else self.data
+            for indices in pending.values():
+                try:
+                    store(indices, _summarize(configs[indices[0]], window))
+                except Exception as e:
+                    logger.error(f"Sweep point {configs[indices[0]]} failed: {e}")
+            return summaries
+
+        executor = self._start()
+        futures = {
+            executor.submit(_run_sweep_point, configs[indices[0]], start): indices
+            for indices in pending.values()
+        }
+        for future, indices in futures.items():
+            try:
+                store(indices, future.result())
+            except Exception as e:
+                logger.error(f"Sweep point {configs[indices[0]]} failed: {e}")
+        return summaries
+
+def run_backtest_sweep(historical_data: pd.DataFrame, configs: List[BacktestConfig],
+                       cache_dir: Optional[str] = None,
+                       max_workers: Optional[int] = None) -> List[Optional[Dict[str, Any]]]:
+    """Backtest every config over historical_data; returns summaries in config order
+
+    A summary is None if that run failed. With cache_dir set, summaries are read
+    from and written to the on-disk cache, and only uncached configs are run.
+    Use a BacktestSweepPool to run several sweeps over the same data.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    with BacktestSweepPool(historical_data, cache_dir, max_workers) as pool:
+        # One worker per point at most, as the pool is not reused
+        pool.max_workers = min(max_workers, max(1, len(configs)))
+        return pool.run(configs)
@@ -0,0 +1,397 @@
+"""
+Batched Bitcoin Arbitrage Backtesting
+
+Advances many BitcoinBacktestConfig variants through the price series together.
+Per-config state (balances, open position slots, used scaled levels) lives in
+struct-of-arrays form, so each bar updates every config with a handful of
+vectorized NumPy operations instead of running one backtest per config.
+Results match BitcoinBacktester.simulate_trades for each config. The market
+arrays can also be 2-D, one price path per config, which lets Monte Carlo runs
+push thousands of resampled paths through a single config at once.
+
+simulate_upbit_paths does the same for the USDT arbitrage backtest
+(EnhancedUpbitBacktest with ArbitrageStrategy): one config, one price path
+per lane.
+"""
+
+import logging
+from dataclasses import asdict
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from .bitcoin_backtest import BitcoinBacktestConfig, SCALED_ENTRY_LEVELS, SCALED_EXIT_LEVELS
+
+logger = logging.getLogger(__name__)
+
+# Fields that may differ between configs in one batch; everything else must match
+BATCH_FIELDS = [
+    'entry_premium_threshold',
+    'exit_profit_threshold',
+    'position_portion',
+    'leverage_multiplier',
+    'max_position_size_btc',
+]
+
+# Fields that do not affect the simulation
+_IGNORED_FIELDS = {'use_vectorized_engine', 'data_cache_dir'}
+
+# Non-scaled strategy position cap (matches simulate_trades)
+MAX_OPEN_POSITIONS = 3
+
+def _check_shared_fields(configs: List[BitcoinBacktestConfig]) -> None:
+    base = asdict(configs[0])
+    for config in configs[1:]:
+        for field, value in asdict(config).items():
+            if field in BATCH_FIELDS or field in _IGNORED_FIELDS:
+                continue
+            if value != base[field]:
+                raise ValueError(f"All configs in a batch must share '{field}' "
+                                 f"({base[field]!r} != {value!r})")
+
+def simulate_config_batch(premium: np.ndarray, upbit_close: np.ndarray,
+                          binance_close: np.ndarray, usd_krw_rate: np.ndarray,
+                          configs: List[BitcoinBacktestConfig],
+                          track_drawdown: bool = False) -> List[Dict]:
+    """Simulate every config over the same market arrays in one pass
+
+    Only the fields in BATCH_FIELDS may vary between configs. Returns one summary
+    dict per config, in input order, with the balance and return figures of
+    simulate_trades (trade lists and balance history are not produced).
+
+    1-D market arrays are shared by every config; 2-D arrays of shape
+    (len(configs), bars) give each config its own path. With track_drawdown,
+    every bar is valued as in simulate_trades' balance history and each summary
+    also holds 'max_drawdown' (%, peak to trough of total value).
+    """
+    if not configs:
+        return []
+    _check_shared_fields(configs)
+    base = configs[0]
+
+    per_config = np.ndim(premium) == 2
+    # Paths are read one bar (column) at a time, so keep them column-major;
+    # (bars, paths) arrays passed transposed are used without a copy
+    layout = np.asfortranarray if per_config else np.ascontiguousarray
+    premium = layout(premium, dtype=np.float64)
+    upbit_close = layout(upbit_close, dtype=np.float64)
+    binance_close = layout(binance_close, dtype=np.float64)
+    usd_krw_rate = layout(usd_krw_rate, dtype=np.float64)
+    n = premium.shape[-1]
+    if per_config:
+        if premium.shape[0] != len(configs):
+            raise ValueError(f"Expected one market path per config ({premium.shape[0]} != {len(configs)})")
+        premium_values = premium
+        upbit_values = upbit_close
+        binance_values = binance_close
+        fx_values = usd_krw_rate
+    else:
+        premium_values = premium.tolist()
+        upbit_values = upbit_close.tolist()
+        binance_values = binance_close.tolist()
+
+    # Per-config parameters
+    num_configs = len(configs)
+    entry_threshold = np.array([c.entry_premium_threshold for c in configs], dtype=np.float64)
+    exit_threshold = np.array([c.exit_profit_threshold for c in configs], dtype=np.float64)
+    leverage = np.array([c.leverage_multiplier for c in configs], dtype=np.float64)
+    max_size = np.array([c.max_position_size_btc for c in configs], dtype=np.float64)
+    position_portion = np.array([c.position_portion for c in configs], dtype=np.float64)
+
+    upbit_commission = base.upbit_commission
+    binance_commission = base.binance_commission
+    upbit_krw_fee = base.upbit_krw_fee
+
+    scaled = base.use_scaled_strategy
+    if scaled:
+        entry_levels = np.array(SCALED_ENTRY_LEVELS, dtype=np.float64)
+        exit_levels = np.array(SCALED_EXIT_LEVELS, dtype=np.float64)
+        num_slots = len(entry_levels)
+        # Slot k holds the position opened at entry level k; only levels <= -0.5% may exit
+        slot_can_exit = entry_levels <= -0.5
+        initial_total_krw = base.initial_balance_krw + (base.initial_balance_usdt * 1300)
+        available_krw = initial_total_krw * position_portion
+        available_usdt = base.initial_balance_usdt * position_portion
+        next_level = np.zeros(num_configs, dtype=np.int64)
+        used_exit = np.zeros((num_configs, len(exit_levels)), dtype=bool)
+        min_unused_exit = np.full(num_configs, exit_levels.min())
+    else:
+        num_slots = MAX_OPEN_POSITIONS
+
+    # Balances
+    balance_krw = np.full(num_configs, base.initial_balance_krw, dtype=np.float64)
+    balance_usdt = np.full(num_configs, base.initial_balance_usdt, dtype=np.float64)
+    balance_btc = np.full(num_configs, base.initial_btc, dtype=np.float64)
+
+    # Open positions as (config, slot) arrays
+    is_open = np.zeros((num_configs, num_slots), dtype=bool)
+    pos_size = np.zeros((num_configs, num_slots), dtype=np.float64)
+    pos_upbit_entry = np.ones((num_configs, num_slots), dtype=np.float64)
+    pos_binance_entry = np.ones((num_configs, num_slots), dtype=np.float64)
+    pos_margin = np.zeros((num_configs, num_slots), dtype=np.float64)
+    pos_entry_bar = np.zeros((num_configs, num_slots), dtype=np.int64)
+    entry_count = np.zeros(num_configs, dtype=np.int64)
+
+    all_rows = np.arange(num_configs)
+    if scaled:
+        # Scaled slots are filled in entry order, so newest-first is descending slot order
+        scaled_close_order = [np.full(num_configs, slot) for slot in reversed(range(num_slots))]
+
+    entry_candidates: Dict[float, np.ndarray] = {}
+    if track_drawdown:
+        peak_value = np.full(num_configs, -np.inf)
+        min_ratio = np.ones(num_configs, dtype=np.float64)  # Lowest total value / running peak
+
+    i = 0
+    while i < n:
+        if track_drawdown:
+            exit_possible = True  # Every bar is valued, so none can be skipped
+        elif scaled:
+            exit_possible = bool((is_open[:, slot_can_exit].any(axis=1) & np.isfinite(min_unused_exit)).any())
+        else:
+            exit_possible = bool(is_open.any())
+
+        if not exit_possible:
+            # Only entries can change state: jump to the next bar any config could enter on
+            if scaled:
+                has_level = next_level < num_slots
+                if not has_level.any():
+                    break
+                threshold = float(entry_levels[next_level[has_level]].max())
+            else:
+                threshold = float(entry_threshold.max())
+
+            candidates = entry_candidates.get(threshold)
+            if candidates is None:
+                below = premium < threshold
+                candidates = np.flatnonzero(below.any(axis=0) if per_config else below)
+                entry_candidates[threshold] = candidates
+            k = int(np.searchsorted(candidates, i))
+            if k == len(candidates):
+                break
+            i = int(candidates[k])
+
+        if per_config:
+            current_premium = premium_values[:, i]
+            btc_price_krw = upbit_values[:, i]
+            btc_price_usdt = binance_values[:, i]
+        else:
+            current_premium = premium_values[i]
+            btc_price_krw = upbit_values[i]
+            btc_price_usdt = binance_values[i]
+
+        # ENTRY
+        if scaled:
+            has_level = next_level < num_slots
+            want_entry = has_level & (current_premium < entry_levels[np.minimum(next_level, num_slots - 1)])
+        else:
+            want_entry = (current_premium < entry_threshold) & (is_open.sum(axis=1) < MAX_OPEN_POSITIONS)
+
+        if want_entry.any():
+            rows = np.flatnonzero(want_entry)
+            entry_krw = btc_price_krw[rows] if per_config else btc_price_krw
+            entry_usdt = btc_price_usdt[rows] if per_config else btc_price_usdt
+            if scaled:
+                max_btc_by_krw = available_krw[rows] / entry_krw * 0.95
+                max_btc_by_usdt = (available_usdt[rows] * leverage[rows]) / entry_usdt * 0.95
+                size = np.minimum(np.minimum(max_size[rows], max_btc_by_krw), max_btc_by_usdt)
+                upbit_cost = size * entry_krw * (1 + upbit_commission)
+                krw_cost = upbit_cost - upbit_cost * upbit_krw_fee
+            else:
+                max_btc_by_usdt = (balance_usdt[rows] * leverage[rows]) / entry_usdt * 0.95
+                max_btc_by_krw = balance_krw[rows] / entry_krw * 0.95
+                size = np.minimum(np.minimum(max_size[rows], max_btc_by_usdt), max_btc_by_krw)
+                krw_cost = size * entry_krw * (1 + upbit_commission)
+            margin = (size * entry_usdt) / leverage[rows]
+
+            filled = (size >= 0.001) & (balance_krw[rows] >= krw_cost) & (balance_usdt[rows] >= margin)
+            if filled.any():
+                rows = rows[filled]
+                size = size[filled]
+                if per_config:
+                    entry_krw = entry_krw[filled]
+                    entry_usdt = entry_usdt[filled]
+                if scaled:
+                    slots = next_level[rows]
+                    next_level[rows] += 1
+                else:
+                    slots = np.argmin(is_open[rows], axis=1)  # first free slot
+
+                balance_krw[rows] -= krw_cost[filled]
+                balance_btc[rows] += size
+                balance_usdt[rows] -= margin[filled]
+
+                is_open[rows, slots] = True
+                pos_size[rows, slots] = size
+                pos_upbit_entry[rows, slots] = entry_krw
+                pos_binance_entry[rows, slots] = entry_usdt
+                pos_margin[rows, slots] = margin[filled]
+                pos_entry_bar[rows, slots] = i
+                entry_count[rows] += 1
+
+        # EXIT
+        if is_open.any():
+            price_krw = btc_price_krw[:, np.newaxis] if per_config else btc_price_krw
+            price_usdt = btc_price_usdt[:, np.newaxis] if per_config else btc_price_usdt
+            # In place, in the same operation order as simulate_trades
+            upbit_profit_pct = price_krw - pos_upbit_entry
+            upbit_profit_pct /= pos_upbit_entry
+            upbit_profit_pct *= 100
+            binance_profit_pct = pos_binance_entry - price_usdt
+            binance_profit_pct /= pos_binance_entry
+            binance_profit_pct *= 100
+            total_profit_percentage = upbit_profit_pct
+            total_profit_percentage += binance_profit_pct
+            total_profit_percentage /= 2
+
+            if scaled:
+                exit_eligible = is_open & slot_can_exit[np.newaxis, :]
+                closing = None
+                if (exit_eligible & (total_profit_percentage > min_unused_exit[:, np.newaxis])).any():
+                    closing = np.zeros_like(is_open)
+                    # Positions claim exit levels in entry order, so walk the slots in order
+                    for slot in range(num_slots):
+                        rows = np.flatnonzero(exit_eligible[:, slot])
+                        if len(rows) == 0:
+                            continue
+                        hits = ~used_exit[rows] & (total_profit_percentage[rows, slot][:, np.newaxis] > exit_levels)
+                        claimed = hits.any(axis=1)
+                        rows = rows[claimed]
+                        used_exit[rows, hits[claimed].argmax(axis=1)] = True
+                        closing[rows, slot] = True
+                    min_unused_exit = np.where(used_exit, np.inf, exit_levels).min(axis=1)
+            else:
+                closing = is_open & (total_profit_percentage > exit_threshold[:, np.newaxis])
+
+            if closing is not None and closing.any():
+                # Closes are applied newest position first, as in simulate_trades
+                if scaled:
+                    slot_order = scaled_close_order
+                else:
+                    newest_first = np.argsort(-np.where(is_open, pos_entry_bar, -1), axis=1, kind='stable')
+                    slot_order = [newest_first[:, rank] for rank in range(num_slots)]
+
+                for slots in slot_order:
+                    mask = closing[all_rows, slots]
+                    if not mask.any():
+                        continue
+                    rows = all_rows[mask]
+                    slots = slots[mask]
+                    size = pos_size[rows, slots]
+
+                    upbit_proceeds = size * (btc_price_krw[rows] if per_config else btc_price_krw) * (1 - upbit_commission)
+                    net_upbit_proceeds = upbit_proceeds + upbit_proceeds * upbit_krw_fee
+                    balance_krw[rows] += net_upbit_proceeds
+                    balance_btc[rows] -= size
+                    balance_usdt[rows] += pos_margin[rows, slots]
+
+                    is_open[rows, slots] = False
+                    pos_upbit_entry[rows, slots] = 1.0
+                    pos_binance_entry[rows, slots] = 1.0
+
+        if track_drawdown:
+            fx_rate = fx_values[:, i] if per_config else usd_krw_rate[i]
+            total_value = balance_krw + (balance_usdt * fx_rate) + (balance_btc * btc_price_krw)
+            np.maximum(peak_value, total_value, out=peak_value)
+            np.fmin(min_ratio, total_value / peak_value, out=min_ratio)
+
+        i += 1
+
+    final_value_krw = balance_krw + (balance_usdt * usd_krw_rate[..., -1]) + (balance_btc * upbit_close[..., -1])
+    initial_value_krw = np.broadcast_to(
+        base.initial_balance_krw + (base.initial_balance_usdt * usd_krw_rate[..., 0]), (num_configs,))
+    open_positions = is_open.sum(axis=1)
+
+    results = []
+    for c in range(num_configs):
+        results.append({
+            'final_balance_krw': float(balance_krw[c]),
+            'final_balance_usdt': float(balance_usdt[c]),
+            'final_balance_btc': float(balance_btc[c]),
+            'final_value_krw': float(final_value_krw[c]),
+            'initial_value_krw': float(initial_value_krw[c]),
+            'total_return_krw': float(final_value_krw[c] - initial_value_krw[c]),
+            'return_percentage': float(((final_value_krw[c] - initial_value_krw[c]) / initial_value_krw[c]) * 100),
+            'total_trades': int(entry_count[c]),
+            'open_positions': int(open_positions[c])
+        })
+        if track_drawdown:
+            results[-1]['max_drawdown'] = float((1 - min_ratio[c]) * 100)
+    return results
+
+def simulate_frame_batch(df: pd.DataFrame, configs: List[BitcoinBacktestConfig]) -> List[Dict]:
+    """simulate_config_batch over a DataFrame from BitcoinBacktester.fetch_historical_data"""
+    return simulate_config_batch(
+        df['kimchi_premium'].to_numpy(dtype=np.float64),
+        df['upbit_close'].to_numpy(dtype=np.float64),
+        df['binance_close'].to_numpy(dtype=np.float64),
+        df['usd_krw_rate'].to_numpy(dtype=np.float64),
+        configs
+    )
+
+def simulate_upbit_paths(config, times: pd.DatetimeIndex, usd_krw_rate: np.ndarray,
+                         usdt_krw_price: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return and max drawdown (%) of an ArbitrageStrategy backtest over many price paths
+
+    usd_krw_rate and usdt_krw_price are (bars, paths) arrays over the same
+    times. Every path advances one bar at a time with the fills of
+    EnhancedUpbitBacktest._simulate_vectorized (30% sizing, minimum size,
+    daily trade cap, costs and balance checks), so each path's figures match
+    run_backtest_on_data on it.
+    """
+    from .backtest import EnhancedUpbitBacktest, ArbitrageStrategy
+    usd_krw_rate = np.ascontiguousarray(usd_krw_rate, dtype=np.float64)
+    usdt_krw_price = np.ascontiguousarray(usdt_krw_price, dtype=np.float64)
+    bars, paths = usd_krw_rate.shape
+    backtest = EnhancedUpbitBacktest(config, ArbitrageStrategy(config))
+    initial_value = backtest.calculate_performance_metrics()['initial_balance']
+    buy_threshold = backtest.strategy.buy_threshold
+    sell_threshold = backtest.strategy.sell_threshold
+    max_trade_amount = config.max_trade_amount
+    max_trades_per_day = config.max_trades_per_day
+    commission_rate = config.commission_rate
+    slippage_rate = config.slippage_rate
+
+    balance_usd = np.full(paths, backtest.balance_usd, dtype=np.float64)
+    balance_krw = np.full(paths, backtest.balance_krw, dtype=np.float64)
+    trade_count = np.zeros(paths, dtype=np.int64)
+    daily_count = np.zeros(paths, dtype=np.int64)
+    peak = np.full(paths, np.nan)
+    max_drawdown = np.zeros(paths, dtype=np.float64)
+    days = pd.DatetimeIndex(times).normalize().asi8
+
+    for i in range(bars):
+        # Only a path's attempts read its daily count, so resetting every path at midnight
+        # matches the engine resetting on each path's first attempt of the day
+        if i and days[i] != days[i - 1]:
+            daily_count[:] = 0
+        rate = usd_krw_rate[i]
+        price = usdt_krw_price[i]
+        premium = ((price - rate) / rate) * 100
+        buy = premium < buy_threshold
+        sell = (premium > sell_threshold) & ~buy
+        amount = np.minimum(max_trade_amount, balance_usd * 0.3)
+        attempt = (buy | sell) & (amount > 100) & (daily_count < max_trades_per_day)
+        if attempt.any():
+            costs = amount * commission_rate + amount * price * slippage_rate
+            krw_amount = amount * price
+            fill_buy = attempt & buy & (balance_usd >= amount + costs)
+            fill_sell = attempt & sell & (balance_krw >= krw_amount)
+            balance_usd = np.where(fill_buy, balance_usd - (amount + costs),
+                                   np.where(fill_sell, balance_usd + (amount - costs), balance_usd))
+            balance_krw = np.where(fill_buy, balance_krw + krw_amount,
+                                   np.where(fill_sell, balance_krw - krw_amount, balance_krw))
+            filled = fill_buy | fill_sell
+            daily_count += filled
+            trade_count += filled
+
+        equity = balance_usd + balance_krw / rate
+        np.fmax(peak, equity, out=peak)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            drawdown = np.where(peak > 0, (peak - equity) / peak * 100, 0.0)
+        np.fmax(max_drawdown, drawdown, out=max_drawdown)
+
+    final_value = balance_usd + balance_krw / 1300  # Same rough conversion as calculate_performance_metrics
+    returns = (final_value - initial_value) / initial_value * 100 if initial_value > 0 else np.zeros(paths)
+    # Runs without trades report no drawdown, as calculate_performance_metrics does
+    max_drawdown[trade_count == 0] = 0.0
+    return returns, max_drawdown
@@ -11,11 +11,20 @@ from typing import Dict, List, Optional, Tuple
 import logging
 import json
 import ccxt
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
 from .bitcoin_kimchi_strategy import BitcoinArbitrageConfig, BitcoinArbitrageStrategy
+from .ohlcv_cache import OHLCVCache, OHLCV_COLUMNS
+from .rate_limit import get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
+# Scaled strategy levels
+# Entry levels: 0%, -0.5%, -1.0%, -1.5%, -2.0%, -2.5%, -3.0%, -3.5%, -4.0%
+SCALED_ENTRY_LEVELS = [0.0, -0.5, -1.0, -1.5, -2.0, -2.5, -3.0, -3.5, -4.0]
+# Exit levels: 0.5%, 1.0%, 1.5%, 2.0%, 2.5%, etc.
+SCALED_EXIT_LEVELS = [0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0]
+
 @dataclass 
 class BitcoinBacktestConfig:
     """Configuration for Bitcoin arbitrage backtesting"""
@@ -33,6 +42,8 @@ class BitcoinBacktestConfig:
     slippage_rate: float = 0.001             # 0.1% slippage
     use_scaled_strategy: bool = True         # Use scaled entry/exit strategy
     position_portion: float = 0.25           # 25% of capital per position
+    use_vectorized_engine: bool = False      # Run simulate_trades over NumPy arrays instead of iterrows
+    data_cache_dir: Optional[str] = None     # Directory for the on-disk OHLCV cache (None disables caching)
 
 class BitcoinBacktester:
     """Backtest Bitcoin arbitrage strategy"""
@@ -41,6 +52,7 @@ class BitcoinBacktester:
         self.config = config
         self.binance = ccxt.binance()
         self.upbit = ccxt.upbit()
+        self.ohlcv_cache = OHLCVCache(config.data_cache_dir) if config.data_cache_dir else None
         
     def calculate_funding_income(self, position_size: float, position_value_usdt: float, 
                                hours_held: int) -> float:
@@ -50,6 +62,53 @@ class BitcoinBacktester:
         funding_income = position_value_usdt * self.config.binance_funding_rate * funding_periods
         return funding_income
     
+    def _fetch_ohlcv_span(self, exchange: str, symbol: str, timeframe: str,
+                          since: int, until: int, limit: int) -> List[List[float]]:
+        """Page through an exchange's OHLCV history between two millisecond timestamps"""
+        client = self.binance if exchange == 'binance' else self.upbit
+        rate_limiter = get_rate_limiter(exchange)
+        rows = []
+        current_ts = since
+        
+        while current_ts < until:
+            # Wait for this exchange's rate budget instead of a fixed sleep
+            rate_limiter.acquire()
+            ohlcv = client.fetch_ohlcv(
+                symbol,
+                timeframe=timeframe,
+                since=current_ts,
+                limit=limit
+            )
+            
+            if not ohlcv:
+                break
+                
+            rows.extend(ohlcv)
+            current_ts = ohlcv[-1][0] + 1
+        
+        return rows
+    
+    def _fetch_ohlcv_frame(self, exchange: str, symbol: str, timeframe: str,
+                           start_ts: int, end_ts: int, limit: int) -> pd.DataFrame:
+        """Fetch OHLCV candles as a timestamp-indexed DataFrame with exchange-prefixed columns"""
+        if self.ohlcv_cache is not None:
+            columns = self.ohlcv_cache.get_range(
+                exchange, symbol, timeframe, start_ts, end_ts,
+                lambda since, until: self._fetch_ohlcv_span(exchange, symbol, timeframe, since, until, limit)
+            )
+            df = pd.DataFrame(columns.T, columns=OHLCV_COLUMNS)
+            df['timestamp'] = df['timestamp'].astype('int64')
+        else:
+            df = pd.DataFrame(
+                self._fetch_ohlcv_span(exchange, symbol, timeframe, start_ts, end_ts, limit),
+                columns=OHLCV_COLUMNS
+            )
+        
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        df.set_index('timestamp', inplace=True)
+        df.columns = [f'{exchange}_{col}' for col in df.columns]
+        return df
+    
     def fetch_historical_data(self, start_date: str, end_date: str, 
                             timeframe: str = '1h') -> pd.DataFrame:
         """Fetch historical data from exchanges"""
@@ -60,66 +119,18 @@ class BitcoinBacktester:
             start_ts = int(pd.Timestamp(start_date).timestamp() * 1000)
             end_ts = int(pd.Timestamp(end_date).timestamp() * 1000)
             
-            # Fetch Binance BTC/USDT data
-            binance_data = []
-            current_ts = start_ts
-            
-            while current_ts < end_ts:
-                ohlcv = self.binance.fetch_ohlcv(
-                    'BTC/USDT', 
-                    timeframe=timeframe,
-                    since=current_ts,
-                    limit=1000
+            # Fetch Binance BTC/USDT and Upbit BTC/KRW concurrently; each exchange
+            # is paced by its own rate limiter
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                binance_future = executor.submit(
+                    self._fetch_ohlcv_frame, 'binance', 'BTC/USDT', timeframe, start_ts, end_ts, 1000
                 )
-                
-                if not ohlcv:
-                    break
-                    
-                binance_data.extend(ohlcv)
-                current_ts = ohlcv[-1][0] + 1
-                
-                # Avoid rate limits
-                import time
-                time.sleep(0.5)
-            
-            # Convert to DataFrame
-            binance_df = pd.DataFrame(
-                binance_data,
-                columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
-            )
-            binance_df['timestamp'] = pd.to_datetime(binance_df['timestamp'], unit='ms')
-            binance_df.set_index('timestamp', inplace=True)
-            binance_df.columns = [f'binance_{col}' for col in binance_df.columns]
-            
-            # Fetch Upbit BTC/KRW data
-            upbit_data = []
-            current_ts = start_ts
-            
-            while current_ts < end_ts:
-                ohlcv = self.upbit.fetch_ohlcv(
-                    'BTC/KRW',
-                    timeframe=timeframe,
-                    since=current_ts,
-                    limit=200  # Upbit has lower limits
+                upbit_future = executor.submit(
+                    self._fetch_ohlcv_frame, 'upbit', 'BTC/KRW', timeframe, start_ts, end_ts,
+                    200  # Upbit has lower limits
                 )
-                
-                if not ohlcv:
-                    break
-                    
-                upbit_data.extend(ohlcv)
-                current_ts = ohlcv[-1][0] + 1
-                
-                # Avoid rate limits
-                time.sleep(0.5)
-            
-            # Convert to DataFrame
-            upbit_df = pd.DataFrame(
-                upbit_data,
-                columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
-            )
-            upbit_df['timestamp'] = pd.to_datetime(upbit_df['timestamp'], unit='ms')
-            upbit_df.set_index('timestamp', inplace=True)
-            upbit_df.columns = [f'upbit_{col}' for col in upbit_df.columns]
+                binance_df = binance_future.result()
+                upbit_df = upbit_future.result()
             
             # Merge data
             df = pd.merge(binance_df, upbit_df, left_index=True, right_index=True, how='inner')
@@ -140,6 +151,9 @@ class BitcoinBacktester:
     
     def simulate_trades(self, df: pd.DataFrame) -> Dict:
         """Simulate trades based on historical data with scaled entry/exit strategy"""
+        if self.config.use_vectorized_engine:
+            return self.simulate_trades_vectorized(df)
+        
         # Initialize balances
         balance_krw = self.config.initial_balance_krw
         balance_usdt = self.config.initial_balance_usdt
@@ -152,10 +166,8 @@ class BitcoinBacktester:
         
         # Scaled strategy configuration
         if self.config.use_scaled_strategy:
-            # Entry levels: 0%, -0.5%, -1.0%, -1.5%, -2.0%, -2.5%, -3.0%, -3.5%, -4.0%
-            entry_levels = [0.0, -0.5, -1.0, -1.5, -2.0, -2.5, -3.0, -3.5, -4.0]
-            # Exit levels: 0.5%, 1.0%, 1.5%, 2.0%, 2.5%, etc.
-            exit_levels = [0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0]
+            entry_levels = list(SCALED_ENTRY_LEVELS)
+            exit_levels = list(SCALED_EXIT_LEVELS)
             
             # Track which entry/exit levels have been used
             used_entry_levels = set()
@@ -370,6 +382,326 @@ class BitcoinBacktester:
             'open_positions': len(open_positions)
         }
     
+    def simulate_trades_vectorized(self, df: pd.DataFrame) -> Dict:
+        """Array-based equivalent of simulate_trades
+        
+        Pulls the price columns into contiguous float64 arrays and runs the same
+        entry/exit state machine over them. Stretches where no position can be
+        closed are skipped by jumping straight to the next bar whose premium can
+        trigger an entry, and balance history is rebuilt from the recorded events.
+        """
+        return self.simulate_market_arrays(
+            df.index,
+            df['kimchi_premium'].to_numpy(dtype=np.float64),
+            df['upbit_close'].to_numpy(dtype=np.float64),
+            df['binance_close'].to_numpy(dtype=np.float64),
+            df['usd_krw_rate'].to_numpy(dtype=np.float64)
+        )
+    
+    def simulate_market_arrays(self, times: pd.Index, premium: np.ndarray, upbit_close: np.ndarray,
+                               binance_close: np.ndarray, usd_krw_rate: np.ndarray,
+                               include_balance_history: bool = True) -> Dict:
+        """Run the array engine directly on market arrays (see simulate_trades_vectorized)
+        
+        Sweeps that only need summary figures can pass include_balance_history=False
+        to skip building the per-bar balance records.
+        """
+        premium = np.ascontiguousarray(premium, dtype=np.float64)
+        upbit_close = np.ascontiguousarray(upbit_close, dtype=np.float64)
+        binance_close = np.ascontiguousarray(binance_close, dtype=np.float64)
+        usd_krw_rate = np.ascontiguousarray(usd_krw_rate, dtype=np.float64)
+        n = len(premium)
+        
+        # Scalar access on Python floats is much cheaper than indexing NumPy arrays
+        premium_values = premium.tolist()
+        upbit_values = upbit_close.tolist()
+        binance_values = binance_close.tolist()
+        fx_values = usd_krw_rate.tolist()
+        
+        balance_krw = self.config.initial_balance_krw
+        balance_usdt = self.config.initial_balance_usdt
+        balance_btc = self.config.initial_btc
+        
+        trades = []
+        open_positions = []
+        
+        # Bars where balances changed, with the balances after that bar
+        event_bars = []
+        event_balances = []
+        
+        scaled = self.config.use_scaled_strategy
+        if scaled:
+            entry_levels = list(SCALED_ENTRY_LEVELS)
+            exit_levels = list(SCALED_EXIT_LEVELS)
+            max_open_positions = len(entry_levels)
+        else:
+            entry_levels = [self.config.entry_premium_threshold]
+            exit_levels = [self.config.exit_profit_threshold]
+            max_open_positions = 3
+        used_entry_levels = set()
+        used_exit_levels = set()
+        
+        leverage = self.config.leverage_multiplier
+        initial_total_krw = self.config.initial_balance_krw + (self.config.initial_balance_usdt * 1300)
+        scaled_available_krw = initial_total_krw * self.config.position_portion
+        scaled_available_usdt = self.config.initial_balance_usdt * self.config.position_portion
+        
+        # Sorted bar indices where premium < threshold, cached per threshold
+        entry_candidates: Dict[float, np.ndarray] = {}
+        
+        i = 0
+        while i < n:
+            # Work out whether any open position could be closed on this bar
+            if scaled:
+                exit_possible = (
+                    len(used_exit_levels) < len(exit_levels) and
+                    any(pos.get('entry_level', 0) <= -0.5 for pos in open_positions)
+                )
+            else:
+                exit_possible = bool(open_positions)
+            
+            if not exit_possible:
+                # Only an entry can change state, so jump to the next bar that can trigger one
+                entry_threshold = None
+                if len(open_positions) < max_open_positions:
+                    unused_levels = [level for level in entry_levels if level not in used_entry_levels]
+                    if unused_levels:
+                        entry_threshold = max(unused_levels)
+                
+                if entry_threshold is None:
+                    break
+                
+                candidates = entry_candidates.get(entry_threshold)
+                if candidates is None:
+                    candidates = np.flatnonzero(premium < entry_threshold)
+                    entry_candidates[entry_threshold] = candidates
+                
+                k = int(np.searchsorted(candidates, i))
+                if k == len(candidates):
+                    break
+                i = int(candidates[k])
+            
+            idx = times[i]
+            current_premium = premium_values[i]
+            btc_price_krw = upbit_values[i]
+            btc_price_usdt = binance_values[i]
+            changed = False
+            
+            # ENTRY
+            if scaled:
+                for entry_level in entry_levels:
+                    if (current_premium < entry_level and
+                        entry_level not in used_entry_levels and
+                        len(open_positions) < len(entry_levels)):
+                        
+                        max_btc_by_krw = scaled_available_krw / btc_price_krw * 0.95
+                        max_btc_by_usdt = (scaled_available_usdt * leverage) / btc_price_usdt * 0.95
+                        position_size = min(self.config.max_position_size_btc, max_btc_by_krw, max_btc_by_usdt)
+                        
+                        if position_size >= 0.001:
+                            upbit_cost = position_size * btc_price_krw * (1 + self.config.upbit_commission)
+                            krw_deposit_income = upbit_cost * self.config.upbit_krw_fee
+                            total_upbit_cost = upbit_cost - krw_deposit_income
+                            
+                            binance_margin_required = (position_size * btc_price_usdt) / leverage
+                            binance_proceeds = position_size * btc_price_usdt * (1 - self.config.binance_commission)
+                            
+                            if balance_krw >= total_upbit_cost and balance_usdt >= binance_margin_required:
+                                balance_krw -= total_upbit_cost
+                                balance_btc += position_size
+                                balance_usdt -= binance_margin_required
+                                
+                                open_positions.append({
+                                    'entry_time': idx,
+                                    'entry_premium': current_premium,
+                                    'entry_level': entry_level,
+                                    'size': position_size,
+                                    'upbit_entry_price': btc_price_krw,
+                                    'binance_entry_price': btc_price_usdt,
+                                    'upbit_cost_krw': total_upbit_cost,
+                                    'binance_margin_usdt': binance_margin_required,
+                                    'binance_proceeds_usdt': binance_proceeds,
+                                    'leverage': leverage
+                                })
+                                used_entry_levels.add(entry_level)
+                                
+                                trades.append({
+                                    'time': idx,
+                                    'type': 'ENTRY',
+                                    'premium': current_premium,
+                                    'entry_level': entry_level,
+                                    'size': position_size,
+                                    'upbit_price': btc_price_krw,
+                                    'binance_price': btc_price_usdt,
+                                    'leverage': leverage
+                                })
+                                changed = True
+                                break
+            else:
+                if current_premium < self.config.entry_premium_threshold and len(open_positions) < 3:
+                    max_btc_by_usdt = (balance_usdt * leverage) / btc_price_usdt * 0.95
+                    max_btc_by_krw = balance_krw / btc_price_krw * 0.95
+                    position_size = min(self.config.max_position_size_btc, max_btc_by_usdt, max_btc_by_krw)
+                    
+                    if position_size >= 0.001:
+                        upbit_cost = position_size * btc_price_krw * (1 + self.config.upbit_commission)
+                        binance_margin_required = (position_size * btc_price_usdt) / leverage
+                        binance_proceeds = position_size * btc_price_usdt * (1 - self.config.binance_commission)
+                        
+                        if balance_krw >= upbit_cost and balance_usdt >= binance_margin_required:
+                            balance_krw -= upbit_cost
+                            balance_btc += position_size
+                            balance_usdt -= binance_margin_required
+                            
+                            open_positions.append({
+                                'entry_time': idx,
+                                'entry_premium': current_premium,
+                                'size': position_size,
+                                'upbit_entry_price': btc_price_krw,
+                                'binance_entry_price': btc_price_usdt,
+                                'upbit_cost_krw': upbit_cost,
+                                'binance_margin_usdt': binance_margin_required,
+                                'binance_proceeds_usdt': binance_proceeds,
+                                'leverage': leverage
+                            })
+                            
+                            trades.append({
+                                'time': idx,
+                                'type': 'ENTRY',
+                                'premium': current_premium,
+                                'size': position_size,
+                                'upbit_price': btc_price_krw,
+                                'binance_price': btc_price_usdt,
+                                'leverage': leverage
+                            })
+                            changed = True
+            
+            # EXIT
+            positions_to_close = []
+            for j, pos in enumerate(open_positions):
+                upbit_profit_pct = ((btc_price_krw - pos['upbit_entry_price']) / pos['upbit_entry_price']) * 100
+                binance_profit_pct = ((pos['binance_entry_price'] - btc_price_usdt) / pos['binance_entry_price']) * 100
+                total_profit_percentage = (upbit_profit_pct + binance_profit_pct) / 2
+                
+                if scaled:
+                    for exit_level in exit_levels:
+                        if (total_profit_percentage > exit_level and
+                            exit_level not in used_exit_levels and
+                            pos.get('entry_level', 0) <= -0.5):
+                            positions_to_close.append((j, exit_level))
+                            used_exit_levels.add(exit_level)
+                            break
+                else:
+                    if total_profit_percentage > self.config.exit_profit_threshold:
+                        positions_to_close.append((j, self.config.exit_profit_threshold))
+            
+            for j, exit_level in reversed(positions_to_close):
+                pos = open_positions.pop(j)
+                
+                position_duration = (idx - pos['entry_time']).total_seconds() / 3600
+                position_value_usdt = pos['size'] * pos['binance_entry_price']
+                funding_income = self.calculate_funding_income(pos['size'], position_value_usdt, position_duration)
+                
+                upbit_proceeds = pos['size'] * btc_price_krw * (1 - self.config.upbit_commission)
+                krw_withdrawal_income = upbit_proceeds * self.config.upbit_krw_fee
+                net_upbit_proceeds = upbit_proceeds + krw_withdrawal_income
+                balance_krw += net_upbit_proceeds
+                balance_btc -= pos['size']
+                
+                binance_cost = pos['size'] * btc_price_usdt * (1 + self.config.binance_commission)
+                balance_usdt += pos['binance_margin_usdt']
+                
+                upbit_pnl_krw = net_upbit_proceeds - pos['upbit_cost_krw']
+                binance_pnl_usdt = pos['binance_proceeds_usdt'] - binance_cost + funding_income
+                
+                trades.append({
+                    'time': idx,
+                    'type': 'EXIT',
+                    'premium': current_premium,
+                    'exit_level': exit_level,
+                    'size': pos['size'],
+                    'upbit_price': btc_price_krw,
+                    'binance_price': btc_price_usdt,
+                    'upbit_pnl_krw': upbit_pnl_krw,
+                    'binance_pnl_usdt': binance_pnl_usdt,
+                    'funding_income_usdt': funding_income,
+                    'total_pnl_krw': upbit_pnl_krw + (binance_pnl_usdt * fx_values[i])
+                })
+                changed = True
+            
+            if changed:
+                event_bars.append(i)
+                event_balances.append((balance_krw, balance_usdt, balance_btc))
+            
+            i += 1
+        
+        balance_history = []
+        if include_balance_history:
+            # Forward-fill balances between events and value them bar by bar
+            initial_balances = (self.config.initial_balance_krw, self.config.initial_balance_usdt, self.config.initial_btc)
+            balance_table = np.array([initial_balances] + event_balances, dtype=np.float64)
+            balance_slot = np.searchsorted(np.asarray(event_bars, dtype=np.int64), np.arange(n), side='right')
+            krw_history = balance_table[balance_slot, 0]
+            usdt_history = balance_table[balance_slot, 1]
+            btc_history = balance_table[balance_slot, 2]
+            total_value_history = krw_history + (usdt_history * usd_krw_rate) + (btc_history * upbit_close)
+            
+            balance_history = [
+                {
+                    'time': time_value,
+                    'balance_krw': krw,
+                    'balance_usdt': usdt,
+                    'balance_btc': btc,
+                    'total_value_krw': total_value,
+                    'premium': bar_premium
+                }
+                for time_value, krw, usdt, btc, total_value, bar_premium in zip(
+                    times, krw_history.tolist(), usdt_history.tolist(), btc_history.tolist(),
+                    total_value_history.tolist(), premium_values
+                )
+            ]
+        
+        final_value_krw = balance_krw + (balance_usdt * fx_values[-1]) + (balance_btc * upbit_values[-1])
+        initial_value_krw = self.config.initial_balance_krw + (self.config.initial_balance_usdt * fx_values[0])
+        
+        return {
+            'trades': trades,
+            'balance_history': balance_history,
+            'final_balance_krw': balance_krw,
+            'final_balance_usdt': balance_usdt,
+            'final_balance_btc': balance_btc,
+            'final_value_krw': final_value_krw,
+            'initial_value_krw': initial_value_krw,
+            'total_return_krw': final_value_krw - initial_value_krw,
+            'return_percentage': ((final_value_krw - initial_value_krw) / initial_value_krw) * 100,
+            'total_trades': len([t for t in trades if t['type'] == 'ENTRY']),
+            'open_positions': len(open_positions)
+        }
+    
+    def simulate_batch(self, df: pd.DataFrame, configs: List[BitcoinBacktestConfig]) -> List[Dict]:
+        """Simulate many config variants over df in a single pass (see batch_backtest)"""
+        from .batch_backtest import simulate_frame_batch
+        return simulate_frame_batch(df, configs)
+    
+    def walk_forward(self, start_date: str, end_date: str, space: List['ParamSpec'],
+                     wf_config: Optional['WalkForwardConfig'] = None, search: str = 'grid',
+                     search_options: Optional[Dict] = None,
+                     max_workers: Optional[int] = None) -> 'WalkForwardResult':
+        """Walk-forward optimization of the config fields in space over one fetched history"""
+        from .walk_forward import BitcoinWalkForward, run_walk_forward
+        
+        df = self.fetch_historical_data(start_date, end_date)
+        if df.empty:
+            raise ValueError("No historical data available")
+        return run_walk_forward(df, BitcoinWalkForward(self.config), space, wf_config,
+                                search=search, search_options=search_options, max_workers=max_workers)
+    
+    def monte_carlo(self, df: Optional[pd.DataFrame], results: Dict,
+                    mc_config: Optional['MonteCarloConfig'] = None) -> 'MonteCarloResult':
+        """Return and drawdown distributions of a completed run (see monte_carlo.bitcoin_monte_carlo)"""
+        from .monte_carlo import bitcoin_monte_carlo
+        return bitcoin_monte_carlo(self.config, df, results, mc_config)
+    
     def run_backtest(self, start_date: str, end_date: str) -> Dict:
         """Run complete backtest"""
         try:
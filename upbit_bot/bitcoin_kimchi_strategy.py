@@ -8,18 +8,22 @@ This module implements the Bitcoin kimchi premium arbitrage strategy:
 4. Sell Bitcoin on Upbit with limit orders (one tick above current price)
 """
 
-import requests
-import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, Optional, Tuple, List
 from datetime import datetime, timedelta
-import ccxt
 import pandas as pd
 import numpy as np
 from dataclasses import dataclass, asdict
+from .market_data_hub import MarketDataHub, get_market_data_hub
+from .order_book import OrderBook, trim_order_books
+from .fx_rate import FXRateProvider, get_fx_provider
 
 logger = logging.getLogger(__name__)
 
+# Shared pool for the concurrent quote fetches in calculate_bitcoin_kimchi_premium
+_quote_fetch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='premium-fetch')
+
 @dataclass
 class BitcoinArbitrageConfig:
     """Configuration for Bitcoin arbitrage strategy"""
@@ -30,55 +34,36 @@ class BitcoinArbitrageConfig:
     max_open_positions: int = 3            # Maximum simultaneous positions
     use_market_orders_binance: bool = True  # Use market orders on Binance
     min_order_size_btc: float = 0.001      # Minimum BTC order size
+    max_fx_age_seconds: float = 900.0      # Refuse entries on a USD/KRW rate older than this
 
 class BitcoinKimchiPremiumCalculator:
     """Calculate Bitcoin kimchi premium between Binance and Upbit"""
     
-    def __init__(self):
-        self.binance = ccxt.binance()
-        self.upbit = ccxt.upbit()
-        
-        # Exchange rate API
-        self.exchange_rate_api = "https://api.exchangerate-api.com/v4/latest/USD"
+    def __init__(self, hub: Optional[MarketDataHub] = None, fx: Optional[FXRateProvider] = None):
+        # Exchange clients and quotes come from the process-wide hub
+        self.hub = hub or get_market_data_hub()
+        self.binance = self.hub.binance
+        self.upbit = self.hub.upbit
         
-        # Cache for exchange rates
-        self._exchange_rate_cache = {}
-        self._cache_timestamp = 0
-        self._cache_duration = 300  # 5 minutes
+        # USD/KRW comes from the process-wide cached provider
+        self.fx = fx or get_fx_provider()
+
+        # Time budget for all premium inputs to arrive (seconds). Each exchange call is
+        # also bounded by the hub's request_timeout, so late fetches do not pile up
+        self.fetch_timeout = 5.0
         
     def get_usd_krw_rate(self) -> Optional[float]:
-        """Get current USD/KRW exchange rate"""
-        current_time = time.time()
-        
-        # Check cache first
-        if (current_time - self._cache_timestamp < self._cache_duration and 
-            'USD_KRW' in self._exchange_rate_cache):
-            return self._exchange_rate_cache['USD_KRW']
-        
+        """Get current USD/KRW exchange rate (cached, refreshed in the background)"""
         try:
-            response = requests.get(self.exchange_rate_api, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'rates' in data and 'KRW' in data['rates']:
-                usd_krw_rate = data['rates']['KRW']
-                
-                # Update cache
-                self._exchange_rate_cache['USD_KRW'] = usd_krw_rate
-                self._cache_timestamp = current_time
-                
-                logger.info(f"Retrieved USD/KRW rate: {usd_krw_rate}")
-                return usd_krw_rate
-                
+            return self.fx.get_rate()
         except Exception as e:
-            logger.warning(f"Failed to get USD/KRW rate: {e}")
-            # Use fallback rate
-            return 1350.0
+            logger.error(f"Failed to get USD/KRW rate: {e}")
+            return None
     
     def get_binance_btc_usdt_price(self) -> Optional[float]:
         """Get BTC/USDT price from Binance"""
         try:
-            ticker = self.binance.fetch_ticker('BTC/USDT')
+            ticker = self.hub.get_ticker('binance', 'BTC/USDT')
             btc_usdt_price = float(ticker['last'])
             logger.info(f"Binance BTC/USDT price: {btc_usdt_price}")
             return btc_usdt_price
@@ -89,7 +74,7 @@ class BitcoinKimchiPremiumCalculator:
     def get_upbit_btc_krw_price(self) -> Optional[float]:
         """Get BTC/KRW price from Upbit"""
         try:
-            ticker = self.upbit.fetch_ticker('BTC/KRW')
+            ticker = self.hub.get_ticker('upbit', 'BTC/KRW')
             btc_krw_price = float(ticker['last'])
             logger.info(f"Upbit BTC/KRW price: {btc_krw_price}")
             return btc_krw_price
@@ -97,17 +82,10 @@ class BitcoinKimchiPremiumCalculator:
             logger.error(f"Failed to get Upbit BTC/KRW price: {e}")
             return None
     
-    def get_order_book(self, exchange: str, symbol: str) -> Optional[Dict]:
-        """Get order book for a specific exchange and symbol"""
+    def get_order_book(self, exchange: str, symbol: str) -> Optional[OrderBook]:
+        """Get the fixed-depth order book for a specific exchange and symbol"""
         try:
-            if exchange.lower() == 'binance':
-                order_book = self.binance.fetch_order_book(symbol)
-            elif exchange.lower() == 'upbit':
-                order_book = self.upbit.fetch_order_book(symbol)
-            else:
-                raise ValueError(f"Unknown exchange: {exchange}")
-            
-            return order_book
+            return self.hub.get_order_book(exchange, symbol)
         except Exception as e:
             logger.error(f"Failed to get order book for {exchange} {symbol}: {e}")
             return None
@@ -115,10 +93,30 @@ class BitcoinKimchiPremiumCalculator:
     def calculate_bitcoin_kimchi_premium(self) -> Optional[Dict]:
         """Calculate Bitcoin kimchi premium percentage"""
         try:
-            # Get prices
-            binance_btc_usdt = self.get_binance_btc_usdt_price()
-            upbit_btc_krw = self.get_upbit_btc_krw_price()
-            usd_krw_rate = self.get_usd_krw_rate()
+            # Fetch prices, FX rate and order books concurrently so both legs are quoted together
+            futures = {
+                'binance_btc_usdt': _quote_fetch_pool.submit(self.get_binance_btc_usdt_price),
+                'upbit_btc_krw': _quote_fetch_pool.submit(self.get_upbit_btc_krw_price),
+                'usd_krw_rate': _quote_fetch_pool.submit(self.fx.get_quote),
+                'upbit_order_book': _quote_fetch_pool.submit(self.get_order_book, 'upbit', 'BTC/KRW'),
+                'binance_order_book': _quote_fetch_pool.submit(self.get_order_book, 'binance', 'BTC/USDT'),
+            }
+            wait(futures.values(), timeout=self.fetch_timeout)
+
+            fetched = {}
+            for name, future in futures.items():
+                if future.done():
+                    fetched[name] = future.result()
+                else:
+                    # Not started yet (queued behind slow fetches) means it never runs
+                    future.cancel()
+                    logger.warning(f"{name} not received within {self.fetch_timeout}s")
+                    fetched[name] = None
+
+            binance_btc_usdt = fetched['binance_btc_usdt']
+            upbit_btc_krw = fetched['upbit_btc_krw']
+            fx_quote = fetched['usd_krw_rate']
+            usd_krw_rate = fx_quote.rate if fx_quote else None
             
             if not all([binance_btc_usdt, upbit_btc_krw, usd_krw_rate]):
                 logger.error("Failed to get required prices for kimchi premium calculation")
@@ -130,9 +128,9 @@ class BitcoinKimchiPremiumCalculator:
             # Calculate kimchi premium
             kimchi_premium = ((upbit_btc_krw - binance_btc_krw) / binance_btc_krw) * 100
             
-            # Get order books for better execution prices
-            upbit_order_book = self.get_order_book('upbit', 'BTC/KRW')
-            binance_order_book = self.get_order_book('binance', 'BTC/USDT')
+            # Order books for better execution prices
+            upbit_order_book = fetched['upbit_order_book']
+            binance_order_book = fetched['binance_order_book']
             
             result = {
                 'kimchi_premium_percentage': kimchi_premium,
@@ -140,6 +138,8 @@ class BitcoinKimchiPremiumCalculator:
                 'binance_btc_usdt': binance_btc_usdt,
                 'binance_btc_krw': binance_btc_krw,
                 'usd_krw_rate': usd_krw_rate,
+                'usd_krw_age_seconds': fx_quote.age_seconds,
+                'usd_krw_source': fx_quote.source,
                 'timestamp': datetime.now().isoformat(),
                 'price_difference_krw': upbit_btc_krw - binance_btc_krw,
                 'upbit_order_book': upbit_order_book,
@@ -162,23 +162,21 @@ class BitcoinArbitrageStrategy:
         self.open_positions = []
         self.position_counter = 0
         
-    def get_limit_price(self, order_book: Dict, side: str, tick_offset: int = 1) -> float:
+    def get_limit_price(self, order_book: OrderBook, side: str, tick_offset: int = 1) -> float:
         """Calculate limit order price based on order book"""
         try:
-            if side == 'buy':
-                # For buying, use bid price minus tick offset
-                best_bid = order_book['bids'][0][0]
-                # Get price at tick_offset level if available
-                if len(order_book['bids']) > tick_offset:
-                    return order_book['bids'][tick_offset][0]
-                return best_bid
-            else:  # sell
-                # For selling, use ask price plus tick offset
-                best_ask = order_book['asks'][0][0]
-                # Get price at tick_offset level if available
-                if len(order_book['asks']) > tick_offset:
-                    return order_book['asks'][tick_offset][0]
-                return best_ask
+            if isinstance(order_book, dict):
+                order_book = OrderBook.from_ccxt(order_book)
+
+            # For buying, use bid price minus tick offset; for selling, ask price plus tick offset
+            book_side = 'bids' if side == 'buy' else 'asks'
+            # Get price at tick_offset level if available, else the best price
+            price = order_book.price_at(book_side, tick_offset)
+            if price is None:
+                price = order_book.price_at(book_side, 0)
+            if price is None:
+                raise ValueError(f"order book has no {book_side}")
+            return price
         except Exception as e:
             logger.error(f"Error calculating limit price: {e}")
             return None
@@ -204,6 +202,13 @@ class BitcoinArbitrageStrategy:
             logger.info(f"Maximum positions reached: {len(self.open_positions)}")
             return False
         
+        # Refuse to enter on a stale or fallback USD/KRW rate
+        if 'usd_krw_age_seconds' in premium_data:
+            fx_age = premium_data['usd_krw_age_seconds']
+            if fx_age is None or fx_age > self.config.max_fx_age_seconds:
+                logger.warning(f"USD/KRW rate is stale ({premium_data.get('usd_krw_source')}, age {fx_age}); not entering")
+                return False
+        
         # Check kimchi premium threshold
         premium = premium_data['kimchi_premium_percentage']
         if premium < self.config.entry_premium_threshold:
@@ -324,7 +329,7 @@ class BitcoinArbitrageStrategy:
                 'max_positions': self.config.max_open_positions,
                 'positions': self.open_positions,
                 'last_update': datetime.now().isoformat(),
-                'market_data': premium_data
+                'market_data': trim_order_books(premium_data)
             }
             
         except Exception as e:
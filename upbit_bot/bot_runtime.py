@@ -0,0 +1,239 @@
+"""
+Event-Driven Bot Runtime
+
+Runs UpbitTradingBot on an asyncio event loop instead of a sleep-and-poll
+loop. The runtime subscribes to the market data hub, so every USDT/KRW tick,
+whether streamed or fetched, reaches the loop as soon as it lands. The
+decision is made right away from that tick and the cached USD/KRW quote,
+with no I/O on the tick path.
+
+Orders go to a single worker thread. That thread also runs the performance
+checks, so it is the only place the bot's balances change, and a slow
+exchange call never delays the next decision. While an order is in flight,
+up to order_queue_size signals (one by default) wait for the worker; a newer
+signal replaces the oldest waiting one. Before sending a waiting signal, the
+worker checks it against the latest decision and skips it if the market has
+moved on, so a fill is never followed by a stale or opposite order.
+
+A poller fetches the ticker when no tick has arrived for poll_interval
+seconds, which also covers hubs with no stream. The emergency stop is checked
+on its own cadence.
+
+stop() may be called from any thread. It cancels the tick, poll and
+performance tasks, lets an order already sent to the exchange finish, and
+unsubscribes from the hub before run() returns.
+"""
+
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class AsyncRuntimeConfig:
+    """Configuration for the event-driven bot runtime"""
+    exchange: str = 'upbit'
+    symbol: str = 'USDT/KRW'
+    poll_interval: float = 5.0          # Fetch the ticker if no tick has arrived for this long (seconds)
+    performance_interval: float = 60.0  # Emergency-stop and live metrics cadence (seconds)
+    order_queue_size: int = 1           # Signals allowed to wait behind an in-flight order; newer ones replace the oldest
+
+class AsyncBotRuntime:
+    """Drives an UpbitTradingBot from market data events on an asyncio loop"""
+
+    def __init__(self, bot, config: Optional[AsyncRuntimeConfig] = None):
+        self.bot = bot
+        self.config = config or AsyncRuntimeConfig()
+        self.last_opportunity: Optional[Dict] = None
+        self.stats = {'ticks': 0, 'decisions': 0, 'orders': 0, 'dropped_orders': 0,
+                      'stale_orders': 0, 'polls': 0}
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._tick_event: Optional[asyncio.Event] = None
+        self._orders: Optional[asyncio.Queue] = None
+        self._latest_tick = None            # (ticker, fetched_at epoch seconds)
+        self._last_tick_at = 0.0            # Loop time of the last tick or poll
+        self._in_flight: Optional[asyncio.Future] = None
+        self._stop_requested = False
+        self._subscribed = False
+        # One thread owns the bot's state (orders, balances, performance); polls use another
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._poll_executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def status(self) -> Dict[str, Any]:
+        """Counters, queue depth, decision latency and the last decision"""
+        return {
+            'running': self.running,
+            'stats': dict(self.stats),
+            'queued_orders': self._orders.qsize() if self._orders is not None else 0,
+            'order_in_flight': self._in_flight is not None,
+            'decision_latency': self.bot.decision_latency.summary(),
+            'last_opportunity': self.last_opportunity
+        }
+
+    def stop(self) -> None:
+        """Request shutdown; safe to call from any thread, before or during run()"""
+        self._stop_requested = True
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                pass  # Loop already closed
+
+    def _on_market_data(self, kind: str, exchange: str, symbol: str, value: Any, fetched_at: float) -> None:
+        # Hub listener; runs on whichever thread produced the value
+        if kind != 'ticker' or exchange != self.config.exchange or symbol != self.config.symbol:
+            return
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._push_tick, value, fetched_at)
+        except RuntimeError:
+            pass  # Loop already closed
+
+    def _push_tick(self, ticker: Dict, fetched_at: float) -> None:
+        self._latest_tick = (ticker, fetched_at)
+        self._last_tick_at = self._loop.time()
+        self.stats['ticks'] += 1
+        self._tick_event.set()
+
+    async def _decide(self) -> None:
+        while True:
+            await self._tick_event.wait()
+            self._tick_event.clear()
+            ticker, fetched_at = self._latest_tick
+            try:
+                opportunity = self.bot.evaluate_opportunity(float(ticker['last']), self.bot.fx.get_quote())
+            except Exception as e:
+                logger.error(f"Error evaluating tick: {e}")
+                continue
+
+            # Only the latest tick is evaluated, so this is the age of the price acted on
+            tick_age = max(0.0, time.time() - fetched_at)
+            self.bot.decision_latency.record(tick_age)
+            opportunity['tick_age_seconds'] = tick_age
+            self.last_opportunity = opportunity
+            self.stats['decisions'] += 1
+
+            if opportunity.get('profitable', False):
+                if self._orders.full():
+                    superseded = self._orders.get_nowait()
+                    self.stats['dropped_orders'] += 1
+                    logger.debug(f"Order in flight; {opportunity['action']} signal replaces "
+                                 f"waiting {superseded['action']} signal")
+                self._orders.put_nowait(opportunity)
+
+    async def _execute_orders(self) -> None:
+        while True:
+            opportunity = await self._orders.get()
+            latest = self.last_opportunity
+            if latest is not opportunity and not (latest.get('profitable', False)
+                                                  and latest['action'] == opportunity['action']):
+                # Newer ticks no longer call for this order
+                self.stats['stale_orders'] += 1
+                logger.debug(f"Skipping stale {opportunity['action']} signal; latest is {latest['action']}")
+                continue
+            self._in_flight = self._loop.run_in_executor(
+                self._executor, self.bot.execute_trade,
+                opportunity['action'], self.bot.config.max_trade_amount)
+            try:
+                # Shielded so cancellation leaves the exchange call to finish; run() waits for it
+                result = await asyncio.shield(self._in_flight)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Order failed: {e}")
+                self._in_flight = None
+                continue
+            self._in_flight = None
+            self.stats['orders'] += 1
+            if result['success']:
+                logger.info(f"Trade successful: {opportunity['action']}")
+            else:
+                logger.warning(f"Trade failed: {result.get('reason', 'Unknown')}")
+
+    async def _poll(self) -> None:
+        hub = self.bot.market_data
+        while True:
+            idle = self._loop.time() - self._last_tick_at
+            if idle < self.config.poll_interval:
+                await asyncio.sleep(self.config.poll_interval - idle)
+                continue
+            self.stats['polls'] += 1
+            try:
+                # A subscribed hub announces a fetched value itself; otherwise feed it in directly
+                ticker = await self._loop.run_in_executor(
+                    self._poll_executor, hub.get_ticker, self.config.exchange, self.config.symbol)
+                if not self._subscribed:
+                    age = hub.get_age('ticker', self.config.exchange, self.config.symbol) or 0.0
+                    self._push_tick(ticker, time.time() - age)
+            except Exception as e:
+                logger.warning(f"Ticker poll failed: {e}")
+            self._last_tick_at = self._loop.time()
+
+    async def _monitor(self) -> None:
+        while True:
+            try:
+                performance = await self._loop.run_in_executor(self._executor, self.bot.record_performance)
+                if performance['return_percentage'] < -self.bot.config.emergency_stop_loss:
+                    logger.critical("Emergency stop triggered!")
+                    self._stop_event.set()
+                    return
+            except Exception as e:
+                logger.error(f"Performance check failed: {e}")
+            await asyncio.sleep(self.config.performance_interval)
+
+    async def run(self) -> None:
+        """Run until stop() is called, the emergency stop fires or the task is cancelled"""
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self._tick_event = asyncio.Event()
+        self._orders = asyncio.Queue(maxsize=self.config.order_queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bot-orders')
+        self._poll_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bot-poll')
+        if self._stop_requested:
+            self._stop_event.set()
+
+        hub = self.bot.market_data
+        self._subscribed = hasattr(hub, 'subscribe')
+        if self._subscribed:
+            hub.subscribe(self._on_market_data)
+        self.bot.is_running = True
+        logger.info("Starting event-driven trading bot...")
+
+        tasks: List[asyncio.Task] = []
+        try:
+            # The very first USD/KRW fetch blocks; keep it off the loop
+            await self._loop.run_in_executor(self._poll_executor, self.bot.fx.get_quote)
+            tasks = [
+                asyncio.create_task(self._decide(), name='bot-decide'),
+                asyncio.create_task(self._execute_orders(), name='bot-orders'),
+                asyncio.create_task(self._poll(), name='bot-poll'),
+                asyncio.create_task(self._monitor(), name='bot-monitor'),
+            ]
+            await self._stop_event.wait()
+        finally:
+            if self._subscribed:
+                hub.unsubscribe(self._on_market_data)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self._in_flight is not None:
+                await asyncio.gather(self._in_flight, return_exceptions=True)
+                self._in_flight = None
+            self._executor.shutdown(wait=False)
+            self._poll_executor.shutdown(wait=False)
+            self.bot.is_running = False
+            self._loop = None
+            logger.info(f"Bot stopped; decision latency: {self.bot.decision_latency.summary()}")
@@ -0,0 +1,300 @@
+"""
+Columnar Backtest Storage
+
+Array-backed containers for backtest output. Curves (equity, daily returns)
+are kept in float64 arrays and trades in a NumPy structured array, instead of
+Python float lists and one TradeRecord dataclass (plus balance dict) per trade.
+Both containers behave like read-only lists: len(), indexing, slicing,
+iteration and truthiness work as before. TradeRecord objects are only built
+when a trade is actually accessed.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from .trading_bot import TradeRecord
+
+logger = logging.getLogger(__name__)
+
+_INITIAL_CAPACITY = 256
+
+class FloatSeries(Sequence):
+    """Growable float64 array with list-style read access"""
+
+    def __init__(self, values: Optional[Iterable[float]] = None):
+        if values is None:
+            self._data = np.empty(_INITIAL_CAPACITY, dtype=np.float64)
+            self._length = 0
+        else:
+            self._data = np.array(values, dtype=np.float64)
+            self._length = len(self._data)
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._length + extra
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data), _INITIAL_CAPACITY), dtype=np.float64)
+            grown[:self._length] = self._data[:self._length]
+            self._data = grown
+
+    def append(self, value: float) -> None:
+        self._reserve(1)
+        self._data[self._length] = value
+        self._length += 1
+
+    def extend(self, values: Iterable[float]) -> None:
+        values = np.asarray(values if isinstance(values, np.ndarray) else list(values), dtype=np.float64)
+        self._reserve(len(values))
+        self._data[self._length:self._length + len(values)] = values
+        self._length += len(values)
+
+    @property
+    def values(self) -> np.ndarray:
+        """Read-only view of the stored values"""
+        view = self._data[:self._length]
+        view.flags.writeable = False
+        return view
+
+    def tolist(self) -> List[float]:
+        return self._data[:self._length].tolist()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[float, List[float]]:
+        if isinstance(index, slice):
+            return self._data[:self._length][index].tolist()
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("FloatSeries index out of range")
+        return float(self._data[index])
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.tolist())
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        values = self._data[:self._length]
+        return values.astype(dtype) if dtype is not None else values
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (FloatSeries, list, tuple, np.ndarray)):
+            return len(self) == len(other) and self.tolist() == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"FloatSeries({self._length} values)"
+
+# One row per trade; text fields that rarely vary are stored sparsely on the log
+TRADE_DTYPE = np.dtype([
+    ('timestamp', 'i8'),             # ns since the UTC epoch (naive timestamps: as if UTC)
+    ('action', 'i1'),                # Index into TRADE_ACTIONS
+    ('amount_usd', 'f8'),
+    ('usdt_krw_price', 'f8'),
+    ('usd_krw_rate', 'f8'),
+    ('difference_percentage', 'f8'),
+    ('success', '?'),
+    ('profit_loss', 'f8'),
+    ('balance_usd', 'f8'),
+    ('balance_krw', 'f8'),
+    ('has_balance', '?'),
+])
+
+TRADE_ACTIONS = ['BUY', 'SELL']
+
+class TradeLog(Sequence):
+    """Trades in a structured array; TradeRecord objects are built on access"""
+
+    def __init__(self):
+        self._rows = np.zeros(_INITIAL_CAPACITY, dtype=TRADE_DTYPE)
+        self._length = 0
+        self._tz = None
+        # Rare values that do not fit the columns, keyed by row
+        self._timestamp_text: Dict[int, str] = {}
+        self._reasons: Dict[int, str] = {}
+        self._actions: Dict[int, str] = {}
+        self._balances: Dict[int, Dict[str, float]] = {}
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._length + extra
+        if needed > len(self._rows):
+            grown = np.zeros(max(needed, 2 * len(self._rows)), dtype=TRADE_DTYPE)
+            grown[:self._length] = self._rows[:self._length]
+            self._rows = grown
+
+    def _encode_timestamp(self, row: int, timestamp: Any) -> int:
+        text = timestamp if isinstance(timestamp, str) else timestamp.isoformat()
+        try:
+            parsed = pd.Timestamp(text)
+            if self._length == 0 or row == 0:
+                self._tz = parsed.tz
+            if parsed.tz == self._tz and self._format_timestamp(parsed.value) == text:
+                return parsed.value
+        except (ValueError, TypeError):
+            parsed = None
+        self._timestamp_text[row] = text
+        return parsed.value if parsed is not None else 0
+
+    def _format_timestamp(self, value: int) -> str:
+        return pd.Timestamp(value, tz=self._tz).isoformat()
+
+    def append(self, trade: TradeRecord) -> None:
+        """Store a TradeRecord as one row"""
+        self._reserve(1)
+        row = self._length
+        record = self._rows[row]
+        record['timestamp'] = self._encode_timestamp(row, trade.timestamp)
+        if trade.action in TRADE_ACTIONS:
+            record['action'] = TRADE_ACTIONS.index(trade.action)
+        else:
+            self._actions[row] = trade.action
+        record['amount_usd'] = trade.amount_usd
+        record['usdt_krw_price'] = trade.usdt_krw_price
+        record['usd_krw_rate'] = trade.usd_krw_rate
+        record['difference_percentage'] = trade.difference_percentage
+        record['success'] = trade.success
+        record['profit_loss'] = trade.profit_loss
+        if trade.reason:
+            self._reasons[row] = trade.reason
+
+        balance = trade.balance_after
+        if balance is not None:
+            record['has_balance'] = True
+            if set(balance) == {'USD', 'KRW'}:
+                record['balance_usd'] = balance['USD']
+                record['balance_krw'] = balance['KRW']
+            else:
+                self._balances[row] = dict(balance)
+        self._length += 1
+
+    def extend_columns(self, timestamps: pd.DatetimeIndex, actions: Sequence[str],
+                       amount_usd: np.ndarray, usdt_krw_price: np.ndarray, usd_krw_rate: np.ndarray,
+                       difference_percentage: np.ndarray, balance_usd: np.ndarray,
+                       balance_krw: np.ndarray) -> None:
+        """Append successful fills with zero profit_loss, column by column"""
+        count = len(amount_usd)
+        if count == 0:
+            return
+        timestamps = pd.DatetimeIndex(timestamps)
+        if self._length == 0:
+            self._tz = timestamps.tz
+        elif timestamps.tz != self._tz:
+            for i in range(count):
+                self.append(TradeRecord(
+                    timestamp=timestamps[i].isoformat(), action=actions[i], amount_usd=float(amount_usd[i]),
+                    usdt_krw_price=float(usdt_krw_price[i]), usd_krw_rate=float(usd_krw_rate[i]),
+                    difference_percentage=float(difference_percentage[i]), success=True,
+                    balance_after={'USD': float(balance_usd[i]), 'KRW': float(balance_krw[i])}))
+            return
+
+        self._reserve(count)
+        rows = self._rows[self._length:self._length + count]
+        rows['timestamp'] = timestamps.as_unit('ns').asi8
+        rows['action'] = [TRADE_ACTIONS.index(action) for action in actions]
+        rows['amount_usd'] = amount_usd
+        rows['usdt_krw_price'] = usdt_krw_price
+        rows['usd_krw_rate'] = usd_krw_rate
+        rows['difference_percentage'] = difference_percentage
+        rows['success'] = True
+        rows['profit_loss'] = 0.0
+        rows['balance_usd'] = balance_usd
+        rows['balance_krw'] = balance_krw
+        rows['has_balance'] = True
+        self._length += count
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only view of one numeric column"""
+        view = self._rows[name][:self._length]
+        view.flags.writeable = False
+        return view
+
+    def timestamp_text(self, index: int) -> str:
+        """The trade's timestamp string without building the whole TradeRecord"""
+        if index < 0:
+            index += self._length
+        text = self._timestamp_text.get(index)
+        return text if text is not None else self._format_timestamp(int(self._rows['timestamp'][index]))
+
+    def timestamp_at(self, index: int) -> datetime:
+        """The trade's timestamp as a datetime, read from the int64 column"""
+        if index < 0:
+            index += self._length
+        text = self._timestamp_text.get(index)
+        if text is not None:
+            return datetime.fromisoformat(text)
+        timestamp = pd.Timestamp(int(self._rows['timestamp'][index]), tz=self._tz).to_pydatetime(warn=False)
+        if timestamp.tzinfo is not None:
+            # Fixed offset, as datetime.fromisoformat gives for the ISO string
+            timestamp = timestamp.replace(tzinfo=timezone(timestamp.utcoffset()))
+        return timestamp
+
+    def _materialize(self, index: int) -> TradeRecord:
+        row = self._rows[index]
+        if row['has_balance']:
+            balance = self._balances.get(index)
+            if balance is None:
+                balance = {'USD': float(row['balance_usd']), 'KRW': float(row['balance_krw'])}
+            else:
+                balance = dict(balance)
+        else:
+            balance = None
+        return TradeRecord(
+            timestamp=self.timestamp_text(index),
+            action=self._actions.get(index, TRADE_ACTIONS[row['action']]),
+            amount_usd=float(row['amount_usd']),
+            usdt_krw_price=float(row['usdt_krw_price']),
+            usd_krw_rate=float(row['usd_krw_rate']),
+            difference_percentage=float(row['difference_percentage']),
+            success=bool(row['success']),
+            reason=self._reasons.get(index, ''),
+            profit_loss=float(row['profit_loss']),
+            balance_after=balance
+        )
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[TradeRecord, List[TradeRecord]]:
+        if isinstance(index, slice):
+            return [self._materialize(i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("TradeLog index out of range")
+        return self._materialize(index)
+
+    def __iter__(self) -> Iterator[TradeRecord]:
+        for index in range(self._length):
+            yield self._materialize(index)
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def __repr__(self) -> str:
+        return f"TradeLog({self._length} trades)"
+
+class DrawdownHistory(Sequence):
+    """(timestamp, drawdown %) pairs computed from arrays when accessed"""
+
+    def __init__(self, drawdowns: np.ndarray, timestamp_at: Callable[[int], datetime]):
+        self.drawdowns = drawdowns
+        self._timestamp_at = timestamp_at
+
+    def __len__(self) -> int:
+        return len(self.drawdowns)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Tuple[datetime, float], List[Tuple[datetime, float]]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("DrawdownHistory index out of range")
+        return self._timestamp_at(index), float(self.drawdowns[index])
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
@@ -0,0 +1,229 @@
+"""
+Executor Layer for Blocking Work
+
+Each FastAPI app runs on a single event loop. A synchronous ccxt, requests or
+backtest call made inside an async handler stalls every other request and
+WebSocket until it returns, so that work goes through one of two lanes:
+
+- io: a thread pool for exchange and HTTP calls (hub, FX provider,
+  calculators, bot methods).
+- cpu: a process pool for backtests and optimizations. Jobs that fan out to
+  their own process pool, or that report progress back to the loop, run on a
+  thread instead. They still count against the cpu lane's limit.
+
+A lane runs at most `concurrency` calls at once and lets at most `max_queued`
+more wait for a slot. Beyond that, calls are rejected with ExecutorBusy, so
+overload shows up as an immediate 503 rather than a growing backlog. stats()
+reports running and queued counts, rejections, and wait and run times.
+"""
+
+import os
+import time
+import asyncio
+import functools
+import threading
+import logging
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class ExecutorBusy(RuntimeError):
+    """A lane's wait queue is full"""
+
+@dataclass
+class ExecutorConfig:
+    """Concurrency limits for the blocking-work lanes"""
+    io_concurrency: int = 16            # Exchange/HTTP calls running at once (threads)
+    io_max_queued: int = 256            # I/O calls allowed to wait for a thread
+    cpu_concurrency: Optional[int] = None  # Backtests/optimizations at once (default: CPU count)
+    cpu_max_queued: int = 8             # CPU jobs allowed to wait for a slot
+
+class ExecutorLane:
+    """A bounded executor with admission control and queue-depth metrics
+
+    Slots are handed out on the event loop, so queued calls never occupy a
+    pool worker. A slot is released when the work itself finishes, even if the
+    awaiting caller was cancelled, so the limit always reflects running work.
+    """
+
+    def __init__(self, name: str, executor_factory: Callable[[], Executor], concurrency: int,
+                 max_queued: int, thread_factory: Optional[Callable[[], Executor]] = None):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self._executor_factory = executor_factory
+        self._thread_factory = thread_factory
+        self._executor: Optional[Executor] = None
+        self._thread_executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+        self._running = 0
+        self._waiters: deque = deque()
+        self._counters = {
+            'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0,
+            'peak_queued': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'run_seconds': 0.0
+        }
+
+    def _get_executor(self, in_thread: bool) -> Executor:
+        with self._lock:
+            if in_thread and self._thread_factory is not None:
+                if self._thread_executor is None:
+                    self._thread_executor = self._thread_factory()
+                return self._thread_executor
+            if self._executor is None:
+                self._executor = self._executor_factory()
+            return self._executor
+
+    async def _acquire(self) -> None:
+        if self._running < self.concurrency and not self._waiters:
+            self._running += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._counters['peak_queued'] = max(self._counters['peak_queued'], len(self._waiters))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # The slot was handed over just as we were cancelled
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # Hand the slot straight to the next caller
+                return
+        self._running -= 1
+
+    def _finish(self, future: asyncio.Future, started: float) -> None:
+        self._counters['run_seconds'] += time.perf_counter() - started
+        if future.cancelled() or future.exception() is not None:
+            self._counters['failed'] += 1
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                with self._lock:
+                    logger.error(f"{self.name} pool broke; it will be recreated")
+                    self._executor = None
+        else:
+            self._counters['completed'] += 1
+        self._release()
+
+    async def _submit(self, fn: Callable, args: tuple, kwargs: Dict, in_thread: bool) -> Any:
+        if self._running >= self.concurrency and len(self._waiters) >= self.max_queued:
+            self._counters['rejected'] += 1
+            raise ExecutorBusy(f"{self.name} executor is busy ({len(self._waiters)} calls queued)")
+        self._counters['submitted'] += 1
+
+        queued_at = time.perf_counter()
+        await self._acquire()
+        wait = time.perf_counter() - queued_at
+        self._counters['wait_seconds'] += wait
+        self._counters['max_wait_seconds'] = max(self._counters['max_wait_seconds'], wait)
+
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._get_executor(in_thread), functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(functools.partial(self._finish, started=time.perf_counter()))
+        return await asyncio.shield(future)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on this lane's pool once a slot is free
+
+        For a process lane, fn and its arguments must be picklable.
+        """
+        return await self._submit(fn, args, kwargs, in_thread=False)
+
+    async def run_in_thread(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn on a thread under this lane's limits (for jobs that cannot be pickled)"""
+        return await self._submit(fn, args, kwargs, in_thread=True)
+
+    def stats(self) -> Dict[str, Any]:
+        started = self._counters['submitted'] - len(self._waiters)
+        finished = self._counters['completed'] + self._counters['failed']
+        return {
+            'concurrency': self.concurrency,
+            'max_queued': self.max_queued,
+            'running': self._running,
+            'queued': len(self._waiters),
+            'submitted': self._counters['submitted'],
+            'completed': self._counters['completed'],
+            'failed': self._counters['failed'],
+            'rejected': self._counters['rejected'],
+            'peak_queued': self._counters['peak_queued'],
+            'mean_wait_ms': self._counters['wait_seconds'] / started * 1000 if started > 0 else 0.0,
+            'max_wait_ms': self._counters['max_wait_seconds'] * 1000,
+            'mean_run_ms': self._counters['run_seconds'] / finished * 1000 if finished else 0.0
+        }
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            for executor in (self._executor, self._thread_executor):
+                if executor is not None:
+                    executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+            self._thread_executor = None
+
+class Executors:
+    """The io and cpu lanes shared by a process"""
+
+    def __init__(self, config: Optional[ExecutorConfig] = None):
+        self.config = config or ExecutorConfig()
+        io_concurrency = self.config.io_concurrency
+        cpu_concurrency = self.config.cpu_concurrency or os.cpu_count() or 1
+        self.io = ExecutorLane(
+            'io',
+            lambda: ThreadPoolExecutor(max_workers=io_concurrency, thread_name_prefix='io'),
+            io_concurrency, self.config.io_max_queued)
+        self.cpu = ExecutorLane(
+            'cpu',
+            lambda: ProcessPoolExecutor(max_workers=cpu_concurrency),
+            cpu_concurrency, self.config.cpu_max_queued,
+            thread_factory=lambda: ThreadPoolExecutor(max_workers=cpu_concurrency, thread_name_prefix='cpu-job'))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {'io': self.io.stats(), 'cpu': self.cpu.stats()}
+
+    def shutdown(self, wait: bool = False) -> None:
+        self.io.shutdown(wait)
+        self.cpu.shutdown(wait)
+
+_executors: Optional[Executors] = None
+_executors_lock = threading.Lock()
+
+def get_executors() -> Executors:
+    """Return the process-wide executor lanes, creating them on first use"""
+    global _executors
+    with _executors_lock:
+        if _executors is None:
+            _executors = Executors()
+        return _executors
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking exchange/HTTP call on the shared I/O lane"""
+    return await get_executors().io.run(fn, *args, **kwargs)
+
+async def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """Run a picklable backtest job on the shared process lane"""
+    return await get_executors().cpu.run(fn, *args, **kwargs)
+
+# Process-lane jobs: module-level so they can be pickled to pool workers
+
+def run_upbit_backtest(config, start_date: datetime, end_date: datetime, use_real_data: bool = False):
+    """Run an EnhancedUpbitBacktest and return its BacktestResult"""
+    from .backtest import EnhancedUpbitBacktest
+    return EnhancedUpbitBacktest(config).run_backtest(start_date, end_date, use_real_data=use_real_data)
+
+def run_bitcoin_backtest(config, start_date: str, end_date: str) -> Dict:
+    """Run a BitcoinBacktester backtest and return its results dict"""
+    from .bitcoin_backtest import BitcoinBacktester
+    return BitcoinBacktester(config).run_backtest(start_date, end_date)
@@ -0,0 +1,150 @@
+"""
+USD/KRW Exchange Rate Provider
+
+One process-wide source of the USD/KRW rate for the calculators and the bot.
+Reads return the cached rate immediately. Once the rate is older than
+refresh_after, a single background refresh is started, so a slow FX endpoint
+never stalls a trading tick. Sources are tried in priority order over a
+pooled HTTP session. Every quote carries its age, so strategies can refuse to
+trade when the rate is stale or only the fallback is available.
+"""
+
+import time
+import threading
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class FXSource:
+    """An HTTP endpoint that returns the USD/KRW rate"""
+    name: str
+    url: str
+    extract: Callable[[Dict], float] = lambda data: float(data['rates']['KRW'])
+
+# Tried in order until one succeeds
+DEFAULT_FX_SOURCES = [
+    FXSource('exchangerate-api', 'https://api.exchangerate-api.com/v4/latest/USD'),
+    FXSource('open-er-api', 'https://open.er-api.com/v6/latest/USD'),
+    FXSource('frankfurter', 'https://api.frankfurter.app/latest?from=USD&to=KRW'),
+]
+
+@dataclass
+class FXRateConfig:
+    """Configuration for the USD/KRW rate provider"""
+    sources: List[FXSource] = field(default_factory=lambda: list(DEFAULT_FX_SOURCES))
+    refresh_after: float = 240.0    # Start a background refresh once the rate is this old (seconds)
+    max_age: float = 900.0          # Rates older than this are reported as stale (seconds)
+    request_timeout: float = 5.0    # Per-source HTTP timeout (seconds)
+    fallback_rate: float = 1350.0   # Returned when no source has ever answered
+
+@dataclass
+class FXQuote:
+    """A USD/KRW rate with its provenance"""
+    rate: float
+    source: str                 # Source name, or 'fallback'
+    fetched_at: Optional[float] # Epoch seconds; None for the fallback rate
+
+    @property
+    def age_seconds(self) -> Optional[float]:
+        return time.time() - self.fetched_at if self.fetched_at is not None else None
+
+    def is_stale(self, max_age: float) -> bool:
+        age = self.age_seconds
+        return age is None or age > max_age
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'rate': self.rate, 'source': self.source, 'age_seconds': self.age_seconds}
+
+class FXRateProvider:
+    """Cached USD/KRW rate refreshed in the background before it expires"""
+
+    def __init__(self, config: Optional[FXRateConfig] = None):
+        self.config = config or FXRateConfig()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.config.sources) or 1, pool_maxsize=4)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._quote: Optional[FXQuote] = None
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()  # Only one refresh in flight
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._first_fetch_done = False
+
+    def _fetch(self) -> Optional[FXQuote]:
+        for source in self.config.sources:
+            try:
+                response = self.session.get(source.url, timeout=self.config.request_timeout)
+                response.raise_for_status()
+                rate = source.extract(response.json())
+                if rate > 0:
+                    logger.info(f"Retrieved USD/KRW rate {rate} from {source.name}")
+                    return FXQuote(rate, source.name, time.time())
+            except Exception as e:
+                logger.warning(f"USD/KRW source {source.name} failed: {e}")
+        return None
+
+    def refresh(self) -> Optional[FXQuote]:
+        """Fetch a new rate now, or wait for the refresh already in flight"""
+        with self._fetch_lock:
+            current = self._quote
+            # Another caller may have refreshed while we waited
+            if current is not None and current.age_seconds < self.config.refresh_after:
+                return current
+            quote = self._fetch()
+            if quote is not None:
+                with self._lock:
+                    self._quote = quote
+            return quote
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self.refresh, name='fx-refresh', daemon=True)
+            self._refresh_thread.start()
+
+    def get_quote(self) -> FXQuote:
+        """Current rate without blocking, except for the very first fetch"""
+        with self._lock:
+            quote = self._quote
+            first_fetch = not self._first_fetch_done
+            self._first_fetch_done = True
+        if quote is None:
+            if first_fetch:
+                quote = self.refresh()
+            else:
+                # Earlier fetches failed; keep retrying off the caller's thread
+                self._refresh_in_background()
+            if quote is None:
+                logger.warning(f"Using fallback USD/KRW rate: {self.config.fallback_rate}")
+                return FXQuote(self.config.fallback_rate, 'fallback', None)
+            return quote
+
+        if quote.age_seconds >= self.config.refresh_after:
+            self._refresh_in_background()
+        return quote
+
+    def get_rate(self) -> float:
+        """Current USD/KRW rate"""
+        return self.get_quote().rate
+
+    def is_stale(self, max_age: Optional[float] = None) -> bool:
+        """Whether the current rate is older than max_age (or is the fallback)"""
+        return self.get_quote().is_stale(self.config.max_age if max_age is None else max_age)
+
+_provider: Optional[FXRateProvider] = None
+_provider_lock = threading.Lock()
+
+def get_fx_provider() -> FXRateProvider:
+    """Return the process-wide USD/KRW rate provider, creating it on first use"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = FXRateProvider()
+        return _provider
@@ -0,0 +1,349 @@
+"""
+Persistent Backtest Job Queue
+
+Backtests and optimizations are submitted as jobs. Each job gets an ID and
+waits in a queue. A fixed number of worker tasks run jobs of any kind, so
+several users can queue work at once instead of being turned away while
+another run is in progress.
+
+Job records live in an append-only JSON Lines index, and each finished
+job's result is written to its own JSON file, so results outlive the
+connection that requested them and survive a restart. Long lists of flat
+records in a result (such as the balance history) are stored as column
+arrays in a .npz file next to it, so they can be paged, downsampled or
+downloaded without parsing the whole result (see result_views). Jobs that
+were queued or running when the process stopped are queued again on start.
+
+A job's spec (its kind and request parameters) is hashed. Submitting a spec
+that is still queued or running returns that job. Submitting one that
+already succeeded returns the stored job instead of recomputing it, unless
+the caller passes reuse_result=False: a result over market data that is still
+arriving (a range ending today or later) would otherwise be served forever.
+A kind's reusable(spec, result) check, given at registration, can also mark
+a finished result as one-off, e.g. when real data could not be fetched.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from .ws_protocol import to_wire
+from .executors import run_io
+from .result_views import Columns, columns_to_records, split_tables, table_length, table_stub
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ['queued', 'running', 'succeeded', 'failed']
+
+# Table arrays are stored as 'table/column'; a column missing from some rows also
+# has '~table/column', True where the row has no value
+MASK_PREFIX = '~'
+
+class JobQueueFull(RuntimeError):
+    """Too many jobs are waiting to run"""
+
+_current_job_id: contextvars.ContextVar = contextvars.ContextVar('current_job_id', default=None)
+
+def current_job_id() -> Optional[str]:
+    """ID of the job whose runner is executing, if any"""
+    return _current_job_id.get()
+
+@dataclass
+class JobQueueConfig:
+    """Job worker and storage settings"""
+    parallelism: int = 2                 # Jobs running at once
+    max_queued: int = 32                 # Jobs allowed to wait for a worker
+    directory: str = 'data_cache/jobs'   # Job index and result files
+
+@dataclass
+class Job:
+    """One submitted backtest or optimization"""
+    job_id: str
+    kind: str                            # Registered runner name, e.g. 'backtest'
+    spec: Dict[str, Any]                 # Request parameters passed to the runner
+    spec_key: str                        # Hash of kind and spec, used for result reuse
+    status: str = 'queued'
+    submitted_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+    reusable: bool = True                # False if the result must not be served for later submits
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+def job_spec_key(kind: str, spec: Dict[str, Any]) -> str:
+    """Hash identifying jobs that would produce the same result"""
+    payload = json.dumps({'kind': kind, 'spec': spec}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class JobStore:
+    """Job records in an append-only JSON Lines index, with one JSON (+ .npz tables) file per result"""
+
+    def __init__(self, directory: str, cached_tables: int = 4):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'jobs.jsonl')
+        self.cached_tables = cached_tables  # Results whose tables stay loaded for paging
+        self._lock = threading.Lock()
+        self._tables: 'OrderedDict[str, Dict[str, Columns]]' = OrderedDict()
+
+    def load(self) -> Dict[str, Job]:
+        """Latest record of every job, compacting the index as a side effect"""
+        jobs: Dict[str, Job] = {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        jobs[record['job_id']] = Job(**record)
+                    except (ValueError, KeyError, TypeError):
+                        continue  # Partially written line from an interrupted run
+        except FileNotFoundError:
+            return jobs
+
+        with self._lock:
+            temp_path = self.index_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for job in jobs.values():
+                    f.write(json.dumps(job.to_dict()) + '\n')
+            os.replace(temp_path, self.index_path)
+        return jobs
+
+    def save(self, job: Job) -> None:
+        with self._lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(job.to_dict()) + '\n')
+
+    def result_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f'{job_id}.json')
+
+    def tables_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f'{job_id}.npz')
+
+    def save_result(self, job_id: str, result: Any) -> None:
+        inline, tables = split_tables(result)
+        if tables:
+            inline = dict(inline, _tables={name: {'rows': table_length(columns), 'columns': list(columns)}
+                                           for name, columns in tables.items()})
+            arrays = {}
+            for name, columns in tables.items():
+                for column, values in columns.items():
+                    arrays[f'{name}/{column}'] = np.ma.getdata(values)
+                    if isinstance(values, np.ma.MaskedArray):
+                        arrays[f'{MASK_PREFIX}{name}/{column}'] = np.ma.getmaskarray(values)
+            temp_path = self.tables_path(job_id) + '.tmp.npz'
+            np.savez(temp_path, **arrays)
+            os.replace(temp_path, self.tables_path(job_id))
+        temp_path = self.result_path(job_id) + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(to_wire(inline), f, separators=(',', ':'))
+        os.replace(temp_path, self.result_path(job_id))
+
+    def load_tables(self, job_id: str) -> Dict[str, Columns]:
+        """A result's tables as column arrays ({} if it has none)"""
+        with self._lock:
+            if job_id in self._tables:
+                self._tables.move_to_end(job_id)
+                return self._tables[job_id]
+        tables: Dict[str, Columns] = {}
+        try:
+            with np.load(self.tables_path(job_id), allow_pickle=False) as archive:
+                masks = {}
+                for key in archive.files:
+                    if key.startswith(MASK_PREFIX):
+                        masks[key[len(MASK_PREFIX):]] = archive[key]
+                        continue
+                    name, column = key.split('/', 1)
+                    tables.setdefault(name, {})[column] = archive[key]
+            for key, mask in masks.items():
+                name, column = key.split('/', 1)
+                tables[name][column] = np.ma.MaskedArray(tables[name][column], mask=mask)
+        except FileNotFoundError:
+            return tables
+        with self._lock:
+            self._tables[job_id] = tables
+            while len(self._tables) > self.cached_tables:
+                self._tables.popitem(last=False)
+        return tables
+
+    def load_result(self, job_id: str, max_rows: Optional[int] = None) -> Optional[Any]:
+        """Stored result; tables longer than max_rows are replaced by stubs (None inlines all)"""
+        try:
+            with open(self.result_path(job_id), 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            return None
+        if not isinstance(result, dict) or '_tables' not in result:
+            return result
+        layout = result.pop('_tables')
+        if max_rows is not None and all(info['rows'] > max_rows for info in layout.values()):
+            tables = {}  # Nothing will be inlined; skip reading the arrays
+        else:
+            tables = self.load_tables(job_id)
+        for name, info in layout.items():
+            if max_rows is not None and info['rows'] > max_rows:
+                result[name] = table_stub(info['rows'], info['columns'])
+            else:
+                result[name] = columns_to_records(tables[name])
+        return result
+
+Runner = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+class JobQueue:
+    """Queued, persistent jobs run by a fixed number of worker tasks"""
+
+    def __init__(self, config: Optional[JobQueueConfig] = None,
+                 on_update: Optional[Callable[[Job], Awaitable[None]]] = None):
+        self.config = config or JobQueueConfig()
+        self.store = JobStore(self.config.directory)
+        self.on_update = on_update  # Awaited after every status change
+        self.jobs: Dict[str, Job] = {}
+        self._runners: Dict[str, Runner] = {}
+        self._reusable: Dict[str, Callable[[Dict[str, Any], Any], bool]] = {}
+        self._by_spec: Dict[str, str] = {}   # spec_key -> newest job that is not failed
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, Job] = {}
+
+    def register(self, kind: str, runner: Runner,
+                 reusable: Optional[Callable[[Dict[str, Any], Any], bool]] = None) -> None:
+        """Run jobs of this kind with await runner(spec), which returns the job's result
+
+        reusable(spec, result) says whether a finished result may be served to
+        later identical submits; by default every result may.
+        """
+        self._runners[kind] = runner
+        if reusable is not None:
+            self._reusable[kind] = reusable
+
+    async def start(self) -> None:
+        """Load stored jobs, requeue unfinished ones and start the workers"""
+        self._queue = asyncio.Queue()
+        self.jobs = await run_io(self.store.load)
+        pending = []
+        for job in sorted(self.jobs.values(), key=lambda job: job.submitted_at):
+            if job.status != 'failed':
+                self._by_spec[job.spec_key] = job.job_id
+            if job.status in ('queued', 'running'):
+                job.status, job.started_at = 'queued', None
+                pending.append(job)
+        for job in pending:
+            self._queue.put_nowait(job)
+        if pending:
+            logger.info(f"Requeued {len(pending)} unfinished job(s)")
+        self._workers = [asyncio.create_task(self._work(), name=f'job-worker-{i}')
+                         for i in range(self.config.parallelism)]
+
+    async def stop(self) -> None:
+        """Cancel the workers; interrupted jobs stay queued for the next start"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, kind: str, spec: Dict[str, Any], reuse_result: bool = True) -> Tuple[Job, bool]:
+        """Queue a job; returns (job, reused), where reused means an identical job was found
+
+        An identical queued or running job is always reused. A succeeded one is
+        reused only if reuse_result is set and its result was found reusable;
+        otherwise the job runs again.
+        Raises KeyError for an unknown kind and JobQueueFull if the queue is full.
+        """
+        if kind not in self._runners:
+            raise KeyError(f"Unknown job kind '{kind}'")
+        spec = to_wire(spec)
+        spec_key = job_spec_key(kind, spec)
+        existing = self.jobs.get(self._by_spec.get(spec_key))
+        if existing is not None and (existing.status in ('queued', 'running')
+                                     or (existing.status == 'succeeded' and reuse_result and existing.reusable)):
+            return existing, True
+
+        if self._queue.qsize() >= self.config.max_queued:
+            raise JobQueueFull(f"{self._queue.qsize()} jobs are already queued")
+        job = Job(uuid.uuid4().hex, kind, spec, spec_key)
+        self.jobs[job.job_id] = job
+        self._by_spec[spec_key] = job.job_id
+        await self._update(job)
+        self._queue.put_nowait(job)
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self, limit: int = 50, kind: Optional[str] = None) -> List[Job]:
+        """Newest jobs first"""
+        jobs = [job for job in self.jobs.values() if kind is None or job.kind == kind]
+        jobs.sort(key=lambda job: job.submitted_at, reverse=True)
+        return jobs[:limit]
+
+    async def result(self, job_id: str, max_rows: Optional[int] = None) -> Optional[Any]:
+        """Stored result of a succeeded job, or None; see JobStore.load_result for max_rows"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status != 'succeeded':
+            return None
+        return await run_io(self.store.load_result, job_id, max_rows)
+
+    async def tables(self, job_id: str) -> Optional[Dict[str, Columns]]:
+        """Column arrays of a succeeded job's tables, or None"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status != 'succeeded':
+            return None
+        return await run_io(self.store.load_tables, job_id)
+
+    async def _update(self, job: Job) -> None:
+        await run_io(self.store.save, job)
+        if self.on_update is not None:
+            try:
+                await self.on_update(job)
+            except Exception as e:
+                logger.error(f"Job update callback failed: {e}")
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status, job.started_at = 'running', datetime.now().isoformat()
+            self._running[job.job_id] = job
+            await self._update(job)
+            try:
+                _current_job_id.set(job.job_id)
+                result = await self._runners[job.kind](job.spec)
+                await run_io(self.store.save_result, job.job_id, result)
+                reusable = self._reusable.get(job.kind)
+                job.reusable = reusable is None or bool(reusable(job.spec, result))
+                job.status = 'succeeded'
+            except asyncio.CancelledError:
+                # Shutting down; leave the job queued so the next start runs it
+                job.status, job.started_at = 'queued', None
+                self.store.save(job)
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.job_id} ({job.kind}) failed: {e}")
+                job.status, job.error = 'failed', str(e)
+                if self._by_spec.get(job.spec_key) == job.job_id:
+                    del self._by_spec[job.spec_key]
+            finally:
+                self._running.pop(job.job_id, None)
+            job.finished_at = datetime.now().isoformat()
+            await self._update(job)
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {status: 0 for status in JOB_STATUSES}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return {
+            'parallelism': self.config.parallelism,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'running': [{'job_id': job.job_id, 'kind': job.kind, 'started_at': job.started_at}
+                        for job in self._running.values()],
+            'counts': counts
+        }
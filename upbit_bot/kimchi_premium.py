@@ -9,72 +9,30 @@ This module implements the kimchi premium arbitrage strategy by:
 5. Providing buy/sell signals based on premium thresholds
 """
 
-import requests
-import time
 import logging
 from typing import Dict, Optional, Tuple
 from datetime import datetime
-import ccxt
+from .market_data_hub import MarketDataHub, get_market_data_hub
+from .fx_rate import FXRateProvider, get_fx_provider
 
 logger = logging.getLogger(__name__)
 
 class KimchiPremiumCalculator:
     """Calculate kimchi premium between Binance and Upbit"""
     
-    def __init__(self):
-        self.binance = ccxt.binance()
-        self.upbit = ccxt.upbit()
+    def __init__(self, hub: Optional[MarketDataHub] = None, fx: Optional[FXRateProvider] = None):
+        # Exchange clients and quotes come from the process-wide hub
+        self.hub = hub or get_market_data_hub()
+        self.binance = self.hub.binance
+        self.upbit = self.hub.upbit
         
-        # Exchange rate API (using exchangerate-api.com)
-        self.exchange_rate_api = "https://api.exchangerate-api.com/v4/latest/USD"
-        
-        # Backup exchange rate APIs
-        self.backup_exchange_apis = [
-            "https://api.fxapi.com/v1/latest?base=USD&symbols=KRW",
-            "https://api.currencyapi.com/v3/latest?apikey=YOUR_API_KEY&base_currency=USD&currencies=KRW"
-        ]
-        
-        # Cache for exchange rates (valid for 5 minutes)
-        self._exchange_rate_cache = {}
-        self._cache_timestamp = 0
-        self._cache_duration = 300  # 5 minutes
+        # USD/KRW comes from the process-wide cached provider
+        self.fx = fx or get_fx_provider()
     
     def get_usd_krw_rate(self) -> Optional[float]:
-        """Get current USD/KRW exchange rate"""
-        current_time = time.time()
-        
-        # Check cache first
-        if (current_time - self._cache_timestamp < self._cache_duration and 
-            'USD_KRW' in self._exchange_rate_cache):
-            return self._exchange_rate_cache['USD_KRW']
-        
-        # Try primary API
-        try:
-            response = requests.get(self.exchange_rate_api, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'rates' in data and 'KRW' in data['rates']:
-                usd_krw_rate = data['rates']['KRW']
-                
-                # Update cache
-                self._exchange_rate_cache['USD_KRW'] = usd_krw_rate
-                self._cache_timestamp = current_time
-                
-                logger.info(f"Retrieved USD/KRW rate: {usd_krw_rate}")
-                return usd_krw_rate
-                
-        except Exception as e:
-            logger.warning(f"Failed to get USD/KRW rate from primary API: {e}")
-        
-        # Try backup: Use Bank of Korea API
+        """Get current USD/KRW exchange rate (cached, refreshed in the background)"""
         try:
-            # This is a simplified approach - in production you'd want to use official APIs
-            # For now, we'll use a reasonable fallback
-            fallback_rate = 1350.0  # Approximate USD/KRW rate
-            logger.warning(f"Using fallback USD/KRW rate: {fallback_rate}")
-            return fallback_rate
-            
+            return self.fx.get_rate()
         except Exception as e:
             logger.error(f"Failed to get USD/KRW rate: {e}")
             return None
@@ -116,7 +74,7 @@ class KimchiPremiumCalculator:
     def get_upbit_usdt_krw_price(self) -> Optional[float]:
         """Get USDT/KRW price from Upbit"""
         try:
-            ticker = self.upbit.fetch_ticker('USDT/KRW')
+            ticker = self.hub.get_ticker('upbit', 'USDT/KRW')
             upbit_usdt_krw = float(ticker['last'])
             
             logger.info(f"Upbit USDT/KRW price: {upbit_usdt_krw}")
@@ -132,7 +90,8 @@ class KimchiPremiumCalculator:
             # Get prices
             binance_price = self.get_binance_usdt_krw_price()
             upbit_price = self.get_upbit_usdt_krw_price()
-            usd_krw_rate = self.get_usd_krw_rate()
+            fx_quote = self.fx.get_quote()
+            usd_krw_rate = fx_quote.rate
             
             if binance_price is None or upbit_price is None or usd_krw_rate is None:
                 logger.error("Failed to get required prices for kimchi premium calculation")
@@ -147,6 +106,8 @@ class KimchiPremiumCalculator:
                 'upbit_usdt_krw': upbit_price,
                 'binance_usdt_krw': binance_price,
                 'usd_krw_rate': usd_krw_rate,
+                'usd_krw_age_seconds': fx_quote.age_seconds,
+                'usd_krw_source': fx_quote.source,
                 'timestamp': datetime.now().isoformat(),
                 'price_difference': upbit_price - binance_price
             }
@@ -217,6 +178,7 @@ class KimchiPremiumStrategy:
         # Strategy parameters
         self.min_premium_for_trade = 0.5  # Minimum premium difference to consider
         self.max_trade_frequency = 4  # Maximum trades per day
+        self.max_fx_age = 900.0  # Refuse to trade on a USD/KRW rate older than this (seconds)
         self.trade_count_today = 0
         self.last_trade_date = None
         
@@ -241,6 +203,14 @@ class KimchiPremiumStrategy:
         if signal == 'HOLD':
             return False
         
+        # Refuse to trade on a stale or fallback USD/KRW rate
+        market_data = signal_data.get('market_data') or {}
+        if 'usd_krw_age_seconds' in market_data:
+            fx_age = market_data['usd_krw_age_seconds']
+            if fx_age is None or fx_age > self.max_fx_age:
+                logger.warning(f"USD/KRW rate is stale ({market_data.get('usd_krw_source')}, age {fx_age}); not trading")
+                return False
+        
         # Check minimum premium difference
         premium = abs(signal_data.get('kimchi_premium', 0))
         if premium < self.min_premium_for_trade:
@@ -0,0 +1,120 @@
+"""
+Shared Market Snapshot Broadcaster
+
+One producer task reads the USDT/KRW ticker and the USD/KRW quote once per
+interval and publishes them as a versioned MarketSnapshot. Every dashboard
+connection waits on the same snapshot instead of polling the exchanges on its
+own, so exchange and FX traffic stays the same however many viewers are
+connected. Per-session work (the bot's own decision, balance and performance)
+is derived from the shared snapshot without further I/O.
+
+The producer starts with the first subscriber and stops after the last one
+leaves. Waiters always receive the newest snapshot, so a slow consumer skips
+intermediate versions instead of falling behind.
+"""
+
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+from .market_data_hub import get_market_data_hub
+from .fx_rate import FXQuote, get_fx_provider
+from .executors import run_io
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class MarketSnapshot:
+    """Market inputs shared by every session for one tick"""
+    version: int
+    timestamp: str                    # ISO time the snapshot was taken
+    usdt_krw_price: Optional[float]   # None if the ticker could not be read
+    fx_quote: FXQuote
+    error: Optional[str] = None
+
+class MarketSnapshotBroadcaster:
+    """Single producer of market snapshots fanned out to any number of subscribers"""
+
+    def __init__(self, interval: float = 5.0, exchange: str = 'upbit', symbol: str = 'USDT/KRW',
+                 hub=None, fx=None):
+        self.interval = interval  # Seconds between snapshots
+        self.exchange = exchange
+        self.symbol = symbol
+        self.hub = hub or get_market_data_hub()
+        self.fx = fx or get_fx_provider()
+
+        self.subscribers = 0
+        self.produced = 0
+        self.last_fetch_seconds = 0.0
+        self._latest: Optional[MarketSnapshot] = None
+        self._condition: Optional[asyncio.Condition] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def latest(self) -> Optional[MarketSnapshot]:
+        return self._latest
+
+    def _fetch(self, version: int) -> MarketSnapshot:
+        # Blocking; runs on the I/O lane
+        fx_quote = self.fx.get_quote()
+        try:
+            ticker = self.hub.get_ticker(self.exchange, self.symbol)
+            price, error = float(ticker['last']), None
+        except Exception as e:
+            logger.error(f"Failed to get {self.symbol} price for snapshot: {e}")
+            previous = self._latest
+            price, error = (previous.usdt_krw_price if previous else None), str(e)
+        return MarketSnapshot(version, datetime.now().isoformat(), price, fx_quote, error)
+
+    async def _produce(self) -> None:
+        while True:
+            started = time.perf_counter()
+            try:
+                snapshot = await run_io(self._fetch, self.produced + 1)
+            except Exception as e:
+                logger.error(f"Market snapshot failed: {e}")
+            else:
+                self.last_fetch_seconds = time.perf_counter() - started
+                self.produced = snapshot.version
+                async with self._condition:
+                    self._latest = snapshot
+                    self._condition.notify_all()
+            await asyncio.sleep(self.interval)
+
+    def subscribe(self) -> None:
+        """Register a subscriber, starting the producer if it is not running"""
+        self.subscribers += 1
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._produce(), name='market-snapshot')
+
+    def unsubscribe(self) -> None:
+        """Drop a subscriber; the producer stops when none are left"""
+        self.subscribers = max(0, self.subscribers - 1)
+        if self.subscribers == 0 and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def wait_for(self, after_version: int = 0) -> MarketSnapshot:
+        """Return the newest snapshot once its version is greater than after_version"""
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self._latest is not None and self._latest.version > after_version)
+            return self._latest
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'subscribers': self.subscribers,
+            'version': self.produced,
+            'running': self._task is not None and not self._task.done(),
+            'last_fetch_ms': self.last_fetch_seconds * 1000
+        }
@@ -0,0 +1,271 @@
+"""
+Shared Market Data Hub
+
+Process-wide owner of the public Binance and Upbit clients. Tickers and order
+books are kept in an in-memory snapshot that every calculator, bot and API
+endpoint reads from, so a dozen dashboards polling the same symbols cost one
+set of exchange requests instead of one per viewer. Each snapshot field
+carries the time it was fetched; reads refetch only when the cached value is
+older than the allowed age, and an optional background thread keeps every
+requested symbol refreshed on a fixed cadence. When a MarketDataStream is
+attached, current WebSocket values are served first and REST is only used for
+symbols the stream does not cover or while it is reconnecting. Subscribers are
+called with every new value, fetched or streamed, so event-driven consumers
+(bot_runtime.py) can react to a tick without polling.
+"""
+
+import os
+import time
+import threading
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import ccxt
+from .rate_limit import get_rate_limiter
+from .order_book import OrderBook, DEFAULT_ORDER_BOOK_DEPTH, API_ORDER_BOOK_LEVELS
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class MarketDataHubConfig:
+    """Configuration for the shared market data hub"""
+    ticker_refresh_interval: float = 2.0       # Background ticker refresh cadence (seconds)
+    order_book_refresh_interval: float = 5.0   # Background order book refresh cadence (seconds)
+    max_ticker_age: float = 5.0                # Refetch on read when a ticker is older than this
+    max_order_book_age: float = 5.0            # Refetch on read when an order book is older than this
+    use_stream: bool = False                   # Serve quotes from the WebSocket feed (market_stream.py)
+    order_book_depth: int = DEFAULT_ORDER_BOOK_DEPTH  # Levels fetched and kept per side
+    request_timeout: float = 3.0               # HTTP timeout of each exchange call (seconds)
+
+class MarketDataHub:
+    """Single set of exchange clients plus a timestamped snapshot of their market data"""
+
+    def __init__(self, config: Optional[MarketDataHubConfig] = None):
+        self.config = config or MarketDataHubConfig()
+        # ccxt takes its HTTP timeout in milliseconds
+        client_options = {'timeout': int(self.config.request_timeout * 1000)}
+        self.clients = {
+            'binance': ccxt.binance(client_options),
+            'upbit': ccxt.upbit(client_options),
+        }
+
+        # (kind, exchange, symbol) -> (value, fetched_at epoch seconds)
+        self._snapshot: Dict[Tuple[str, str, str], Tuple[Any, float]] = {}
+        self._snapshot_lock = threading.Lock()
+        # One in-flight fetch per key; concurrent readers wait for it instead of refetching
+        self._key_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        # ccxt sync clients are not thread-safe, so each exchange is used by one thread at a time
+        self._client_locks = {name: threading.Lock() for name in self.clients}
+
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        # Called as listener(kind, exchange, symbol, value, fetched_at) on every new value
+        self._listeners: List[Callable[[str, str, str, Any, float], None]] = []
+
+        self.stream = None
+        if self.config.use_stream:
+            from .market_stream import MarketDataStream
+            self.attach_stream(MarketDataStream())
+
+    @property
+    def binance(self):
+        return self.clients['binance']
+
+    @property
+    def upbit(self):
+        return self.clients['upbit']
+
+    def attach_stream(self, stream) -> None:
+        """Serve quotes from a MarketDataStream (or compatible feed) before falling back to REST"""
+        if self.stream is not None and hasattr(self.stream, 'remove_listener'):
+            self.stream.remove_listener(self._notify)
+        self.stream = stream
+        if stream is not None and hasattr(stream, 'add_listener'):
+            stream.add_listener(self._notify)
+
+    def subscribe(self, listener: Callable[[str, str, str, Any, float], None]) -> None:
+        """Call listener(kind, exchange, symbol, value, fetched_at) for every fetched or streamed value
+
+        Listeners run on the thread that produced the value and must not block.
+        """
+        with self._snapshot_lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[str, str, str, Any, float], None]) -> None:
+        with self._snapshot_lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _notify(self, kind: str, exchange: str, symbol: str, value: Any, fetched_at: float) -> None:
+        with self._snapshot_lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(kind, exchange, symbol, value, fetched_at)
+            except Exception as e:
+                logger.warning(f"Market data listener failed: {e}")
+
+    def _key_lock(self, key: Tuple[str, str, str]) -> threading.Lock:
+        with self._snapshot_lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._key_locks[key] = lock
+            return lock
+
+    def _call_exchange(self, exchange: str, fetch: Callable[[Any], Any]) -> Any:
+        client = self.clients.get(exchange.lower())
+        if client is None:
+            raise ValueError(f"Unknown exchange: {exchange}")
+        get_rate_limiter(exchange.lower()).acquire()
+        with self._client_locks[exchange.lower()]:
+            return fetch(client)
+
+    def _get(self, kind: str, exchange: str, symbol: str, max_age: float,
+             fetch: Callable[[Any], Any]) -> Tuple[Any, float]:
+        key = (kind, exchange.lower(), symbol)
+        if self.stream is not None:
+            streamed = self.stream.get_cached(kind, exchange, symbol, max_age)
+            if streamed is not None:
+                return streamed
+
+        with self._snapshot_lock:
+            cached = self._snapshot.get(key)
+        if cached is not None and time.time() - cached[1] <= max_age:
+            return cached
+
+        with self._key_lock(key):
+            # Another thread may have refreshed it while we waited
+            with self._snapshot_lock:
+                cached = self._snapshot.get(key)
+            if cached is not None and time.time() - cached[1] <= max_age:
+                return cached
+
+            value = self._call_exchange(exchange, fetch)
+            entry = (value, time.time())
+            with self._snapshot_lock:
+                self._snapshot[key] = entry
+            self._notify(kind, key[1], symbol, value, entry[1])
+            return entry
+
+    def get_ticker(self, exchange: str, symbol: str, max_age: Optional[float] = None) -> Dict:
+        """Return the latest ticker, fetching it if the cached copy is too old"""
+        max_age = self.config.max_ticker_age if max_age is None else max_age
+        ticker, _ = self._get('ticker', exchange, symbol, max_age,
+                              lambda client: client.fetch_ticker(symbol))
+        return ticker
+
+    def get_order_book(self, exchange: str, symbol: str, max_age: Optional[float] = None) -> OrderBook:
+        """Return the latest order book, fetching it if the cached copy is too old
+
+        The returned book is shared with other readers and must not be modified.
+        """
+        max_age = self.config.max_order_book_age if max_age is None else max_age
+        depth = self.config.order_book_depth
+        order_book, _ = self._get('order_book', exchange, symbol, max_age,
+                                  lambda client: OrderBook.from_ccxt(
+                                      client.fetch_order_book(symbol, limit=depth), symbol, depth))
+        return order_book
+
+    def get_age(self, kind: str, exchange: str, symbol: str) -> Optional[float]:
+        """Seconds since a snapshot field was fetched or streamed, or None if it never was"""
+        with self._snapshot_lock:
+            cached = self._snapshot.get((kind, exchange.lower(), symbol))
+        if self.stream is not None:
+            streamed = self.stream.get_cached(kind, exchange, symbol, float('inf'))
+            if streamed is not None and (cached is None or streamed[1] > cached[1]):
+                cached = streamed
+        return time.time() - cached[1] if cached else None
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Copy of every cached field with its fetch time, age and source"""
+        now = time.time()
+        with self._snapshot_lock:
+            items = [(key, entry, 'rest') for key, entry in self._snapshot.items()]
+        if self.stream is not None:
+            items += [(key, entry, 'stream') for key, entry in self.stream.items()]
+
+        result: Dict[str, Dict[str, Any]] = {'tickers': {}, 'order_books': {}}
+        for (kind, exchange, symbol), (value, fetched_at), source in items:
+            section = 'tickers' if kind == 'ticker' else 'order_books'
+            name = f"{exchange}:{symbol}"
+            existing = result[section].get(name)
+            if existing is not None and existing['age_seconds'] <= now - fetched_at:
+                continue
+            result[section][name] = {
+                'data': value.top(API_ORDER_BOOK_LEVELS) if isinstance(value, OrderBook) else value,
+                'updated_at': datetime.fromtimestamp(fetched_at).isoformat(),
+                'age_seconds': now - fetched_at,
+                'source': source
+            }
+        return result
+
+    def _refresh_loop(self):
+        next_ticker_refresh = 0.0
+        next_order_book_refresh = 0.0
+        while not self._stop_event.is_set():
+            now = time.time()
+            with self._snapshot_lock:
+                keys = list(self._snapshot.keys())
+
+            refresh_tickers = now >= next_ticker_refresh
+            refresh_order_books = now >= next_order_book_refresh
+            for kind, exchange, symbol in keys:
+                if self._stop_event.is_set():
+                    break
+                if self.stream is not None:
+                    max_age = self.config.max_ticker_age if kind == 'ticker' else self.config.max_order_book_age
+                    if self.stream.get_cached(kind, exchange, symbol, max_age) is not None:
+                        continue  # The stream is keeping this field current
+                try:
+                    if kind == 'ticker' and refresh_tickers:
+                        self.get_ticker(exchange, symbol, max_age=0)
+                    elif kind == 'order_book' and refresh_order_books:
+                        self.get_order_book(exchange, symbol, max_age=0)
+                except Exception as e:
+                    logger.warning(f"Failed to refresh {kind} {exchange} {symbol}: {e}")
+
+            if refresh_tickers:
+                next_ticker_refresh = now + self.config.ticker_refresh_interval
+            if refresh_order_books:
+                next_order_book_refresh = now + self.config.order_book_refresh_interval
+            wait = max(0.0, min(next_ticker_refresh, next_order_book_refresh) - time.time())
+            self._stop_event.wait(wait)
+
+    def start(self):
+        """Start refreshing every field that has been requested so far in the background"""
+        if self.stream is not None:
+            self.stream.start()
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, name='market-data-hub', daemon=True)
+        self._refresh_thread.start()
+        logger.info("Market data hub refresh started")
+
+    def stop(self):
+        """Stop background refreshing; cached REST values stay readable"""
+        if self.stream is not None:
+            self.stream.stop()
+        self._stop_event.set()
+        if self._refresh_thread:
+            self._refresh_thread.join(timeout=5)
+            self._refresh_thread = None
+        logger.info("Market data hub refresh stopped")
+
+_hub: Optional[MarketDataHub] = None
+_hub_lock = threading.Lock()
+
+def get_market_data_hub() -> MarketDataHub:
+    """Return the process-wide market data hub, creating it on first use
+
+    Set MARKET_DATA_STREAM=1 to serve quotes from the exchange WebSocket feeds.
+    """
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            use_stream = os.getenv('MARKET_DATA_STREAM', '').lower() in ('1', 'true', 'yes')
+            _hub = MarketDataHub(MarketDataHubConfig(use_stream=use_stream))
+        return _hub
@@ -0,0 +1,403 @@
+"""
+Streaming Market Data Feed
+
+Subscribes to the public Binance and Upbit ticker/order book WebSocket
+channels and keeps the latest message for each symbol in memory. The
+MarketDataHub consults the stream before falling back to REST, so the
+calculators and the bot read streamed quotes through their usual
+get_ticker/get_order_book calls.
+
+Order books are held as fixed-depth OrderBook arrays. Upbit pushes complete
+books. Binance books are loaded from a REST depth snapshot and then kept
+current from the sequenced depth diff stream.
+
+Each exchange connection reconnects with exponential backoff. A connection
+that stays silent longer than stale_timeout is treated as a gap and
+reconnected. A Binance diff whose first update id does not follow the
+previous diff is also a gap, and that book is resynchronized from a new
+snapshot. Messages whose sequence (update id or exchange timestamp) goes
+backwards are dropped. After a
+disconnect, every field from that exchange is discarded, so nothing from
+before the gap is served until fresh messages arrive. The endpoint URLs are
+configurable, so the feed can be pointed at a local replay server (see
+stream_replay.py).
+"""
+
+import json
+import time
+import random
+import asyncio
+import threading
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import requests
+import websockets
+from .order_book import OrderBook, DEFAULT_ORDER_BOOK_DEPTH
+from .rate_limit import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class MarketStreamConfig:
+    """Configuration for the streaming market data feed"""
+    binance_url: str = 'wss://stream.binance.com:9443'
+    upbit_url: str = 'wss://api.upbit.com/websocket/v1'
+    binance_rest_url: str = 'https://api.binance.com'  # Depth snapshots for diff synchronization
+    binance_symbols: List[str] = field(default_factory=lambda: ['BTC/USDT'])
+    upbit_symbols: List[str] = field(default_factory=lambda: ['BTC/KRW', 'USDT/KRW'])
+    order_book_depth: int = DEFAULT_ORDER_BOOK_DEPTH  # Levels published per side
+    snapshot_depth: int = 100           # Levels requested in Binance depth snapshots and kept internally
+    stale_timeout: float = 10.0         # Reconnect if a connection is silent this long (seconds)
+    reconnect_delay: float = 1.0        # Initial reconnect backoff (seconds)
+    max_reconnect_delay: float = 30.0   # Backoff ceiling (seconds)
+
+def _binance_stream_symbol(symbol: str) -> str:
+    return symbol.replace('/', '').lower()
+
+def _upbit_code(symbol: str) -> str:
+    base, quote = symbol.split('/')
+    return f"{quote}-{base}"
+
+def _upbit_symbol(code: str) -> str:
+    quote, base = code.split('-')
+    return f"{base}/{quote}"
+
+def parse_binance_ticker(symbol: str, data: Dict) -> Tuple[str, str, Dict, int]:
+    """Convert a 24hr ticker event into (kind, symbol, ccxt-style ticker, sequence)"""
+    timestamp = int(data['E'])
+    ticker = {
+        'symbol': symbol,
+        'timestamp': timestamp,
+        'datetime': datetime.fromtimestamp(timestamp / 1000).isoformat(),
+        'last': float(data['c']),
+        'close': float(data['c']),
+        'bid': float(data['b']),
+        'ask': float(data['a']),
+        'high': float(data['h']),
+        'low': float(data['l']),
+        'open': float(data['o']),
+        'baseVolume': float(data['v']),
+        'quoteVolume': float(data['q']),
+    }
+    return 'ticker', symbol, ticker, timestamp
+
+def parse_upbit_message(message: Dict, depth: int = DEFAULT_ORDER_BOOK_DEPTH) -> Optional[Tuple[str, str, Any, int]]:
+    """Convert an Upbit WebSocket message into (kind, symbol, ticker dict or OrderBook, sequence)"""
+    message_type = message.get('type')
+    code = message.get('code')
+    if not code or message_type not in ('ticker', 'orderbook'):
+        return None
+    symbol = _upbit_symbol(code)
+    timestamp = int(message['timestamp'])
+
+    if message_type == 'ticker':
+        ticker = {
+            'symbol': symbol,
+            'timestamp': timestamp,
+            'datetime': datetime.fromtimestamp(timestamp / 1000).isoformat(),
+            'last': float(message['trade_price']),
+            'close': float(message['trade_price']),
+            'high': float(message['high_price']),
+            'low': float(message['low_price']),
+            'open': float(message['opening_price']),
+            'baseVolume': float(message['acc_trade_volume_24h']),
+            'quoteVolume': float(message['acc_trade_price_24h']),
+        }
+        return 'ticker', symbol, ticker, timestamp
+
+    units = message['orderbook_units']
+    order_book = OrderBook(symbol, depth)
+    order_book.load_snapshot([(unit['bid_price'], unit['bid_size']) for unit in units],
+                             [(unit['ask_price'], unit['ask_size']) for unit in units],
+                             timestamp=timestamp)
+    return 'order_book', symbol, order_book, timestamp
+
+class MarketDataStream:
+    """Latest ticker and order book per symbol, kept current from exchange WebSockets"""
+
+    def __init__(self, config: Optional[MarketStreamConfig] = None):
+        self.config = config or MarketStreamConfig()
+
+        # (kind, exchange, symbol) -> (value, received_at epoch seconds, sequence)
+        self._state: Dict[Tuple[str, str, str], Tuple[Any, float, int]] = {}
+        self._state_lock = threading.Lock()
+        # Called as listener(kind, exchange, symbol, value, received_at) from the stream thread
+        self._listeners: List[Callable[[str, str, str, Any, float], None]] = []
+
+        self.stats: Dict[str, Dict[str, int]] = {
+            exchange: {'messages': 0, 'reconnects': 0, 'gaps': 0, 'out_of_order': 0}
+            for exchange in ('binance', 'upbit')
+        }
+
+        # Binance diff synchronization, used only from the stream's event loop
+        self._binance_books: Dict[str, OrderBook] = {}
+        self._binance_pending: Dict[str, List[Dict]] = {}
+        self._binance_snapshot_tasks: Dict[str, asyncio.Task] = {}
+        self._binance_min_levels: Dict[str, int] = {}
+
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    def get_cached(self, kind: str, exchange: str, symbol: str, max_age: float) -> Optional[Tuple[Any, float]]:
+        """Return (value, received_at) if the streamed value is current, else None"""
+        with self._state_lock:
+            entry = self._state.get((kind, exchange.lower(), symbol))
+        if entry is None or time.time() - entry[1] > max_age:
+            return None
+        return entry[0], entry[1]
+
+    def add_listener(self, listener: Callable[[str, str, str, Any, float], None]) -> None:
+        """Call listener(kind, exchange, symbol, value, received_at) for every accepted message"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, str, str, Any, float], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def items(self) -> List[Tuple[Tuple[str, str, str], Tuple[Any, float]]]:
+        """Every streamed field as ((kind, exchange, symbol), (value, received_at))"""
+        with self._state_lock:
+            return [(key, (value, received_at))
+                    for key, (value, received_at, _) in self._state.items()]
+
+    def status(self) -> Dict[str, Any]:
+        """Connection counters and the number of fields currently streamed"""
+        with self._state_lock:
+            fields = len(self._state)
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'fields': fields,
+            'stats': {exchange: dict(counts) for exchange, counts in self.stats.items()}
+        }
+
+    def _apply(self, exchange: str, parsed: Optional[Tuple[str, str, Any, int]]) -> None:
+        if parsed is None:
+            return
+        kind, symbol, value, sequence = parsed
+        key = (kind, exchange, symbol)
+        with self._state_lock:
+            previous = self._state.get(key)
+            if previous is not None and sequence < previous[2]:
+                self.stats[exchange]['out_of_order'] += 1
+                return
+            received_at = time.time()
+            self._state[key] = (value, received_at, sequence)
+        self.stats[exchange]['messages'] += 1
+        for listener in list(self._listeners):
+            try:
+                listener(kind, exchange, symbol, value, received_at)
+            except Exception as e:
+                logger.warning(f"Stream listener failed: {e}")
+
+    def _mark_gap(self, exchange: str) -> None:
+        with self._state_lock:
+            self._state = {key: entry for key, entry in self._state.items() if key[1] != exchange}
+        if exchange == 'binance':
+            self._reset_binance_books()
+        self.stats[exchange]['gaps'] += 1
+
+    def _reset_binance_books(self, symbol: Optional[str] = None) -> None:
+        symbols = [symbol] if symbol else list(set(self._binance_books) | set(self._binance_pending))
+        for name in symbols:
+            self._binance_books.pop(name, None)
+            self._binance_pending.pop(name, None)
+            task = self._binance_snapshot_tasks.pop(name, None)
+            if task is not None:
+                task.cancel()
+        if symbol:
+            with self._state_lock:
+                self._state.pop(('order_book', 'binance', symbol), None)
+
+    def _fetch_binance_snapshot(self, symbol: str) -> Dict:
+        get_rate_limiter('binance').acquire()
+        response = requests.get(f"{self.config.binance_rest_url}/api/v3/depth",
+                                params={'symbol': symbol.replace('/', ''), 'limit': self.config.snapshot_depth},
+                                timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    async def _sync_binance_book(self, symbol: str) -> None:
+        """Load a depth snapshot and replay the diffs buffered while it was in flight"""
+        try:
+            snapshot = await asyncio.get_running_loop().run_in_executor(
+                None, self._fetch_binance_snapshot, symbol)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Binance depth snapshot for {symbol} failed: {e}")
+            self._binance_snapshot_tasks.pop(symbol, None)
+            return
+
+        # The whole snapshot is kept, so removals near the top are refilled from the levels
+        # behind them; books are trimmed to order_book_depth only when published
+        book = OrderBook(symbol, max(self.config.snapshot_depth, self.config.order_book_depth))
+        book.load_snapshot(snapshot['bids'], snapshot['asks'], nonce=int(snapshot['lastUpdateId']))
+        pending = self._binance_pending.pop(symbol, [])
+        self._binance_snapshot_tasks.pop(symbol, None)
+        self._binance_books[symbol] = book
+        # Resync once a side thins below the published depth (or below what the snapshot had)
+        self._binance_min_levels[symbol] = min(self.config.order_book_depth, book.bid_count, book.ask_count)
+
+        # Diffs fully covered by the snapshot are dropped; the first one kept must straddle it
+        pending = [event for event in pending if int(event['u']) > book.nonce]
+        if pending and int(pending[0]['U']) > book.nonce + 1:
+            logger.warning(f"Binance depth snapshot for {symbol} is older than the buffered diffs, resyncing")
+            self._resync_binance_book(symbol)
+            return
+        for index, event in enumerate(pending):
+            if index > 0 and int(event['U']) != book.nonce + 1:
+                logger.warning(f"Binance depth gap for {symbol}: expected {book.nonce + 1}, got {event['U']}")
+                self._resync_binance_book(symbol)
+                self._binance_pending[symbol].extend(pending[index:])
+                return
+            book.apply_diff(event['b'], event['a'], nonce=int(event['u']), timestamp=int(event['E']))
+        self._publish_binance_book(symbol)
+
+    def _resync_binance_book(self, symbol: str) -> None:
+        self._reset_binance_books(symbol)
+        self.stats['binance']['gaps'] += 1
+        self._binance_pending[symbol] = []
+        self._binance_snapshot_tasks[symbol] = asyncio.create_task(self._sync_binance_book(symbol))
+
+    def _publish_binance_book(self, symbol: str) -> None:
+        book = self._binance_books[symbol]
+        if min(book.bid_count, book.ask_count) < self._binance_min_levels.get(symbol, 0):
+            # Levels removed below the tracked window cannot be restored from diffs
+            self._resync_binance_book(symbol)
+            return
+        self._apply('binance', ('order_book', symbol, book.copy(self.config.order_book_depth), book.nonce))
+
+    def _on_binance_depth(self, symbol: str, event: Dict) -> None:
+        book = self._binance_books.get(symbol)
+        if book is None:
+            self._binance_pending.setdefault(symbol, []).append(event)
+            if symbol not in self._binance_snapshot_tasks:
+                self._binance_snapshot_tasks[symbol] = asyncio.create_task(self._sync_binance_book(symbol))
+            return
+
+        first_id, last_id = int(event['U']), int(event['u'])
+        if last_id <= book.nonce:
+            self.stats['binance']['out_of_order'] += 1
+            return
+        if first_id != book.nonce + 1:
+            logger.warning(f"Binance depth gap for {symbol}: expected {book.nonce + 1}, got {first_id}")
+            self._resync_binance_book(symbol)
+            return
+        book.apply_diff(event['b'], event['a'], nonce=last_id, timestamp=int(event['E']))
+        self._publish_binance_book(symbol)
+
+    def _on_binance_message(self, message: Dict, symbols: Dict[str, str]) -> None:
+        stream = message.get('stream', '')
+        data = message.get('data')
+        if not data or '@' not in stream:
+            return
+        symbol = symbols.get(stream.split('@')[0])
+        if symbol is None:
+            return
+        if stream.endswith('@ticker'):
+            self._apply('binance', parse_binance_ticker(symbol, data))
+        elif '@depth' in stream:
+            self._on_binance_depth(symbol, data)
+
+    def _binance_endpoint(self) -> Tuple[str, Dict[str, str]]:
+        symbols = {_binance_stream_symbol(symbol): symbol for symbol in self.config.binance_symbols}
+        streams = []
+        for stream_symbol in symbols:
+            streams.append(f"{stream_symbol}@ticker")
+            streams.append(f"{stream_symbol}@depth@100ms")
+        return f"{self.config.binance_url}/stream?streams={'/'.join(streams)}", symbols
+
+    def _upbit_subscription(self) -> str:
+        codes = [_upbit_code(symbol) for symbol in self.config.upbit_symbols]
+        return json.dumps([
+            {'ticket': f"kimchi-{int(time.time() * 1000)}"},
+            {'type': 'ticker', 'codes': codes},
+            {'type': 'orderbook', 'codes': codes},
+        ])
+
+    async def _run_exchange(self, exchange: str) -> None:
+        delay = self.config.reconnect_delay
+        if exchange == 'binance':
+            url, binance_symbols = self._binance_endpoint()
+        else:
+            url = self.config.upbit_url
+
+        while not self._stop.is_set():
+            try:
+                async with websockets.connect(url, max_size=None, ping_interval=20, ping_timeout=20) as ws:
+                    logger.info(f"{exchange} market stream connected")
+                    if exchange == 'upbit':
+                        await ws.send(self._upbit_subscription())
+
+                    while not self._stop.is_set():
+                        try:
+                            raw = await asyncio.wait_for(ws.recv(), timeout=self.config.stale_timeout)
+                        except asyncio.TimeoutError:
+                            logger.warning(f"{exchange} market stream silent for "
+                                           f"{self.config.stale_timeout}s, reconnecting")
+                            break
+
+                        message = json.loads(raw)
+                        if exchange == 'binance':
+                            self._on_binance_message(message, binance_symbols)
+                        else:
+                            self._apply(exchange, parse_upbit_message(message, self.config.order_book_depth))
+                        delay = self.config.reconnect_delay
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"{exchange} market stream error: {e}")
+
+            if self._stop.is_set():
+                break
+            self._mark_gap(exchange)
+            self.stats[exchange]['reconnects'] += 1
+            wait = delay * (1 + random.random() * 0.25)
+            delay = min(delay * 2, self.config.max_reconnect_delay)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self) -> None:
+        tasks = []
+        if self.config.binance_symbols:
+            tasks.append(asyncio.create_task(self._run_exchange('binance')))
+        if self.config.upbit_symbols:
+            tasks.append(asyncio.create_task(self._run_exchange('upbit')))
+        await self._stop.wait()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _thread_main(self) -> None:
+        try:
+            self._loop.run_until_complete(self._run())
+        finally:
+            self._loop.close()
+
+    def start(self) -> None:
+        """Connect to both exchanges in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._loop = asyncio.new_event_loop()
+        self._stop = asyncio.Event()
+        self._thread = threading.Thread(target=self._thread_main, name='market-stream', daemon=True)
+        self._thread.start()
+        logger.info("Market data stream started")
+
+    def stop(self) -> None:
+        """Close the connections and discard the streamed values"""
+        if self._thread:
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._state_lock:
+            self._state = {}
+        self._binance_books = {}
+        self._binance_pending = {}
+        self._binance_snapshot_tasks = {}
+        logger.info("Market data stream stopped")
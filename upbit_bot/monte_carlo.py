@@ -0,0 +1,281 @@
+"""
+Monte Carlo Robustness Analysis
+
+Turns one completed backtest into return and drawdown distributions over
+thousands of resampled histories:
+
+- block_bootstrap: circular block bootstrap of the premium series together
+  with the exchange-price and USD/KRW log returns of the same bars, re-run
+  through the strategy. Paths are simulated in batches by batch_backtest
+  (one path per lane, one pass over the bars).
+- permutation: the run's closed-trade P&L in random order (same final
+  return, different drawdown).
+- trade_bootstrap: closed trades drawn with replacement.
+
+Paths are generated and simulated in batches to bound memory. Every batch gets
+its own child seed, so results do not depend on how the batches are spread
+over worker processes.
+"""
+
+import os
+import math
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MONTE_CARLO_METHODS = ['block_bootstrap', 'permutation', 'trade_bootstrap']
+
+@dataclass
+class MonteCarloConfig:
+    """Resampling settings"""
+    n_paths: int = 10_000
+    method: str = 'block_bootstrap'     # One of MONTE_CARLO_METHODS
+    block_length: int = 168             # Bars per bootstrap block (one week of hourly bars)
+    batch_size: int = 1000              # Paths simulated together (larger is faster but uses ~32 bytes x bars x paths)
+    seed: Optional[int] = None
+    max_workers: Optional[int] = None   # Processes for the batches (None: one per core, 1: in-process)
+    percentiles: Tuple[float, ...] = (5, 25, 50, 75, 95)
+
+@dataclass
+class MonteCarloResult:
+    """Per-path return and max drawdown (%), with the original run for comparison"""
+    method: str
+    returns: np.ndarray = field(repr=False)
+    max_drawdowns: np.ndarray = field(repr=False)
+    baseline: Dict[str, float]
+    percentiles: Tuple[float, ...] = (5, 25, 50, 75, 95)
+
+    def summary(self) -> Dict[str, Any]:
+        def distribution(values: np.ndarray) -> Dict[str, float]:
+            stats = {'mean': float(values.mean()), 'std': float(values.std())}
+            for q, value in zip(self.percentiles, np.percentile(values, self.percentiles)):
+                stats[f"p{q:g}"] = float(value)
+            return stats
+
+        if len(self.returns) == 0:
+            return {'method': self.method, 'paths': 0, 'baseline': self.baseline}
+        return {
+            'method': self.method,
+            'paths': len(self.returns),
+            'baseline': self.baseline,
+            'return_percentage': distribution(self.returns),
+            'max_drawdown': distribution(self.max_drawdowns),
+            'probability_of_loss': float((self.returns < 0).mean()),
+            # Share of paths that did no better than the original run
+            'baseline_return_rank': float((self.returns <= self.baseline['return_percentage']).mean())
+        }
+
+def block_bootstrap_indices(rng: np.random.Generator, length: int, count: int,
+                            block_length: int) -> np.ndarray:
+    """(length, count) bar indices: each column joins randomly started circular blocks"""
+    block_length = max(1, min(block_length, length))
+    blocks = math.ceil(length / block_length)
+    index_type = np.int32 if length < 2 ** 31 else np.int64
+    starts = rng.integers(0, length, size=(blocks, 1, count), dtype=index_type)
+    offsets = np.arange(block_length, dtype=index_type).reshape(1, block_length, 1)
+    indices = starts + offsets
+    indices %= length
+    return indices.reshape(blocks * block_length, count)[:length]
+
+def _resampled_path(values: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Price paths from the series' resampled log returns, starting at its first value"""
+    path = np.diff(np.log(values), prepend=np.log(values[0]))[indices]
+    path[0] = 0.0
+    # In place: paths are (bars, paths_in_batch) and dominate memory use
+    np.cumsum(path, axis=0, out=path)
+    np.exp(path, out=path)
+    path *= values[0]
+    return path
+
+def trade_paths(profit_loss: np.ndarray, initial_equity: float, rng: np.random.Generator,
+                count: int, with_replacement: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Return and max drawdown (%) of count reorderings (or resamples) of the trade P&L"""
+    profit_loss = np.asarray(profit_loss, dtype=np.float64)
+    if len(profit_loss) == 0:
+        return np.zeros(count), np.zeros(count)
+    if with_replacement:
+        orders = profit_loss[rng.integers(0, len(profit_loss), size=(count, len(profit_loss)))]
+    else:
+        orders = rng.permuted(np.tile(profit_loss, (count, 1)), axis=1)
+    return _equity_stats(initial_equity, orders)
+
+def _equity_stats(initial_equity: float, profit_loss: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    equity = np.cumsum(profit_loss, axis=1)
+    equity += initial_equity
+    peak = np.maximum.accumulate(np.maximum(equity, initial_equity), axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drawdowns = np.where(peak > 0, (peak - equity) / peak * 100, 0.0)
+    returns = (equity[:, -1] - initial_equity) / initial_equity * 100
+    return returns, drawdowns.max(axis=1)
+
+def _bitcoin_batch(arrays: Dict[str, np.ndarray], config, block_length: int,
+                   rng: np.random.Generator, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    from .batch_backtest import simulate_config_batch
+    indices = block_bootstrap_indices(rng, len(arrays['kimchi_premium']), count, block_length)
+    premium = arrays['kimchi_premium'][indices]
+    binance_close = _resampled_path(arrays['binance_close'], indices)
+    usd_krw_rate = _resampled_path(arrays['usd_krw_rate'], indices)
+    del indices
+    # upbit_close = binance_close * usd_krw_rate * (1 + premium / 100), as fetch_historical_data defines the premium
+    upbit_close = premium / 100
+    upbit_close += 1
+    upbit_close *= binance_close
+    upbit_close *= usd_krw_rate
+    # (bars, paths) arrays go in transposed: one path per lane, no copy
+    summaries = simulate_config_batch(premium.T, upbit_close.T, binance_close.T, usd_krw_rate.T,
+                                      [config] * count, track_drawdown=True)
+    return (np.array([s['return_percentage'] for s in summaries]),
+            np.array([s['max_drawdown'] for s in summaries]))
+
+def _upbit_batch(arrays: Dict[str, np.ndarray], times: pd.DatetimeIndex, config, block_length: int,
+                 rng: np.random.Generator, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    from .batch_backtest import simulate_upbit_paths
+    usd_krw_rate = arrays['usd_krw_rate']
+    premium = (arrays['usdt_krw_price'] - usd_krw_rate) / usd_krw_rate * 100
+    indices = block_bootstrap_indices(rng, len(usd_krw_rate), count, block_length)
+    fx_paths = _resampled_path(usd_krw_rate, indices)
+    usdt_paths = premium[indices]
+    del indices
+    usdt_paths /= 100
+    usdt_paths += 1
+    usdt_paths *= fx_paths
+    return simulate_upbit_paths(config, times, fx_paths, usdt_paths)
+
+def _simulate_batch(job: Dict[str, Any], arrays: Optional[Dict[str, np.ndarray]],
+                    times: Optional[pd.DatetimeIndex]) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(job['seed'])
+    if job['kind'] == 'trades':
+        return trade_paths(job['profit_loss'], job['initial_equity'], rng, job['count'],
+                           job['with_replacement'])
+    if job['kind'] == 'bitcoin':
+        return _bitcoin_batch(arrays, job['config'], job['block_length'], rng, job['count'])
+    return _upbit_batch(arrays, times, job['config'], job['block_length'], rng, job['count'])
+
+# Per-worker state populated by _init_worker
+_worker_state: Dict[str, Any] = {}
+
+def _init_worker(descriptor: Optional[Dict[str, Any]]):
+    if descriptor is not None:
+        from .parallel_sweep import SharedMarketData
+        shm, times, arrays = SharedMarketData.attach(descriptor)
+        _worker_state['shm'] = shm
+        _worker_state['times'] = times
+        _worker_state['arrays'] = arrays
+
+def _run_worker_batch(job: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    return _simulate_batch(job, _worker_state.get('arrays'), _worker_state.get('times'))
+
+def _run_batches(job: Dict[str, Any], mc: MonteCarloConfig, market: Optional[pd.DataFrame] = None,
+                 fields: Optional[List[str]] = None,
+                 times: Optional[pd.DatetimeIndex] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Split mc.n_paths into seeded batches and run them in-process or across a pool"""
+    counts = [min(mc.batch_size, mc.n_paths - start) for start in range(0, mc.n_paths, mc.batch_size)]
+    seeds = np.random.SeedSequence(mc.seed).spawn(len(counts))
+    jobs = [dict(job, seed=seed, count=count) for seed, count in zip(seeds, counts)]
+
+    max_workers = mc.max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(jobs) <= 1:
+        arrays = {name: market[name].to_numpy(dtype=np.float64) for name in fields} if fields else None
+        outputs = [_simulate_batch(batch, arrays, times) for batch in jobs]
+    else:
+        from contextlib import nullcontext
+        from .parallel_sweep import SharedMarketData
+        shared = SharedMarketData(market, fields, times=times) if fields else nullcontext()
+        with shared as market_data:
+            descriptor = market_data.descriptor if fields else None
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs)), initializer=_init_worker,
+                                     initargs=(descriptor,)) as executor:
+                outputs = list(executor.map(_run_worker_batch, jobs))
+
+    if not outputs:
+        return np.empty(0), np.empty(0)
+    return np.concatenate([o[0] for o in outputs]), np.concatenate([o[1] for o in outputs])
+
+def _check_method(method: str) -> None:
+    if method not in MONTE_CARLO_METHODS:
+        raise ValueError(f"Unknown Monte Carlo method '{method}' (choose from {', '.join(MONTE_CARLO_METHODS)})")
+
+def _trade_baseline(profit_loss: np.ndarray, initial_equity: float) -> Dict[str, float]:
+    if len(profit_loss) == 0:
+        return {'return_percentage': 0.0, 'max_drawdown': 0.0}
+    returns, drawdowns = _equity_stats(initial_equity, np.asarray(profit_loss, dtype=np.float64)[np.newaxis, :])
+    return {'return_percentage': float(returns[0]), 'max_drawdown': float(drawdowns[0])}
+
+def upbit_trade_pnl(result) -> np.ndarray:
+    """Equity change (USD) from each trade to the next in a BacktestResult
+
+    The Upbit engine does not book P&L per trade, so each trade's contribution
+    is read from the balances it left: equity is balance_usd + balance_krw /
+    usd_krw_rate, as the backtest values it. A last element carries the
+    change from the last trade to result.final_balance (the final valuation
+    of the holdings), so the changes add up to result.total_return and the
+    baseline return equals result.return_percentage.
+    """
+    trades = result.trades
+    has_balance = trades.column('has_balance')
+    equity = (trades.column('balance_usd') + trades.column('balance_krw') / trades.column('usd_krw_rate'))[has_balance]
+    return np.diff(np.concatenate(([result.initial_balance], equity, [result.final_balance])))
+
+def bitcoin_monte_carlo(config, market_data: Optional[pd.DataFrame], results: Optional[Dict] = None,
+                        mc: Optional[MonteCarloConfig] = None) -> MonteCarloResult:
+    """Monte Carlo over a BitcoinBacktester run
+
+    block_bootstrap needs the run's market_data (from fetch_historical_data);
+    the trade methods need its results (from simulate_trades or run_backtest).
+    Drawdowns are peak to trough of total value, valued every bar (bootstrap)
+    or after every closed trade (trade methods).
+    """
+    from .batch_backtest import simulate_config_batch
+    from .parallel_sweep import MARKET_FIELDS
+    mc = mc or MonteCarloConfig()
+    _check_method(mc.method)
+    config = replace(config, use_vectorized_engine=True)
+
+    if mc.method == 'block_bootstrap':
+        original = simulate_config_batch(*(market_data[name].to_numpy(dtype=np.float64) for name in MARKET_FIELDS),
+                                         [config], track_drawdown=True)[0]
+        job = {'kind': 'bitcoin', 'config': config, 'block_length': mc.block_length}
+        returns, drawdowns = _run_batches(job, mc, market_data, list(MARKET_FIELDS),
+                                          pd.DatetimeIndex(market_data.index))
+        baseline = {'return_percentage': original['return_percentage'], 'max_drawdown': original['max_drawdown']}
+    else:
+        profit_loss = np.array([t['total_pnl_krw'] for t in results['trades'] if t['type'] == 'EXIT'])
+        initial_equity = results['initial_value_krw']
+        job = {'kind': 'trades', 'profit_loss': profit_loss, 'initial_equity': initial_equity,
+               'with_replacement': mc.method == 'trade_bootstrap'}
+        returns, drawdowns = _run_batches(job, mc)
+        baseline = _trade_baseline(profit_loss, initial_equity)
+    return MonteCarloResult(mc.method, returns, drawdowns, baseline, mc.percentiles)
+
+def upbit_monte_carlo(config, historical_data: Optional[pd.DataFrame], result=None,
+                      mc: Optional[MonteCarloConfig] = None) -> MonteCarloResult:
+    """Monte Carlo over an EnhancedUpbitBacktest run
+
+    block_bootstrap needs the run's historical_data (datetime, usd_krw_rate,
+    usdt_krw_price) and backtests every resampled path with config; the trade
+    methods resample the per-trade equity changes of the run's BacktestResult
+    (see upbit_trade_pnl).
+    """
+    mc = mc or MonteCarloConfig()
+    _check_method(mc.method)
+    config = replace(config, use_vectorized_engine=True)
+
+    if mc.method == 'block_bootstrap':
+        from .backtest import EnhancedUpbitBacktest, ArbitrageStrategy
+        original = EnhancedUpbitBacktest(config, ArbitrageStrategy(config)).run_backtest_on_data(historical_data)
+        job = {'kind': 'upbit', 'config': config, 'block_length': mc.block_length}
+        returns, drawdowns = _run_batches(job, mc, historical_data, ['usd_krw_rate', 'usdt_krw_price'],
+                                          pd.DatetimeIndex(historical_data['datetime']))
+        baseline = {'return_percentage': original.return_percentage, 'max_drawdown': original.max_drawdown}
+    else:
+        profit_loss = upbit_trade_pnl(result)
+        job = {'kind': 'trades', 'profit_loss': profit_loss, 'initial_equity': result.initial_balance,
+               'with_replacement': mc.method == 'trade_bootstrap'}
+        returns, drawdowns = _run_batches(job, mc)
+        baseline = _trade_baseline(profit_loss, result.initial_balance)
+    return MonteCarloResult(mc.method, returns, drawdowns, baseline, mc.percentiles)
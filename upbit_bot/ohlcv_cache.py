@@ -0,0 +1,148 @@
+"""
+OHLCV Disk Cache
+
+Stores exchange candles on disk so repeated backtests over the same range do not
+re-download history. Each exchange/symbol/timeframe gets its own column-major
+.npy file (timestamp, open, high, low, close, volume) that is memory-mapped on
+read, plus a small JSON sidecar recording the contiguous time range that has
+already been fetched. Only the missing head/tail gaps are requested from the
+exchange.
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+_TIMEFRAME_UNITS_MS = {
+    'm': 60_000,
+    'h': 3_600_000,
+    'd': 86_400_000,
+    'w': 604_800_000,
+}
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """Convert a ccxt timeframe string such as '1m' or '4h' to milliseconds"""
+    unit = timeframe[-1]
+    if unit not in _TIMEFRAME_UNITS_MS:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return int(timeframe[:-1]) * _TIMEFRAME_UNITS_MS[unit]
+
+class OHLCVCache:
+    """Columnar on-disk OHLCV store with incremental top-up"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _base_path(self, exchange: str, symbol: str, timeframe: str) -> str:
+        safe_symbol = symbol.replace('/', '-')
+        return os.path.join(self.cache_dir, f"{exchange}_{safe_symbol}_{timeframe}")
+
+    def load(self, exchange: str, symbol: str, timeframe: str) -> Tuple[Optional[np.ndarray], Optional[Dict]]:
+        """Return the memory-mapped (6, n) column array and coverage metadata, if cached"""
+        base_path = self._base_path(exchange, symbol, timeframe)
+        try:
+            with open(base_path + '.json') as f:
+                coverage = json.load(f)
+            columns = np.load(base_path + '.npy', mmap_mode='r')
+            return columns, coverage
+        except FileNotFoundError:
+            return None, None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable OHLCV cache {base_path}: {e}")
+            return None, None
+
+    def store(self, exchange: str, symbol: str, timeframe: str,
+              columns: np.ndarray, coverage: Dict) -> None:
+        """Atomically replace the cached columns and coverage metadata"""
+        base_path = self._base_path(exchange, symbol, timeframe)
+        # Unique temp names, so concurrent writers never replace each other's half-written file
+        self._replace(base_path + '.npy', lambda f: np.save(f, np.ascontiguousarray(columns, dtype=np.float64)))
+        self._replace(base_path + '.json', lambda f: f.write(json.dumps(coverage).encode()))
+
+    def _replace(self, path: str, write: Callable) -> None:
+        """Write a temp file next to path with write(f), then rename it over path"""
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @staticmethod
+    def _slice(columns: np.ndarray, start_ts: int, end_ts: int) -> np.ndarray:
+        """Copy of the candles with start_ts <= timestamp < end_ts"""
+        timestamps = columns[0]
+        lo = int(np.searchsorted(timestamps, start_ts, side='left'))
+        hi = int(np.searchsorted(timestamps, end_ts, side='left'))
+        return np.array(columns[:, lo:hi])
+
+    def get_range(self, exchange: str, symbol: str, timeframe: str,
+                  start_ts: int, end_ts: int,
+                  fetch_span: Callable[[int, int], List[List[float]]]) -> np.ndarray:
+        """Return candles with start_ts <= timestamp < end_ts as a (6, n) column array
+
+        fetch_span(since, until) must download candles from the exchange for the
+        given millisecond range; it is only called for the parts of the range that
+        are not already on disk.
+        """
+        timeframe_ms = timeframe_to_ms(timeframe)
+        # Never mark the still-forming candle as covered
+        now_ms = int(time.time() * 1000)
+        last_complete_end = (now_ms // timeframe_ms) * timeframe_ms
+
+        cached, coverage = self.load(exchange, symbol, timeframe)
+
+        gaps = []
+        if cached is None:
+            gaps.append((start_ts, end_ts))
+        else:
+            if start_ts < coverage['start']:
+                gaps.append((start_ts, coverage['start']))
+            if end_ts > coverage['end'] and coverage['end'] < last_complete_end:
+                gaps.append((coverage['end'], end_ts))
+
+        if gaps:
+            new_rows = []
+            for since, until in gaps:
+                logger.info(f"Fetching {exchange} {symbol} {timeframe} gap {since} -> {until}")
+                new_rows.extend(fetch_span(since, until))
+
+            fetched = np.array(new_rows, dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS)).T
+            fetched = fetched[:, fetched[0] + timeframe_ms <= now_ms]
+
+            if cached is not None:
+                merged = np.concatenate([np.asarray(cached), fetched], axis=1)
+                new_start = min(coverage['start'], gaps[0][0])
+                new_end = max(coverage['end'], min(gaps[-1][1], last_complete_end))
+            else:
+                merged = fetched
+                new_start = start_ts
+                new_end = min(end_ts, last_complete_end)
+
+            # Sort by timestamp and keep the most recently fetched copy of each candle
+            order = np.argsort(merged[0], kind='stable')
+            merged = merged[:, order]
+            keep = np.ones(merged.shape[1], dtype=bool)
+            keep[:-1] = merged[0, 1:] != merged[0, :-1]
+            merged = merged[:, keep]
+
+            self.store(exchange, symbol, timeframe, merged, {'start': int(new_start), 'end': int(new_end)})
+            # The merged array may extend past the request on either side
+            return self._slice(merged, start_ts, end_ts)
+
+        logger.info(f"Serving {exchange} {symbol} {timeframe} from cache")
+        return self._slice(cached, start_ts, end_ts)
@@ -0,0 +1,164 @@
+"""
+Fixed-Depth Order Book
+
+Compact order book held in preallocated NumPy arrays, bids sorted high to
+low and asks low to high. A book is loaded from a REST or WebSocket snapshot
+and can then be kept current from (price, quantity) diffs, where a quantity
+of zero removes the level. Levels beyond the configured depth are dropped, so
+memory and copy cost stay constant however deep the exchange book is. Once a
+side has dropped levels, removals can leave it shallower than the depth: the
+levels it holds are still exactly the best ones, but the levels behind them
+are unknown until the next snapshot.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Levels kept per side
+DEFAULT_ORDER_BOOK_DEPTH = 20
+
+# Levels per side included in API responses
+API_ORDER_BOOK_LEVELS = 5
+
+class OrderBook:
+    """Top-of-book bids and asks in fixed-size price/quantity arrays"""
+
+    def __init__(self, symbol: str, depth: int = DEFAULT_ORDER_BOOK_DEPTH):
+        self.symbol = symbol
+        self.depth = depth
+        self.bid_prices = np.zeros(depth, dtype=np.float64)
+        self.bid_sizes = np.zeros(depth, dtype=np.float64)
+        self.ask_prices = np.zeros(depth, dtype=np.float64)
+        self.ask_sizes = np.zeros(depth, dtype=np.float64)
+        self.bid_count = 0
+        self.ask_count = 0
+        # Whether levels exist beyond the ones held (so new levels past the last one are unplaceable)
+        self.bids_truncated = False
+        self.asks_truncated = False
+        self.nonce: Optional[int] = None      # Exchange update id of the last applied change
+        self.timestamp: Optional[int] = None  # Exchange time of the last applied change (ms)
+
+    @classmethod
+    def from_ccxt(cls, order_book: Dict, symbol: Optional[str] = None,
+                  depth: int = DEFAULT_ORDER_BOOK_DEPTH) -> 'OrderBook':
+        """Build a book from a ccxt fetch_order_book result"""
+        book = cls(symbol or order_book.get('symbol', ''), depth)
+        book.load_snapshot(order_book.get('bids', []), order_book.get('asks', []),
+                           order_book.get('nonce'), order_book.get('timestamp'))
+        return book
+
+    def load_snapshot(self, bids: Iterable[Sequence], asks: Iterable[Sequence],
+                      nonce: Optional[int] = None, timestamp: Optional[int] = None) -> None:
+        """Replace both sides with the given levels (already sorted best first)"""
+        self.bid_count, self.bids_truncated = self._load_side(self.bid_prices, self.bid_sizes, bids)
+        self.ask_count, self.asks_truncated = self._load_side(self.ask_prices, self.ask_sizes, asks)
+        self.nonce = nonce
+        self.timestamp = timestamp
+
+    def _load_side(self, prices: np.ndarray, sizes: np.ndarray, levels: Iterable[Sequence]) -> Tuple[int, bool]:
+        count = 0
+        for level in levels:
+            if count == self.depth:
+                return count, True
+            prices[count] = float(level[0])
+            sizes[count] = float(level[1])
+            count += 1
+        return count, False
+
+    def apply_diff(self, bids: Iterable[Sequence], asks: Iterable[Sequence],
+                   nonce: Optional[int] = None, timestamp: Optional[int] = None) -> None:
+        """Apply (price, quantity) level changes; quantity 0 removes the level"""
+        for price, size in bids:
+            self.bid_count, self.bids_truncated = self._update_side(
+                self.bid_prices, self.bid_sizes, self.bid_count, self.bids_truncated,
+                float(price), float(size), descending=True)
+        for price, size in asks:
+            self.ask_count, self.asks_truncated = self._update_side(
+                self.ask_prices, self.ask_sizes, self.ask_count, self.asks_truncated,
+                float(price), float(size), descending=False)
+        if nonce is not None:
+            self.nonce = nonce
+        if timestamp is not None:
+            self.timestamp = timestamp
+
+    def _update_side(self, prices: np.ndarray, sizes: np.ndarray, count: int, truncated: bool,
+                     price: float, size: float, descending: bool) -> Tuple[int, bool]:
+        if descending:
+            index = int(np.searchsorted(-prices[:count], -price))
+        else:
+            index = int(np.searchsorted(prices[:count], price))
+        exists = index < count and prices[index] == price
+
+        if size == 0:
+            if exists:
+                prices[index:count - 1] = prices[index + 1:count]
+                sizes[index:count - 1] = sizes[index + 1:count]
+                count -= 1
+            return count, truncated
+
+        if exists:
+            sizes[index] = size
+            return count, truncated
+        if index >= self.depth or (index == count and truncated):
+            return count, truncated  # Outside the known part of the book
+
+        if count == self.depth:
+            truncated = True  # The last level is pushed out
+        end = min(count, self.depth - 1)
+        prices[index + 1:end + 1] = prices[index:end]
+        sizes[index + 1:end + 1] = sizes[index:end]
+        prices[index] = price
+        sizes[index] = size
+        return min(count + 1, self.depth), truncated
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return float(self.bid_prices[0]) if self.bid_count else None
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return float(self.ask_prices[0]) if self.ask_count else None
+
+    def price_at(self, side: str, level: int = 0) -> Optional[float]:
+        """Price at a level of the 'bids' or 'asks' side, or None if the side is shallower"""
+        if side == 'bids':
+            return float(self.bid_prices[level]) if level < self.bid_count else None
+        return float(self.ask_prices[level]) if level < self.ask_count else None
+
+    def copy(self, depth: Optional[int] = None) -> 'OrderBook':
+        """Independent copy, keeping only the best `depth` levels per side if given"""
+        depth = self.depth if depth is None else min(depth, self.depth)
+        book = OrderBook(self.symbol, depth)
+        book.bid_prices[:] = self.bid_prices[:depth]
+        book.bid_sizes[:] = self.bid_sizes[:depth]
+        book.ask_prices[:] = self.ask_prices[:depth]
+        book.ask_sizes[:] = self.ask_sizes[:depth]
+        book.bid_count = min(self.bid_count, depth)
+        book.ask_count = min(self.ask_count, depth)
+        book.bids_truncated = self.bids_truncated or self.bid_count > depth
+        book.asks_truncated = self.asks_truncated or self.ask_count > depth
+        book.nonce = self.nonce
+        book.timestamp = self.timestamp
+        return book
+
+    def top(self, levels: int = API_ORDER_BOOK_LEVELS) -> Dict[str, Any]:
+        """ccxt-style dict with at most `levels` levels per side"""
+        bid_levels = min(levels, self.bid_count)
+        ask_levels = min(levels, self.ask_count)
+        return {
+            'symbol': self.symbol,
+            'bids': np.column_stack((self.bid_prices[:bid_levels], self.bid_sizes[:bid_levels])).tolist(),
+            'asks': np.column_stack((self.ask_prices[:ask_levels], self.ask_sizes[:ask_levels])).tolist(),
+            'timestamp': self.timestamp,
+            'nonce': self.nonce
+        }
+
+def trim_order_books(data: Optional[Dict], levels: int = API_ORDER_BOOK_LEVELS) -> Optional[Dict]:
+    """Copy of a result dict with every OrderBook replaced by its top-N view"""
+    if data is None:
+        return None
+    return {key: value.top(levels) if isinstance(value, OrderBook) else value
+            for key, value in data.items()}
@@ -0,0 +1,142 @@
+"""
+Parallel Parameter Sweep for the Bitcoin Arbitrage Backtester
+
+Loads market data once, places the price arrays in shared memory and fans a
+grid of BitcoinBacktestConfig overrides out across a process pool. Workers map
+the shared arrays read-only instead of receiving a pickled copy of the data,
+and results are yielded as soon as each backtest finishes.
+"""
+
+import os
+import logging
+from dataclasses import replace
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .bitcoin_backtest import BitcoinBacktester, BitcoinBacktestConfig
+
+logger = logging.getLogger(__name__)
+
+MARKET_FIELDS = ['kimchi_premium', 'upbit_close', 'binance_close', 'usd_krw_rate']
+
+SUMMARY_KEYS = [
+    'return_percentage', 'total_trades', 'total_return_krw', 'final_value_krw',
+    'initial_value_krw', 'open_positions'
+]
+
+class SharedMarketData:
+    """Market arrays held in shared memory for read-only use by sweep workers"""
+
+    def __init__(self, df: pd.DataFrame, fields: List[str] = MARKET_FIELDS,
+                 times: Optional[pd.DatetimeIndex] = None):
+        self.length = len(df)
+        self.fields = list(fields)
+        times = pd.DatetimeIndex(df.index if times is None else times)
+        self.tz = str(times.tz) if times.tz is not None else None
+
+        # Row 0 holds the timestamps (int64 ns), rows 1.. the float64 market fields
+        nbytes = max(1, (len(self.fields) + 1) * self.length * 8)
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        block = np.ndarray((len(self.fields) + 1, self.length), dtype=np.float64, buffer=self._shm.buf)
+        block[0].view(np.int64)[:] = times.as_unit('ns').asi8
+        for row, field in enumerate(self.fields, start=1):
+            block[row] = df[field].to_numpy(dtype=np.float64)
+        del block
+
+    @property
+    def descriptor(self) -> Dict[str, Any]:
+        """Picklable handle passed to workers"""
+        return {'name': self._shm.name, 'length': self.length, 'fields': self.fields, 'tz': self.tz}
+
+    @staticmethod
+    def attach(descriptor: Dict[str, Any]) -> Tuple[shared_memory.SharedMemory, pd.DatetimeIndex, Dict[str, np.ndarray]]:
+        """Map the shared block; the returned SharedMemory must be kept alive while the arrays are used"""
+        # Pool workers share the parent's resource tracker, so attaching does not
+        # register a second owner and the parent's unlink() stays authoritative
+        shm = shared_memory.SharedMemory(name=descriptor['name'])
+        fields = descriptor.get('fields', MARKET_FIELDS)
+        block = np.ndarray((len(fields) + 1, descriptor['length']), dtype=np.float64, buffer=shm.buf)
+        block.flags.writeable = False
+        times = pd.DatetimeIndex(block[0].view(np.int64).view('datetime64[ns]'))
+        if descriptor.get('tz'):
+            times = times.tz_localize('UTC').tz_convert(descriptor['tz'])
+        arrays = {field: block[row] for row, field in enumerate(fields, start=1)}
+        return shm, times, arrays
+
+    def close(self):
+        """Release and unlink the shared block"""
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Per-worker state populated by _init_worker
+_worker_state: Dict[str, Any] = {}
+
+def _init_worker(descriptor: Dict[str, Any], base_config: BitcoinBacktestConfig):
+    shm, times, arrays = SharedMarketData.attach(descriptor)
+    _worker_state['shm'] = shm
+    _worker_state['times'] = times
+    _worker_state['arrays'] = arrays
+    _worker_state['backtester'] = BitcoinBacktester(base_config)
+
+def _summarize(backtester: BitcoinBacktester, config: BitcoinBacktestConfig, times: pd.Index,
+               arrays: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    backtester.config = config
+    results = backtester.simulate_market_arrays(
+        times,
+        arrays['kimchi_premium'],
+        arrays['upbit_close'],
+        arrays['binance_close'],
+        arrays['usd_krw_rate'],
+        include_balance_history=False
+    )
+    return {key: results[key] for key in SUMMARY_KEYS}
+
+def _run_sweep_point(base_config: BitcoinBacktestConfig, params: Dict[str, Any]) -> Dict[str, Any]:
+    return _summarize(_worker_state['backtester'], replace(base_config, **params),
+                      _worker_state['times'], _worker_state['arrays'])
+
+def run_parallel_sweep(df: pd.DataFrame, param_grid: List[Dict[str, Any]],
+                       base_config: Optional[BitcoinBacktestConfig] = None,
+                       max_workers: Optional[int] = None) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+    """Backtest every parameter set in param_grid over df, yielding results as they finish
+
+    Each item in param_grid holds BitcoinBacktestConfig field overrides. Yields
+    (params, summary) pairs in completion order; summary is None if that run failed.
+    """
+    base_config = replace(base_config or BitcoinBacktestConfig(), use_vectorized_engine=True)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    if max_workers == 1:
+        # Run in this process (e.g. inside a walk-forward worker) without a pool or shared copy
+        backtester = BitcoinBacktester(base_config)
+        arrays = {field: df[field].to_numpy(dtype=np.float64) for field in MARKET_FIELDS}
+        for params in param_grid:
+            try:
+                yield params, _summarize(backtester, replace(base_config, **params), df.index, arrays)
+            except Exception as e:
+                logger.error(f"Sweep point {params} failed: {e}")
+                yield params, None
+        return
+
+    with SharedMarketData(df) as market_data:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(market_data.descriptor, base_config)) as executor:
+            futures = {
+                executor.submit(_run_sweep_point, base_config, params): params
+                for params in param_grid
+            }
+            for future in as_completed(futures):
+                params = futures[future]
+                try:
+                    yield params, future.result()
+                except Exception as e:
+                    logger.error(f"Sweep point {params} failed: {e}")
+                    yield params, None
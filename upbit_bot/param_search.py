@@ -0,0 +1,426 @@
+"""
+Pluggable Parameter Search
+
+Search strategies for backtest parameter optimization, all driven through the
+same interface: a list of ParamSpec dimensions and an evaluator that backtests
+a batch of parameter points on a given fraction of the history (the fidelity)
+and returns one summary dict per point.
+
+- grid: every combination of each dimension's grid values
+- random: uniformly sampled points
+- halving: successive halving, scoring many random candidates on short, recent
+  windows of the data and promoting only the best to longer runs
+- tpe: Tree-structured Parzen Estimator, a Bayesian search that samples where a
+  density fitted to the best trials is high relative to the rest
+
+A dimension's high is excluded by every strategy, as in np.arange and
+--param-ranges, and sampling strategies only draw values a grid would contain.
+
+Evaluators for EnhancedUpbitBacktest and BitcoinBacktester are provided. They
+batch each request so points run in parallel (or in one batched pass).
+"""
+
+import math
+import logging
+import itertools
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Largest float below 1, so sampled unit values never reach an excluded upper bound
+_BELOW_ONE = float(np.nextafter(1.0, 0.0))
+
+# evaluate(points, fidelity) -> one summary per point (None if that run failed)
+Evaluator = Callable[[List[Dict[str, Any]], float], List[Optional[Dict[str, Any]]]]
+
+@dataclass
+class ParamSpec:
+    """One search dimension: a numeric range or an explicit list of values"""
+    name: str
+    low: float = 0.0
+    high: float = 1.0                   # Exclusive upper bound, as in np.arange and --param-ranges
+    step: Optional[float] = None        # Grid spacing; sampled values are always grid values
+    decimals: Optional[int] = None      # Round values to this many decimals
+    log: bool = False                   # Sample on a log scale (requires low > 0)
+    values: Optional[List[Any]] = None  # Explicit choices, used instead of the range
+
+    def _round(self, value: float) -> float:
+        return round(value, self.decimals) if self.decimals is not None else value
+
+    def grid(self) -> List[Any]:
+        """Values used by grid search"""
+        if self.values is not None:
+            return list(self.values)
+        if self.step is None:
+            raise ValueError(f"Parameter '{self.name}' needs a step or values for grid search")
+        values = [self._round(value) for value in np.arange(self.low, self.high, self.step)]
+        # Float steps can carry arange (or the rounding) onto high itself
+        return [value for value in values if value < self.high]
+
+    def _grid_index(self, grid: List[Any], value: Any) -> int:
+        if value in grid:
+            return grid.index(value)
+        return int(np.argmin(np.abs(np.array(grid, dtype=np.float64) - value)))
+
+    def from_unit(self, u: float) -> Any:
+        """Map u in [0, 1] onto the dimension
+
+        Sampled values are the ones grid search would try: one of the values,
+        a grid value when a step is set, or else a number in [low, high).
+        """
+        u = min(max(u, 0.0), _BELOW_ONE)
+        if self.values is not None:
+            return self.values[int(u * len(self.values))]
+        if self.step is not None and not self.log:
+            grid = self.grid()
+            return grid[int(u * len(grid))]
+        if self.log:
+            value = math.exp(math.log(self.low) + u * (math.log(self.high) - math.log(self.low)))
+        else:
+            value = self.low + u * (self.high - self.low)
+        if self.step is not None:
+            grid = self.grid()  # Log-scaled sample of a grid: the nearest grid value
+            return grid[self._grid_index(grid, value)]
+        value = self._round(float(min(value, np.nextafter(self.high, self.low))))
+        if value >= self.high:
+            value = self._round(self.high - 10.0 ** -self.decimals)  # Rounding reached high
+        return value
+
+    def to_unit(self, value: Any) -> float:
+        """Inverse of from_unit (the centre of the value's cell for discrete values)"""
+        if self.values is not None:
+            return (self.values.index(value) + 0.5) / len(self.values)
+        if self.step is not None and not self.log:
+            grid = self.grid()
+            return (self._grid_index(grid, value) + 0.5) / len(grid)
+        if self.high == self.low:
+            return 0.0
+        if self.log:
+            return (math.log(value) - math.log(self.low)) / (math.log(self.high) - math.log(self.low))
+        return (value - self.low) / (self.high - self.low)
+
+@dataclass
+class Trial:
+    """One evaluated parameter point"""
+    params: Dict[str, Any]
+    fidelity: float                     # Fraction of the history the backtest ran on
+    summary: Optional[Dict[str, Any]]   # None if the backtest failed
+    score: Optional[float]              # Objective value; None if missing or not finite
+
+@dataclass
+class SearchResult:
+    """Outcome of a parameter search"""
+    best_params: Dict[str, Any]
+    best_score: float
+    best_summary: Optional[Dict[str, Any]]
+    trials: List[Trial] = field(default_factory=list)
+
+    @property
+    def full_trials(self) -> List[Trial]:
+        """Trials evaluated on the whole history"""
+        return [trial for trial in self.trials if trial.fidelity >= 1.0]
+
+def _point_key(params: Dict[str, Any]) -> Tuple:
+    return tuple(sorted((name, float(value) if isinstance(value, (int, float)) else value)
+                        for name, value in params.items()))
+
+class SearchStrategy:
+    """Base class: evaluates points in batches and tracks the best full-fidelity trial"""
+    name = 'base'
+
+    def __init__(self, metric: str = 'return_percentage', seed: Optional[int] = None,
+                 batch_size: Optional[int] = None,
+                 constraint: Optional[Callable[[Dict[str, Any]], bool]] = None):
+        self.metric = metric                # Summary key to maximize
+        self.seed = seed
+        self.batch_size = batch_size        # Points per evaluator call (None: as many as available)
+        self.constraint = constraint        # Points for which this returns False are skipped
+        self.rng = np.random.default_rng(seed)
+
+    def _score(self, summary: Optional[Dict[str, Any]]) -> Optional[float]:
+        if summary is None:
+            return None
+        value = summary.get(self.metric)
+        if value is None or not math.isfinite(value):
+            return None
+        return float(value)
+
+    def _allowed(self, params: Dict[str, Any]) -> bool:
+        return self.constraint is None or self.constraint(params)
+
+    def _sample(self, space: List[ParamSpec]) -> Dict[str, Any]:
+        return {spec.name: spec.from_unit(self.rng.random()) for spec in space}
+
+    def _sample_unique(self, space: List[ParamSpec], count: int, seen: set) -> List[Dict[str, Any]]:
+        """Up to count new random points that satisfy the constraint"""
+        points = []
+        attempts = 0
+        while len(points) < count and attempts < count * 50:
+            attempts += 1
+            params = self._sample(space)
+            key = _point_key(params)
+            if key in seen or not self._allowed(params):
+                continue
+            seen.add(key)
+            points.append(params)
+        return points
+
+    def _evaluate(self, evaluate: Evaluator, points: List[Dict[str, Any]], fidelity: float,
+                  trials: List[Trial], progress: Optional[Callable[[int, int], None]],
+                  total: int) -> List[Trial]:
+        batch_size = self.batch_size or len(points) or 1
+        new_trials = []
+        for start in range(0, len(points), batch_size):
+            batch = points[start:start + batch_size]
+            summaries = evaluate(batch, fidelity)
+            for params, summary in zip(batch, summaries):
+                trial = Trial(params, fidelity, summary, self._score(summary))
+                trials.append(trial)
+                new_trials.append(trial)
+            if progress:
+                progress(len(trials), total)
+        return new_trials
+
+    def _result(self, trials: List[Trial]) -> SearchResult:
+        best = None
+        for trial in trials:
+            if trial.fidelity >= 1.0 and trial.score is not None and (best is None or trial.score > best.score):
+                best = trial
+        if best is None:
+            return SearchResult({}, float('-inf'), None, trials)
+        return SearchResult(best.params, best.score, best.summary, trials)
+
+    def run(self, space: List[ParamSpec], evaluate: Evaluator,
+            progress: Optional[Callable[[int, int], None]] = None) -> SearchResult:
+        """Search the space; progress(done, total) is called after each evaluated batch"""
+        raise NotImplementedError
+
+class GridSearch(SearchStrategy):
+    """Every combination of the dimensions' grid values"""
+    name = 'grid'
+
+    def run(self, space: List[ParamSpec], evaluate: Evaluator,
+            progress: Optional[Callable[[int, int], None]] = None) -> SearchResult:
+        names = [spec.name for spec in space]
+        points = [dict(zip(names, values)) for values in itertools.product(*(spec.grid() for spec in space))]
+        points = [params for params in points if self._allowed(params)]
+        trials: List[Trial] = []
+        self._evaluate(evaluate, points, 1.0, trials, progress, len(points))
+        return self._result(trials)
+
+class RandomSearch(SearchStrategy):
+    """Uniformly sampled points"""
+    name = 'random'
+
+    def __init__(self, n_trials: int = 50, **kwargs):
+        super().__init__(**kwargs)
+        self.n_trials = n_trials
+
+    def run(self, space: List[ParamSpec], evaluate: Evaluator,
+            progress: Optional[Callable[[int, int], None]] = None) -> SearchResult:
+        points = self._sample_unique(space, self.n_trials, set())
+        trials: List[Trial] = []
+        self._evaluate(evaluate, points, 1.0, trials, progress, len(points))
+        return self._result(trials)
+
+class SuccessiveHalving(SearchStrategy):
+    """Random candidates scored on short windows; the best 1/eta move on to longer ones"""
+    name = 'halving'
+
+    def __init__(self, n_candidates: int = 81, eta: int = 3, min_fidelity: float = 1 / 9, **kwargs):
+        super().__init__(**kwargs)
+        self.n_candidates = n_candidates
+        self.eta = eta                      # Keep 1/eta of the candidates at each rung
+        self.min_fidelity = min_fidelity    # Fraction of the history used by the first rung
+
+    def _rungs(self) -> List[float]:
+        fidelities = []
+        fidelity = self.min_fidelity
+        while fidelity < 1.0:
+            fidelities.append(fidelity)
+            fidelity *= self.eta
+        return fidelities + [1.0]
+
+    def run(self, space: List[ParamSpec], evaluate: Evaluator,
+            progress: Optional[Callable[[int, int], None]] = None) -> SearchResult:
+        candidates = self._sample_unique(space, self.n_candidates, set())
+        rungs = self._rungs()
+
+        # Upper bound on the number of evaluations, for progress reporting
+        total, size = 0, len(candidates)
+        for _ in rungs:
+            total += size
+            size = max(1, math.ceil(size / self.eta))
+
+        trials: List[Trial] = []
+        for rung, fidelity in enumerate(rungs):
+            rung_trials = self._evaluate(evaluate, candidates, fidelity, trials, progress, total)
+            if fidelity >= 1.0:
+                break
+            scored = sorted((trial for trial in rung_trials if trial.score is not None),
+                            key=lambda trial: trial.score, reverse=True)
+            keep = max(1, math.ceil(len(candidates) / self.eta))
+            candidates = [trial.params for trial in scored[:keep]]
+            logger.info(f"Successive halving rung {rung} (fidelity {fidelity:.2f}): "
+                        f"{len(candidates)} of {len(rung_trials)} promoted")
+            if not candidates:
+                break
+        return self._result(trials)
+
+class TPESearch(SearchStrategy):
+    """Tree-structured Parzen Estimator over the unit cube of the dimensions"""
+    name = 'tpe'
+
+    def __init__(self, n_trials: int = 60, n_startup: int = 15, gamma: float = 0.25,
+                 n_ei_candidates: int = 64, batch_size: Optional[int] = 8, **kwargs):
+        super().__init__(batch_size=batch_size, **kwargs)
+        self.n_trials = n_trials
+        self.n_startup = n_startup              # Random trials before the model is used
+        self.gamma = gamma                      # Fraction of trials treated as "good"
+        self.n_ei_candidates = n_ei_candidates  # Draws from the good density per proposal
+
+    @staticmethod
+    def _bandwidth(samples: np.ndarray) -> np.ndarray:
+        count, dims = samples.shape
+        std = samples.std(axis=0) if count > 1 else np.full(dims, 0.25)
+        return np.clip(std * count ** (-1.0 / (dims + 4)), 0.02, 0.5)
+
+    @staticmethod
+    def _log_density(x: np.ndarray, samples: np.ndarray, bandwidth: np.ndarray) -> np.ndarray:
+        """Log density of each row of x under a Gaussian mixture on samples plus a uniform prior"""
+        # (candidates, components, dims) -> per-component log density
+        z = (x[:, None, :] - samples[None, :, :]) / bandwidth
+        log_components = (-0.5 * z ** 2 - np.log(bandwidth * math.sqrt(2 * math.pi))).sum(axis=2)
+        log_components = np.concatenate((log_components, np.zeros((len(x), 1))), axis=1)  # Uniform prior
+        peak = log_components.max(axis=1, keepdims=True)
+        return (peak + np.log(np.exp(log_components - peak).sum(axis=1, keepdims=True)))[:, 0] - math.log(len(samples) + 1)
+
+    def _propose(self, space: List[ParamSpec], trials: List[Trial], seen: set) -> Optional[Dict[str, Any]]:
+        scored = [trial for trial in trials if trial.score is not None]
+        units = np.array([[spec.to_unit(trial.params[spec.name]) for spec in space] for trial in scored])
+        order = np.argsort([-trial.score for trial in scored], kind='stable')
+        n_good = max(1, int(math.ceil(self.gamma * len(scored))))
+        good, bad = units[order[:n_good]], units[order[n_good:]]
+        if len(bad) == 0:
+            return None
+        good_bw, bad_bw = self._bandwidth(good), self._bandwidth(bad)
+
+        # Sample from the good density (a component or the uniform prior), keep the best l(x)/g(x)
+        components = self.rng.integers(0, len(good) + 1, self.n_ei_candidates)
+        candidates = self.rng.random((self.n_ei_candidates, len(space)))
+        from_good = components < len(good)
+        candidates[from_good] = np.clip(
+            good[components[from_good]] + self.rng.normal(size=(from_good.sum(), len(space))) * good_bw, 0.0, 1.0)
+        ratio = self._log_density(candidates, good, good_bw) - self._log_density(candidates, bad, bad_bw)
+
+        for index in np.argsort(-ratio):
+            params = {spec.name: spec.from_unit(candidates[index, d]) for d, spec in enumerate(space)}
+            key = _point_key(params)
+            if key not in seen and self._allowed(params):
+                seen.add(key)
+                return params
+        return None
+
+    def run(self, space: List[ParamSpec], evaluate: Evaluator,
+            progress: Optional[Callable[[int, int], None]] = None) -> SearchResult:
+        trials: List[Trial] = []
+        seen: set = set()
+        startup = self._sample_unique(space, min(self.n_startup, self.n_trials), seen)
+        self._evaluate(evaluate, startup, 1.0, trials, progress, self.n_trials)
+
+        while len(trials) < self.n_trials:
+            count = min(self.batch_size or 1, self.n_trials - len(trials))
+            points = []
+            for _ in range(count):
+                params = self._propose(space, trials, seen)
+                if params is None:
+                    points.extend(self._sample_unique(space, 1, seen))
+                else:
+                    points.append(params)
+            if not points:
+                break  # Space exhausted
+            self._evaluate(evaluate, points, 1.0, trials, progress, self.n_trials)
+        return self._result(trials)
+
+SEARCH_STRATEGIES = {
+    GridSearch.name: GridSearch,
+    RandomSearch.name: RandomSearch,
+    SuccessiveHalving.name: SuccessiveHalving,
+    TPESearch.name: TPESearch,
+}
+
+def get_search_strategy(name: str, **kwargs) -> SearchStrategy:
+    """Create a search strategy by name ('grid', 'random', 'halving' or 'tpe')"""
+    if name not in SEARCH_STRATEGIES:
+        raise ValueError(f"Unknown search strategy '{name}' (choose from {', '.join(SEARCH_STRATEGIES)})")
+    return SEARCH_STRATEGIES[name](**kwargs)
+
+def recent_window(df: pd.DataFrame, fidelity: float, min_rows: int = 2) -> pd.DataFrame:
+    """The most recent `fidelity` fraction of the rows (all of them at fidelity 1)"""
+    if fidelity >= 1.0:
+        return df
+    rows = min(len(df), max(min_rows, int(math.ceil(len(df) * fidelity))))
+    return df.iloc[len(df) - rows:]
+
+class UpbitEvaluator:
+    """Evaluator running EnhancedUpbitBacktest sweeps of BacktestConfig overrides
+
+    Every batch runs on one BacktestSweepPool, so the worker processes and the
+    shared-memory copy of the data are set up once per search. Use it in a with
+    block (or call close()) to release them when the search is done.
+    """
+
+    def __init__(self, historical_data: pd.DataFrame, base_config, cache_dir: Optional[str] = None,
+                 max_workers: Optional[int] = None):
+        from .backtest_sweep import BacktestSweepPool
+        self.base_config = base_config
+        self.pool = BacktestSweepPool(historical_data, cache_dir, max_workers)
+
+    def __call__(self, points: List[Dict[str, Any]], fidelity: float) -> List[Optional[Dict[str, Any]]]:
+        configs = [replace(self.base_config, **params) for params in points]
+        return self.pool.run(configs, rows=len(recent_window(self.pool.data, fidelity)))
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def __enter__(self) -> 'UpbitEvaluator':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def upbit_evaluator(historical_data: pd.DataFrame, base_config, cache_dir: Optional[str] = None,
+                    max_workers: Optional[int] = None) -> UpbitEvaluator:
+    """Evaluator running EnhancedUpbitBacktest sweeps of BacktestConfig overrides (see UpbitEvaluator)"""
+    return UpbitEvaluator(historical_data, base_config, cache_dir, max_workers)
+
+def bitcoin_evaluator(market_data: pd.DataFrame, base_config,
+                      max_workers: Optional[int] = None) -> Evaluator:
+    """Evaluator running BitcoinBacktester over BitcoinBacktestConfig overrides
+
+    Points that only vary batchable fields are simulated together in one pass
+    (batch_backtest); anything else goes through the process-pool sweep.
+    """
+    from .batch_backtest import BATCH_FIELDS, simulate_frame_batch
+    from .parallel_sweep import run_parallel_sweep
+
+    def evaluate(points: List[Dict[str, Any]], fidelity: float) -> List[Optional[Dict[str, Any]]]:
+        window = recent_window(market_data, fidelity)
+        if all(name in BATCH_FIELDS for params in points for name in params):
+            try:
+                return simulate_frame_batch(window, [replace(base_config, **params) for params in points])
+            except Exception as e:
+                logger.error(f"Batched evaluation failed: {e}")
+                return [None] * len(points)
+
+        # Results arrive in completion order with the same dict objects that were submitted
+        grid = [dict(params) for params in points]
+        positions = {id(params): index for index, params in enumerate(grid)}
+        summaries: List[Optional[Dict[str, Any]]] = [None] * len(points)
+        for params, summary in run_parallel_sweep(window, grid, base_config, max_workers):
+            summaries[positions[id(params)]] = summary
+        return summaries
+    return evaluate
@@ -0,0 +1,176 @@
+"""
+Streaming Performance Metrics
+
+Accumulates backtest and live-session statistics one bar and one trade at a
+time: running equity peak and drawdown, mean and variance of period returns
+(Welford, merged block-wise for array updates), and win/loss counts and sums.
+Every metric can be read in O(1) at any point, mid-run included, so nothing
+has to re-walk the equity curve or the trade list afterwards.
+"""
+
+import math
+import logging
+from typing import Any, Dict, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class PerformanceAccumulator:
+    """Online peak/drawdown, return moments and win/loss statistics"""
+
+    def __init__(self, periods_per_year: int = 252):
+        self.periods_per_year = periods_per_year  # Used to annualize the Sharpe ratio
+        self.reset()
+
+    def reset(self) -> None:
+        # Equity
+        self.bar_count = 0
+        self.last_equity: Optional[float] = None
+        self.peak: Optional[float] = None
+        self.drawdown = 0.0          # Current drawdown (%)
+        self.max_drawdown = 0.0      # Largest drawdown seen (%)
+        # Period returns
+        self.return_count = 0
+        self.return_mean = 0.0
+        self.return_m2 = 0.0         # Sum of squared deviations from the mean
+        # Trades
+        self.trade_count = 0
+        self.winning_trades = 0
+        self.losing_trades = 0
+        self.total_wins = 0.0
+        self.total_losses = 0.0
+
+    def record_bar(self, equity: float, period_return: Optional[float] = None) -> float:
+        """Add one equity point (and its return, if known); returns the drawdown at this bar"""
+        equity = float(equity)
+        if period_return is None and self.last_equity:
+            period_return = (equity - self.last_equity) / self.last_equity * 100
+        if period_return is not None:
+            self._add_return(float(period_return))
+
+        # A NaN first value pins the peak (value > NaN is never true), as the original loop did
+        if self.peak is None or equity > self.peak:
+            self.peak = equity
+        drawdown = (self.peak - equity) / self.peak * 100 if self.peak > 0 else 0.0
+        self.drawdown = drawdown
+        if drawdown > self.max_drawdown:
+            self.max_drawdown = drawdown
+
+        self.last_equity = equity
+        self.bar_count += 1
+        return drawdown
+
+    def record_bars(self, equity: np.ndarray, period_returns: np.ndarray) -> np.ndarray:
+        """Add a block of equity points and their returns; returns their drawdowns"""
+        equity = np.asarray(equity, dtype=np.float64)
+        if len(equity) == 0:
+            return equity.copy()
+        self._add_returns(np.asarray(period_returns, dtype=np.float64))
+
+        if self.peak is None:
+            self.peak = float(equity[0])
+        if math.isnan(self.peak):
+            peaks = np.full(len(equity), np.nan)
+        else:
+            # fmax skips NaN values, which never raise the peak
+            peaks = np.fmax.accumulate(np.concatenate(([self.peak], equity)))[1:]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            drawdowns = np.where(peaks > 0, (peaks - equity) / peaks * 100, 0.0)
+
+        valid = drawdowns[~np.isnan(drawdowns)]
+        if len(valid):
+            self.max_drawdown = max(self.max_drawdown, float(valid.max()))
+        self.peak = float(peaks[-1])
+        self.drawdown = float(drawdowns[-1])
+        self.last_equity = float(equity[-1])
+        self.bar_count += len(equity)
+        return drawdowns
+
+    def _add_return(self, value: float) -> None:
+        self.return_count += 1
+        delta = value - self.return_mean
+        self.return_mean += delta / self.return_count
+        self.return_m2 += delta * (value - self.return_mean)
+
+    def _add_returns(self, values: np.ndarray) -> None:
+        count = len(values)
+        if count == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.return_count + count
+        delta = mean - self.return_mean
+        self.return_m2 += m2 + delta * delta * self.return_count * count / total
+        self.return_mean += delta * count / total
+        self.return_count = total
+
+    def record_trade(self, profit_loss: float) -> None:
+        """Add one closed trade's profit or loss"""
+        self.trade_count += 1
+        if profit_loss > 0:
+            self.winning_trades += 1
+            self.total_wins += profit_loss
+        elif profit_loss < 0:
+            self.losing_trades += 1
+            self.total_losses += abs(profit_loss)
+
+    def record_trades(self, profit_loss: np.ndarray) -> None:
+        """Add a block of trades' profit or loss, in trade order"""
+        profit_loss = np.asarray(profit_loss, dtype=np.float64)
+        wins = profit_loss[profit_loss > 0]
+        losses = profit_loss[profit_loss < 0]
+        self.trade_count += len(profit_loss)
+        self.winning_trades += len(wins)
+        self.losing_trades += len(losses)
+        # Summed one by one so the totals match record_trade exactly
+        self.total_wins = sum(wins.tolist(), self.total_wins)
+        self.total_losses = sum(np.abs(losses).tolist(), self.total_losses)
+
+    @property
+    def return_std(self) -> float:
+        """Population standard deviation of period returns"""
+        return math.sqrt(self.return_m2 / self.return_count) if self.return_count else 0.0
+
+    @property
+    def sharpe_ratio(self) -> float:
+        """Annualized Sharpe ratio of period returns"""
+        if not self.return_count:
+            return 0.0
+        std = self.return_std
+        if std == 0:
+            return 0.0
+        return (self.return_mean / std) * math.sqrt(self.periods_per_year)
+
+    @property
+    def win_rate(self) -> float:
+        return (self.winning_trades / self.trade_count) * 100 if self.trade_count else 0.0
+
+    @property
+    def average_win(self) -> float:
+        return self.total_wins / self.winning_trades if self.winning_trades > 0 else 0.0
+
+    @property
+    def average_loss(self) -> float:
+        return self.total_losses / self.losing_trades if self.losing_trades > 0 else 0.0
+
+    @property
+    def profit_factor(self) -> float:
+        return self.total_wins / self.total_losses if self.total_losses > 0 else float('inf')
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current metrics as a dict"""
+        return {
+            'bars': self.bar_count,
+            'equity': self.last_equity,
+            'peak_equity': self.peak,
+            'drawdown': self.drawdown,
+            'max_drawdown': self.max_drawdown,
+            'sharpe_ratio': self.sharpe_ratio,
+            'total_trades': self.trade_count,
+            'winning_trades': self.winning_trades,
+            'losing_trades': self.losing_trades,
+            'win_rate': self.win_rate,
+            'profit_factor': self.profit_factor if self.total_losses > 0 else None,  # None: no losses yet
+            'average_win': self.average_win,
+            'average_loss': self.average_loss
+        }
@@ -0,0 +1,73 @@
+"""
+Exchange Rate Limiting
+
+Token-bucket rate limiters shared by every caller in the process, one per
+exchange, sized to the exchanges' documented public REST limits.
+"""
+
+import time
+import threading
+import logging
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (requests per second, burst size) for public market-data endpoints
+EXCHANGE_RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    'binance': (10.0, 10.0),  # 1200 request weight/min, klines cost 2 weight at limit=1000
+    'upbit': (8.0, 8.0),      # Quotation API allows 10 req/s per IP; keep headroom
+}
+
+DEFAULT_RATE_LIMIT: Tuple[float, float] = (5.0, 5.0)
+
+class TokenBucket:
+    """Thread-safe token bucket: refills at `rate` tokens/s up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available without waiting"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until tokens are available; returns the time spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait_time = (tokens - self._tokens) / self.rate
+            time.sleep(wait_time)
+            waited += wait_time
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(exchange: str) -> TokenBucket:
+    """Return the process-wide token bucket for an exchange"""
+    with _limiters_lock:
+        limiter = _limiters.get(exchange)
+        if limiter is None:
+            rate, capacity = EXCHANGE_RATE_LIMITS.get(exchange, DEFAULT_RATE_LIMIT)
+            limiter = TokenBucket(rate, capacity)
+            _limiters[exchange] = limiter
+        return limiter
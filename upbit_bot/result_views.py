@@ -0,0 +1,273 @@
+"""
+Views over Large Backtest Results
+
+A Bitcoin backtest on minute data returns hundreds of thousands of
+balance_history rows and thousands of trades. Sending them in one message
+freezes the browser. This module lets the job store keep such lists of
+records ("tables") as column arrays, and serve them in pieces:
+
+- paginate_table: a page of rows after an opaque cursor.
+- downsample: a curve reduced to about one point per pixel. 'lttb'
+  (Largest-Triangle-Three-Buckets) keeps the visual shape, and 'minmax'
+  keeps each bucket's extremes, so spikes and drawdowns survive.
+
+The column arrays are also the binary download format (.npz), so the full
+resolution data stays available. Conversion is exact or not done at all:
+tables of up to INLINE_ROWS rows, and tables holding nested or mixed values,
+stay as records. Keys missing from some rows are kept as masks.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DOWNSAMPLE_METHODS = ['lttb', 'minmax']
+
+# Tables with more rows than this are left out of inline results and fetched by page
+INLINE_ROWS = 1000
+
+Columns = Dict[str, np.ndarray]
+
+def is_table(value: Any) -> bool:
+    """True for a non-empty list of dicts"""
+    return isinstance(value, list) and bool(value) and all(isinstance(row, dict) for row in value)
+
+def _is_naive_time(value: Any) -> bool:
+    return isinstance(value, (datetime, pd.Timestamp)) and value.tzinfo is None
+
+def _column_kind(values: List[Any]) -> Optional[str]:
+    """How a column's present values can be stored exactly, or None if they cannot
+
+    Present values must all be bools, all ints, all strs, all naive datetimes,
+    or numbers with None (stored as NaN floats). Anything else, such as nested
+    dicts or lists, mixed kinds, or time zones, would not round-trip.
+    """
+    if all(isinstance(value, (bool, np.bool_)) for value in values):
+        return 'bool'
+    if all(isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_)) for value in values):
+        return 'int'
+    if all(value is None or (isinstance(value, (int, float, np.integer, np.floating))
+                             and not isinstance(value, (bool, np.bool_))) for value in values):
+        return 'float'
+    if all(isinstance(value, str) for value in values):
+        return 'str'
+    if all(_is_naive_time(value) for value in values):
+        return 'time'
+    return None
+
+def _column_array(values: List[Any], kind: str) -> np.ndarray:
+    if kind == 'bool':
+        return np.array(values, dtype=bool)
+    if kind == 'int':
+        return np.array(values, dtype=np.int64)
+    if kind == 'float':
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    if kind == 'str':
+        return np.array(values, dtype=str)
+    return pd.DatetimeIndex(values).to_numpy(dtype='datetime64[ns]')
+
+def _column_names(records: List[Dict[str, Any]]) -> List[str]:
+    return list(dict.fromkeys(name for row in records for name in row))
+
+def is_columnar(records: List[Dict[str, Any]]) -> bool:
+    """Whether records_to_columns can store these rows exactly"""
+    return all(_column_kind([row[name] for row in records if name in row]) is not None
+               for name in _column_names(records))
+
+def records_to_columns(records: List[Dict[str, Any]]) -> Optional[Columns]:
+    """Column arrays (float, int, bool, datetime64 or str) from a list of row dicts
+
+    A column missing from some rows becomes a masked array, masked where the
+    key is absent. Returns None if any column cannot be stored exactly (see
+    _column_array); such tables are kept as records.
+    """
+    columns: Columns = {}
+    for name in _column_names(records):
+        present = np.fromiter((name in row for row in records), dtype=bool, count=len(records))
+        values = [row[name] for row in records if name in row]
+        kind = _column_kind(values)
+        if kind is None:
+            return None
+        array = _column_array(values, kind)
+        if not present.all():
+            full = np.zeros(len(records), dtype=array.dtype)
+            full[present] = array
+            array = np.ma.MaskedArray(full, mask=~present)
+        columns[name] = array
+    return columns
+
+def _iso_times(array: np.ndarray) -> List[Optional[str]]:
+    # Same text as datetime/Timestamp.isoformat(): fractions only when non-zero
+    text = np.datetime_as_string(array, unit='s').astype(object)
+    nanos = array.astype('datetime64[ns]').astype(np.int64) % 1_000_000_000
+    for index in np.flatnonzero(nanos):
+        nano = int(nanos[index])
+        text[index] += f'.{nano // 1000:06d}' if nano % 1000 == 0 else f'.{nano:09d}'
+    text[np.isnat(array)] = None
+    return text.tolist()
+
+def _plain_values(array: np.ndarray) -> List[Any]:
+    if np.issubdtype(array.dtype, np.datetime64):
+        return _iso_times(array)
+    if np.issubdtype(array.dtype, np.floating):
+        missing = np.isnan(array)
+        if missing.any():
+            # NaN is not valid JSON; missing values go out as null
+            values = array.astype(object)
+            values[missing] = None
+            return values.tolist()
+    return array.tolist()
+
+_ABSENT = object()
+
+def _column_values(array: np.ndarray) -> List[Any]:
+    if not isinstance(array, np.ma.MaskedArray):
+        return _plain_values(array)
+    values = _plain_values(array.data)
+    for index in np.flatnonzero(np.ma.getmaskarray(array)):
+        values[index] = _ABSENT
+    return values
+
+def columns_to_records(columns: Columns, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Rows [start, stop) as JSON-ready dicts (times as ISO strings); masked cells are left out"""
+    names = list(columns)
+    values = [_column_values(columns[name][start:stop]) for name in names]
+    if not any(isinstance(columns[name], np.ma.MaskedArray) for name in names):
+        return [dict(zip(names, row)) for row in zip(*values)]
+    return [{name: value for name, value in zip(names, row) if value is not _ABSENT} for row in zip(*values)]
+
+def table_length(columns: Columns) -> int:
+    return len(next(iter(columns.values()))) if columns else 0
+
+def paginate_table(columns: Columns, cursor: Optional[str] = None, limit: int = 500) -> Dict[str, Any]:
+    """One page of rows; pass next_cursor back to get the following page (None at the end)"""
+    try:
+        start = int(cursor) if cursor else 0
+    except ValueError:
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    total = table_length(columns)
+    start = max(0, min(start, total))
+    stop = min(total, start + max(1, limit))
+    return {
+        'rows': columns_to_records(columns, start, stop),
+        'next_cursor': str(stop) if stop < total else None,
+        'total': total
+    }
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # First and last points are fixed; the rest are split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # The next bucket's average point stands in for the point not chosen yet
+        next_start = stop
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        average_x = x[next_start:next_stop].mean() if next_stop > next_start else x[-1]
+        average_y = y[next_start:next_stop].mean() if next_stop > next_start else y[-1]
+        areas = np.abs((x[previous] - average_x) * (y[start:stop] - y[previous])
+                       - (x[previous] - x[start:stop]) * (average_y - y[previous]))
+        if np.all(np.isnan(areas)):
+            chosen = start
+        else:
+            chosen = start + int(np.nanargmax(areas))
+        selected[bucket + 1] = chosen
+        previous = chosen
+    return selected
+
+def minmax_indices(y: np.ndarray, buckets: int) -> np.ndarray:
+    """Indices of each bucket's minimum and maximum, in order (at most 2 per bucket)"""
+    n = len(y)
+    if buckets * 2 >= n or buckets < 1:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    selected = []
+    for start, stop in zip(edges[:-1], edges[1:]):
+        chunk = y[start:stop]
+        if stop <= start or np.all(np.isnan(chunk)):
+            continue
+        low, high = start + int(np.nanargmin(chunk)), start + int(np.nanargmax(chunk))
+        selected.extend(sorted({low, high}))
+    return np.array(selected, dtype=np.int64)
+
+def downsample(columns: Columns, names: List[str], width: int, method: str = 'lttb',
+               x_name: Optional[str] = None) -> Dict[str, Any]:
+    """Each named column reduced for a chart width pixels wide
+
+    x values come from x_name (times as ISO strings) or are row numbers. Every
+    series gets its own x values, because each keeps different points.
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unknown downsampling method '{method}'; choose from {DOWNSAMPLE_METHODS}")
+    missing = [name for name in names + ([x_name] if x_name else []) if name not in columns]
+    if missing:
+        raise KeyError(f"Unknown column(s): {', '.join(missing)}")
+    total = table_length(columns)
+    if x_name:
+        x_values = columns[x_name]
+        if isinstance(x_values, np.ma.MaskedArray):
+            raise ValueError(f"Column '{x_name}' is missing from some rows and cannot be the x axis")
+        x_numeric = x_values.astype('datetime64[ns]').astype(np.int64) \
+            if np.issubdtype(x_values.dtype, np.datetime64) else x_values.astype(np.float64)
+    else:
+        x_values = x_numeric = np.arange(total)
+
+    series = {}
+    for name in names:
+        # Rows without the column are gaps (NaN), like missing values
+        y = np.ma.filled(columns[name].astype(np.float64), np.nan)
+        if method == 'lttb':
+            indices = lttb_indices(x_numeric, y, width)
+        else:
+            indices = minmax_indices(y, max(1, width // 2))
+        series[name] = {'x': _plain_values(x_values[indices]), 'y': _plain_values(y[indices])}
+    return {'method': method, 'width': width, 'total_points': total, 'series': series}
+
+def split_tables(result: Any, min_rows: int = INLINE_ROWS) -> Tuple[Any, Dict[str, Columns]]:
+    """Separate a result dict's large tables (as columns) from the rest of its fields
+
+    Only tables longer than min_rows that records_to_columns can store exactly
+    are split out; everything else stays in the returned dict unchanged.
+    """
+    if not isinstance(result, dict):
+        return result, {}
+    inline, tables = {}, {}
+    for key, value in result.items():
+        columns = records_to_columns(value) if is_table(value) and len(value) > min_rows else None
+        if columns is None:
+            inline[key] = value
+        else:
+            tables[key] = columns
+    return inline, tables
+
+def table_stub(rows: int, columns: List[str]) -> Dict[str, Any]:
+    """Placeholder for a table too large to inline"""
+    return {'rows': rows, 'columns': columns, 'truncated': True}
+
+def inline_view(result: Any, max_rows: Optional[int] = INLINE_ROWS) -> Any:
+    """result with tables longer than max_rows replaced by table_stub (None keeps everything)
+
+    Tables that split_tables would keep as records (see is_columnar) are never
+    stubbed, since they can only be read whole.
+    """
+    if not isinstance(result, dict) or max_rows is None:
+        return result
+    view = {}
+    for key, value in result.items():
+        if is_table(value) and len(value) > max_rows and is_columnar(value):
+            value = table_stub(len(value), _column_names(value))
+        view[key] = value
+    return view
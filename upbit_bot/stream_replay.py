@@ -0,0 +1,130 @@
+"""
+Local WebSocket Replay Server
+
+Serves recorded exchange messages over a local WebSocket endpoint so the
+streaming market data feed can be exercised without touching the exchanges.
+Frames are keyed by request path ('/stream' for Binance combined streams,
+'/websocket/v1' for Upbit). Each connection replays its path's frames in
+order. Setting drop_after closes the connection after that many frames to
+exercise reconnects. Plain HTTP GETs are answered from http_responses (keyed
+by path), which stands in for REST endpoints such as Binance depth snapshots.
+
+Example:
+    server = ReplayServer({'/stream': load_frames('binance.jsonl')})
+    server.start()
+    stream = MarketDataStream(MarketStreamConfig(binance_url=server.url, upbit_symbols=[]))
+"""
+
+import json
+import asyncio
+import threading
+import logging
+from http import HTTPStatus
+from typing import Dict, List, Optional, Union
+import websockets
+
+logger = logging.getLogger(__name__)
+
+Frame = Union[str, bytes, Dict]
+
+def load_frames(path: str) -> List[Dict]:
+    """Read one recorded message per line from a JSON Lines file"""
+    frames = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                frames.append(json.loads(line))
+    return frames
+
+class ReplayServer:
+    """Replays recorded frames to every client that connects"""
+
+    def __init__(self, frames: Dict[str, List[Frame]], host: str = '127.0.0.1', port: int = 0,
+                 interval: float = 0.0, drop_after: Optional[int] = None, hold_open: bool = True,
+                 http_responses: Optional[Dict[str, Dict]] = None):
+        self.frames = frames
+        self.http_responses = http_responses or {}
+        self.host = host
+        self.port = port
+        self.interval = interval        # Delay between frames (seconds)
+        self.drop_after = drop_after    # Close each connection after this many frames
+        self.hold_open = hold_open      # Keep the connection open once all frames are sent
+        self.connections = 0
+
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def _handler(self, websocket, path: Optional[str] = None) -> None:
+        if path is None:
+            request = getattr(websocket, 'request', None)
+            path = request.path if request is not None else websocket.path
+        path = path.split('?')[0]
+        self.connections += 1
+
+        sent = 0
+        for frame in self.frames.get(path, []):
+            if self.drop_after is not None and sent >= self.drop_after:
+                return
+            await websocket.send(json.dumps(frame) if isinstance(frame, dict) else frame)
+            sent += 1
+            if self.interval:
+                await asyncio.sleep(self.interval)
+
+        if self.hold_open:
+            await self._stop.wait()
+
+    def _process_request(self, *args):
+        # websockets >= 13 passes (connection, request); the legacy server passes (path, headers)
+        if hasattr(args[0], 'respond'):
+            connection, request = args
+            path, headers = request.path, request.headers
+        else:
+            connection = None
+            path, headers = args
+        if headers.get('Upgrade', '').lower() == 'websocket':
+            return None
+
+        body = self.http_responses.get(path.split('?')[0])
+        status = HTTPStatus.OK if body is not None else HTTPStatus.NOT_FOUND
+        text = json.dumps(body) if body is not None else 'Not Found'
+        if connection is not None:
+            return connection.respond(status, text)
+        return status, [('Content-Type', 'application/json')], text.encode()
+
+    async def _serve(self) -> None:
+        async with websockets.serve(self._handler, self.host, self.port,
+                                    process_request=self._process_request) as server:
+            self.port = list(server.sockets)[0].getsockname()[1]
+            self._ready.set()
+            await self._stop.wait()
+
+    def _thread_main(self) -> None:
+        try:
+            self._loop.run_until_complete(self._serve())
+        except Exception as e:
+            logger.error(f"Replay server failed: {e}")
+        finally:
+            self._ready.set()
+            self._loop.close()
+
+    def start(self) -> None:
+        """Start serving in a background thread; returns once the port is bound"""
+        self._loop = asyncio.new_event_loop()
+        self._stop = asyncio.Event()
+        self._thread = threading.Thread(target=self._thread_main, name='stream-replay', daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=5)
+        logger.info(f"Replay server listening on {self.url}")
+
+    def stop(self) -> None:
+        if self._thread:
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._thread.join(timeout=5)
+            self._thread = None
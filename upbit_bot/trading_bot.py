@@ -3,12 +3,15 @@ import time
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
-import requests
 from dotenv import load_dotenv
 import ccxt
 import json
 import threading
 from dataclasses import dataclass, asdict
+from .market_data_hub import get_market_data_hub
+from .fx_rate import get_fx_provider
+from .performance import PerformanceAccumulator
+from .market_replay import LatencyTracker
 
 # Configure logging
 logging.basicConfig(
@@ -33,6 +36,7 @@ class TradingConfig:
     max_trades_per_day: int = 10
     cooldown_period: int = 300  # 5 minutes cooldown between trades
     emergency_stop_loss: float = 5.0  # Emergency stop at 5% total loss
+    max_fx_age: float = 900.0  # Do not trade on a USD/KRW rate older than this (seconds)
 
 @dataclass
 class TradeRecord:
@@ -110,14 +114,24 @@ class RiskManager:
 class UpbitTradingBot:
     def __init__(self, api_key: Optional[str] = None, secret_key: Optional[str] = None, 
                  initial_balance_usd: float = 10000, config: Optional[TradingConfig] = None, 
-                 virtual_mode: bool = True):
+                 virtual_mode: bool = True, hub=None, fx=None, clock=None):
         """
         Initialize the Enhanced Upbit Trading Bot
+
+        hub and fx default to the process-wide market data hub and USD/KRW
+        provider; a MarketDataRecorder wrapper or a MarketDataReplay can be
+        passed instead. clock, when given, paces run_bot through its
+        sleep(seconds) method, which returns False to end the run.
         """
         load_dotenv()
         self.virtual_mode = virtual_mode
         self.config = config or TradingConfig()
         self.risk_manager = RiskManager(self.config)
+        # Public market data is read from the shared hub
+        self.market_data = hub or get_market_data_hub()
+        self.fx = fx or get_fx_provider()
+        self.clock = clock
+        self._runtime = None  # AsyncBotRuntime while run_bot_async is active
         
         # Initialize API client
         if not virtual_mode:
@@ -138,7 +152,7 @@ class UpbitTradingBot:
                 logger.error(f"Failed to connect to Upbit API: {str(e)}")
                 raise
         else:
-            self.client = ccxt.upbit()  # Public API only
+            self.client = self.market_data.upbit  # Public API only
             
         # Initialize balances
         self.virtual_balance_usd = initial_balance_usd
@@ -158,17 +172,15 @@ class UpbitTradingBot:
             'max_drawdown': 0.0,
             'win_rate': 0.0
         }
+        self.performance_tracker = PerformanceAccumulator()  # Equity per cycle, P&L per trade
+        self.decision_latency = LatencyTracker()  # Age of the USDT/KRW tick when each decision is made
         
         logger.info(f"Bot initialized in {'virtual' if virtual_mode else 'live'} mode")
 
     def get_exchange_rate(self) -> float:
         """Get current USD/KRW exchange rate with error handling"""
         try:
-            url = "https://api.exchangerate-api.com/v4/latest/USD"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            rate = data['rates']['KRW']
+            rate = self.fx.get_rate()
             logger.debug(f"USD/KRW rate: {rate}")
             return rate
         except Exception as e:
@@ -181,7 +193,7 @@ class UpbitTradingBot:
     def get_usdt_krw_price(self) -> float:
         """Get current USDT/KRW price from Upbit with error handling"""
         try:
-            ticker = self.client.fetch_ticker('USDT/KRW')
+            ticker = self.market_data.get_ticker('upbit', 'USDT/KRW')
             price = float(ticker['last'])
             logger.debug(f"USDT/KRW price: {price}")
             return price
@@ -192,40 +204,52 @@ class UpbitTradingBot:
                 return self.last_market_data['usdt_krw_price']
             return 1300.0  # Fallback price
 
+    def evaluate_opportunity(self, usdt_krw_price: float, fx_quote) -> Dict:
+        """Decide on an action from a USDT/KRW price and a USD/KRW quote, without any I/O"""
+        usd_krw_rate = fx_quote.rate
+        
+        # Calculate the difference percentage
+        diff_percentage = ((usdt_krw_price - usd_krw_rate) / usd_krw_rate) * 100
+        
+        # Determine action based on threshold
+        action = 'HOLD'
+        if diff_percentage < -self.config.price_threshold:
+            action = 'BUY'
+        elif diff_percentage > self.config.price_threshold:
+            action = 'SELL'
+        
+        # Never act on a stale or fallback USD/KRW rate
+        fx_stale = fx_quote.is_stale(self.config.max_fx_age)
+        if fx_stale:
+            logger.warning(f"USD/KRW rate is stale ({fx_quote.source}, age {fx_quote.age_seconds}); holding")
+        
+        # Cache market data
+        self.last_market_data = {
+            'usd_krw_rate': usd_krw_rate,
+            'usdt_krw_price': usdt_krw_price
+        }
+        
+        opportunity = {
+            'timestamp': datetime.now().isoformat(),
+            'usd_krw_rate': usd_krw_rate,
+            'usd_krw_age_seconds': fx_quote.age_seconds,
+            'usd_krw_source': fx_quote.source,
+            'usdt_krw_price': usdt_krw_price,
+            'difference_percentage': diff_percentage,
+            'action': 'HOLD' if fx_stale else action,
+            'profitable': not fx_stale and abs(diff_percentage) > self.config.price_threshold,
+            'confidence': min(abs(diff_percentage), 5.0) / 5.0  # Confidence score 0-1
+        }
+        
+        logger.debug(f"Arbitrage opportunity: {opportunity}")
+        return opportunity
+
     def calculate_arbitrage_opportunity(self) -> Dict:
         """Calculate arbitrage opportunity with enhanced analysis"""
         try:
-            usd_krw_rate = self.get_exchange_rate()
+            fx_quote = self.fx.get_quote()
             usdt_krw_price = self.get_usdt_krw_price()
-            
-            # Calculate the difference percentage
-            diff_percentage = ((usdt_krw_price - usd_krw_rate) / usd_krw_rate) * 100
-            
-            # Determine action based on threshold
-            action = 'HOLD'
-            if diff_percentage < -self.config.price_threshold:
-                action = 'BUY'
-            elif diff_percentage > self.config.price_threshold:
-                action = 'SELL'
-            
-            # Cache market data
-            self.last_market_data = {
-                'usd_krw_rate': usd_krw_rate,
-                'usdt_krw_price': usdt_krw_price
-            }
-            
-            opportunity = {
-                'timestamp': datetime.now().isoformat(),
-                'usd_krw_rate': usd_krw_rate,
-                'usdt_krw_price': usdt_krw_price,
-                'difference_percentage': diff_percentage,
-                'action': action,
-                'profitable': abs(diff_percentage) > self.config.price_threshold,
-                'confidence': min(abs(diff_percentage), 5.0) / 5.0  # Confidence score 0-1
-            }
-            
-            logger.debug(f"Arbitrage opportunity: {opportunity}")
-            return opportunity
+            return self.evaluate_opportunity(usdt_krw_price, fx_quote)
             
         except Exception as e:
             logger.error(f"Error calculating arbitrage opportunity: {str(e)}")
@@ -350,6 +374,7 @@ class UpbitTradingBot:
             self.performance_metrics['successful_trades'] += 1
         
         self.performance_metrics['total_profit_loss'] += trade.profit_loss
+        self.performance_tracker.record_trade(trade.profit_loss)
         self.performance_metrics['win_rate'] = (
             self.performance_metrics['successful_trades'] / 
             self.performance_metrics['total_trades'] * 100
@@ -366,9 +391,59 @@ class UpbitTradingBot:
             'total_return': total_value - self.initial_balance,
             'return_percentage': ((total_value - self.initial_balance) / self.initial_balance) * 100,
             'metrics': self.performance_metrics,
+            'live_metrics': self.performance_tracker.snapshot(),
             'trade_count': len(self.trade_history)
         }
 
+    def record_performance(self) -> Dict:
+        """Record the current equity in the live metrics and return the performance summary"""
+        summary = self.get_performance_summary()
+        self.performance_tracker.record_bar(summary['current_balance'])
+        self.performance_metrics['max_drawdown'] = self.performance_tracker.max_drawdown
+        summary['live_metrics'] = self.performance_tracker.snapshot()
+        summary['decision_latency'] = self.decision_latency.summary()
+        return summary
+
+    def run_cycle(self) -> Optional[Dict]:
+        """Run one check-and-trade cycle; returns the opportunity, or None if the emergency stop fired"""
+        # Check for emergency stop
+        performance = self.record_performance()
+        if performance['return_percentage'] < -self.config.emergency_stop_loss:
+            logger.critical("Emergency stop triggered!")
+            self.is_running = False
+            return None
+        
+        # Calculate opportunity
+        opportunity = self.calculate_arbitrage_opportunity()
+        
+        # Tick-to-decision latency: how old the USDT/KRW quote was when the action was chosen
+        tick_age = self.market_data.get_age('ticker', 'upbit', 'USDT/KRW')
+        if tick_age is not None and 'error' not in opportunity:
+            self.decision_latency.record(tick_age)
+            opportunity['tick_age_seconds'] = tick_age
+        
+        if opportunity.get('profitable', False):
+            result = self.execute_trade(
+                opportunity['action'], 
+                self.config.max_trade_amount
+            )
+            
+            if result['success']:
+                logger.info(f"Trade successful: {opportunity['action']}")
+            else:
+                logger.warning(f"Trade failed: {result.get('reason', 'Unknown')}")
+        
+        # Log current status
+        if len(self.trade_history) % 10 == 0:  # Every 10th cycle
+            logger.info(f"Performance: {performance}")
+        return opportunity
+
+    def _sleep(self, seconds: float) -> bool:
+        if self.clock is not None:
+            return self.clock.sleep(seconds) is not False
+        time.sleep(seconds)
+        return True
+
     def run_bot(self, check_interval: int = 60):
         """Run the trading bot with enhanced monitoring"""
         logger.info("Starting enhanced trading bot...")
@@ -376,32 +451,12 @@ class UpbitTradingBot:
         
         try:
             while self.is_running:
-                # Check for emergency stop
-                performance = self.get_performance_summary()
-                if performance['return_percentage'] < -self.config.emergency_stop_loss:
-                    logger.critical("Emergency stop triggered!")
-                    self.is_running = False
+                if self.run_cycle() is None:
                     break
                 
-                # Calculate opportunity
-                opportunity = self.calculate_arbitrage_opportunity()
-                
-                if opportunity.get('profitable', False):
-                    result = self.execute_trade(
-                        opportunity['action'], 
-                        self.config.max_trade_amount
-                    )
-                    
-                    if result['success']:
-                        logger.info(f"Trade successful: {opportunity['action']}")
-                    else:
-                        logger.warning(f"Trade failed: {result.get('reason', 'Unknown')}")
-                
-                # Log current status
-                if len(self.trade_history) % 10 == 0:  # Every 10th cycle
-                    logger.info(f"Performance: {performance}")
-                
-                time.sleep(check_interval)
+                if not self._sleep(check_interval):
+                    logger.info("Market data clock finished")
+                    break
                 
         except KeyboardInterrupt:
             logger.info("Bot stopped by user")
@@ -409,11 +464,23 @@ class UpbitTradingBot:
             logger.error(f"Bot error: {str(e)}")
         finally:
             self.is_running = False
-            logger.info("Bot stopped")
+            logger.info(f"Bot stopped; decision latency: {self.decision_latency.summary()}")
+
+    async def run_bot_async(self, runtime_config=None):
+        """Run the bot on the event-driven asyncio runtime until stop_bot() is called"""
+        from .bot_runtime import AsyncBotRuntime
+        self._runtime = AsyncBotRuntime(self, runtime_config)
+        try:
+            await self._runtime.run()
+        finally:
+            self._runtime = None
 
     def stop_bot(self):
-        """Stop the trading bot"""
+        """Stop the trading bot; an async runtime is cancelled and drained"""
         self.is_running = False
+        runtime = self._runtime
+        if runtime is not None:
+            runtime.stop()
         logger.info("Bot stop requested")
 
     def export_trade_history(self, filename: Optional[str] = None) -> Optional[str]:
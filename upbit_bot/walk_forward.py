@@ -0,0 +1,322 @@
+"""
+Walk-Forward Optimization
+
+Splits a loaded history into rolling (or anchored) train/test folds, searches
+parameters on each train window, backtests the winner on the test window that
+follows it, and stitches the out-of-sample equity curves into one compounded
+curve. Folds are optimized in parallel across a process pool. The market
+arrays are placed in shared memory once, and every fold is a positional view
+of them, so overlapping windows are neither refetched nor copied.
+"""
+
+import os
+import math
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .columnar import FloatSeries
+from .performance import PerformanceAccumulator
+from .param_search import Evaluator, ParamSpec, bitcoin_evaluator, get_search_strategy, upbit_evaluator
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class WalkForwardConfig:
+    """Fold layout for walk-forward optimization (periods are pandas Timedelta strings)"""
+    train_period: str = '90D'           # Length of each in-sample window
+    test_period: str = '30D'            # Length of each out-of-sample window
+    step_period: Optional[str] = None   # Shift between folds (None: test_period, so test windows tile)
+    anchored: bool = False              # Grow the train window from the start instead of rolling it
+    min_bars: int = 2                   # Skip folds whose train or test window has fewer bars
+
+@dataclass
+class Fold:
+    """Positional [start, end) bounds of one train/test split"""
+    index: int
+    train_start: int
+    train_end: int
+    test_start: int
+    test_end: int
+
+def walk_forward_folds(times: pd.DatetimeIndex, config: WalkForwardConfig) -> List[Fold]:
+    """Train/test folds over sorted timestamps"""
+    train = pd.Timedelta(config.train_period)
+    test = pd.Timedelta(config.test_period)
+    step = pd.Timedelta(config.step_period) if config.step_period else test
+    if step < test:
+        raise ValueError("step_period must be at least test_period so test windows do not overlap")
+    if len(times) == 0:
+        return []
+
+    folds = []
+    test_start_time = times[0] + train
+    while test_start_time <= times[-1]:
+        train_start_time = times[0] if config.anchored else test_start_time - train
+        train_start, train_end, test_end = times.searchsorted(
+            [train_start_time, test_start_time, test_start_time + test])
+        if train_end - train_start >= config.min_bars and test_end - train_end >= config.min_bars:
+            folds.append(Fold(len(folds), int(train_start), int(train_end), int(train_end), int(test_end)))
+        test_start_time += step
+    return folds
+
+class UpbitWalkForward:
+    """EnhancedUpbitBacktest folds over a (datetime, usd_krw_rate, usdt_krw_price) frame"""
+    name = 'upbit'
+
+    def __init__(self, base_config, cache_dir: Optional[str] = None):
+        self.base_config = base_config
+        self.cache_dir = cache_dir
+
+    def times(self, data: pd.DataFrame) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(data['datetime'])
+
+    def fields(self, data: pd.DataFrame) -> List[str]:
+        from .backtest_sweep import UPBIT_MARKET_FIELDS
+        return [name for name in UPBIT_MARKET_FIELDS if name in data]
+
+    def frame(self, times: pd.DatetimeIndex, arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+        return pd.DataFrame({'datetime': times, **arrays}, copy=False)
+
+    def evaluator(self, window: pd.DataFrame) -> Evaluator:
+        return upbit_evaluator(window, self.base_config, cache_dir=self.cache_dir, max_workers=1)
+
+    def out_of_sample(self, window: pd.DataFrame, params: Dict[str, Any]) -> Tuple[Dict[str, Any], np.ndarray, float]:
+        """(summary, equity per bar, starting equity) of params over the test window"""
+        from .backtest import EnhancedUpbitBacktest, ArbitrageStrategy
+        from .backtest_sweep import SWEEP_SUMMARY_KEYS
+        config = replace(self.base_config, use_vectorized_engine=True, **params)
+        result = EnhancedUpbitBacktest(config, ArbitrageStrategy(config)).run_backtest_on_data(window)
+        summary = {key: getattr(result, key) for key in SWEEP_SUMMARY_KEYS}
+        return summary, np.array(result.equity_curve, dtype=np.float64), config.initial_balance_usd
+
+class BitcoinWalkForward:
+    """BitcoinBacktester folds over a time-indexed market frame"""
+    name = 'bitcoin'
+
+    def __init__(self, base_config):
+        self.base_config = replace(base_config, use_vectorized_engine=True)
+
+    def times(self, data: pd.DataFrame) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(data.index)
+
+    def fields(self, data: pd.DataFrame) -> List[str]:
+        from .parallel_sweep import MARKET_FIELDS
+        return list(MARKET_FIELDS)
+
+    def frame(self, times: pd.DatetimeIndex, arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+        return pd.DataFrame(arrays, index=times, copy=False)
+
+    def evaluator(self, window: pd.DataFrame) -> Evaluator:
+        return bitcoin_evaluator(window, self.base_config, max_workers=1)
+
+    def out_of_sample(self, window: pd.DataFrame, params: Dict[str, Any]) -> Tuple[Dict[str, Any], np.ndarray, float]:
+        """(summary, equity per bar, starting equity) of params over the test window"""
+        from .bitcoin_backtest import BitcoinBacktester
+        from .parallel_sweep import SUMMARY_KEYS
+        results = BitcoinBacktester(replace(self.base_config, **params)).simulate_trades(window)
+        summary = {key: results[key] for key in SUMMARY_KEYS}
+        equity = np.array([bar['total_value_krw'] for bar in results['balance_history']], dtype=np.float64)
+        return summary, equity, results['initial_value_krw']
+
+@dataclass
+class FoldResult:
+    """Best train-window parameters and how they did on the following test window"""
+    fold: Fold
+    train_range: Tuple[pd.Timestamp, pd.Timestamp]
+    test_range: Tuple[pd.Timestamp, pd.Timestamp]
+    best_params: Dict[str, Any]
+    train_score: float
+    test_summary: Optional[Dict[str, Any]]
+    test_equity: np.ndarray = field(repr=False)
+    initial_equity: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'fold': self.fold.index,
+            'train_start': self.train_range[0].isoformat(),
+            'train_end': self.train_range[1].isoformat(),
+            'test_start': self.test_range[0].isoformat(),
+            'test_end': self.test_range[1].isoformat(),
+            'best_params': {name: value.item() if isinstance(value, np.generic) else value
+                            for name, value in self.best_params.items()},
+            'train_score': self.train_score,
+            'test_summary': self.test_summary
+        }
+
+@dataclass
+class WalkForwardResult:
+    """Per-fold results and the stitched out-of-sample equity curve"""
+    folds: List[FoldResult]
+    equity_times: pd.DatetimeIndex
+    equity_curve: FloatSeries
+    summary: Dict[str, Any]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'summary': self.summary,
+            'folds': [fold.to_dict() for fold in self.folds],
+            'equity_times': [timestamp.isoformat() for timestamp in self.equity_times],
+            'equity_curve': self.equity_curve.tolist()
+        }
+
+def _run_fold(engine, data: pd.DataFrame, times: pd.DatetimeIndex, fold: Fold, space: List[ParamSpec],
+              search: str, search_options: Dict[str, Any]) -> FoldResult:
+    train = data.iloc[fold.train_start:fold.train_end]
+    test = data.iloc[fold.test_start:fold.test_end]
+    outcome = get_search_strategy(search, **search_options).run(space, engine.evaluator(train))
+
+    summary, equity, initial_equity = None, np.empty(0), 0.0
+    if outcome.best_summary is not None:
+        summary, equity, initial_equity = engine.out_of_sample(test, outcome.best_params)
+    else:
+        logger.warning(f"Walk-forward fold {fold.index}: no successful train backtest")
+    return FoldResult(
+        fold=fold,
+        train_range=(times[fold.train_start], times[fold.train_end - 1]),
+        test_range=(times[fold.test_start], times[fold.test_end - 1]),
+        best_params=outcome.best_params,
+        train_score=outcome.best_score,
+        test_summary=summary,
+        test_equity=equity,
+        initial_equity=initial_equity
+    )
+
+# Per-worker state populated by _init_worker
+_worker_state: Dict[str, Any] = {}
+
+def _init_worker(descriptor: Dict[str, Any], engine):
+    from .parallel_sweep import SharedMarketData
+    shm, times, arrays = SharedMarketData.attach(descriptor)
+    _worker_state['shm'] = shm
+    _worker_state['times'] = times
+    _worker_state['engine'] = engine
+    _worker_state['data'] = engine.frame(times, arrays)
+
+def _run_worker_fold(fold: Fold, space: List[ParamSpec], search: str,
+                     search_options: Dict[str, Any]) -> FoldResult:
+    return _run_fold(_worker_state['engine'], _worker_state['data'], _worker_state['times'],
+                     fold, space, search, search_options)
+
+def _annualized_return(returns: List[float], bars: List[int], bars_per_year: float) -> Optional[float]:
+    # Mean compounded growth per bar over the windows, as a yearly return in %
+    growth = [math.log1p(value / 100) / count for value, count in zip(returns, bars) if value > -100 and count > 0]
+    if not growth or not math.isfinite(bars_per_year):
+        return None
+    return math.expm1(float(np.mean(growth)) * bars_per_year) * 100
+
+def stitch_out_of_sample(folds: List[FoldResult], times: pd.DatetimeIndex,
+                         metric: str = 'return_percentage') -> Tuple[pd.DatetimeIndex, FloatSeries, Dict[str, Any]]:
+    """Chain the test-window equity curves, compounding each fold's growth onto the last
+
+    metric is the summary key the train searches maximized, so train_score
+    is only a return (and walk_forward_efficiency is only reported) when it
+    is 'return_percentage'. Train and test returns are annualized per bar
+    before they are compared, since the windows differ in length.
+    """
+    tested = [result for result in folds if len(result.test_equity) and result.initial_equity > 0]
+    curve = FloatSeries()
+    positions = []
+    capital = tested[0].initial_equity if tested else 0.0
+    start_capital = capital
+    performance = PerformanceAccumulator()
+    for result in tested:
+        scaled = result.test_equity * (capital / result.initial_equity)
+        previous = np.concatenate(([curve[-1] if curve else start_capital], scaled[:-1]))
+        performance.record_bars(scaled, (scaled - previous) / previous * 100)
+        curve.extend(scaled)
+        positions.extend(range(result.fold.test_start, result.fold.test_start + len(scaled)))
+        capital = float(scaled[-1])
+
+    train_scores = [result.train_score for result in tested if math.isfinite(result.train_score)]
+    test_returns = [result.test_summary['return_percentage'] for result in tested]
+    mean_train = float(np.mean(train_scores)) if train_scores else 0.0
+    mean_test = float(np.mean(test_returns)) if test_returns else 0.0
+
+    bar_spacing = pd.Series(times).diff().median() if len(times) > 1 else pd.NaT
+    bars_per_year = pd.Timedelta(days=365) / bar_spacing if pd.notna(bar_spacing) and bar_spacing > pd.Timedelta(0) \
+        else float('nan')
+    test_annualized = _annualized_return(
+        test_returns, [result.fold.test_end - result.fold.test_start for result in tested], bars_per_year)
+    train_annualized = None
+    if metric == 'return_percentage':
+        scored = [result for result in tested if math.isfinite(result.train_score)]
+        train_annualized = _annualized_return(
+            [result.train_score for result in scored],
+            [result.fold.train_end - result.fold.train_start for result in scored], bars_per_year)
+    efficiency = None
+    if train_annualized is not None and test_annualized is not None and train_annualized > 0:
+        efficiency = test_annualized / train_annualized
+    summary = {
+        'folds': len(folds),
+        'tested_folds': len(tested),
+        'initial_equity': start_capital,
+        'final_equity': capital,
+        'oos_return_percentage': (capital - start_capital) / start_capital * 100 if start_capital else 0.0,
+        'oos_max_drawdown': performance.max_drawdown,
+        'oos_sharpe_ratio': performance.sharpe_ratio,
+        'train_metric': metric,
+        'mean_train_score': mean_train,
+        'mean_test_return': mean_test,
+        'train_annualized_return': train_annualized,
+        'test_annualized_return': test_annualized,
+        'profitable_test_folds': sum(1 for value in test_returns if value > 0),
+        # Share of the annualized in-sample return that survived out of sample
+        'walk_forward_efficiency': efficiency
+    }
+    return times[positions], curve, summary
+
+def run_walk_forward(data: pd.DataFrame, engine, space: List[ParamSpec],
+                     config: Optional[WalkForwardConfig] = None, search: str = 'grid',
+                     search_options: Optional[Dict[str, Any]] = None,
+                     max_workers: Optional[int] = None,
+                     progress: Optional[Callable[[int, int], None]] = None) -> WalkForwardResult:
+    """Optimize on every train fold, evaluate on its test fold and stitch the results
+
+    engine is an UpbitWalkForward or BitcoinWalkForward. Folds run in parallel
+    (one search per worker process, each over a view of the shared arrays);
+    with max_workers=1 or a single fold everything runs in this process.
+    progress(done, total) is called as folds finish. search_options are sent to
+    the workers, so a constraint must be a module-level function, not a lambda.
+    """
+    config = config or WalkForwardConfig()
+    search_options = dict(search_options or {})
+    times = engine.times(data)
+    folds = walk_forward_folds(times, config)
+    logger.info(f"Walk-forward ({engine.name}, {search} search): {len(folds)} folds over {len(data)} bars")
+    if not folds:
+        return WalkForwardResult([], times[:0], FloatSeries(), stitch_out_of_sample([], times)[2])
+
+    results: List[Optional[FoldResult]] = [None] * len(folds)
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(folds) == 1:
+        for fold in folds:
+            try:
+                results[fold.index] = _run_fold(engine, data, times, fold, space, search, search_options)
+            except Exception as e:
+                logger.error(f"Walk-forward fold {fold.index} failed: {e}")
+            if progress:
+                progress(fold.index + 1, len(folds))
+    else:
+        from .parallel_sweep import SharedMarketData
+        with SharedMarketData(data, engine.fields(data), times=times) as market_data:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(folds)), initializer=_init_worker,
+                                     initargs=(market_data.descriptor, engine)) as executor:
+                futures = [executor.submit(_run_worker_fold, fold, space, search, search_options)
+                           for fold in folds]
+                for done, (fold, future) in enumerate(zip(folds, futures), start=1):
+                    try:
+                        results[fold.index] = future.result()
+                    except Exception as e:
+                        logger.error(f"Walk-forward fold {fold.index} failed: {e}")
+                    if progress:
+                        progress(done, len(folds))
+
+    completed = [result for result in results if result is not None]
+    metric = search_options.get('metric', 'return_percentage')
+    equity_times, equity_curve, summary = stitch_out_of_sample(completed, times, metric)
+    logger.info(f"Walk-forward completed: {summary['oos_return_percentage']:.2f}% out-of-sample return "
+                f"over {summary['tested_folds']} folds")
+    return WalkForwardResult(completed, equity_times, equity_curve, summary)
@@ -3,12 +3,17 @@ from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import json
 import asyncio
 import logging
 from .backtest import EnhancedUpbitBacktest, BacktestConfig, ArbitrageStrategy
 from .trading_bot import UpbitTradingBot, TradingConfig
+from .market_data_hub import get_market_data_hub
+from .executors import ExecutorBusy, get_executors, run_io, run_cpu, run_upbit_backtest
+from .market_broadcast import MarketSnapshotBroadcaster, MarketSnapshot
+from .ws_protocol import WIRE_FORMATS, WireSession, receive_message, to_wire
+from .ws_outbound import ClientWriter, OutboundQueueConfig
 import uuid
 import os
 
@@ -28,45 +33,98 @@ templates = Jinja2Templates(directory="templates")
 active_sessions: Dict[str, Dict[str, Any]] = {}
 virtual_traders: Dict[str, UpbitTradingBot] = {}
 connection_manager = []
+# Shared read-only bot for /api/market-data; quotes come from the market data hub
+market_data_bot: Optional[UpbitTradingBot] = None
+# One market snapshot per tick, shared by every /ws/trading connection
+market_snapshots = MarketSnapshotBroadcaster(interval=5.0)
 
 class ConnectionManager:
-    def __init__(self):
+    # Messages that replace the previous one of their type; sent as deltas to delta clients
+    STATE_TYPES = ('market_update', 'performance_update')
+
+    def __init__(self, queue_config: Optional[OutboundQueueConfig] = None):
         self.active_connections: List[WebSocket] = []
         self.session_connections: Dict[str, List[WebSocket]] = {}
+        # Each connection is written by its own task, so a slow client only delays itself
+        self.writers: Dict[WebSocket, ClientWriter] = {}
+        self.connection_sessions: Dict[WebSocket, str] = {}
+        self.queue_config = queue_config or OutboundQueueConfig()
     
     async def connect(self, websocket: WebSocket, session_id: str):
         await websocket.accept()
+        wire = WireSession.from_query(websocket.query_params, self.STATE_TYPES)
+        writer = ClientWriter(websocket, wire, self.queue_config, self.STATE_TYPES, on_close=self._forget)
         self.active_connections.append(websocket)
+        self.writers[websocket] = writer
+        self.connection_sessions[websocket] = session_id
         
         if session_id not in self.session_connections:
             self.session_connections[session_id] = []
         self.session_connections[session_id].append(websocket)
         
-        logger.info(f"WebSocket connected for session {session_id}")
+        writer.start()
+        if not wire.is_legacy:
+            writer.send(wire.describe())
+        logger.info(f"WebSocket connected for session {session_id} ({wire.format}, delta={wire.delta})")
     
-    def disconnect(self, websocket: WebSocket, session_id: str):
-        self.active_connections.remove(websocket)
+    def _forget(self, websocket: WebSocket):
+        # Also called by the writer when it drops a slow client
+        self.writers.pop(websocket, None)
+        session_id = self.connection_sessions.pop(websocket, None)
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
         if session_id in self.session_connections:
             self.session_connections[session_id].remove(websocket)
             if not self.session_connections[session_id]:
                 del self.session_connections[session_id]
+    
+    def disconnect(self, websocket: WebSocket, session_id: str):
+        writer = self.writers.get(websocket)
+        self._forget(websocket)
+        if writer is not None:
+            writer.close()
         
         logger.info(f"WebSocket disconnected for session {session_id}")
     
+    def handle_control(self, websocket: WebSocket, message: Any) -> bool:
+        """Apply a client's ack/resync message; False if it is an application message"""
+        writer = self.writers.get(websocket)
+        return writer is not None and writer.wire.handle_control(message)
+    
+    async def send_to(self, websocket: WebSocket, message: dict):
+        """Queue a message for one connection in its negotiated wire format"""
+        writer = self.writers.get(websocket)
+        if writer is not None:
+            writer.send(to_wire(message))
+    
     async def send_personal_message(self, message: dict, session_id: str):
-        if session_id in self.session_connections:
-            for connection in self.session_connections[session_id]:
-                try:
-                    await connection.send_json(message)
-                except:
-                    pass
+        """Queue a message for every connection of a session"""
+        message = to_wire(message)
+        for connection in list(self.session_connections.get(session_id, [])):
+            writer = self.writers.get(connection)
+            if writer is not None:
+                writer.send(message)
     
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+        """Queue a message for every connected client"""
+        message = to_wire(message)
+        for writer in list(self.writers.values()):
+            writer.send(message)
+    
+    def stats(self) -> Dict[str, Any]:
+        wires = [writer.wire for writer in self.writers.values()]
+        return {
+            "connections": len(self.active_connections),
+            "formats": {
+                wire_format: sum(1 for wire in wires if wire.format == wire_format)
+                for wire_format in WIRE_FORMATS
+            },
+            "delta_connections": sum(1 for wire in wires if wire.delta),
+            "bytes_sent": sum(wire.stats['bytes'] for wire in wires),
+            "policy": self.queue_config.policy,
+            "max_queued": self.queue_config.max_queued,
+            "clients": [writer.stats() for writer in self.writers.values()]
+        }
 
 manager = ConnectionManager()
 
@@ -85,7 +143,13 @@ async def home(request: Request):
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {
+        "status": "healthy",
+        "executors": get_executors().stats(),
+        "market_snapshots": market_snapshots.stats(),
+        "websockets": manager.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
 
 @app.post("/api/backtest", response_class=JSONResponse)
 async def run_backtest_api(
@@ -123,9 +187,8 @@ async def run_backtest_api(
             max_trades_per_day=max_trades_per_day
         )
         
-        # Run backtest
-        backtest = EnhancedUpbitBacktest(config)
-        result = backtest.run_backtest(start_dt, end_dt, use_real_data=use_real_data)
+        # Run backtest in the process pool
+        result = await run_cpu(run_upbit_backtest, config, start_dt, end_dt, use_real_data)
         
         # Return structured result
         return {
@@ -157,10 +220,12 @@ async def run_backtest_api(
                 }
                 for trade in result.trades
             ],
-            "daily_returns": result.daily_returns,
-            "equity_curve": result.equity_curve
+            "daily_returns": result.daily_returns.tolist(),
+            "equity_curve": result.equity_curve.tolist()
         }
         
+    except ExecutorBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Backtest error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -196,9 +261,8 @@ async def run_backtest_form(
             max_trades_per_day=max_trades_per_day
         )
         
-        # Run backtest
-        backtest = EnhancedUpbitBacktest(config)
-        result = backtest.run_backtest(start_dt, end_dt, use_real_data=use_real_data)
+        # Run backtest in the process pool
+        result = await run_cpu(run_upbit_backtest, config, start_dt, end_dt, use_real_data)
         
         # Format trades for template
         formatted_trades = []
@@ -237,8 +301,8 @@ async def run_backtest_form(
                 "results": template_results,
                 "trades": formatted_trades,
                 "config": config,
-                "equity_curve": result.equity_curve,
-                "daily_returns": result.daily_returns
+                "equity_curve": result.equity_curve.tolist(),
+                "daily_returns": result.daily_returns.tolist()
             }
         )
         
@@ -366,6 +430,7 @@ async def stop_trading_session(session_id: str):
         if session_id in virtual_traders:
             virtual_traders[session_id].stop_bot()
             del virtual_traders[session_id]
+        _session_updates.pop(session_id, None)
         
         # Remove session
         del active_sessions[session_id]
@@ -379,10 +444,50 @@ async def stop_trading_session(session_id: str):
         logger.error(f"Error stopping session: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _session_update(trader: UpbitTradingBot, snapshot: MarketSnapshot):
+    """Opportunity, balance and performance of one session from a shared market snapshot"""
+    if snapshot.usdt_krw_price is None:
+        opportunity = {
+            'timestamp': snapshot.timestamp,
+            'error': snapshot.error,
+            'action': 'HOLD',
+            'profitable': False
+        }
+    else:
+        opportunity = trader.evaluate_opportunity(snapshot.usdt_krw_price, snapshot.fx_quote)
+    return opportunity, trader.get_current_balance(), trader.record_performance()
+
+# Newest (snapshot version, update) per session, shared by every connection watching it
+_session_updates: Dict[str, Tuple[int, asyncio.Future]] = {}
+
+async def shared_session_update(session_id: str, trader: UpbitTradingBot, snapshot: MarketSnapshot):
+    """_session_update run once per session and snapshot version, however many tabs are open
+
+    record_performance adds a bar to the session's live metrics, so running it
+    per connection would count every snapshot once per viewer.
+    """
+    entry = _session_updates.get(session_id)
+    if entry is None or entry[0] < snapshot.version:
+        if trader.virtual_mode:
+            future = asyncio.get_running_loop().create_future()
+            try:
+                future.set_result(_session_update(trader, snapshot))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future = asyncio.ensure_future(run_io(_session_update, trader, snapshot))
+        entry = (snapshot.version, future)
+        _session_updates[session_id] = entry
+    # Shielded so one connection closing does not cancel the update for the others
+    return await asyncio.shield(entry[1])
+
 @app.websocket("/ws/trading/{session_id}")
 async def trading_websocket(websocket: WebSocket, session_id: str):
     """Enhanced WebSocket for real-time trading updates"""
     await manager.connect(websocket, session_id)
+    market_snapshots.subscribe()
+    receive_task = None
+    snapshot_task = None
     
     try:
         # Initialize session if not exists
@@ -395,100 +500,116 @@ async def trading_websocket(websocket: WebSocket, session_id: str):
             }
         
         trader = virtual_traders[session_id]
+        performance = None
+        version = 0
+        receive_task = asyncio.create_task(receive_message(websocket))
+        snapshot_task = asyncio.create_task(market_snapshots.wait_for(version))
         
         while True:
-            try:
-                # Get current market status
-                opportunity = trader.calculate_arbitrage_opportunity()
-                balance = trader.get_current_balance()
-                performance = trader.get_performance_summary()
-                
-                # Send comprehensive update
-                await manager.send_personal_message({
-                    "type": "market_update",
-                    "timestamp": datetime.now().isoformat(),
-                    "opportunity": opportunity,
-                    "balance": balance,
-                    "performance": performance,
-                    "trade_history": [
-                        {
-                            "timestamp": trade.timestamp,
-                            "action": trade.action,
-                            "amount_usd": trade.amount_usd,
-                            "usdt_krw_price": trade.usdt_krw_price,
-                            "success": trade.success,
-                            "profit_loss": trade.profit_loss
-                        }
-                        for trade in trader.trade_history[-10:]  # Last 10 trades
-                    ]
-                }, session_id)
-                
-                # Check for client messages
+            done, _ = await asyncio.wait({receive_task, snapshot_task}, return_when=asyncio.FIRST_COMPLETED)
+            
+            if snapshot_task in done:
+                snapshot = snapshot_task.result()
+                version = snapshot.version
+                snapshot_task = asyncio.create_task(market_snapshots.wait_for(version))
                 try:
-                    message = await asyncio.wait_for(websocket.receive_json(), timeout=1.0)
-                    
-                    if message["type"] == "execute_trade":
-                        action = message["action"]
-                        amount = float(message.get("amount", trader.config.max_trade_amount))
-                        
-                        result = trader.execute_trade(action, amount)
-                        
-                        await manager.send_personal_message({
-                            "type": "trade_result",
-                            "result": result,
-                            "timestamp": datetime.now().isoformat()
-                        }, session_id)
+                    # Market data is shared; only this session's view is computed, once per snapshot
+                    opportunity, balance, performance = await shared_session_update(session_id, trader, snapshot)
                     
-                    elif message["type"] == "get_performance":
-                        await manager.send_personal_message({
-                            "type": "performance_update",
-                            "performance": performance,
-                            "timestamp": datetime.now().isoformat()
-                        }, session_id)
-                    
-                    elif message["type"] == "stop_bot":
-                        trader.stop_bot()
-                        await manager.send_personal_message({
-                            "type": "bot_stopped",
-                            "message": "Trading bot stopped",
-                            "timestamp": datetime.now().isoformat()
-                        }, session_id)
-                        break
-                        
-                except asyncio.TimeoutError:
-                    pass
-                except json.JSONDecodeError:
+                    # Send comprehensive update
+                    await manager.send_to(websocket, {
+                        "type": "market_update",
+                        "timestamp": datetime.now().isoformat(),
+                        "snapshot_version": version,
+                        "opportunity": opportunity,
+                        "balance": balance,
+                        "performance": performance,
+                        "trade_history": [
+                            {
+                                "timestamp": trade.timestamp,
+                                "action": trade.action,
+                                "amount_usd": trade.amount_usd,
+                                "usdt_krw_price": trade.usdt_krw_price,
+                                "success": trade.success,
+                                "profit_loss": trade.profit_loss
+                            }
+                            for trade in trader.trade_history[-10:]  # Last 10 trades
+                        ]
+                    })
+                except WebSocketDisconnect:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error in trading loop: {str(e)}")
+                    await manager.send_personal_message({
+                        "type": "error",
+                        "message": str(e),
+                        "timestamp": datetime.now().isoformat()
+                    }, session_id)
+            
+            if receive_task in done:
+                try:
+                    message = receive_task.result()
+                except ValueError:
+                    message = None  # Undecodable binary frame
+                receive_task = asyncio.create_task(receive_message(websocket))
+                if manager.handle_control(websocket, message):
+                    continue
+                if not isinstance(message, dict) or "type" not in message:
                     await manager.send_personal_message({
                         "type": "error",
                         "message": "Invalid JSON message",
                         "timestamp": datetime.now().isoformat()
                     }, session_id)
+                    continue
                 
-                await asyncio.sleep(5)  # Update every 5 seconds
+                if message["type"] == "execute_trade":
+                    action = message["action"]
+                    amount = float(message.get("amount", trader.config.max_trade_amount))
+                    
+                    result = await run_io(trader.execute_trade, action, amount)
+                    
+                    await manager.send_personal_message({
+                        "type": "trade_result",
+                        "result": result,
+                        "timestamp": datetime.now().isoformat()
+                    }, session_id)
                 
-            except Exception as e:
-                logger.error(f"Error in trading loop: {str(e)}")
-                await manager.send_personal_message({
-                    "type": "error",
-                    "message": str(e),
-                    "timestamp": datetime.now().isoformat()
-                }, session_id)
-                await asyncio.sleep(5)
+                elif message["type"] == "get_performance":
+                    await manager.send_personal_message({
+                        "type": "performance_update",
+                        "performance": performance if performance is not None else trader.get_performance_summary(),
+                        "timestamp": datetime.now().isoformat()
+                    }, session_id)
+                
+                elif message["type"] == "stop_bot":
+                    trader.stop_bot()
+                    await manager.send_personal_message({
+                        "type": "bot_stopped",
+                        "message": "Trading bot stopped",
+                        "timestamp": datetime.now().isoformat()
+                    }, session_id)
+                    break
                 
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for session {session_id}")
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
     finally:
+        for task in (receive_task, snapshot_task):
+            if task is not None:
+                task.cancel()
+        market_snapshots.unsubscribe()
         manager.disconnect(websocket, session_id)
 
 @app.get("/api/market-data")
 async def get_market_data():
     """Get current market data"""
+    global market_data_bot
+    
     try:
-        # Create a temporary bot to get market data
-        temp_bot = UpbitTradingBot(virtual_mode=True)
-        opportunity = temp_bot.calculate_arbitrage_opportunity()
+        if market_data_bot is None:
+            market_data_bot = UpbitTradingBot(virtual_mode=True)
+        opportunity = await run_io(market_data_bot.calculate_arbitrage_opportunity)
         
         return {
             "success": True,
@@ -508,9 +629,11 @@ async def get_market_data():
 async def optimize_strategy(
     start_date: str,
     end_date: str,
-    param_ranges: Optional[str] = None
+    param_ranges: Optional[str] = None,
+    search: str = "grid",
+    n_trials: int = 50
 ):
-    """Optimize trading strategy parameters"""
+    """Optimize trading strategy parameters (search: grid, random, halving or tpe)"""
     try:
         start_dt = datetime.strptime(start_date, "%Y-%m-%d")
         end_dt = datetime.strptime(end_date, "%Y-%m-%d")
@@ -527,7 +650,11 @@ async def optimize_strategy(
         
         # Run optimization
         backtest = EnhancedUpbitBacktest()
-        optimization_result = backtest.optimize_parameters(start_dt, end_dt, ranges)
+        search_options = {'n_trials': n_trials} if search in ('random', 'tpe') else {}
+        # The sweep fans out to its own process pool, so only its driver occupies a CPU-lane thread
+        optimization_result = await get_executors().cpu.run_in_thread(
+            backtest.optimize_parameters, start_dt, end_dt, ranges, cache_dir='data_cache',
+            search=search, search_options=search_options)
         
         return {
             "success": True,
@@ -552,6 +679,9 @@ async def startup_event():
     os.makedirs("logs", exist_ok=True)
     os.makedirs("exports", exist_ok=True)
     
+    # Start refreshing shared market data
+    get_market_data_hub().start()
+    
     logger.info("Web app initialized successfully")
 
 @app.on_event("shutdown")
@@ -571,6 +701,10 @@ async def shutdown_event():
     active_sessions.clear()
     virtual_traders.clear()
     
+    await market_snapshots.stop()
+    get_market_data_hub().stop()
+    get_executors().shutdown()
+    
     logger.info("Web app shutdown complete")
 
 # Legacy endpoint for backward compatibility
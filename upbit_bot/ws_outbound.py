@@ -0,0 +1,174 @@
+"""
+Per-Client WebSocket Outbound Queues
+
+Each connection gets a bounded queue drained by its own writer task, so a
+broadcast only enqueues and returns, and a slow or stalled browser delays
+nobody but itself.
+
+Replaceable messages are periodic updates where only the newest matters,
+such as status and progress. A newer replaceable message supersedes a queued,
+unsent one of the same type and job_id, so progress of concurrent jobs is
+kept apart. When the queue is full, the slow-consumer policy
+decides what happens:
+
+- 'coalesce' (default): drop the oldest queued replaceable message to make
+  room. If none is queued, a new replaceable message is dropped instead. If
+  the new message is not replaceable either, the client is disconnected.
+- 'drop_oldest': drop the oldest queued replaceable message to make room.
+  If none is queued, the client is disconnected, since results, errors and
+  other one-off messages are never dropped.
+- 'disconnect': close the connection.
+
+A send that takes longer than send_timeout also disconnects the client.
+Messages are framed by the connection's WireSession when they are sent, so
+delta encoding always diffs against what the client actually received.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterable, Optional, Tuple
+from .ws_protocol import Frame, WireSession, send_frame
+
+logger = logging.getLogger(__name__)
+
+SLOW_CONSUMER_POLICIES = ['coalesce', 'drop_oldest', 'disconnect']
+
+@dataclass
+class OutboundQueueConfig:
+    """Limits for each connection's outbound queue"""
+    max_queued: int = 64          # Messages waiting per connection
+    policy: str = 'coalesce'      # What to do when the queue is full (see SLOW_CONSUMER_POLICIES)
+    send_timeout: float = 10.0    # Seconds one send may take before the client is dropped
+
+@dataclass
+class _Outbound:
+    message_type: Optional[str]
+    coalesce_key: Tuple[Optional[str], Any]   # (type, job_id): updates of different jobs never replace each other
+    message: Any                  # Plain message, or None if frame is preset
+    frame: Optional[Frame]        # Pre-encoded frame shared by identical clients
+    enqueued_at: float
+
+class ClientWriter:
+    """Bounded outbound queue and writer task for one WebSocket"""
+
+    def __init__(self, websocket, wire: WireSession, config: Optional[OutboundQueueConfig] = None,
+                 replaceable_types: Iterable[str] = (), on_close: Optional[Callable[[Any], None]] = None):
+        self.websocket = websocket
+        self.wire = wire
+        self.config = config or OutboundQueueConfig()
+        if self.config.policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy '{self.config.policy}'; "
+                             f"choose from {SLOW_CONSUMER_POLICIES}")
+        self.replaceable_types = set(replaceable_types)
+        self.closed = False
+        self._on_close = on_close
+        self._queue: Deque[_Outbound] = deque()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._counters = {
+            'enqueued': 0, 'sent': 0, 'coalesced': 0, 'dropped': 0, 'peak_queued': 0,
+            'latency_seconds': 0.0, 'max_latency_seconds': 0.0, 'send_seconds': 0.0
+        }
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name='ws-writer')
+
+    def send(self, message: Any = None, frame: Optional[Frame] = None) -> bool:
+        """Queue a plain message (or a ready frame) without waiting; False if it was not queued"""
+        if self.closed:
+            return False
+        message_type = message.get('type') if isinstance(message, dict) else None
+        job_id = message.get('job_id') if isinstance(message, dict) else None
+        item = _Outbound(message_type, (message_type, job_id), message, frame, time.perf_counter())
+        replaceable = message_type in self.replaceable_types
+
+        if replaceable:
+            for queued in self._queue:
+                if queued.coalesce_key == item.coalesce_key:
+                    self._queue.remove(queued)
+                    self._counters['coalesced'] += 1
+                    break
+
+        if len(self._queue) >= self.config.max_queued and not self._make_room(replaceable):
+            return False
+
+        self._queue.append(item)
+        self._counters['enqueued'] += 1
+        self._counters['peak_queued'] = max(self._counters['peak_queued'], len(self._queue))
+        self._ready.set()
+        return True
+
+    def _make_room(self, replaceable: bool) -> bool:
+        policy = self.config.policy
+        if policy in ('coalesce', 'drop_oldest'):
+            for queued in self._queue:
+                if queued.message_type in self.replaceable_types:
+                    self._queue.remove(queued)
+                    self._counters['dropped'] += 1
+                    return True
+            if policy == 'coalesce' and replaceable:
+                self._counters['dropped'] += 1  # Nothing older to drop; the update itself is expendable
+                return False
+        logger.warning(f"WebSocket client fell {len(self._queue)} messages behind; disconnecting")
+        self.close()
+        return False
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                while not self._queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                item = self._queue.popleft()
+                frame = item.frame if item.frame is not None else self.wire.encode(item.message)
+                started = time.perf_counter()
+                await asyncio.wait_for(send_frame(self.websocket, frame), self.config.send_timeout)
+                finished = time.perf_counter()
+                latency = finished - item.enqueued_at
+                self._counters['sent'] += 1
+                self._counters['send_seconds'] += finished - started
+                self._counters['latency_seconds'] += latency
+                self._counters['max_latency_seconds'] = max(self._counters['max_latency_seconds'], latency)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"WebSocket send took over {self.config.send_timeout}s; disconnecting")
+            self.close()
+        except Exception as e:
+            logger.error(f"Error sending to WebSocket: {e}")
+            self.close()
+
+    def close(self) -> None:
+        """Stop the writer and drop queued messages; runs on_close once"""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        asyncio.ensure_future(self._close_socket())
+        if self._on_close is not None:
+            self._on_close(self.websocket)
+
+    async def _close_socket(self) -> None:
+        try:
+            await self.websocket.close(code=1013)  # Try again later
+        except Exception:
+            pass  # Already closed by the client
+
+    def stats(self) -> Dict[str, Any]:
+        sent = self._counters['sent']
+        return {
+            'queued': len(self._queue),
+            'peak_queued': self._counters['peak_queued'],
+            'enqueued': self._counters['enqueued'],
+            'sent': sent,
+            'coalesced': self._counters['coalesced'],
+            'dropped': self._counters['dropped'],
+            'mean_latency_ms': self._counters['latency_seconds'] / sent * 1000 if sent else 0.0,
+            'max_latency_ms': self._counters['max_latency_seconds'] * 1000,
+            'mean_send_ms': self._counters['send_seconds'] / sent * 1000 if sent else 0.0
+        }
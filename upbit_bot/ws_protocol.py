@@ -0,0 +1,242 @@
+"""
+Dashboard WebSocket Wire Protocol
+
+Clients pick a wire format and delta mode when they connect, through query
+parameters: /ws?format=msgpack&delta=1. Without parameters, messages are
+plain JSON text exactly as before, so existing dashboards keep working.
+
+- format=json (default) sends compact JSON text frames. format=msgpack
+  sends MessagePack binary frames; it falls back to JSON if msgpack is not
+  installed.
+- delta=1 numbers every frame with 'seq'. State messages (types the server
+  marks as state, such as periodic status or market updates) are sent as
+  {'type', 'seq', 'full': state} on connect or resync. After that they are
+  sent as {'type', 'seq', 'base': seq, 'delta': patch}: a field-level patch
+  against the newest state of that type that the client has acknowledged.
+  Clients send {'type': 'ack', 'seq': n} once they have applied every frame
+  up to n, and {'type': 'resync'} to get full states again. If too many
+  frames go unacknowledged, the server falls back to a full state.
+
+A patch is {'s': {key: value}, 'd': [key, ...], 'p': {key: patch}}: keys to
+set, keys to delete, and nested dicts to patch. Lists and scalars are
+replaced whole. apply_patch() is the reference implementation for clients.
+
+Payloads are converted to plain types once per message (to_wire), instead of
+through a json default= callback on every object.
+"""
+
+import json
+import math
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional, Set, Tuple, Union
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # Optional; clients asking for msgpack get JSON instead
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+WIRE_FORMATS = ['json', 'msgpack']
+
+Frame = Union[str, bytes]
+
+def to_wire(value: Any) -> Any:
+    """Copy of value made only of dict/list/str/int/float/bool/None"""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, dict):
+        return {str(key): to_wire(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_wire(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime, date)) or hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'to_dict'):
+        return to_wire(value.to_dict())
+    return str(value)
+
+def encode_frame(message: Dict, wire_format: str = 'json') -> Frame:
+    """Serialize an already plain message; msgpack yields bytes, JSON yields text"""
+    if wire_format == 'msgpack':
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message, separators=(',', ':'))
+
+def decode_frame(frame: Frame) -> Any:
+    """Parse a client frame: bytes as msgpack, text as JSON"""
+    if isinstance(frame, (bytes, bytearray)):
+        if msgpack is None:
+            raise ValueError("Binary frames need msgpack installed")
+        return msgpack.unpackb(frame, raw=False)
+    return json.loads(frame)
+
+def _same(old: Any, new: Any) -> bool:
+    if isinstance(old, float) and isinstance(new, float) and math.isnan(old) and math.isnan(new):
+        return True
+    return type(old) is type(new) and old == new
+
+def diff_state(old: Dict, new: Dict) -> Dict:
+    """Field-level patch that turns old into new (empty if they are equal)"""
+    patch: Dict[str, Any] = {}
+    sets = {}
+    nested = {}
+    for key, value in new.items():
+        if key not in old:
+            sets[key] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            sub = diff_state(old[key], value)
+            if sub:
+                nested[key] = sub
+        elif not _same(old[key], value):
+            sets[key] = value
+    deleted = [key for key in old if key not in new]
+    if sets:
+        patch['s'] = sets
+    if deleted:
+        patch['d'] = deleted
+    if nested:
+        patch['p'] = nested
+    return patch
+
+def apply_patch(state: Dict, patch: Dict) -> Dict:
+    """Reference client-side application of a diff_state patch; returns a new dict"""
+    result = dict(state)
+    for key in patch.get('d', []):
+        result.pop(key, None)
+    result.update(patch.get('s', {}))
+    for key, sub in patch.get('p', {}).items():
+        result[key] = apply_patch(result.get(key) or {}, sub)
+    return result
+
+@dataclass
+class _ChannelState:
+    acked: Optional[Tuple[int, Dict]] = None                 # (seq, state) the client has confirmed
+    pending: Dict[int, Dict] = field(default_factory=dict)   # Sent but unacknowledged states by seq
+
+class WireSession:
+    """Negotiated format, sequence numbers and acknowledged states for one connection"""
+
+    def __init__(self, wire_format: str = 'json', delta: bool = False,
+                 state_types: Iterable[str] = (), max_unacked: int = 32):
+        if wire_format not in WIRE_FORMATS:
+            raise ValueError(f"Unknown wire format '{wire_format}'; choose from {WIRE_FORMATS}")
+        if wire_format == 'msgpack' and msgpack is None:
+            logger.warning("msgpack is not installed; using JSON")
+            wire_format = 'json'
+        self.format = wire_format
+        self.delta = delta
+        self.state_types: Set[str] = set(state_types)
+        self.max_unacked = max_unacked  # Unacknowledged states per type before falling back to full
+        self.seq = 0
+        self.stats = {'frames': 0, 'bytes': 0, 'full_states': 0, 'delta_states': 0}
+        self._channels: Dict[str, _ChannelState] = {}
+
+    @classmethod
+    def from_query(cls, query_params, state_types: Iterable[str] = ()) -> 'WireSession':
+        """Session negotiated from ?format=json|msgpack&delta=0|1"""
+        wire_format = query_params.get('format', 'json').lower()
+        if wire_format not in WIRE_FORMATS:
+            logger.warning(f"Unknown wire format '{wire_format}' requested; using JSON")
+            wire_format = 'json'
+        delta = query_params.get('delta', '0').lower() in ('1', 'true', 'yes')
+        return cls(wire_format, delta, state_types)
+
+    @property
+    def is_legacy(self) -> bool:
+        """Plain JSON without sequence numbers, identical for every such client"""
+        return self.format == 'json' and not self.delta
+
+    @property
+    def binary(self) -> bool:
+        return self.format == 'msgpack'
+
+    def describe(self) -> Dict[str, Any]:
+        return {'type': 'protocol', 'format': self.format, 'delta': self.delta,
+                'state_types': sorted(self.state_types)}
+
+    def encode(self, message: Dict) -> Frame:
+        """Frame a plain (to_wire) message for this client"""
+        if not self.delta:
+            frame = encode_frame(message, self.format)
+        else:
+            self.seq += 1
+            message_type = message.get('type')
+            if message_type in self.state_types:
+                envelope = self._state_envelope(message_type, message)
+            else:
+                envelope = dict(message, seq=self.seq)
+            frame = encode_frame(envelope, self.format)
+        self.stats['frames'] += 1
+        self.stats['bytes'] += len(frame)
+        return frame
+
+    def _state_envelope(self, message_type: str, state: Dict) -> Dict:
+        channel = self._channels.setdefault(message_type, _ChannelState())
+        if channel.acked is None or len(channel.pending) >= self.max_unacked:
+            if channel.pending and len(channel.pending) >= self.max_unacked:
+                channel.pending.clear()
+                channel.acked = None
+            envelope = {'type': message_type, 'seq': self.seq, 'full': state}
+            self.stats['full_states'] += 1
+        else:
+            base_seq, base_state = channel.acked
+            envelope = {'type': message_type, 'seq': self.seq, 'base': base_seq,
+                        'delta': diff_state(base_state, state)}
+            self.stats['delta_states'] += 1
+        channel.pending[self.seq] = state
+        return envelope
+
+    def acknowledge(self, seq: int) -> None:
+        """The client has applied every frame up to and including seq"""
+        for channel in self._channels.values():
+            confirmed = [sent for sent in channel.pending if sent <= seq]
+            if confirmed:
+                newest = max(confirmed)
+                channel.acked = (newest, channel.pending[newest])
+                for sent in confirmed:
+                    del channel.pending[sent]
+
+    def resync(self) -> None:
+        """Forget acknowledged states so the next state of every type is sent in full"""
+        self._channels.clear()
+
+    def handle_control(self, message: Any) -> bool:
+        """Apply an 'ack' or 'resync' client message; False if message is something else"""
+        if not isinstance(message, dict):
+            return False
+        if message.get('type') == 'ack':
+            self.acknowledge(int(message.get('seq', 0)))
+            return True
+        if message.get('type') == 'resync':
+            self.resync()
+            return True
+        return False
+
+async def receive_message(websocket) -> Any:
+    """Next client message from a Starlette WebSocket, decoded from text JSON or binary msgpack
+
+    Text that is not JSON is returned as the raw string.
+    """
+    message = await websocket.receive()
+    if message['type'] == 'websocket.disconnect':
+        from starlette.websockets import WebSocketDisconnect
+        raise WebSocketDisconnect(message.get('code', 1000))
+    if message.get('bytes') is not None:
+        return decode_frame(message['bytes'])
+    text = message.get('text') or ''
+    try:
+        return decode_frame(text)
+    except ValueError:
+        return text
+
+async def send_frame(websocket, frame: Frame) -> None:
+    if isinstance(frame, bytes):
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(frame)
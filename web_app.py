@@ -5,13 +5,14 @@ FastAPI backend with WebSocket support for real-time updates
 
 import asyncio
 import json
+import os
 import logging
 import traceback
-from datetime import datetime
+from datetime import date, datetime
 from typing import Dict, List, Optional, Any
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, BackgroundTasks
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse
 from pydantic import BaseModel, Field
 import uvicorn
 
@@ -19,8 +20,18 @@ import uvicorn
 from upbit_bot.backtest import BacktestConfig, EnhancedUpbitBacktest
 from upbit_bot.trading_bot import TradingConfig, UpbitTradingBot
 from upbit_bot.kimchi_premium import KimchiPremiumCalculator
+from upbit_bot.bitcoin_kimchi_strategy import BitcoinKimchiPremiumCalculator
+from upbit_bot.market_data_hub import get_market_data_hub
+from upbit_bot.order_book import trim_order_books
+from upbit_bot.fx_rate import get_fx_provider
+from upbit_bot.executors import ExecutorBusy, get_executors, run_io, run_cpu
+from upbit_bot.executors import run_bitcoin_backtest as bitcoin_backtest_job
+from upbit_bot.ws_protocol import WireSession, encode_frame, receive_message, to_wire
+from upbit_bot.ws_outbound import ClientWriter, OutboundQueueConfig
+from upbit_bot.job_queue import Job, JobQueue, JobQueueFull, current_job_id
+from upbit_bot.result_views import INLINE_ROWS, downsample, inline_view, paginate_table
 from debug_backtest import DebugUpbitBacktest
-from upbit_bot.bitcoin_backtest import BitcoinBacktestConfig, BitcoinBacktester
+from upbit_bot.bitcoin_backtest import BitcoinBacktestConfig
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -34,6 +45,7 @@ active_connections: List[WebSocket] = []
 running_tasks: Dict[str, bool] = {}
 bot_instance: Optional[UpbitTradingBot] = None
 kimchi_calculator: Optional[KimchiPremiumCalculator] = None
+bitcoin_kimchi_calculator: Optional[BitcoinKimchiPremiumCalculator] = None
 
 # Pydantic models for API
 class BacktestRequest(BaseModel):
@@ -48,6 +60,7 @@ class BacktestRequest(BaseModel):
     take_profit: float = Field(1.0, description="Take profit percentage")
     max_trades_per_day: int = Field(10, description="Maximum trades per day")
     use_real_data: bool = Field(True, description="Use real historical data")
+    seed: Optional[int] = Field(42, description="Seed for synthetic prices and simulated FX noise (None: new data every run)")
     debug_mode: bool = Field(False, description="Enable debug mode")
     verbose_debug: bool = Field(False, description="Enable verbose debug")
     show_signals: bool = Field(False, description="Show trading signals")
@@ -71,6 +84,9 @@ class OptimizationRequest(BaseModel):
     threshold_min: float = Field(0.1, description="Minimum threshold to test")
     threshold_max: float = Field(2.0, description="Maximum threshold to test")
     threshold_step: float = Field(0.1, description="Threshold step size")
+    search: str = Field("grid", description="Search strategy: grid, random, halving or tpe")
+    n_trials: int = Field(30, description="Evaluations for random and tpe search")
+    seed: int = Field(42, description="Seed for the synthetic prices every threshold is scored on")
 
 class BitcoinArbitrageRequest(BaseModel):
     """Request model for Bitcoin arbitrage strategy"""
@@ -93,73 +109,102 @@ class BitcoinBacktestRequest(BaseModel):
 
 # WebSocket connection manager
 class ConnectionManager:
-    def __init__(self):
+    # Periodic messages that replace the previous one of their type; sent as deltas to delta clients
+    STATE_TYPES = ('trading_status', 'backtest_progress', 'optimization_progress', 'bitcoin_backtest_progress')
+
+    def __init__(self, queue_config: Optional[OutboundQueueConfig] = None):
         self.active_connections: List[WebSocket] = []
+        self.sessions: Dict[WebSocket, WireSession] = {}
+        # Each connection is written by its own task, so a slow client only delays itself
+        self.writers: Dict[WebSocket, ClientWriter] = {}
+        self.queue_config = queue_config or OutboundQueueConfig()
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
+        session = WireSession.from_query(websocket.query_params, self.STATE_TYPES)
+        writer = ClientWriter(websocket, session, self.queue_config, self.STATE_TYPES, on_close=self.disconnect)
         self.active_connections.append(websocket)
-        logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
+        self.sessions[websocket] = session
+        self.writers[websocket] = writer
+        writer.start()
+        if not session.is_legacy:
+            writer.send(session.describe())
+        logger.info(f"WebSocket connected ({session.format}, delta={session.delta}). "
+                    f"Total connections: {len(self.active_connections)}")
 
     def disconnect(self, websocket: WebSocket):
+        writer = self.writers.pop(websocket, None)
+        self.sessions.pop(websocket, None)
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
-        logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
+            logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
+        if writer is not None:
+            writer.close()
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        try:
-            await websocket.send_text(message)
-        except Exception as e:
-            logger.error(f"Error sending personal message: {e}")
+        writer = self.writers.get(websocket)
+        if writer is not None:
+            writer.send(frame=message)
 
     async def broadcast(self, message: str):
-        """Broadcast message to all connected clients"""
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting to connection: {e}")
-                disconnected.append(connection)
-        
-        # Remove disconnected connections
-        for connection in disconnected:
-            self.disconnect(connection)
+        """Queue a text message for every connected client"""
+        for writer in list(self.writers.values()):
+            writer.send(frame=message)
 
     async def send_data(self, data: Dict[str, Any]):
-        """Send structured data to all connected clients"""
-        def json_serializer(obj):
-            """Custom JSON serializer for datetime objects"""
-            if hasattr(obj, 'isoformat'):
-                return obj.isoformat()
-            elif isinstance(obj, (int, float, str, bool, list, dict, type(None))):
-                return obj
-            else:
-                return str(obj)
-        
+        """Queue structured data for every client in its negotiated wire format"""
+        legacy_frame = None
         try:
-            message = json.dumps(data, default=json_serializer)
-            await self.broadcast(message)
+            message = to_wire(data)
         except Exception as e:
-            logger.error(f"Error serializing data to JSON: {e}")
-            # Send error message instead
-            error_message = json.dumps({
-                "type": "serialization_error",
-                "error": str(e)
-            })
-            await self.broadcast(error_message)
+            logger.error(f"Error converting data for WebSocket: {e}")
+            message = {"type": "serialization_error", "error": str(e)}
+
+        for writer in list(self.writers.values()):
+            if writer.wire.is_legacy:
+                # Identical for every plain JSON client, so encode it once
+                if legacy_frame is None:
+                    legacy_frame = encode_frame(message)
+                writer.send(message, frame=legacy_frame)
+            else:
+                writer.send(message)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self.active_connections),
+            "policy": self.queue_config.policy,
+            "max_queued": self.queue_config.max_queued,
+            "clients": [
+                {"format": writer.wire.format, "delta": writer.wire.delta, "seq": writer.wire.seq,
+                 **writer.wire.stats, **writer.stats()}
+                for writer in self.writers.values()
+            ]
+        }
 
 manager = ConnectionManager()
 
+async def broadcast_job_update(job: Job):
+    await manager.send_data({
+        "type": "job_update",
+        **{key: value for key, value in job.to_dict().items() if key != "spec"}
+    })
+
+# Backtests and optimizations run as queued jobs whose results are kept on disk
+jobs = JobQueue(on_update=broadcast_job_update)
+
 # WebSocket endpoint
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         while True:
-            data = await websocket.receive_text()
+            data = await receive_message(websocket)
+            session = manager.sessions.get(websocket)
+            if session is not None and session.handle_control(data):
+                continue
             # Echo received data (can be used for client-server communication)
-            await manager.send_personal_message(f"Echo: {data}", websocket)
+            echo = data if isinstance(data, str) else json.dumps(data)
+            await manager.send_personal_message(f"Echo: {echo}", websocket)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
@@ -177,14 +222,78 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
-@app.post("/api/backtest")
-async def run_backtest(request: BacktestRequest, background_tasks: BackgroundTasks):
-    """Run backtest with given parameters"""
-    if "backtest" in running_tasks and running_tasks["backtest"]:
-        raise HTTPException(status_code=409, detail="Backtest is already running")
+@app.on_event("startup")
+async def start_market_data_hub():
+    """Keep shared market data refreshed for every endpoint and dashboard"""
+    get_market_data_hub().start()
+
+@app.on_event("startup")
+async def start_job_queue():
+    """Register the job runners and resume jobs left unfinished by the last run"""
+    jobs.register("backtest", lambda spec: execute_backtest(BacktestRequest(**spec)), backtest_is_reusable)
+    jobs.register("optimization", lambda spec: execute_optimization(OptimizationRequest(**spec)))
+    jobs.register("bitcoin_backtest", lambda spec: execute_bitcoin_backtest(BitcoinBacktestRequest(**spec)))
+    await jobs.start()
+
+@app.on_event("shutdown")
+async def stop_market_data_hub():
+    await jobs.stop()
+    get_market_data_hub().stop()
+    get_executors().shutdown()
+
+def result_is_final(kind: str, spec: Dict[str, Any]) -> bool:
+    """Whether running spec again later would give the same result
+
+    Optimizations score every threshold on synthetic prices from spec's seed.
+    Backtests draw synthetic prices (or FX noise over real prices) from their
+    seed, so without one every run differs. Real market data for a range
+    ending today or later is still arriving, so such a result is only good
+    until the next candle.
+    """
+    if kind == "optimization":
+        return True
+    if kind == "backtest":
+        if spec.get("seed") is None:
+            return False
+        if not spec.get("use_real_data", True):
+            return True
+    try:
+        return datetime.strptime(spec["end_date"], "%Y-%m-%d").date() < date.today()
+    except (KeyError, TypeError, ValueError):
+        return False
+
+def backtest_is_reusable(spec: Dict[str, Any], result: Dict[str, Any]) -> bool:
+    """False when real data was requested but the backtest fell back to synthetic prices"""
+    return result.get("data_source") == ("real" if spec.get("use_real_data", True) else "synthetic")
+
+async def submit_job(kind: str, request: BaseModel, complete_type: str, force: bool = False) -> Dict[str, Any]:
+    """Queue a job, or replay the stored result of an identical one that already finished
+
+    Stored results are only replayed for date ranges fully in the past; force
+    runs the job again regardless.
+    """
+    spec = request.model_dump()
+    try:
+        job, reused = await jobs.submit(kind, spec, reuse_result=not force and result_is_final(kind, spec))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     
-    background_tasks.add_task(execute_backtest, request)
-    return {"status": "started", "message": "Backtest started successfully"}
+    if reused and job.status == 'succeeded':
+        await manager.send_data({
+            "type": complete_type,
+            "job_id": job.job_id,
+            "cached": True,
+            "data": await jobs.result(job.job_id, INLINE_ROWS)
+        })
+        return {"status": "cached", "job_id": job.job_id, "message": "Identical job already finished; sent stored result"}
+    if reused:
+        return {"status": job.status, "job_id": job.job_id, "message": "Identical job is already in progress"}
+    return {"status": "queued", "job_id": job.job_id, "message": f"{kind} job queued"}
+
+@app.post("/api/backtest")
+async def run_backtest(request: BacktestRequest, force: bool = False):
+    """Run backtest with given parameters (force=true ignores a stored result)"""
+    return await submit_job("backtest", request, "backtest_complete", force)
 
 @app.post("/api/trading/start")
 async def start_trading(request: TradingRequest, background_tasks: BackgroundTasks):
@@ -229,12 +338,14 @@ async def get_kimchi_premium():
         if not kimchi_calculator:
             kimchi_calculator = KimchiPremiumCalculator()
         
-        result = kimchi_calculator.calculate_kimchi_premium()
+        result = await run_io(kimchi_calculator.calculate_kimchi_premium)
         return {
             "status": "success",
             "data": result,
             "timestamp": datetime.now().isoformat()
         }
+    except ExecutorBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting kimchi premium: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting kimchi premium: {str(e)}")
@@ -242,29 +353,46 @@ async def get_kimchi_premium():
 @app.get("/api/bitcoin-kimchi-premium")
 async def get_bitcoin_kimchi_premium():
     """Get current Bitcoin kimchi premium"""
+    global bitcoin_kimchi_calculator
+    
     try:
-        from upbit_bot.bitcoin_kimchi_strategy import BitcoinKimchiPremiumCalculator
+        if not bitcoin_kimchi_calculator:
+            bitcoin_kimchi_calculator = BitcoinKimchiPremiumCalculator()
         
-        calculator = BitcoinKimchiPremiumCalculator()
-        result = calculator.calculate_bitcoin_kimchi_premium()
+        result = await run_io(bitcoin_kimchi_calculator.calculate_bitcoin_kimchi_premium)
         
         return {
             "status": "success",
-            "data": result,
+            "data": trim_order_books(result),
             "timestamp": datetime.now().isoformat()
         }
+    except ExecutorBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting Bitcoin kimchi premium: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting Bitcoin kimchi premium: {str(e)}")
 
+@app.get("/api/market-snapshot")
+async def get_market_snapshot():
+    """Get every cached ticker and order book with its fetch time and age"""
+    hub = get_market_data_hub()
+    try:
+        # The first USD/KRW read fetches synchronously
+        fx_quote = await run_io(get_fx_provider().get_quote)
+    except ExecutorBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {
+        "status": "success",
+        "data": hub.snapshot(),
+        "stream": hub.stream.status() if hub.stream is not None else None,
+        "usd_krw": fx_quote.to_dict(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.post("/api/bitcoin-backtest")
-async def run_bitcoin_backtest(request: BitcoinBacktestRequest, background_tasks: BackgroundTasks):
-    """Run Bitcoin arbitrage strategy backtest"""
-    if "bitcoin_backtest" in running_tasks and running_tasks["bitcoin_backtest"]:
-        raise HTTPException(status_code=409, detail="Bitcoin backtest is already running")
-    
-    background_tasks.add_task(execute_bitcoin_backtest, request)
-    return {"status": "started", "message": "Bitcoin arbitrage backtest started"}
+async def run_bitcoin_backtest(request: BitcoinBacktestRequest, force: bool = False):
+    """Run Bitcoin arbitrage strategy backtest (force=true ignores a stored result)"""
+    return await submit_job("bitcoin_backtest", request, "bitcoin_backtest_complete", force)
 
 @app.post("/api/bitcoin-arbitrage/start")
 async def start_bitcoin_arbitrage(request: BitcoinArbitrageRequest):
@@ -313,45 +441,108 @@ async def get_bitcoin_arbitrage_status():
                 "message": "Bitcoin arbitrage strategy is not running"
             }
         
-        status = bitcoin_strategy.get_strategy_status()
+        status = await run_io(bitcoin_strategy.get_strategy_status)
         return {
             "status": "active",
             "data": status,
             "timestamp": datetime.now().isoformat()
         }
+    except ExecutorBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting Bitcoin arbitrage status: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting Bitcoin arbitrage status: {str(e)}")
 
 @app.post("/api/optimize")
-async def optimize_parameters(request: OptimizationRequest, background_tasks: BackgroundTasks):
-    """Optimize trading parameters"""
-    if "optimization" in running_tasks and running_tasks["optimization"]:
-        raise HTTPException(status_code=409, detail="Optimization is already running")
+async def optimize_parameters(request: OptimizationRequest, force: bool = False):
+    """Optimize trading parameters (force=true ignores a stored result)"""
+    return await submit_job("optimization", request, "optimization_complete", force)
+
+@app.get("/api/jobs")
+async def list_jobs(limit: int = 50, kind: Optional[str] = None):
+    """Most recent jobs, newest first"""
+    return {"jobs": [job.to_dict() for job in jobs.list_jobs(limit, kind)], "queue": jobs.stats()}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, max_rows: int = INLINE_ROWS):
+    """Status of a job, with its result once it has succeeded
     
-    background_tasks.add_task(execute_optimization, request)
-    return {"status": "started", "message": "Parameter optimization started"}
+    Tables (trades, balance history) longer than max_rows are replaced by their
+    row count and columns; fetch them with the tables and series endpoints.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {**job.to_dict(), "result": await jobs.result(job_id, max_rows)}
+
+async def get_job_table(job_id: str, name: str) -> Dict[str, Any]:
+    """Column arrays of one table of a finished job, or an HTTP error"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != 'succeeded':
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    tables = await jobs.tables(job_id)
+    if name not in tables:
+        raise HTTPException(status_code=404, detail=f"Result has no table '{name}' (tables: {', '.join(tables) or 'none'})")
+    return tables[name]
+
+@app.get("/api/jobs/{job_id}/tables/{name}")
+async def get_job_table_page(job_id: str, name: str, cursor: Optional[str] = None, limit: int = 500):
+    """One page of a result table, e.g. trades; follow next_cursor for the rest"""
+    columns = await get_job_table(job_id, name)
+    try:
+        return paginate_table(columns, cursor, min(max(limit, 1), 5000))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/jobs/{job_id}/tables/{name}/series")
+async def get_job_series(job_id: str, name: str, columns: str, width: int = 1000,
+                         method: str = "lttb", x: Optional[str] = "time"):
+    """Comma-separated columns of a result table downsampled for a chart width pixels wide"""
+    table = await get_job_table(job_id, name)
+    x_name = x if x in table else None
+    try:
+        # Short numpy work, but it scans every row, so keep it off the loop
+        return await run_io(downsample, table, columns.split(","), min(max(width, 3), 20000), method, x_name)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=e.args[0] if e.args else str(e))
+
+@app.get("/api/jobs/{job_id}/download")
+async def download_job_tables(job_id: str):
+    """Every table of a finished job at full resolution, as a NumPy .npz archive of columns"""
+    job = jobs.get(job_id)
+    if job is None or job.status != 'succeeded':
+        raise HTTPException(status_code=404, detail="No finished job with that ID")
+    path = jobs.store.tables_path(job_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Job result has no tables")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{job.kind}-{job_id}.npz")
 
 @app.get("/api/status")
 async def get_status():
     """Get current system status"""
     return {
-        "running_tasks": running_tasks,
+        "running_tasks": {**running_tasks, **{job["kind"]: True for job in jobs.stats()["running"]}},
         "active_connections": len(manager.active_connections),
+        "websockets": manager.stats(),
         "bot_active": bot_instance is not None,
+        "executors": get_executors().stats(),
+        "jobs": jobs.stats(),
         "timestamp": datetime.now().isoformat()
     }
 
 # Background task functions
-async def execute_backtest(request: BacktestRequest):
-    """Execute backtest in background"""
-    running_tasks["backtest"] = True
-    
+async def execute_backtest(request: BacktestRequest) -> Dict[str, Any]:
+    """Execute backtest as a job; returns the result sent to clients"""
+    # Captured here: progress is reported from worker threads, where the context is not set
+    job_id = current_job_id()
     try:
         logger.info("Starting backtest execution")
         
         await manager.send_data({
             "type": "backtest_started",
+            "job_id": job_id,
             "message": "Backtest started"
         })
         
@@ -374,11 +565,7 @@ async def execute_backtest(request: BacktestRequest):
             logger.info(f"Backtest config created: initial_balance_usd={config.initial_balance_usd}, buy_threshold={config.buy_threshold}, sell_threshold={config.sell_threshold}")
         except Exception as e:
             logger.error(f"Error creating BacktestConfig: {e}")
-            await manager.send_data({
-                "type": "backtest_error",
-                "error": f"Configuration error: {str(e)}"
-            })
-            return
+            raise ValueError(f"Configuration error: {str(e)}")
         
         # Create debug configuration
         debug_config = {
@@ -387,18 +574,21 @@ async def execute_backtest(request: BacktestRequest):
             'show_signals': request.show_signals
         }
         
-        # Create a simple queue-like system for WebSocket updates
+        loop = asyncio.get_running_loop()
+        
+        # Queue-like sink for WebSocket updates; the backtest runs on a worker thread
         class WebSocketQueue:
             def __init__(self, manager):
                 self.manager = manager
                 self.pending_tasks = []
                 
             def put(self, item):
-                task = asyncio.create_task(self.manager.send_data({
+                future = asyncio.run_coroutine_threadsafe(self.manager.send_data({
                     "type": "backtest_update",
+                    "job_id": job_id,
                     "data": item
-                }))
-                self.pending_tasks.append(task)
+                }), loop)
+                self.pending_tasks.append(asyncio.wrap_future(future, loop=loop))
                 
             async def wait_for_pending(self):
                 if self.pending_tasks:
@@ -412,12 +602,13 @@ async def execute_backtest(request: BacktestRequest):
         # Run backtest with progress tracking
         await manager.send_data({
             "type": "backtest_progress",
+            "job_id": job_id,
             "progress": 30,
             "message": "Running backtest simulation..."
         })
         
         # Create a progress-aware backtest wrapper
-        async def run_with_progress():
+        def run_with_progress():
             # Store original calculate_signal method
             original_calculate_signal = backtest.strategy.calculate_signal
             total_days = (end_dt - start_dt).days
@@ -428,25 +619,28 @@ async def execute_backtest(request: BacktestRequest):
                 current_day += 1
                 if current_day % max(1, total_days // 20) == 0:  # Update every 5%
                     progress = 30 + int((current_day / total_days) * 60)  # 30-90%
-                    asyncio.create_task(manager.send_data({
+                    asyncio.run_coroutine_threadsafe(manager.send_data({
                         "type": "backtest_progress",
+                        "job_id": job_id,
                         "progress": min(90, progress),
                         "message": f"Processing day {current_day}/{total_days}..."
-                    }))
+                    }), loop)
                 return original_calculate_signal(data)
             
             # Replace with progress-aware version
             backtest.strategy.calculate_signal = progress_aware_calculate_signal
             
-            # Run the backtest with real data as requested
-            result = backtest.run_backtest(start_dt, end_dt, use_real_data=request.use_real_data)
+            # Run the backtest with real data as requested; the seed makes synthetic prices repeatable
+            historical_data = backtest.load_historical_data(start_dt, end_dt, request.use_real_data, request.seed)
+            result = backtest.run_backtest_on_data(historical_data)
             
             # Restore original method
             backtest.strategy.calculate_signal = original_calculate_signal
             
-            return result
+            return result, historical_data.attrs.get('data_source')
         
-        result = await run_with_progress()
+        # Progress is reported back to the loop, so the job runs on a thread under the CPU lane's limits
+        result, data_source = await get_executors().cpu.run_in_thread(run_with_progress)
         
         # Wait for any pending WebSocket messages
         await ws_queue.wait_for_pending()
@@ -454,6 +648,7 @@ async def execute_backtest(request: BacktestRequest):
         # Send completion progress
         await manager.send_data({
             "type": "backtest_progress",
+            "job_id": job_id,
             "progress": 100,
             "message": "Backtest completed!"
         })
@@ -465,9 +660,7 @@ async def execute_backtest(request: BacktestRequest):
         if not manager.active_connections:
             logger.error("No active WebSocket connections to send results to!")
         
-        await manager.send_data({
-            "type": "backtest_complete",
-            "data": {
+        data = {
                 "initial_balance": float(result.initial_balance),
                 "final_balance": float(result.final_balance),
                 "total_return": float(result.total_return),
@@ -481,6 +674,7 @@ async def execute_backtest(request: BacktestRequest):
                 "losing_trades": int(result.losing_trades),
                 "average_win": float(result.average_win),
                 "average_loss": float(result.average_loss),
+                "data_source": data_source,
                 "trades": [
                     {
                         "timestamp": trade.timestamp if isinstance(trade.timestamp, str) else trade.timestamp.isoformat() if hasattr(trade.timestamp, 'isoformat') else str(trade.timestamp),
@@ -494,23 +688,25 @@ async def execute_backtest(request: BacktestRequest):
                     }
                     for trade in result.trades[-10:]  # Last 10 trades
                 ]
-            }
+        }
+        await manager.send_data({
+            "type": "backtest_complete",
+            "job_id": job_id,
+            "data": data
         })
         
         logger.info("Backtest results sent successfully")
-        
-        # Small delay to ensure messages are sent
-        await asyncio.sleep(0.5)
+        return data
         
     except Exception as e:
         logger.error(f"Backtest error: {e}")
         await manager.send_data({
             "type": "backtest_error",
+            "job_id": job_id,
             "error": str(e),
             "traceback": traceback.format_exc()
         })
-    finally:
-        running_tasks["backtest"] = False
+        raise
 
 async def execute_trading(request: TradingRequest):
     """Execute trading in background"""
@@ -566,19 +762,27 @@ async def execute_trading(request: TradingRequest):
         running_tasks["trading"] = False
 
 async def run_trading_bot(bot: UpbitTradingBot):
-    """Run trading bot with WebSocket updates"""
+    """Run trading bot on the event-driven runtime with WebSocket status updates"""
+    bot_task = asyncio.create_task(bot.run_bot_async())
     try:
-        # This would need to be adapted based on your trading bot implementation
-        # For now, we'll simulate trading activity
-        while running_tasks.get("trading", False):
-            await asyncio.sleep(60)  # Check every minute
+        while not bot_task.done():
+            await asyncio.wait({bot_task}, timeout=60)
+            if bot_task.done():
+                break
             
             # Send status update
             await manager.send_data({
                 "type": "trading_status",
-                "message": f"Bot is running - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+                "message": f"Bot is running - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                "decision_latency": bot.decision_latency.summary()
             })
+        
+        bot_task.result()
             
+    except asyncio.CancelledError:
+        bot.stop_bot()
+        await asyncio.gather(bot_task, return_exceptions=True)
+        raise
     except Exception as e:
         logger.error(f"Trading bot error: {e}")
         await manager.send_data({
@@ -586,13 +790,14 @@ async def run_trading_bot(bot: UpbitTradingBot):
             "error": str(e)
         })
 
-async def execute_optimization(request: OptimizationRequest):
-    """Execute parameter optimization in background"""
-    running_tasks["optimization"] = True
-    
+async def execute_optimization(request: OptimizationRequest) -> Dict[str, Any]:
+    """Execute parameter optimization as a job; returns the result sent to clients"""
+    # Captured here: progress is reported from worker threads, where the context is not set
+    job_id = current_job_id()
     try:
         await manager.send_data({
             "type": "optimization_started",
+            "job_id": job_id,
             "message": "Parameter optimization started"
         })
         
@@ -600,90 +805,97 @@ async def execute_optimization(request: OptimizationRequest):
         start_dt = datetime.strptime(request.start_date, "%Y-%m-%d")
         end_dt = datetime.strptime(request.end_date, "%Y-%m-%d")
         
-        # Generate parameter combinations
-        import numpy as np
-        thresholds = np.arange(request.threshold_min, request.threshold_max + request.threshold_step, request.threshold_step)
+        from upbit_bot.param_search import ParamSpec, get_search_strategy, upbit_evaluator
         
-        results = []
-        best_return = float('-inf')
-        best_params = None
+        base_config = BacktestConfig(
+            initial_balance_usd=float(request.initial_balance),
+            max_trade_amount=float(request.max_trade_amount),
+            stop_loss_threshold=2.0,
+            take_profit_threshold=1.0,
+            max_trades_per_day=10
+        )
         
-        total_combinations = len(thresholds)
+        # One seeded dataset, so every threshold is scored on the same prices
+        historical_data = await get_executors().cpu.run_in_thread(
+            EnhancedUpbitBacktest(base_config).load_historical_data, start_dt, end_dt, use_real_data=False, seed=request.seed)
+        space = [ParamSpec('price_threshold', request.threshold_min,
+                           request.threshold_max + request.threshold_step, request.threshold_step)]
+        # Evaluate in batches so progress is reported as the search goes
+        options = {'batch_size': 10}
+        if request.search in ('random', 'tpe'):
+            options['n_trials'] = request.n_trials
+        strategy = get_search_strategy(request.search, **options)
         
-        for i, threshold in enumerate(thresholds):
-            try:
-                # Create configuration
-                config = BacktestConfig(
-                    initial_balance_usd=float(request.initial_balance),
-                    max_trade_amount=float(request.max_trade_amount),
-                    price_threshold=float(threshold),
-                    stop_loss_threshold=2.0,
-                    take_profit_threshold=1.0,
-                    max_trades_per_day=10
-                )
-                
-                # Run backtest
-                backtest = EnhancedUpbitBacktest(config)
-                result = backtest.run_backtest(start_dt, end_dt, use_real_data=False)
-                
-                # Store result
-                result_data = {
-                    "threshold": float(threshold),
-                    "return_pct": float(result.return_percentage),
-                    "max_drawdown": float(result.max_drawdown),
-                    "trades": int(result.total_trades),
-                    "win_rate": float(result.win_rate)
-                }
-                results.append(result_data)
-                
-                if result.return_percentage > best_return:
-                    best_return = result.return_percentage
-                    best_params = result_data
-                
-                # Send progress update
-                progress = ((i + 1) / total_combinations) * 100
-                await manager.send_data({
-                    "type": "optimization_progress",
-                    "progress": progress,
-                    "message": f"Testing threshold {threshold:.2f}% - {i+1}/{total_combinations}"
-                })
-                
-            except Exception as e:
-                logger.error(f"Optimization error for threshold {threshold}: {e}")
+        loop = asyncio.get_running_loop()
+        
+        def report_progress(done: int, total: int):
+            asyncio.run_coroutine_threadsafe(manager.send_data({
+                "type": "optimization_progress",
+                "job_id": job_id,
+                "progress": done / total * 100 if total else 100,
+                "message": f"Tested {done}/{total} parameter sets"
+            }), loop)
+        
+        def search():
+            # One worker pool for every batch of the search, shut down when it finishes
+            with upbit_evaluator(historical_data, base_config) as evaluate:
+                return strategy.run(space, evaluate, report_progress)
+
+        # The search fans batches out to its own process pool and reports progress, so it runs on a thread
+        outcome = await get_executors().cpu.run_in_thread(search)
+        
+        results = []
+        best_params = None
+        for trial in outcome.full_trials:
+            if trial.summary is None:
                 continue
+            result_data = {
+                "threshold": float(trial.params['price_threshold']),
+                "return_pct": float(trial.summary['return_percentage']),
+                "max_drawdown": float(trial.summary['max_drawdown']),
+                "trades": int(trial.summary['total_trades']),
+                "win_rate": float(trial.summary['win_rate'])
+            }
+            results.append(result_data)
+            if trial.params is outcome.best_params:
+                best_params = result_data
         
         # Send results
+        data = {
+            "best_params": best_params,
+            "all_results": results
+        }
         await manager.send_data({
             "type": "optimization_complete",
-            "data": {
-                "best_params": best_params,
-                "all_results": results
-            }
+            "job_id": job_id,
+            "data": data
         })
+        return data
         
     except Exception as e:
         logger.error(f"Optimization error: {e}")
         await manager.send_data({
             "type": "optimization_error",
+            "job_id": job_id,
             "error": str(e),
             "traceback": traceback.format_exc()
         })
-    finally:
-        running_tasks["optimization"] = False
+        raise
 
-async def execute_bitcoin_backtest(request: BitcoinBacktestRequest):
-    """Execute Bitcoin arbitrage backtest in background"""
-    running_tasks["bitcoin_backtest"] = True
-    
+async def execute_bitcoin_backtest(request: BitcoinBacktestRequest) -> Dict[str, Any]:
+    """Execute Bitcoin arbitrage backtest as a job; returns the backtest results"""
+    # Captured here: progress is reported from worker threads, where the context is not set
+    job_id = current_job_id()
     try:
         logger.info("Starting Bitcoin arbitrage backtest")
         
         await manager.send_data({
             "type": "bitcoin_backtest_started",
+            "job_id": job_id,
             "message": "Bitcoin arbitrage backtest started"
         })
         
-        from upbit_bot.bitcoin_backtest import BitcoinBacktestConfig, BitcoinBacktester
+        from upbit_bot.bitcoin_backtest import BitcoinBacktestConfig
         
         # Create configuration
         config = BitcoinBacktestConfig(
@@ -694,33 +906,36 @@ async def execute_bitcoin_backtest(request: BitcoinBacktestRequest):
             max_position_size_btc=request.max_position_size_btc
         )
         
-        # Create and run backtest
-        backtester = BitcoinBacktester(config)
-        
         # Send progress updates
         await manager.send_data({
             "type": "bitcoin_backtest_progress",
+            "job_id": job_id,
             "progress": 20,
             "message": "Fetching historical data..."
         })
         
-        result = backtester.run_backtest(request.start_date, request.end_date)
+        result = await run_cpu(bitcoin_backtest_job, config, request.start_date, request.end_date)
+        if 'error' in result:
+            # Failed runs are reported, not stored as results
+            raise RuntimeError(result['error'])
         
-        # Send completion
+        # Send completion; long tables are fetched from the job's result endpoints
         await manager.send_data({
             "type": "bitcoin_backtest_complete",
-            "data": result
+            "job_id": job_id,
+            "data": await run_io(inline_view, result, INLINE_ROWS)
         })
+        return result
         
     except Exception as e:
         logger.error(f"Bitcoin backtest error: {e}")
         await manager.send_data({
             "type": "bitcoin_backtest_error",
+            "job_id": job_id,
             "error": str(e),
             "traceback": traceback.format_exc()
         })
-    finally:
-        running_tasks["bitcoin_backtest"] = False
+        raise
 
 def get_html_content():
     """Return the HTML content for the web interface"""
@@ -1345,9 +1560,10 @@ def get_html_content():
             
             function initializeWebSocket() {
                 const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-                const wsUrl = `${protocol}//${window.location.host}/ws`;
+                const wsUrl = `${protocol}//${window.location.host}/ws?delta=1`;
                 
                 ws = new WebSocket(wsUrl);
+                wireStates = {};
                 
                 ws.onopen = function() {
                     isConnected = true;
@@ -1356,11 +1572,16 @@ def get_html_content():
                 };
                 
                 ws.onmessage = function(event) {
+                    let data;
                     try {
-                        const data = JSON.parse(event.data);
-                        handleWebSocketMessage(data);
+                        data = JSON.parse(event.data);
                     } catch (e) {
                         addLog(`Received: ${event.data}`, 'info');
+                        return;
+                    }
+                    data = applyWireFrame(data);
+                    if (data) {
+                        handleWebSocketMessage(data);
                     }
                 };
                 
@@ -1378,6 +1599,43 @@ def get_html_content():
                 };
             }
             
+            // Delta protocol: states[type][seq] holds reconstructed states until acknowledged
+            let wireStates = {};
+            
+            function applyPatch(state, patch) {
+                const result = Object.assign({}, state);
+                (patch.d || []).forEach(key => delete result[key]);
+                Object.assign(result, patch.s || {});
+                Object.entries(patch.p || {}).forEach(([key, sub]) => {
+                    result[key] = applyPatch(result[key] || {}, sub);
+                });
+                return result;
+            }
+            
+            function applyWireFrame(frame) {
+                if (frame.seq === undefined || frame.type === 'protocol') {
+                    return frame;
+                }
+                let message = frame;
+                if (frame.full !== undefined || frame.delta !== undefined) {
+                    const states = wireStates[frame.type] = wireStates[frame.type] || {};
+                    if (frame.full !== undefined) {
+                        message = frame.full;
+                    } else if (states[frame.base] !== undefined) {
+                        message = applyPatch(states[frame.base], frame.delta);
+                    } else {
+                        ws.send(JSON.stringify({type: 'resync'}));
+                        return null;
+                    }
+                    // The server only diffs against states at or after the current base
+                    const oldest = frame.full !== undefined ? frame.seq : frame.base;
+                    Object.keys(states).forEach(seq => { if (Number(seq) < oldest) delete states[seq]; });
+                    states[frame.seq] = message;
+                }
+                ws.send(JSON.stringify({type: 'ack', seq: frame.seq}));
+                return message;
+            }
+            
             function handleWebSocketMessage(data) {
                 console.log('Received WebSocket message:', data);
                 
@@ -1460,6 +1718,10 @@ def get_html_content():
                         }
                         break;
                         
+                    case 'job_update':
+                        addLog(`Job ${data.job_id.slice(0, 8)} (${data.kind}): ${data.status}${data.error ? ' - ' + data.error : ''}`, data.status === 'failed' ? 'error' : 'info');
+                        break;
+                        
                     default:
                         addLog(`Unknown message type: ${data.type}`, 'warning');
                 }